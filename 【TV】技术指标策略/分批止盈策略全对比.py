@@ -26,11 +26,18 @@ import warnings
 warnings.filterwarnings('ignore')
 
 sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / '模块'))
 
 from 真实BTC高置信度策略 import (
     get_real_btc_data, calculate_sqzmom, calculate_wavetrend, 
-    calculate_adx, calculate_atr
+    calculate_adx, calculate_atr, _moments
 )
+from 数据快照模块 import SnapshotStore, ResultCache, code_hash, dataset_hash
+import 指标缓存模块
+from 指标缓存模块 import INDICATOR_CACHE
+import 滚动统计模块
+from 滚动统计模块 import rolling_moments
+from 规则模块 import RuleSet, TV_ENTRY_RULES
 
 
 def calculate_all_indicators(df):
@@ -61,9 +68,10 @@ def calculate_all_indicators(df):
     df['ema10'] = df['close'].ewm(span=10, adjust=False).mean()
     df['ema20'] = df['close'].ewm(span=20, adjust=False).mean()
     
-    # 布林带
-    df['bb_middle'] = df['close'].rolling(window=20).mean()
-    df['bb_std'] = df['close'].rolling(window=20).std()
+    # 布林带（融合滚动矩，样本标准差）
+    bb = rolling_moments(df['close'], 20, df['high'], df['low'], ddof=1)
+    df['bb_middle'] = bb['mean']
+    df['bb_std'] = bb['std']
     df['bb_upper'] = df['bb_middle'] + 2 * df['bb_std']
     df['bb_lower'] = df['bb_middle'] - 2 * df['bb_std']
     
@@ -96,16 +104,24 @@ def calculate_all_indicators(df):
     return df
 
 
+# 指标结果缓存键计入的全部源码：指标函数、其辅助函数（_moments / 滚动统计模块）
+# 以及 calculate_adx 调用的指标缓存模块，任何一处改动都会让缓存失效
+INDICATOR_CODE = (calculate_all_indicators, calculate_sqzmom, calculate_wavetrend, calculate_adx,
+                  calculate_atr, _moments, 滚动统计模块, 指标缓存模块)
+
+
+# 统一的入场条件（第一仓放宽到 wt1 < 40，其余同 TV_ENTRY_RULES）
+ENTRY_RULES = RuleSet({
+    1: 'wtGoldenCross and wt1 < 40',
+    2: TV_ENTRY_RULES[2].expr,
+    3: TV_ENTRY_RULES[3].expr,
+    4: TV_ENTRY_RULES[4].expr,
+})
+
+
 def get_entry_conditions(row):
     """统一的入场条件"""
-    entryCond1 = (row['wtGoldenCross'] and row['wt1'] < 40)
-    entryCond2 = (row['sqzOff'] and row['isLime'] and row['wt1'] > row['wt2'])
-    entryCond3 = (row['priceStructConfirmed'] and row['sqzOff'] and 
-                 row['isLime'] and row['wt1'] > row['wt2'])
-    entryCond4 = (row['adx'] > 20 and row['priceStructConfirmed'] and 
-                 row['sqzOff'] and row['isLime'] and row['wt1'] > row['wt2'])
-    
-    return entryCond1, entryCond2, entryCond3, entryCond4
+    return tuple(ENTRY_RULES.check(row).values())
 
 
 class PartialExitStrategy:
@@ -170,6 +186,8 @@ class PartialExitStrategy:
         peak_equity = self.initial_capital
         exit_count = 0  # 已止盈次数
         
+        entry_matrix = ENTRY_RULES.matrix(df)
+        
         for i in range(1, len(df)):
             row = df.iloc[i]
             date = row['date']
@@ -309,7 +327,7 @@ class PartialExitStrategy:
             
             # 开仓信号
             if position == 0:
-                entryCond1, entryCond2, entryCond3, entryCond4 = get_entry_conditions(row)
+                entryCond1, entryCond2, entryCond3, entryCond4 = entry_matrix[i]
                 
                 # 第一仓
                 if not long1Entered and entryCond1:
@@ -325,7 +343,7 @@ class PartialExitStrategy:
                     highest_price = price
                     exit_count = 0
             else:
-                entryCond1, entryCond2, entryCond3, entryCond4 = get_entry_conditions(row)
+                entryCond1, entryCond2, entryCond3, entryCond4 = entry_matrix[i]
                 
                 # 第二仓
                 if long1Entered and not long2Entered and entryCond2:
@@ -616,8 +634,12 @@ class VolatilityPartialExit(PartialExitStrategy):
         return False, None, None
 
 
-def compare_partial_exit_strategies(df):
-    """对比所有分批止盈策略"""
+def compare_partial_exit_strategies(df, snapshot=None, cache=None):
+    """
+    对比所有分批止盈策略
+    
+    传入 snapshot + cache 时，每个策略的回测结果按 (快照哈希, 策略参数/代码 + 指标帧内容哈希) 缓存
+    """
     print()
     print("=" * 120)
     print("🎯 分批止盈策略全对比 - 根据市场技术信号分批出场")
@@ -662,12 +684,25 @@ def compare_partial_exit_strategies(df):
     ]
     
     results = []
+    # 回测输入是派生的指标帧：按其内容哈希入键，指标代码改动后旧回测结果自动失效
+    frame_hash = dataset_hash(df, source='calculate_all_indicators') if cache is not None else None
     
     for idx, strategy in enumerate(strategies, 1):
         print(f"[{idx}/{len(strategies)}] 回测: {strategy.name}...")
         
         try:
-            portfolio_df, trades_df = strategy.run_backtest(df)
+            if snapshot is not None and cache is not None:
+                params = {
+                    'class': type(strategy).__name__,
+                    'attrs': vars(strategy),
+                    'code': code_hash(*type(strategy).__mro__[:-1]),
+                    'input': frame_hash
+                }
+                portfolio_df, trades_df = cache.memoize('partial_exit_backtest', snapshot, params,
+                                                        lambda: strategy.run_backtest(df))
+                portfolio_df, trades_df = portfolio_df.copy(), trades_df.copy()
+            else:
+                portfolio_df, trades_df = strategy.run_backtest(df)
             
             if len(portfolio_df) > 0:
                 final_value = portfolio_df['total_value'].iloc[-1]
@@ -751,6 +786,8 @@ def compare_partial_exit_strategies(df):
     hold_return = (end_price / start_price - 1) * 100
     
     print(f"📊 买入持有基准: {hold_return:+.2f}%")
+    if cache is not None:
+        print(f"💾 回测缓存: 命中 {cache.hits} 次, 未命中 {cache.misses} 次")
     print()
     
     # 找出最佳策略
@@ -789,17 +826,78 @@ def main():
     print(f"   价格范围: ${df['close'].min():,.2f} - ${df['close'].max():,.2f}")
     print()
     
+    # 数据快照：同一份数据的指标和回测结果直接复用缓存
+    results_folder = Path(__file__).parent / 'results'
+    snapshot = SnapshotStore(results_folder / '数据快照').snapshot(df, source='cryptocompare:BTC-USD:1d')
+    cache = ResultCache(results_folder / '结果缓存')
+    INDICATOR_CACHE.enable_disk(Path(__file__).parent.parent / '指标缓存')
+    print(f"📸 数据快照: {snapshot.hash}")
+    print()
+    
     # 计算指标
     print("【步骤3】计算技术指标...")
-    df = calculate_all_indicators(df)
+    df = cache.memoize('calculate_all_indicators', snapshot,
+                       {'code': code_hash(*INDICATOR_CODE)},
+                       lambda: calculate_all_indicators(snapshot.frame))
     print("✅ 指标计算完成")
+    print(f"💾 {INDICATOR_CACHE.summary()}")
     print()
     
     # 对比所有策略
     print("【步骤4】对比所有分批止盈策略...")
-    compare_partial_exit_strategies(df)
+    compare_partial_exit_strategies(df, snapshot=snapshot, cache=cache)
+
+
+def check_indicator_cache_key():
+    """
+    自检：改动辅助函数（滚动统计模块）后，指标结果缓存必须未命中
+    
+    把滚动统计模块复制到临时目录加载，替换进 INDICATOR_CODE 计算缓存键；
+    改动副本源码后键应变化，memoize 重新计算而不是返回旧结果
+    """
+    import importlib.util
+    import linecache
+    import shutil
+    import tempfile
+    
+    print("🧪 指标缓存键自检")
+    folder = Path(tempfile.mkdtemp(prefix='指标缓存键自检_'))
+    helper_path = folder / '滚动统计模块.py'
+    shutil.copy(滚动统计模块.__file__, helper_path)
+    spec = importlib.util.spec_from_file_location('滚动统计模块_副本', helper_path)
+    helper = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(helper)
+    
+    def key():
+        code = tuple(helper if obj is 滚动统计模块 else obj for obj in INDICATOR_CODE)
+        return {'code': code_hash(*code)}
+    
+    rng = np.random.default_rng(0)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.02, 300)))
+    df = pd.DataFrame({'date': pd.date_range('2022-01-01', periods=300, freq='D'), 'open': close,
+                       'high': close * 1.01, 'low': close * 0.99, 'close': close, 'volume': 1.0})
+    snapshot = SnapshotStore(folder / '数据快照').snapshot(df, source='selftest')
+    cache = ResultCache(folder / '结果缓存')
+    
+    assert key() == {'code': code_hash(*INDICATOR_CODE)}, "副本与原模块源码一致时键应相同"
+    for _ in range(2):
+        cache.memoize('calculate_all_indicators', snapshot, key(), lambda: calculate_all_indicators(snapshot.frame))
+    assert (cache.hits, cache.misses) == (1, 1), (cache.hits, cache.misses)
+    
+    # 改动辅助函数源码：键变化，缓存未命中
+    with open(helper_path, 'a', encoding='utf-8') as f:
+        f.write('\n# 自检：模拟辅助函数改动\n')
+    linecache.checkcache(str(helper_path))
+    cache.memoize('calculate_all_indicators', snapshot, key(), lambda: calculate_all_indicators(snapshot.frame))
+    print(f"   命中 {cache.hits} 次，未命中 {cache.misses} 次")
+    assert (cache.hits, cache.misses) == (1, 2), "辅助函数改动后缓存仍然命中"
+    shutil.rmtree(folder, ignore_errors=True)
+    print("✅ 指标缓存键自检通过")
 
 
 if __name__ == "__main__":
-    main()
+    if '--selftest' in sys.argv:
+        check_indicator_cache_key()
+    else:
+        main()
 
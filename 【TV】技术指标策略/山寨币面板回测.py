@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+山寨币面板回测 - 多币种一次跑完四仓渐进策略
+
+流程：
+1. yfinance 批量下载 N 个币种日线 → (币种 × 日期) 面板
+2. 面板上一次性向量化计算 WaveTrend / SQZMOM / ADX / ATR
+3. 每个币种的四仓渐进回测放进进程池并行执行
+4. 输出 results/altcoins_backtest_results.csv，并报告吞吐量（币种·年/秒）
+
+策略逻辑与 真实BTC高置信度策略.RealBTCHighConfidenceStrategy.run_backtest 逐条一致。
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / '模块'))
+
+from 真实BTC高置信度策略 import RealBTCHighConfidenceStrategy
+from 面板模块 import build_panel, panel_indicators
+from 规则模块 import TV_ENTRY_RULES
+
+ALTCOINS = {
+    'ADA-USD': 'Cardano',
+    'ETH-USD': 'Ethereum',
+    'BNB-USD': 'BNB',
+    'DOGE-USD': 'Dogecoin',
+    'XRP-USD': 'XRP',
+    'LTC-USD': 'Litecoin',
+    'SOL-USD': 'Solana',
+    'AVAX-USD': 'Avalanche',
+    'DOT-USD': 'Polkadot',
+    'MATIC-USD': 'Polygon',
+}
+
+# 回测需要的列
+BACKTEST_COLUMNS = ['close', 'low', 'atr', 'adx', 'ema10', 'ema20', 'wt1', 'wt2', 'wtGoldenCross',
+                    'sqzOff', 'isLime', 'priceStructConfirmed', 'trendExit']
+
+
+def download_altcoins(symbols, start='2019-01-01', end='2024-12-31'):
+    """yfinance 一次请求批量下载，返回 {symbol: DataFrame}"""
+    import yfinance as yf
+
+    print(f"📥 批量下载 {len(symbols)} 个币种日线...")
+    raw = yf.download(list(symbols), start=start, end=end, group_by='ticker',
+                      auto_adjust=False, progress=False, threads=True)
+    frames = {}
+    for symbol in symbols:
+        try:
+            df = raw[symbol].dropna(subset=['Close']).reset_index()
+        except KeyError:
+            print(f"⚠️  {symbol} 无数据")
+            continue
+        df.columns = [str(col).lower() for col in df.columns]
+        frames[symbol] = df[['date', 'open', 'high', 'low', 'close', 'volume']]
+        print(f"   {symbol}: {len(df)} 天")
+    return frames
+
+
+def progressive_entry_backtest(data, initial_capital=10000, leverage=1.0):
+    """
+    四仓渐进回测（单币种，数组版）
+
+    Args:
+        data: {列名: 一维数组}，列见 BACKTEST_COLUMNS
+
+    Returns:
+        dict: trades, wins, final_value, total_return, max_dd
+    """
+    strategy = RealBTCHighConfidenceStrategy(initial_capital=initial_capital, leverage=leverage)
+    levels = strategy.position_levels
+    stop_ratios = strategy.stop_loss_ratios
+    max_dd_allowed = strategy.max_drawdown_allowed
+
+    col = {key: np.asarray(data[key]).tolist() for key in BACKTEST_COLUMNS}
+    close, low, atr, adx = col['close'], col['low'], col['atr'], col['adx']
+    ema10, ema20 = col['ema10'], col['ema20']
+    trend_exit = col['trendExit']
+    entry_matrix = TV_ENTRY_RULES.matrix(data).tolist()
+
+    cash = initial_capital
+    position = 0
+    entry_prices = {}
+    entered = 0  # 已建仓层数（按顺序 base → mid → full → full2）
+    peak_equity = initial_capital
+    trail_stop_price = None
+    trades = wins = 0
+    values = []
+
+    def close_out(price):
+        nonlocal cash, position, entry_prices, entered, trail_stop_price, trades, wins
+        avg = sum(entry_prices.values()) / len(entry_prices) if entry_prices else 0
+        pnl = position * (price - avg) if entry_prices else 0
+        trades += 1
+        wins += pnl > 0
+        cash += position * price
+        position = 0
+        entry_prices = {}
+        entered = 0
+        trail_stop_price = None
+
+    for i in range(1, len(close)):
+        price = close[i]
+        total_value = cash + position * price
+
+        # 回撤控制
+        if position != 0:
+            peak_equity = max(peak_equity, total_value)
+            if (peak_equity - total_value) / peak_equity > max_dd_allowed:
+                close_out(price)
+                continue
+
+        # ATR追踪止盈
+        if position > 0:
+            if ema10[i] > ema20[i]:
+                atr_mult = 1.7 if adx[i] > 25 else (1.3 if adx[i] < 20 else 1.5)
+            else:
+                atr_mult = 1.5
+            current_trail_stop = price - atr_mult * atr[i]
+            trail_stop_price = current_trail_stop if trail_stop_price is None \
+                else max(trail_stop_price, current_trail_stop)
+            if price < trail_stop_price:
+                close_out(price)
+                continue
+
+        # 分层止损
+        if position > 0 and entry_prices:
+            if any(low[i] < entry_price * stop_ratios[level] for level, entry_price in entry_prices.items()):
+                close_out(price)
+                continue
+
+        # 趋势信号出场
+        if position > 0 and trend_exit[i]:
+            close_out(price)
+            continue
+
+        # 四阶段入场（同一根K线可以连续满足多层）
+        conditions = entry_matrix[i]
+        for level, (name, ratio) in enumerate(levels.items()):
+            if entered == level and conditions[level]:
+                qty = max(1, int(initial_capital * ratio * leverage / price))
+                position += qty
+                cash -= qty * price
+                entry_prices[name] = price
+                entered += 1
+
+        values.append(cash + position * price)
+
+    if values:
+        values = np.asarray(values)
+        peak = np.maximum.accumulate(values)
+        final_value = float(values[-1])
+        max_dd = float(((values - peak) / peak * 100).min())
+    else:
+        final_value, max_dd = float(initial_capital), 0.0
+
+    return {
+        'trades': trades,
+        'wins': wins,
+        'final_value': final_value,
+        'total_return': (final_value - initial_capital) / initial_capital * 100,
+        'max_dd': max_dd,
+    }
+
+
+def _backtest_job(args):
+    symbol, data, initial_capital = args
+    return symbol, progressive_entry_backtest(data, initial_capital)
+
+
+def run_panel_backtest(frames, names=None, initial_capital=10000, workers=None):
+    """
+    面板回测主流程
+
+    Args:
+        frames: {symbol: DataFrame}
+        workers: 进程数（None=CPU核数，1=串行）
+
+    Returns:
+        (结果DataFrame, 统计信息dict)
+    """
+    names = names or {}
+    t0 = time.perf_counter()
+    panel = build_panel(frames)
+    indicators = panel_indicators(panel)
+    t_indicators = time.perf_counter() - t0
+
+    valid = panel.valid
+    jobs = []
+    for s, symbol in enumerate(panel.symbols):
+        mask = valid[s]
+        data = {key: (indicators[key] if key in indicators else panel[key])[s, mask] for key in BACKTEST_COLUMNS}
+        jobs.append((symbol, data, initial_capital))
+
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outcomes = dict(pool.map(_backtest_job, jobs))
+    else:
+        outcomes = dict(map(_backtest_job, jobs))
+    elapsed = time.perf_counter() - t0
+
+    rows = []
+    for s, symbol in enumerate(panel.symbols):
+        mask = valid[s]
+        close = panel['close'][s, mask]
+        dates = panel.dates[mask]
+        outcome = outcomes[symbol]
+        hold_return = (close[-1] / close[0] - 1) * 100
+        rows.append({
+            'symbol': symbol,
+            'name': names.get(symbol, symbol),
+            'days': int(mask.sum()),
+            'trades': outcome['trades'],
+            'win_rate': outcome['wins'] / outcome['trades'] * 100 if outcome['trades'] else 0,
+            'total_return': outcome['total_return'],
+            'max_dd': outcome['max_dd'],
+            'final_value': outcome['final_value'],
+            'hold_return': hold_return,
+            'outperform': outcome['total_return'] - hold_return,
+            'start_date': dates[0].tz_localize('UTC'),
+            'end_date': dates[-1].tz_localize('UTC'),
+        })
+
+    results = pd.DataFrame(rows).sort_values('total_return', ascending=False).reset_index(drop=True)
+    stats = {
+        'symbols': len(panel.symbols),
+        'symbol_years': panel.symbol_years(),
+        'indicator_seconds': t_indicators,
+        'total_seconds': elapsed,
+        'workers': workers,
+    }
+    stats['throughput'] = stats['symbol_years'] / elapsed if elapsed > 0 else float('inf')
+    return results, stats
+
+
+def main():
+    print("=" * 100)
+    print("🎯 山寨币面板回测（四仓渐进策略）")
+    print("=" * 100)
+    print()
+
+    print("【步骤1】下载数据...")
+    frames = download_altcoins(ALTCOINS)
+    if not frames:
+        print("❌ 无法获取数据，退出程序")
+        return
+    print()
+
+    print("【步骤2】面板指标 + 并行回测...")
+    results, stats = run_panel_backtest(frames, names=ALTCOINS)
+    print(f"✅ {stats['symbols']} 个币种, {stats['symbol_years']:.1f} 币种·年")
+    print(f"   指标 {stats['indicator_seconds']*1000:.0f}ms, 总计 {stats['total_seconds']*1000:.0f}ms "
+          f"({stats['workers']} 进程)")
+    print(f"   吞吐量: {stats['throughput']:.1f} 币种·年/秒")
+    print()
+
+    print("【步骤3】结果对比")
+    print("-" * 100)
+    print(f"{'币种':<12} {'天数':>6} {'交易':>6} {'胜率':>8} {'策略收益':>12} {'最大回撤':>10} {'持有收益':>12} {'超额':>12}")
+    for _, row in results.iterrows():
+        print(f"{row['symbol']:<12} {row['days']:>6} {row['trades']:>6} {row['win_rate']:>7.1f}% "
+              f"{row['total_return']:>+11.1f}% {row['max_dd']:>9.1f}% {row['hold_return']:>+11.1f}% "
+              f"{row['outperform']:>+11.1f}%")
+    print()
+
+    output = Path(__file__).parent / 'results' / 'altcoins_backtest_results.csv'
+    output.parent.mkdir(exist_ok=True)
+    results.to_csv(output, index=False, encoding='utf-8-sig')
+    print(f"✅ 结果已保存到: results/{output.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,11 @@ from datetime import datetime, timedelta
 
 # 添加模块路径
 sys.path.append(str(Path(__file__).parent / '模块'))
+sys.path.append(str(Path(__file__).parent.parent / '模块'))
+from 指标缓存模块 import cached_indicator, adx as cached_adx
+import 滚动统计模块
+from 滚动统计模块 import rolling_moments
+from 规则模块 import TV_ENTRY_RULES
 
 
 def get_real_btc_data():
@@ -128,28 +133,32 @@ def get_real_btc_data():
         return None
 
 
+def _moments(df, length, use_true_range=True):
+    """融合滚动矩（样本标准差，与 pandas rolling().std() 口径一致），返回 {名称: Series}"""
+    moments = rolling_moments(df['close'], length, df['high'], df['low'], ddof=1,
+                              use_true_range=use_true_range)
+    return {key: pd.Series(value, index=df.index) for key, value in moments.items()}
+
+
+# 缓存键计入 _moments 与滚动统计模块的源码，辅助函数改动后磁盘缓存自动失效
+@cached_indicator('sqzmom_tv', depends=(_moments, 滚动统计模块))
 def calculate_sqzmom(df, lengthBB=20, multBB=2.0, lengthKC=20, multKC=1.5, useTrueRange=True):
     """计算SQZMOM挤压动能指标 - 严格按照TradingView实现"""
     source = df['close']
     
+    # 布林带 / 肯特纳通道：融合滚动矩一次算出均值、样本标准差、最高/最低、波幅均值
+    bb = _moments(df, lengthBB, useTrueRange)
+    kc = bb if lengthKC == lengthBB else _moments(df, lengthKC, useTrueRange)
+    
     # 布林带计算
-    basis = source.rolling(window=lengthBB).mean()
-    dev = multBB * source.rolling(window=lengthBB).std()
+    basis = bb['mean']
+    dev = multBB * bb['std']
     upperBB = basis + dev
     lowerBB = basis - dev
     
-    # 肯特纳通道计算
-    maKC = source.rolling(window=lengthKC).mean()
-    if useTrueRange:
-        # 计算True Range
-        tr1 = df['high'] - df['low']
-        tr2 = abs(df['high'] - df['close'].shift(1))
-        tr3 = abs(df['low'] - df['close'].shift(1))
-        rangeKC = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    else:
-        rangeKC = df['high'] - df['low']
-    
-    rangemaKC = rangeKC.rolling(window=lengthKC).mean()
+    # 肯特纳通道计算（rangeKC = useTrueRange ? TR : high - low）
+    maKC = kc['mean']
+    rangemaKC = kc['range_mean']
     upperKC = maKC + rangemaKC * multKC
     lowerKC = maKC - rangemaKC * multKC
     
@@ -158,8 +167,8 @@ def calculate_sqzmom(df, lengthBB=20, multBB=2.0, lengthKC=20, multKC=1.5, useTr
     sqzOff = (lowerBB < lowerKC) & (upperBB > upperKC)
     
     # 动能线线性回归 - 严格按照TradingView的linreg实现
-    avgHL = (df['high'].rolling(window=lengthKC).max() + df['low'].rolling(window=lengthKC).min()) / 2
-    avgAll = (avgHL + source.rolling(window=lengthKC).mean()) / 2
+    avgHL = (kc['max'] + kc['min']) / 2
+    avgAll = (avgHL + maKC) / 2
     
     # 线性回归斜率计算
     def linreg_slope(series):
@@ -187,6 +196,7 @@ def calculate_sqzmom(df, lengthBB=20, multBB=2.0, lengthKC=20, multKC=1.5, useTr
     }
 
 
+@cached_indicator('wavetrend_close')
 def calculate_wavetrend(df, channelLength=10, averageLength=21):
     """计算WaveTrend指标 - 严格按照TradingView实现"""
     esa = df['close'].ewm(span=channelLength, adjust=False).mean()
@@ -209,39 +219,19 @@ def calculate_wavetrend(df, channelLength=10, averageLength=21):
 
 
 def calculate_adx(df, length=14):
-    """计算ADX指标 - 严格按照TradingView实现"""
-    high_diff = df['high'].diff()
-    low_diff = -df['low'].diff()
-    
-    plus_dm = high_diff.where((high_diff > low_diff) & (high_diff > 0), 0)
-    minus_dm = low_diff.where((low_diff > high_diff) & (low_diff > 0), 0)
-    
-    tr1 = df['high'] - df['low']
-    tr2 = abs(df['high'] - df['close'].shift(1))
-    tr3 = abs(df['low'] - df['close'].shift(1))
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    
-    atr = tr.rolling(window=length).mean()
-    plus_di = 100 * (plus_dm.rolling(window=length).mean() / atr)
-    minus_di = 100 * (minus_dm.rolling(window=length).mean() / atr)
-    
-    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
-    adx = dx.rolling(window=length).mean()
-    
+    """计算ADX指标 - 严格按照TradingView实现（与WT策略共用缓存）"""
+    result = cached_adx(df, period=length)
     return {
-        'plusDI': plus_di,
-        'minusDI': minus_di,
-        'adx': adx
+        'plusDI': result['plus_di'],
+        'minusDI': result['minus_di'],
+        'adx': result['adx']
     }
 
 
+@cached_indicator('atr_sma', depends=(_moments, 滚动统计模块))
 def calculate_atr(df, length=14):
-    """计算ATR指标"""
-    tr1 = df['high'] - df['low']
-    tr2 = abs(df['high'] - df['close'].shift(1))
-    tr3 = abs(df['low'] - df['close'].shift(1))
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    return tr.rolling(window=length).mean()
+    """计算ATR指标（真实波幅的简单移动平均）"""
+    return _moments(df, length)['range_mean']
 
 
 def calculate_all_indicators(df):
@@ -320,34 +310,16 @@ class RealBTCHighConfidenceStrategy:
         self.max_drawdown_allowed = 0.30 / self.leverage  # 30% / 杠杆倍数
     
     def get_entry_conditions(self, row):
-        """获取入场条件 - 严格按照TradingView Pine Script逻辑"""
-        # 四阶段入场条件 - 完全按照Pine Script实现
-        
-        # 第一仓：highlightGreen and wtGoldenCross and (wt1 < -20)
-        # highlightGreen = sqz4h or (mom4h > nz(mom4h[1]) and mom4h > 0)
-        # 由于没有4小时数据，简化为基础条件
-        entryCond1 = (row['wtGoldenCross'] and 
-                     row['wt1'] < -20)
-        
-        # 第二仓：sqzOff and isLime and wt1 > wt2
-        entryCond2 = (row['sqzOff'] and 
-                     row['isLime'] and 
-                     row['wt1'] > row['wt2'])
-        
-        # 第三仓：priceStructConfirmed and sqzOff and isLime and wt1 > wt2
-        entryCond3 = (row['priceStructConfirmed'] and 
-                     row['sqzOff'] and 
-                     row['isLime'] and 
-                     row['wt1'] > row['wt2'])
-        
-        # 第四仓：adx > adxThreshold and priceStructConfirmed and sqzOff and isLime and wt1 > wt2
-        entryCond4 = (row['adx'] > 20 and 
-                     row['priceStructConfirmed'] and 
-                     row['sqzOff'] and 
-                     row['isLime'] and 
-                     row['wt1'] > row['wt2'])
-        
-        return entryCond1, entryCond2, entryCond3, entryCond4
+        """
+        获取入场条件 - 严格按照TradingView Pine Script逻辑（规则见 TV_ENTRY_RULES）
+        
+        第一仓：highlightGreen and wtGoldenCross and (wt1 < -20)
+                （没有4小时数据，highlightGreen 省略）
+        第二仓：sqzOff and isLime and wt1 > wt2
+        第三仓：priceStructConfirmed and 第二仓条件
+        第四仓：adx > adxThreshold and 第三仓条件
+        """
+        return tuple(TV_ENTRY_RULES.check(row).values())
     
     def calculate_atr_multiplier(self, row):
         """计算ATR倍数 - 严格按照TradingView逻辑"""
@@ -393,6 +365,9 @@ class RealBTCHighConfidenceStrategy:
         peak_equity = self.initial_capital
         trail_stop_price = None
         
+        # 四阶段入场条件整段一次算出（与 get_entry_conditions 同一套规则）
+        entry_matrix = TV_ENTRY_RULES.matrix(df)
+        
         for i in range(1, len(df)):
             row = df.iloc[i]
             prev_row = df.iloc[i-1]
@@ -536,7 +511,7 @@ class RealBTCHighConfidenceStrategy:
                 continue
             
             # === 开仓信号（按照Pine Script四阶段入场逻辑） ===
-            entryCond1, entryCond2, entryCond3, entryCond4 = self.get_entry_conditions(row)
+            entryCond1, entryCond2, entryCond3, entryCond4 = entry_matrix[i]
             
             # 第一仓：Long-1
             if not long1Entered and entryCond1:
@@ -11,7 +11,9 @@ import numpy as np
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent / '模块'))
+sys.path.append(str(Path(__file__).parent.parent / '模块'))
 from 数据模块 import DataModule
+from 指标缓存模块 import INDICATOR_CACHE, wavetrend, adx
 
 
 def calculate_all_indicators(df):
@@ -20,14 +22,9 @@ def calculate_all_indicators(df):
     df = df.copy()
     
     # 1. WaveTrend（TradingView标准）
-    n1, n2 = 10, 21
-    hlc3 = (df['high'] + df['low'] + df['close']) / 3
-    esa = hlc3.ewm(span=n1, adjust=False).mean()
-    d = (hlc3 - esa).abs().ewm(span=n1, adjust=False).mean()
-    ci = (hlc3 - esa) / (0.015 * d)
-    
-    df['wt1'] = ci.ewm(span=n2, adjust=False).mean()  # EMA
-    df['wt2'] = df['wt1'].rolling(window=4).mean()  # SMA
+    wt = wavetrend(df, n1=10, n2=21)
+    df['wt1'] = wt['wt1']
+    df['wt2'] = wt['wt2']
     
     # 2. 动量指标（多个周期）
     df['momentum_5d'] = df['close'].pct_change(5)
@@ -38,24 +35,7 @@ def calculate_all_indicators(df):
     df['momentum_20d_norm'] = (df['momentum_20d'] - df['momentum_20d'].mean()) / df['momentum_20d'].std()
     
     # 3. ADX（趋势强度）
-    period = 14
-    high_diff = df['high'].diff()
-    low_diff = -df['low'].diff()
-    
-    plus_dm = high_diff.where((high_diff > low_diff) & (high_diff > 0), 0)
-    minus_dm = low_diff.where((low_diff > high_diff) & (low_diff > 0), 0)
-    
-    tr1 = df['high'] - df['low']
-    tr2 = abs(df['high'] - df['close'].shift())
-    tr3 = abs(df['low'] - df['close'].shift())
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    
-    atr = tr.rolling(window=period).mean()
-    plus_di = 100 * (plus_dm.rolling(window=period).mean() / atr)
-    minus_di = 100 * (minus_dm.rolling(window=period).mean() / atr)
-    
-    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
-    df['adx'] = dx.rolling(window=period).mean()
+    df['adx'] = adx(df, period=14)['adx']
     
     # 4. 移动平均线（趋势过滤）
     df['ma50'] = df['close'].rolling(window=50).mean()
@@ -323,7 +303,9 @@ def main():
     
     # 计算指标
     print("【步骤2】计算所有指标...")
+    INDICATOR_CACHE.enable_disk(Path(__file__).parent.parent / '指标缓存')
     df = calculate_all_indicators(price_data)
+    print(f"💾 {INDICATOR_CACHE.summary()}")
     print()
     
     # 测试不同策略
@@ -11,7 +11,9 @@ import numpy as np
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent / '模块'))
+sys.path.append(str(Path(__file__).parent.parent / '模块'))
 from 数据模块 import DataModule
+from 指标缓存模块 import INDICATOR_CACHE, wavetrend, adx
 
 
 def calculate_indicators(df):
@@ -19,38 +21,16 @@ def calculate_indicators(df):
     df = df.copy()
     
     # WaveTrend（TradingView标准）
-    n1, n2 = 10, 21
-    hlc3 = (df['high'] + df['low'] + df['close']) / 3
-    esa = hlc3.ewm(span=n1, adjust=False).mean()
-    d = (hlc3 - esa).abs().ewm(span=n1, adjust=False).mean()
-    ci = (hlc3 - esa) / (0.015 * d)
-    
-    df['wt1'] = ci.ewm(span=n2, adjust=False).mean()  # EMA
-    df['wt2'] = df['wt1'].rolling(window=4).mean()  # SMA
+    wt = wavetrend(df, n1=10, n2=21)
+    df['wt1'] = wt['wt1']
+    df['wt2'] = wt['wt2']
     
     # 动量
     mom_20d = df['close'].pct_change(20)
     df['momentum'] = (mom_20d - mom_20d.mean()) / mom_20d.std()
     
     # ADX
-    period = 14
-    high_diff = df['high'].diff()
-    low_diff = -df['low'].diff()
-    
-    plus_dm = high_diff.where((high_diff > low_diff) & (high_diff > 0), 0)
-    minus_dm = low_diff.where((low_diff > high_diff) & (low_diff > 0), 0)
-    
-    tr1 = df['high'] - df['low']
-    tr2 = abs(df['high'] - df['close'].shift())
-    tr3 = abs(df['low'] - df['close'].shift())
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    
-    atr = tr.rolling(window=period).mean()
-    plus_di = 100 * (plus_dm.rolling(window=period).mean() / atr)
-    minus_di = 100 * (minus_dm.rolling(window=period).mean() / atr)
-    
-    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
-    df['adx'] = dx.rolling(window=period).mean()
+    df['adx'] = adx(df, period=14)['adx']
     
     return df
 
@@ -299,7 +279,9 @@ def main():
     
     # 计算指标
     print("【步骤2】计算指标...")
+    INDICATOR_CACHE.enable_disk(Path(__file__).parent.parent / '指标缓存')
     df = calculate_indicators(price_data)
+    print(f"💾 {INDICATOR_CACHE.summary()}")
     print()
     
     # 测试多种双向策略
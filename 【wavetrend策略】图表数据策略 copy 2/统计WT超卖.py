@@ -11,7 +11,9 @@ import numpy as np
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent / '模块'))
+sys.path.append(str(Path(__file__).parent.parent / '模块'))
 from 数据模块 import DataModule
+from 事件研究模块 import EventStudy
 
 
 def calculate_wavetrend(df):
@@ -48,46 +50,31 @@ def analyze_wt_levels(df):
     print("=" * 100)
     print()
     
-    # 定义不同的超卖阈值
+    # 定义不同的超卖阈值：每根满足条件的K线都是一个事件，一次算完
     thresholds = [-30, -40, -50, -60, -70]
+    study = EventStudy(df['close'], df['high'], df['low'], dates=df['date'], horizons=(5, 20, 60))
+    events = study.bar_events({f'wt1 < {threshold}': df['wt1'] < threshold for threshold in thresholds})
+    table = study.summary(events)
+    prices = events.groupby('event', sort=False)['anchor_price'].agg(['mean', 'min', 'max'])
     
     results = []
     
-    for threshold in thresholds:
-        # 找出wt1低于阈值的情况
-        oversold = df[df['wt1'] < threshold].copy()
-        count = len(oversold)
-        
-        if count == 0:
-            continue
-        
-        # 统计这些时刻的价格和未来收益
-        avg_price = oversold['close'].mean()
-        min_price = oversold['close'].min()
-        max_price = oversold['close'].max()
-        
-        # 未来收益统计
-        avg_return_5d = oversold['return_5d'].mean()
-        avg_return_20d = oversold['return_20d'].mean()
-        avg_return_60d = oversold['return_60d'].mean()
-        
-        win_rate_5d = (oversold['return_5d'] > 0).sum() / oversold['return_5d'].notna().sum() * 100 if oversold['return_5d'].notna().sum() > 0 else 0
-        win_rate_20d = (oversold['return_20d'] > 0).sum() / oversold['return_20d'].notna().sum() * 100 if oversold['return_20d'].notna().sum() > 0 else 0
-        win_rate_60d = (oversold['return_60d'] > 0).sum() / oversold['return_60d'].notna().sum() * 100 if oversold['return_60d'].notna().sum() > 0 else 0
-        
+    for name, stats in table.iterrows():
         results.append({
-            'threshold': f'wt1 < {threshold}',
-            'count': count,
-            'percentage': count / len(df) * 100,
-            'avg_price': avg_price,
-            'min_price': min_price,
-            'max_price': max_price,
-            'avg_return_5d': avg_return_5d,
-            'avg_return_20d': avg_return_20d,
-            'avg_return_60d': avg_return_60d,
-            'win_rate_5d': win_rate_5d,
-            'win_rate_20d': win_rate_20d,
-            'win_rate_60d': win_rate_60d
+            'threshold': name,
+            'count': int(stats['count']),
+            'percentage': stats['count'] / len(df) * 100,
+            'avg_price': prices.loc[name, 'mean'],
+            'min_price': prices.loc[name, 'min'],
+            'max_price': prices.loc[name, 'max'],
+            'avg_return_5d': stats['avg_return_5d'],
+            'avg_return_20d': stats['avg_return_20d'],
+            'avg_return_60d': stats['avg_return_60d'],
+            'win_rate_5d': stats['win_rate_5d'] if stats['win_rate_5d'] == stats['win_rate_5d'] else 0,
+            'win_rate_20d': stats['win_rate_20d'] if stats['win_rate_20d'] == stats['win_rate_20d'] else 0,
+            'win_rate_60d': stats['win_rate_60d'] if stats['win_rate_60d'] == stats['win_rate_60d'] else 0,
+            'avg_mfe_20d': stats['avg_mfe_20d'],
+            'avg_mae_20d': stats['avg_mae_20d']
         })
     
     # 显示统计结果
@@ -111,6 +98,7 @@ def analyze_wt_levels(df):
         print(f"  未来5日收益: {r['avg_return_5d']:+.2f}% (胜率 {r['win_rate_5d']:.1f}%)")
         print(f"  未来20日收益: {r['avg_return_20d']:+.2f}% (胜率 {r['win_rate_20d']:.1f}%)")
         print(f"  未来60日收益: {r['avg_return_60d']:+.2f}% (胜率 {r['win_rate_60d']:.1f}%)")
+        print(f"  20日内最大浮盈/浮亏: {r['avg_mfe_20d']:+.2f}% / {r['avg_mae_20d']:+.2f}%")
     
     return results
 
@@ -169,30 +157,26 @@ def analyze_golden_cross_after_oversold(df):
     print("=" * 100)
     print()
     
-    df = df.copy()
-    
     # 找出金叉点
-    df['golden_cross'] = ((df['wt1'] > df['wt2']) & 
-                          (df['wt1'].shift(1) <= df['wt2'].shift(1)))
+    golden_cross = ((df['wt1'] > df['wt2']) & 
+                    (df['wt1'].shift(1) <= df['wt2'].shift(1)))
     
-    # 分析不同超卖程度下出现金叉的情况
+    # 分析不同超卖程度下出现金叉的情况（所有阈值一次统计）
     thresholds = [-30, -40, -50, -60]
+    study = EventStudy(df['close'], df['high'], df['low'], dates=df['date'], horizons=(5, 20, 60))
+    events = study.bar_events({f'wt1 < {threshold}': (df['wt1'] < threshold) & golden_cross
+                               for threshold in thresholds})
+    table = study.summary(events)
     
-    print(f"{'超卖阈值':<15} {'金叉次数':<12} {'平均20日收益':<15} {'胜率':<10}")
-    print("-" * 70)
+    print(f"{'超卖阈值':<15} {'金叉次数':<12} {'平均20日收益':<15} {'胜率':<10} {'20日最大浮盈':<14} {'20日最大浮亏':<14}")
+    print("-" * 100)
     
-    for threshold in thresholds:
-        # 找出在超卖区域且发生金叉的情况
-        condition = (df['wt1'] < threshold) & df['golden_cross']
-        signals = df[condition]
-        
-        if len(signals) == 0:
-            continue
-        
-        avg_return = signals['return_20d'].mean()
-        win_rate = (signals['return_20d'] > 0).sum() / signals['return_20d'].notna().sum() * 100 if signals['return_20d'].notna().sum() > 0 else 0
-        
-        print(f"wt1 < {threshold:<6} {len(signals):<12} {avg_return:>+10.2f}%       {win_rate:>6.1f}%")
+    for name, stats in table.iterrows():
+        win_rate = stats['win_rate_20d'] if stats['win_rate_20d'] == stats['win_rate_20d'] else 0
+        print(f"{name:<15} {int(stats['count']):<12} {stats['avg_return_20d']:>+10.2f}%       {win_rate:>6.1f}%"
+              f"     {stats['avg_mfe_20d']:>+8.2f}%      {stats['avg_mae_20d']:>+8.2f}%")
+    
+    return events
 
 
 def main():
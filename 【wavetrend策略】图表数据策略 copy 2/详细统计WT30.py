@@ -10,7 +10,9 @@ import numpy as np
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent / '模块'))
+sys.path.append(str(Path(__file__).parent.parent / '模块'))
 from 数据模块 import DataModule
+from 事件研究模块 import EventStudy
 
 
 def calculate_wavetrend(df):
@@ -33,77 +35,26 @@ def calculate_wavetrend(df):
 
 
 def find_continuous_periods(df):
-    """将连续的超卖天数合并为一个周期"""
-    df = df.copy()
-    df['oversold'] = df['wt1'] < -30
-    
-    periods = []
-    in_period = False
-    period_start = None
-    period_data = []
-    
-    for i in range(len(df)):
-        row = df.iloc[i]
-        
-        if row['oversold'] and not in_period:
-            # 开始新的超卖周期
-            in_period = True
-            period_start = i
-            period_data = [row]
-        elif row['oversold'] and in_period:
-            # 继续超卖周期
-            period_data.append(row)
-        elif not row['oversold'] and in_period:
-            # 超卖周期结束
-            in_period = False
-            
-            # 记录这个周期
-            start_date = period_data[0]['date']
-            end_date = period_data[-1]['date']
-            duration = len(period_data)
-            
-            # 找出最低wt1
-            min_wt1 = min([p['wt1'] for p in period_data])
-            min_wt1_date = [p['date'] for p in period_data if p['wt1'] == min_wt1][0]
-            min_wt1_price = [p['close'] for p in period_data if p['wt1'] == min_wt1][0]
-            
-            # 计算周期结束后的涨幅
-            end_price = period_data[-1]['close']
-            
-            # 计算未来涨幅
-            if i + 5 < len(df):
-                price_5d = df.iloc[i + 5]['close']
-                return_5d = (price_5d / end_price - 1) * 100
-            else:
-                return_5d = np.nan
-            
-            if i + 20 < len(df):
-                price_20d = df.iloc[i + 20]['close']
-                return_20d = (price_20d / end_price - 1) * 100
-            else:
-                return_20d = np.nan
-            
-            if i + 60 < len(df):
-                price_60d = df.iloc[i + 60]['close']
-                return_60d = (price_60d / end_price - 1) * 100
-            else:
-                return_60d = np.nan
-            
-            periods.append({
-                'period_num': len(periods) + 1,
-                'start_date': start_date,
-                'end_date': end_date,
-                'duration': duration,
-                'min_wt1': min_wt1,
-                'min_wt1_date': min_wt1_date,
-                'min_wt1_price': min_wt1_price,
-                'exit_price': end_price,
-                'return_5d': return_5d,
-                'return_20d': return_20d,
-                'return_60d': return_60d
-            })
-    
-    return pd.DataFrame(periods)
+    """将连续的超卖天数合并为一个周期（游程编码，向量化）"""
+    study = EventStudy(df['close'], df['high'], df['low'], dates=df['date'], horizons=(5, 20, 60))
+    # 周期结束后第1天起计持有期；到最后一天仍在超卖区的周期不计入
+    runs = study.run_events(df['wt1'] < -30, values=df['wt1'], anchor='end', offset=1)
+    
+    return pd.DataFrame({
+        'period_num': np.arange(1, len(runs) + 1),
+        'start_date': runs['start_date'],
+        'end_date': runs['end_date'],
+        'duration': runs['duration'],
+        'min_wt1': runs['min_value'],
+        'min_wt1_date': runs['min_date'],
+        'min_wt1_price': runs['min_price'],
+        'exit_price': runs['anchor_price'],
+        'return_5d': runs['return_5d'],
+        'return_20d': runs['return_20d'],
+        'return_60d': runs['return_60d'],
+        'mfe_20d': runs['mfe_20d'],
+        'mae_20d': runs['mae_20d']
+    })
 
 
 def main():
@@ -167,6 +118,7 @@ def main():
     print(f"  5日后:  {avg_return_5d:+.2f}% (胜率 {win_rate_5d:.1f}%)")
     print(f"  20日后: {avg_return_20d:+.2f}% (胜率 {win_rate_20d:.1f}%)")
     print(f"  60日后: {avg_return_60d:+.2f}% (胜率 {win_rate_60d:.1f}%)")
+    print(f"20日内平均最大浮盈 {periods_df['mfe_20d'].mean():+.2f}%, 平均最大浮亏 {periods_df['mae_20d'].mean():+.2f}%")
     print()
     
     # 详细列表
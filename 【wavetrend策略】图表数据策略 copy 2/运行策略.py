@@ -10,10 +10,12 @@ import pandas as pd
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent / '模块'))
+sys.path.append(str(Path(__file__).parent.parent / '模块'))
 
 from 核心策略模块 import ScoringModule, TrendTradingStrategy
 from 核心回测模块 import TrendBacktestEngine
 from 数据模块 import DataModule
+from 数据快照模块 import SnapshotStore, ResultCache, code_hash
 
 def main():
     print("=" * 100)
@@ -86,18 +88,33 @@ def main():
         scored_data = scoring.calculate_period_scores(full_data)
     print()
     
+    # 数据快照：数据和代码不变时，策略与回测结果直接读缓存
+    snapshot = SnapshotStore('数字化数据/数据快照').snapshot(scored_data, source='cryptocompare+chart_digitized:BTC:1d')
+    cache = ResultCache('数字化数据/结果缓存')
+    print(f"📸 数据快照: {snapshot.hash}")
+    print()
+    
     # 3. 运行策略
     print("【步骤3】运行趋势交易策略...")
     print("-" * 100)
     strategy = TrendTradingStrategy()
-    strategy_results = strategy.run_strategy(scored_data)
+    strategy_results = cache.memoize('run_strategy', snapshot, {'code': code_hash(TrendTradingStrategy)},
+                                     lambda: strategy.run_strategy(snapshot.frame))
     print()
     
     # 4. 运行回测
     print("【步骤4】运行回测...")
     print("-" * 100)
     backtest = TrendBacktestEngine(initial_capital=10000, max_loss_per_trade=0.10)
-    portfolio_df, trades_df = backtest.run_backtest(strategy_results)
+    backtest_params = {
+        'initial_capital': backtest.initial_capital,
+        'max_loss_per_trade': backtest.max_loss_per_trade,
+        # 回测输入来自 TrendTradingStrategy：上游策略代码改动后回测缓存也要失效
+        'code': code_hash(TrendBacktestEngine, TrendTradingStrategy)
+    }
+    portfolio_df, trades_df = cache.memoize('run_backtest', snapshot, backtest_params,
+                                            lambda: backtest.run_backtest(strategy_results))
+    print(f"💾 结果缓存: 命中 {cache.hits} 次, 未命中 {cache.misses} 次")
     
     # 5. 保存结果
     print("【步骤5】保存结果...")
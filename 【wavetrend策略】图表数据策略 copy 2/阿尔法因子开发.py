@@ -12,7 +12,10 @@ from pathlib import Path
 from scipy import stats
 
 sys.path.append(str(Path(__file__).parent / '模块'))
+sys.path.append(str(Path(__file__).parent.parent / '模块'))
 from 数据模块 import DataModule
+from 因子IC模块 import ICEngine
+from 因子阈值网格模块 import threshold_grid_backtest, best_thresholds
 
 
 class AlphaFactorLibrary:
@@ -183,6 +186,7 @@ class FactorAnalyzer:
     
     def __init__(self):
         self.factor_lib = AlphaFactorLibrary()
+        self.ic_engine = None
     
     def calculate_all_factors(self, df):
         """计算所有因子"""
@@ -242,30 +246,26 @@ class FactorAnalyzer:
         
         factor_cols = [col for col in df.columns if col.startswith('factor_')]
         
+        # 所有因子 × 所有周期一次算完（每个因子、每个周期只做一次秩变换）
+        self.ic_engine = ICEngine(df[factor_cols], df['close'], dates=df.get('date'))
+        ic_table = self.ic_engine.ic_table((5, 20, 60))
+        
         results = []
         
         for factor_name in factor_cols:
             factor_display_name = factor_name.replace('factor_', '').replace('_', ' ').title()
-            
-            # 计算不同周期的IC值
-            ic_5d, p_5d = self.calculate_ic(df[factor_name], df['future_return_5d'])
-            ic_20d, p_20d = self.calculate_ic(df[factor_name], df['future_return_20d'])
-            ic_60d, p_60d = self.calculate_ic(df[factor_name], df['future_return_60d'])
-            
-            # 计算因子的均值和标准差
-            factor_mean = df[factor_name].mean()
-            factor_std = df[factor_name].std()
+            row = ic_table.loc[factor_name]
             
             results.append({
                 'factor': factor_display_name,
-                'ic_5d': ic_5d,
-                'p_5d': p_5d,
-                'ic_20d': ic_20d,
-                'p_20d': p_20d,
-                'ic_60d': ic_60d,
-                'p_60d': p_60d,
-                'mean': factor_mean,
-                'std': factor_std
+                'ic_5d': row['ic_5d'],
+                'p_5d': row['p_5d'],
+                'ic_20d': row['ic_20d'],
+                'p_20d': row['p_20d'],
+                'ic_60d': row['ic_60d'],
+                'p_60d': row['p_60d'],
+                'mean': df[factor_name].mean(),
+                'std': df[factor_name].std()
             })
         
         results_df = pd.DataFrame(results)
@@ -302,6 +302,40 @@ class FactorAnalyzer:
         
         return results_df
     
+    def analyze_ic_decay(self, df, max_horizon=120, rolling_horizon=20, window=250):
+        """
+        IC衰减（1~max_horizon日）与滚动IC稳定性
+        复用 evaluate_factors 建好的引擎（秩已缓存）
+        """
+        if self.ic_engine is None:
+            factor_cols = [col for col in df.columns if col.startswith('factor_')]
+            self.ic_engine = ICEngine(df[factor_cols], df['close'], dates=df.get('date'))
+        
+        decay = self.ic_engine.decay_summary(max_horizon)
+        rolling = self.ic_engine.rolling_ic(rolling_horizon, window=window)
+        
+        print()
+        print(f"📉 IC衰减（1~{max_horizon}日）与滚动IC（{rolling_horizon}日收益, {window}日窗口）:")
+        print()
+        print(f"{'因子名称':<25} {'峰值IC':<10} {'峰值周期':<10} {'半衰期':<10} {'滚动IC均值':<12} {'IR':<8}")
+        print("-" * 100)
+        
+        rows = []
+        for factor_name, row in decay.iterrows():
+            series = rolling[factor_name].dropna()
+            ic_mean = series.mean() if len(series) else np.nan
+            ic_ir = ic_mean / series.std() if len(series) > 1 and series.std() > 0 else np.nan
+            half_life = f"{row['half_life']:.0f}日" if not pd.isna(row['half_life']) else f">{max_horizon}日"
+            peak_ic = f"{row['peak_ic']:+.4f}" if not pd.isna(row['peak_ic']) else "N/A"
+            print(f"{factor_name.replace('factor_', '').replace('_', ' ').title():<25} "
+                  f"{peak_ic:<10} {str(int(row['peak_horizon'])) + '日':<10} {half_life:<10} "
+                  f"{ic_mean:+.4f}      {ic_ir:+.2f}")
+            rows.append({'factor': factor_name, 'peak_ic': row['peak_ic'], 'peak_horizon': int(row['peak_horizon']),
+                         'half_life': row['half_life'], 'rolling_ic_mean': ic_mean, 'rolling_ic_ir': ic_ir})
+        
+        print()
+        return pd.DataFrame(rows)
+    
     def test_factor_strategy(self, df, factor_name, threshold=0.5):
         """
         测试单个因子的交易策略
@@ -311,54 +345,42 @@ class FactorAnalyzer:
         print(f"🔍 测试因子策略: {factor_name.replace('factor_', '').replace('_', ' ').title()}")
         print("-" * 80)
         
-        df = df.copy()
-        df = df.dropna(subset=[factor_name, 'close'])
-        
-        initial_capital = 10000
-        cash = initial_capital
-        btc_holdings = 0
-        
-        trades = []
-        portfolio_values = []
+        result = threshold_grid_backtest(df[[factor_name]], df['close'], entries=[threshold]).iloc[0]
+        total_return, max_dd, trades = result['return'], result['max_dd'], int(result['trades'])
         
-        for i in range(len(df)):
-            row = df.iloc[i]
-            price = row['close']
-            factor_value = row[factor_name]
-            
-            # 买入信号
-            if factor_value > threshold and btc_holdings == 0 and cash > 0:
-                btc_holdings = (cash * 0.95) / price
-                cash = cash * 0.05
-                trades.append({'date': row['date'], 'action': 'BUY', 'price': price})
-            
-            # 卖出信号
-            elif factor_value < -threshold and btc_holdings > 0:
-                cash += btc_holdings * price
-                btc_holdings = 0
-                trades.append({'date': row['date'], 'action': 'SELL', 'price': price})
-            
-            total_value = cash + btc_holdings * price
-            portfolio_values.append(total_value)
-        
-        final_value = portfolio_values[-1]
-        total_return = (final_value - initial_capital) / initial_capital * 100
-        
-        # 计算最大回撤
-        peak = initial_capital
-        max_dd = 0
-        for value in portfolio_values:
-            if value > peak:
-                peak = value
-            dd = (peak - value) / peak * 100
-            if dd > max_dd:
-                max_dd = dd
-        
-        print(f"  交易次数: {len(trades)}")
+        print(f"  交易次数: {trades}")
         print(f"  最终收益: {total_return:+.2f}%")
         print(f"  最大回撤: -{max_dd:.2f}%")
         
-        return total_return, max_dd, len(trades)
+        return total_return, max_dd, trades
+    
+    def scan_factor_thresholds(self, df, entries=None, exits=None, metric='return'):
+        """
+        所有因子 × 入场/出场阈值网格一次回测
+        exits=None 时出场阈值 = -入场阈值（与 test_factor_strategy 相同）
+        
+        Returns:
+            (完整网格表, 每个因子最优阈值表)
+        """
+        factor_cols = [col for col in df.columns if col.startswith('factor_')]
+        if entries is None:
+            entries = np.round(np.arange(0.1, 1.0, 0.1), 2)
+        
+        table = threshold_grid_backtest(df[factor_cols], df['close'], entries=entries, exits=exits)
+        best = best_thresholds(table, metric)
+        
+        print()
+        print(f"🔍 阈值网格扫描: {len(factor_cols)} 个因子 × {len(table) // max(len(factor_cols), 1)} 组阈值")
+        print()
+        print(f"{'因子名称':<25} {'入场':<8} {'出场':<8} {'收益率':<12} {'最大回撤':<12} {'交易次数':<10}")
+        print("-" * 100)
+        for _, row in best.iterrows():
+            print(f"{row['factor'].replace('factor_', '').replace('_', ' ').title():<25} "
+                  f"{row['entry']:<8.2f} {row['exit']:<8.2f} {row['return']:+.2f}%{'':<4} "
+                  f"{-row['max_dd']:.2f}%{'':<4} {row['trades']:<10}")
+        print()
+        
+        return table, best
 
 
 def main():
@@ -393,6 +415,7 @@ def main():
     # 3. 评估因子
     print("【步骤3】评估因子有效性...")
     results = analyzer.evaluate_factors(df_with_factors)
+    decay_results = analyzer.analyze_ic_decay(df_with_factors)
     print()
     
     # 4. 测试最佳因子的策略
@@ -402,14 +425,17 @@ def main():
     # 选择IC值最高的几个因子测试
     factor_cols = [col for col in df_with_factors.columns if col.startswith('factor_')]
     
+    # 所有因子 × 阈值网格一次回测，阈值0.3的前5个因子沿用原对比表
+    grid_table, best_table = analyzer.scan_factor_thresholds(df_with_factors)
+    base = threshold_grid_backtest(df_with_factors[factor_cols[:5]], df_with_factors['close'], entries=[0.3])
+    
     strategy_results = []
-    for factor_col in factor_cols[:5]:  # 测试前5个因子
-        ret, dd, trades = analyzer.test_factor_strategy(df_with_factors, factor_col, threshold=0.3)
+    for _, row in base.iterrows():
         strategy_results.append({
-            'factor': factor_col.replace('factor_', '').replace('_', ' ').title(),
-            'return': ret,
-            'max_dd': dd,
-            'trades': trades
+            'factor': row['factor'].replace('factor_', '').replace('_', ' ').title(),
+            'return': row['return'],
+            'max_dd': row['max_dd'],
+            'trades': int(row['trades'])
         })
     
     print()
@@ -436,7 +462,11 @@ def main():
     # 保存结果
     results.to_csv('数字化数据/factor_evaluation.csv', index=False, encoding='utf-8-sig')
     print()
+    decay_results.to_csv('数字化数据/factor_ic_decay.csv', index=False, encoding='utf-8-sig')
+    grid_table.to_csv('数字化数据/factor_threshold_grid.csv', index=False, encoding='utf-8-sig')
     print("✅ 因子评估结果已保存: 数字化数据/factor_evaluation.csv")
+    print("✅ IC衰减结果已保存: 数字化数据/factor_ic_decay.csv")
+    print("✅ 阈值网格结果已保存: 数字化数据/factor_threshold_grid.csv")
     print()
 
 
@@ -37,8 +37,30 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import sys
 import os
+import pickle
+import copy
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
 warnings.filterwarnings('ignore')
 
+sys.path.append(str(Path(__file__).parent / '模块'))
+from K线存储模块 import CandleStore, INTERVAL_MS
+from 多周期模块 import IntradaySqzmomLayer
+from 滚动统计模块 import rolling_moments
+from 规则模块 import MONITOR_ENTRY_RULES
+from 增量指标模块 import IncrementalIndicatorState
+from K线推送模块 import KlineStreamClient
+from 盘中预警模块 import ProvisionalSignalTracker
+from 多品种扫描模块 import fetch_watchlist, scan_frames
+from 流水线计时模块 import StageTimer
+from 提醒记录模块 import AlertLedger
+from 邮件发件箱模块 import Outbox, ResendTransport
+from 报告模板模块 import (wrap_email, render_daily_report, render_entry_alert, render_exit_alert,
+                    render_provisional_alert, render_watchlist_report)
+from 历史报告模块 import HitCountHistory, render_reports
+
 # 支撑阻力位功能已移除
 
 class BTCIndicatorMonitor:
@@ -55,7 +77,21 @@ class BTCIndicatorMonitor:
         }
         """
         self.email_config = email_config or {}
-        self.last_alert_time = {}  # 记录上次提醒时间，避免重复提醒
+        self.candle_store = CandleStore(Path(__file__).parent / 'K线数据')  # 本地K线存储
+        # 跨运行的提醒去重：同一K线同一信号只发一次，出场信号48小时冷却
+        self.alert_ledger = AlertLedger(Path(self.candle_store.data_folder) / '提醒记录.sqlite3',
+                                        cooldowns={'出场': 48})
+        self.force_send = False  # True 时忽略提醒记录（手动补发）
+        # 落盘发件箱：先写入磁盘再投递，失败按指数退避重试，未送达的下次运行继续
+        self.outbox = Outbox(Path(self.candle_store.data_folder) / '邮件发件箱',
+                             ResendTransport(os.getenv('RESEND_API_KEY', 're_test_key_placeholder'),
+                                             "BTC Monitor <btcmonitor@resend.dev>", ["350980368@qq.com"]))
+        self.outbox_drain_timeout = 120  # 单次运行结束前等待重试的最长秒数
+        self.sqzmom_4h = IntradaySqzmomLayer(self.candle_store, 'BTCUSDT', '4h')  # 4小时SQZMOM层
+        self.daemon_frame = None  # 守护进程模式：常驻指标帧
+        self.indicator_state = None  # 守护进程模式：增量指标状态
+        self.provisional_tracker = None  # 盘中预警：预备信号去重与确认记录
+        self.email_concurrency = 3  # 同时发送的邮件数上限
         
         # 策略参数
         self.name = "BTC技术指标监控系统"
@@ -70,151 +106,60 @@ class BTCIndicatorMonitor:
         self.stop_loss_pct = 0.15  # 止损比例
         self.atr_mult = 2.0  # ATR追踪倍数
         self.enable_short = False  # 禁用做空
-    
-    def send_email(self, subject, body, is_alert=False):
-        """发送邮件 - 使用Resend API（GPT推荐方案）"""
-        import requests
-        import os
         
-        print(f"🚀 使用Resend API发送邮件...")
+        # 持仓账本：回测同一套仓位逻辑，每次运行只推进新收盘的K线（见 advance_strategy）
+        self.strategy_start = '2024-01-01'
+        self.strategy_book_version = 2  # 账本口径变化时加1（2: 指标帧带ATR，追踪止盈生效），旧账本从头回放
+        self.strategy_trades = []
+        self.strategy_last_date = None  # 账本已推进到的最后一根K线
+    
+    def send_email(self, subject, body, is_alert=False, key=None):
+        """
+        发送邮件 - 经落盘发件箱投递到Resend API
         
-        # Resend API配置
-        api_key = os.getenv('RESEND_API_KEY', 're_test_key_placeholder')
-        api_url = "https://api.resend.com/emails"
+        Args:
+            key: 幂等键（如 'BTCUSDT|入场1|2024-05-01'），同一个键只投递一次；
+                 投递失败的邮件留在发件箱，按指数退避重试
         
+        Returns:
+            是否已送达（False 时邮件仍在发件箱中等待重试）
+        """
         # 邮件标题
         if is_alert:
             email_subject = f"🚨 {subject}"
         else:
             email_subject = f"📊 {subject}"
         
-        # HTML邮件内容
-        html_content = f"""
-        <html>
-        <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; }}
-            table {{ border-collapse: collapse; width: 100%; margin: 10px 0; }}
-            th {{ background-color: #4CAF50; color: white; padding: 10px; text-align: left; }}
-            td {{ border: 1px solid #ddd; padding: 8px; }}
-            tr:nth-child(even) {{ background-color: #f2f2f2; }}
-            .alert {{ background-color: #fff3cd; padding: 15px; margin: 10px 0; border-left: 5px solid #ff9800; }}
-            .danger {{ background-color: #ffebee; padding: 15px; margin: 10px 0; border-left: 5px solid #f44336; }}
-            .success {{ background-color: #e8f5e9; padding: 15px; margin: 10px 0; border-left: 5px solid #4CAF50; }}
-        </style>
-        </head>
-        <body>
-            {body}
-        </body>
-        </html>
-        """
-        
-        # Resend邮件数据
-        email_data = {
-            "from": "BTC Monitor <btcmonitor@resend.dev>",
-            "to": ["350980368@qq.com"],
-            "subject": email_subject,
-            "html": html_content
-        }
-        
-        # 发送请求
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        try:
-            print(f"📧 发送邮件到: 350980368@qq.com")
-            print(f"📧 邮件主题: {email_subject}")
-            print(f"📧 使用Resend API...")
-            
-            response = requests.post(api_url, headers=headers, json=email_data, timeout=30)
-            
-            print(f"📧 API响应状态: {response.status_code}")
-            print(f"📧 API响应内容: {response.text}")
-            
-            if response.status_code == 200:
-                print("✅ Resend邮件发送成功!")
-                print("📧 请检查邮箱: 350980368@qq.com")
-                return True
-            else:
-                print(f"❌ Resend发送失败: {response.text}")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Resend API请求失败: {e}")
-            return False
+        # HTML邮件内容（CSS外壳预先生成，只拼接正文）
+        html_content = wrap_email(body)
+        
+        print(f"📧 发送邮件到: 350980368@qq.com")
+        print(f"📧 邮件主题: {email_subject}")
+        message_id = self.outbox.enqueue(email_subject, html_content, key=key)
+        if self.outbox.deliver(message_id):
+            print("✅ Resend邮件发送成功!")
+            return True
+        print("❌ Resend发送失败，邮件已保存在发件箱")
+        return False
     
     def check_entry_signals_detailed(self, row):
-        """检查入场信号并返回详细信息"""
+        """检查入场信号并返回详细信息（条件来自 MONITOR_ENTRY_RULES）"""
         signals = []
+        fired = MONITOR_ENTRY_RULES.check(row)
         
-        # 第1仓信号
-        if row['wt1'] < -25 and row['wt_golden_cross']:
-            signals.append({
-                'level': 1,
-                'type': '入场',
-                'name': '第1仓买入信号',
-                'conditions': [
-                    f"WT1={row['wt1']:.1f} < -25 ✅",
-                    "WT金叉 ✅"
-                ],
-                'price': row['close'],
-                'urgency': 'high'
-            })
-        
-        # 第2仓信号（需要已有第1仓）
-        if row['sqz_off'] and row['is_lime'] and row['wt1'] > row['wt2']:
-            signals.append({
-                'level': 2,
-                'type': '入场',
-                'name': '第2仓加仓信号',
-                'conditions': [
-                    "需要已有第1仓 ✅",
-                    "挤压释放 ✅",
-                    "动能增强(Lime) ✅",
-                    f"WT1({row['wt1']:.1f}) > WT2({row['wt2']:.1f}) ✅"
-                ],
-                'price': row['close'],
-                'urgency': 'medium'
-            })
-        
-        # 第3仓信号
-        if (row['sqz_off'] and row['is_lime'] and row['wt1'] > row['wt2'] and 
-            row['close'] > row['ma14']):
-            signals.append({
-                'level': 3,
-                'type': '入场',
-                'name': '第3仓加仓信号',
-                'conditions': [
-                    "需要已有第2仓 ✅",
-                    "挤压释放 ✅",
-                    "动能增强(Lime) ✅",
-                    f"WT1({row['wt1']:.1f}) > WT2({row['wt2']:.1f}) ✅",
-                    f"价格(${row['close']:,.0f}) > MA14(${row['ma14']:,.0f}) ✅"
-                ],
-                'price': row['close'],
-                'urgency': 'medium'
-            })
-        
-        # 第4仓信号
-        if (row['sqz_off'] and row['is_lime'] and row['wt1'] > row['wt2'] and 
-            row['close'] > row['ma14'] and row['adx'] > 20 and row['adx_up']):
+        for level, name, urgency in ((1, '第1仓买入信号', 'high'), (2, '第2仓加仓信号', 'medium'),
+                                     (3, '第3仓加仓信号', 'medium'), (4, '第4仓加仓信号', 'low')):
+            if not fired[level]:
+                continue
+            conditions = [f"需要已有第{level - 1}仓 ✅"] if level > 1 else []
+            conditions += MONITOR_ENTRY_RULES.explain(level, row)
             signals.append({
-                'level': 4,
+                'level': level,
                 'type': '入场',
-                'name': '第4仓加仓信号',
-                'conditions': [
-                    "需要已有第3仓 ✅",
-                    "挤压释放 ✅",
-                    "动能增强(Lime) ✅",
-                    f"WT1({row['wt1']:.1f}) > WT2({row['wt2']:.1f}) ✅",
-                    f"价格(${row['close']:,.0f}) > MA14(${row['ma14']:,.0f}) ✅",
-                    f"ADX={row['adx']:.1f} > 20 ✅",
-                    "ADX上升 ✅"
-                ],
+                'name': name,
+                'conditions': conditions,
                 'price': row['close'],
-                'urgency': 'low'
+                'urgency': urgency
             })
         
         return signals
@@ -382,34 +327,25 @@ class BTCIndicatorMonitor:
             kc_period = 20
             kc_mult = 1.5
             
-            # 转换为pandas Series以便使用shift
-            close_series = pd.Series(close)
-            high_series = pd.Series(high)
-            low_series = pd.Series(low)
+            # 融合滚动矩：SMA / STDDEV / 最高 / 最低 / 波幅均值一次算出（窗口相同时只遍历一次）
+            bb = rolling_moments(close, bb_period, high, low, use_true_range=use_true_range)
+            kc = bb if kc_period == bb_period else rolling_moments(close, kc_period, high, low,
+                                                                     use_true_range=use_true_range)
             
             # === 布林带计算 ===
-            # source = close, basis = ta.sma(source, lengthBB)
-            bb_mid = talib.SMA(close, timeperiod=bb_period)
-            bb_std = talib.STDDEV(close, timeperiod=bb_period)
+            # source = close, basis = ta.sma(source, lengthBB), dev = multBB * ta.stdev(source, lengthBB)
+            bb_mid = bb['mean']
+            bb_std = bb['std']
             bb_upper = bb_mid + (bb_mult * bb_std)
             bb_lower = bb_mid - (bb_mult * bb_std)
             
             # === 肯特纳通道计算 ===
             # maKC = ta.sma(source, lengthKC)
-            kc_mid = talib.SMA(close, timeperiod=kc_period)
+            kc_mid = kc['mean']
             
             # rangeKC = useTrueRange ? ta.tr : (high - low)
-            if use_true_range:
-                # True Range = max(high-low, abs(high-close[1]), abs(low-close[1]))
-                tr1 = high_series - low_series
-                tr2 = abs(high_series - close_series.shift(1))
-                tr3 = abs(low_series - close_series.shift(1))
-                range_kc = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1).values
-            else:
-                range_kc = high - low
-            
             # rangemaKC = ta.sma(rangeKC, lengthKC)
-            range_ma_kc = talib.SMA(range_kc, timeperiod=kc_period)
+            range_ma_kc = kc['range_mean']
             kc_upper = kc_mid + (range_ma_kc * kc_mult)
             kc_lower = kc_mid - (range_ma_kc * kc_mult)
             
@@ -422,9 +358,9 @@ class BTCIndicatorMonitor:
             
             # === 动能线线性回归计算 ===
             # avgHL = (ta.highest(high, lengthKC) + ta.lowest(low, lengthKC)) / 2
-            avg_hl = (talib.MAX(high, timeperiod=kc_period) + talib.MIN(low, timeperiod=kc_period)) / 2
+            avg_hl = (kc['max'] + kc['min']) / 2
             # avgAll = (avgHL + ta.sma(close, lengthKC)) / 2
-            avg_all = (avg_hl + talib.SMA(close, timeperiod=kc_period)) / 2
+            avg_all = (avg_hl + kc_mid) / 2
             # val = ta.linreg(source - avgAll, lengthKC, 0)
             source_minus_avg = close - avg_all
             val = linear_regression(source_minus_avg, kc_period)
@@ -518,16 +454,7 @@ class BTCIndicatorMonitor:
         df['price_struct_bearish'] = df['close'] < df['ma14']
         
         # TV代码第128行：highlightGreen计算（4小时SQZMOM信号）
-        # 由于使用日线数据，模拟4小时信号：
-        # highlightGreen = sqz4h or (mom4h > nz(mom4h[1]) and mom4h > 0)
-        
-        # 计算4小时级别的信号（简化版：使用更严格的日线信号）
-        # sqz4h: 4小时挤压释放 - 使用日线的sqz_off
-        # mom4h: 4小时动能 - 使用日线的momentum（简化）
-        momentum = df['close'] - df['close'].shift(1)
-        mom4h_condition = (momentum > momentum.shift(1)) & (momentum > 0)
-        
-        df['highlight_green'] = df['sqz_off'] | mom4h_condition
+        df = self.add_4h_signals(df)
         
         # 填充NaN值
         df = df.fillna(method='bfill').fillna(method='ffill')
@@ -535,34 +462,51 @@ class BTCIndicatorMonitor:
         print("✅ 技术指标计算完成")
         return df
     
-    def check_entry_signals(self, row):
-        """检查入场信号 - 纯多头：渐进式触发（无价格过滤）"""
+    def add_4h_signals(self, df, sync=True):
+        """
+        4小时SQZMOM信号 - 使用真实4h K线
+        TV代码：highlightGreen = sqz4h or (mom4h > nz(mom4h[1]) and mom4h > 0)
+        每根日线只取当日收盘前已收盘的最后一根4h K线（无未来函数）
+        sync=False：4h K线已预先同步（监控流水线中与日线并行获取），只读本地
+        """
+        try:
+            self.sqzmom_4h.update(start=df['date'].min() - pd.Timedelta(days=10), sync=sync)
+            aligned = self.sqzmom_4h.align(df['date'])
+            df['sqz4h'] = aligned['sqz4h'].values
+            df['mom4h'] = aligned['mom4h'].values
+            mom4h_prev = df['mom4h'].shift(1).fillna(0)
+            mom4h_condition = (df['mom4h'] > mom4h_prev) & (df['mom4h'] > 0)
+        except Exception as e:
+            # 4h数据不可用时退回日线近似：sqz4h用日线sqz_off，mom4h用日线收盘动量
+            print(f"⚠️ 4小时数据不可用，使用日线近似: {e}")
+            df['sqz4h'] = df['sqz_off']
+            momentum = df['close'] - df['close'].shift(1)
+            mom4h_condition = (momentum > momentum.shift(1)) & (momentum > 0)
+        
+        df['highlight_green'] = df['sqz4h'] | mom4h_condition
+        return df
+    
+    def check_entry_signals(self, row, fired=None):
+        """
+        检查入场信号 - 纯多头：渐进式触发（无价格过滤）
+        
+        fired: 预先算好的 {仓位: 是否满足}（回测时由 MONITOR_ENTRY_RULES.matrix 整段算出），
+               为None时对当前行做标量判断
+        """
         long_signals = []
         short_signals = []  # 已禁用
         
+        if fired is None:
+            fired = MONITOR_ENTRY_RULES.check(row)
+        
         # 多头仓位渐进式触发（恢复原始逻辑，不过滤价格）
         existing_long_levels = {pos['position_level'] for pos in self.long_positions}
-        has_long_lvl1 = 1 in existing_long_levels
-        has_long_lvl2 = 2 in existing_long_levels
-        has_long_lvl3 = 3 in existing_long_levels
-        
-        # 第1多仓：WT金叉做多 - 独立触发
-        if row['wt1'] < -25 and row['wt_golden_cross'] and 1 not in existing_long_levels:
-            long_signals.append(1)
         
-        # 第2多仓：需要已有第1仓
-        if row['sqz_off'] and row['is_lime'] and row['wt1'] > row['wt2'] and has_long_lvl1 and 2 not in existing_long_levels:
-            long_signals.append(2)
-            
-        # 第3多仓：需要已有第2仓
-        if (row['sqz_off'] and row['is_lime'] and row['wt1'] > row['wt2'] and 
-            row['close'] > row['ma14'] and has_long_lvl2 and 3 not in existing_long_levels):
-            long_signals.append(3)
-            
-        # 第4多仓：需要已有第3仓
-        if (row['sqz_off'] and row['is_lime'] and row['wt1'] > row['wt2'] and 
-            row['close'] > row['ma14'] and row['adx_up'] and has_long_lvl3 and 4 not in existing_long_levels):
-            long_signals.append(4)
+        # 第1多仓独立触发；第N多仓需要已有第N-1仓
+        for level in (1, 2, 3, 4):
+            prerequisite = level == 1 or (level - 1) in existing_long_levels
+            if fired[level] and prerequisite and level not in existing_long_levels:
+                long_signals.append(level)
         
         # 空头已禁用
         if self.enable_short:
@@ -959,9 +903,41 @@ class BTCIndicatorMonitor:
         
         return self.account_value
     
+    def reset_strategy(self):
+        """清空持仓账本，回到初始资金"""
+        self.cash = self.initial_capital
+        self.account_value = self.initial_capital
+        self.long_positions = []
+        self.short_positions = []
+        self.strategy_trades = []
+        self.strategy_last_date = None
+    
+    def step_strategy(self, row, fired, trades, trade_id):
+        """推进一根K线：止损 → 止盈/ATR追踪 → 入场 → 账户价值（回测与持仓账本共用）"""
+        current_price = row['close']
+        
+        # 检查止损（双向）
+        trade_id = self.check_stop_loss(row, trades, trade_id)
+        
+        # 检查止盈（双向）
+        trade_id = self.check_take_profit(row, trades, trade_id)
+        
+        # 检查入场信号（纯多头，无空头）
+        long_signals, short_signals = self.check_entry_signals(row, fired=fired)
+        
+        # 纯多头策略：只开多头
+        for signal in long_signals:
+            if len(self.long_positions) < self.max_positions:
+                self.add_position(row['date'], current_price, signal, direction='long')
+        
+        # 更新账户价值
+        self.update_account_value(current_price)
+        return trade_id
+    
     def run_backtest(self):
         """运行回测"""
         print("🚀 开始回测用户指定策略...")
+        self.reset_strategy()
         
         # 获取数据
         df = self.get_btc_data()
@@ -971,7 +947,7 @@ class BTCIndicatorMonitor:
         
         # 筛选2024-2025年数据
         df['date'] = pd.to_datetime(df['date'])
-        df = df[df['date'] >= '2024-01-01'].reset_index(drop=True)
+        df = df[df['date'] >= self.strategy_start].reset_index(drop=True)
         
         if len(df) == 0:
             print("⚠️ 筛选后无数据，使用全部数据")
@@ -987,29 +963,16 @@ class BTCIndicatorMonitor:
         portfolio_values = []
         trade_id = 1
         
-        for idx, row in df.iterrows():
-            current_price = row['close']
-            
-            # 检查止损（双向）
-            trade_id = self.check_stop_loss(row, trades, trade_id)
-            
-            # 检查止盈（双向）
-            trade_id = self.check_take_profit(row, trades, trade_id)
-            
-            # 检查入场信号（纯多头，无空头）
-            long_signals, short_signals = self.check_entry_signals(row)
-            
-            # 纯多头策略：只开多头
-            for signal in long_signals:
-                if len(self.long_positions) < self.max_positions:
-                    self.add_position(row['date'], current_price, signal, direction='long')
-            
-            # 更新账户价值
-            account_value = self.update_account_value(current_price)
+        # 入场条件整段一次算出
+        entry_matrix = MONITOR_ENTRY_RULES.matrix(df)
+        
+        for i, (idx, row) in enumerate(df.iterrows()):
+            trade_id = self.step_strategy(row, dict(zip(MONITOR_ENTRY_RULES.keys(), entry_matrix[i])),
+                                          trades, trade_id)
             portfolio_values.append({
                 'date': row['date'],
-                'price': current_price,
-                'account_value': account_value,
+                'price': row['close'],
+                'account_value': self.account_value,
                 'long_positions': len(self.long_positions),
                 'short_positions': len(self.short_positions)
             })
@@ -1153,20 +1116,54 @@ class BTCIndicatorMonitor:
             'portfolio_values': portfolio_values
         }
 
-    def monitor_and_alert(self):
-        """监控指标并发送邮件提醒"""
+    def monitor_and_alert(self, symbols=None):
+        """监控指标并发送邮件提醒（symbols 为品种列表时扫描整个观察列表）"""
+        if symbols and list(symbols) != ['BTCUSDT']:
+            return self.monitor_watchlist(symbols)
+        
         print("🚀 启动BTC技术指标监控系统...")
         print("="*80)
-        
-        # 获取最新数据
-        df = self.get_btc_data()
+        timer = StageTimer()
+        
+        # 获取最新数据：日线与4小时K线互不依赖，并行获取
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            start_4h = (pd.Timestamp(datetime.utcnow()) - pd.Timedelta(days=5 * 365)).normalize() - pd.Timedelta(days=10)
+            prefetch = pool.submit(timer.wrap('获取4h', self.sqzmom_4h.update), start=start_4h)
+            with timer.stage('获取日线'):
+                df = self.get_btc_data()
+            try:
+                prefetch.result()
+                sync_4h = False
+            except Exception as e:
+                print(f"⚠️ 4小时K线预取失败，计算指标时重试: {e}")
+                sync_4h = True
         if df is None or len(df) == 0:
             print("❌ 获取数据失败")
             return
         
         # 计算指标
-        df = self.calculate_indicators(df)
+        with timer.stage('计算指标', after=('获取日线', '获取4h')):
+            df = self.calculate_indicators(df, sync_4h=sync_4h)
+        
+        self.dispatch_signals(df, timer=timer, after=('计算指标',))
+        timer.report('监控流水线耗时')
+        self.outbox.drain(timeout=self.outbox_drain_timeout)
         
+        print("\n✅ 监控完成")
+    
+    def dispatch_signals(self, df, timer=None, after=()):
+        """
+        对最新一根K线检查信号、生成日报并发送邮件（df 为已计算指标的完整帧）
+        
+        日报与各提醒并行渲染，每封邮件渲染完立即提交发送（最多 email_concurrency 封同时在途），
+        提醒邮件的渲染与日报的发送重叠
+        
+        Args:
+            timer: StageTimer（为None时自建并打印本阶段耗时）
+            after: 本阶段依赖的上游阶段名（关键路径用）
+        """
+        own_timer = timer is None
+        timer = timer or StageTimer()
         # 获取最新一天的数据
         latest = df.iloc[-1]
         current_date = latest['date'].strftime('%Y-%m-%d')
@@ -1176,24 +1173,45 @@ class BTCIndicatorMonitor:
         print(f"💰 当前价格: ${current_price:,.0f}")
         print("="*80)
         
-        # 检查入场信号
-        entry_signals = self.check_entry_signals_detailed(latest)
+        with timer.stage('检查信号', after=after):
+            # 检查入场信号
+            entry_signals = self.check_entry_signals_detailed(latest)
+            
+            # 检查出场信号
+            exit_signal = self.check_exit_signals_detailed(latest)
+        
+        subject, is_alert = self.report_subject(entry_signals, current_date, os.getenv('GITHUB_RUN_NUMBER', '本地'))
         
-        # 检查出场信号
-        exit_signal = self.check_exit_signals_detailed(latest)
+        # 待发送的邮件：(名称, 标题, 渲染函数, 是否醒目, 提醒记录键)
+        # 每日报告复用已算好的指标帧，不再重新获取数据
+        bar_date = latest['date']
+        emails = [('日报', subject, lambda: self.generate_daily_report(latest, entry_signals, exit_signal, df=df),
+                   is_alert, ('BTCUSDT', '日报', bar_date))]
         
-        # 生成每日报告
-        daily_report = self.generate_daily_report(latest, entry_signals, exit_signal)
+        # 如果有重要信号，发送醒目提醒
+        for signal in entry_signals:
+            if signal['urgency'] == 'high':
+                emails.append((f"第{signal['level']}仓提醒", f"BTC {signal['name']}！当前价格${signal['price']:,.0f}",
+                               lambda signal=signal: self.generate_entry_alert(signal, current_date), True,
+                               ('BTCUSDT', f"入场{signal['level']}", bar_date)))
         
-        # 根据买入信号生成标题
+        if exit_signal.get('has_signal') and exit_signal.get('urgency') == 'high':
+            emails.append(('出场提醒', f"BTC出场信号！{exit_signal['signal_count']}个指标触发",
+                           lambda: self.generate_exit_alert(exit_signal, current_date), True,
+                           ('BTCUSDT', '出场', bar_date)))
+        
+        results = self.render_and_send(emails, timer, after=('检查信号',))
+        if own_timer:
+            timer.report('发送流水线耗时')
+        return results
+    
+    def report_subject(self, entry_signals, current_date, run_number):
+        """根据买入信号生成日报标题，返回 (标题, 是否醒目)"""
         if entry_signals:
             # 检查是否有高优先级信号
             high_priority_signals = [s for s in entry_signals if s['urgency'] == 'high']
             medium_priority_signals = [s for s in entry_signals if s['urgency'] == 'medium']
             
-            # 获取运行编号
-            run_number = os.getenv('GITHUB_RUN_NUMBER', '本地')
-            
             if high_priority_signals:
                 # 第1仓信号：最高优先级
                 subject = f"🚨【紧急买入信号】第1仓可买入！BTC监控日报 {current_date} - Run {run_number}"
@@ -1212,632 +1230,469 @@ class BTCIndicatorMonitor:
                 is_alert = False
         else:
             # 无买入信号
-            # 获取运行编号
-            run_number = os.getenv('GITHUB_RUN_NUMBER', '本地')
             subject = f"📊 BTC监控日报 {current_date} - Run {run_number}"
             is_alert = False
         
-        # 发送每日报告
-        self.send_email(
-            subject=subject,
-            body=daily_report,
-            is_alert=is_alert
-        )
+        return subject, is_alert
+    
+    def render_and_send(self, emails, timer, after=()):
+        """
+        并行渲染邮件，每封渲染完立即提交发送（最多 email_concurrency 封同时在途）
         
-        # 如果有重要信号，发送醒目提醒
-        if entry_signals:
-            for signal in entry_signals:
-                if signal['urgency'] == 'high':
-                    alert_body = self.generate_entry_alert(signal, current_date)
-                    self.send_email(
-                        subject=f"BTC {signal['name']}！当前价格${signal['price']:,.0f}",
-                        body=alert_body,
-                        is_alert=True
-                    )
+        渲染之前先查提醒记录：已在同一K线发送过（或在冷却期内）的邮件直接跳过，
+        发送成功后才写入记录；失败的邮件留在发件箱，由 drain / 后台线程 / 下次运行重试
         
-        if exit_signal.get('has_signal') and exit_signal.get('urgency') == 'high':
-            alert_body = self.generate_exit_alert(exit_signal, current_date)
-            self.send_email(
-                subject=f"BTC出场信号！{exit_signal['signal_count']}个指标触发",
-                body=alert_body,
-                is_alert=True
-            )
+        Args:
+            emails: [(名称, 标题, 渲染函数, 是否醒目, 提醒记录键 (品种, 信号类型, K线日期) 或 None), ...]
         
-        print("\n✅ 监控完成")
+        Returns:
+            {名称: 是否发送成功}
+        """
+        results = {}
+        if not self.force_send:
+            skipped = [email[0] for email in emails if email[4] and not self.alert_ledger.should_send(*email[4])]
+            if skipped:
+                print(f"⏭️ 本K线已发送过，跳过: {'、'.join(skipped)}")
+            emails = [email for email in emails if email[0] not in skipped]
+        if not emails:
+            return results
+        with ThreadPoolExecutor(max_workers=len(emails)) as render_pool, \
+                ThreadPoolExecutor(max_workers=self.email_concurrency) as send_pool:
+            rendering = {render_pool.submit(timer.wrap(f'渲染{name}', render, after=after)): (name, title, alert, key)
+                         for name, title, render, alert, key in emails}
+            sending = {}
+            for future in as_completed(rendering):
+                name, title, alert, key = rendering[future]
+                send = timer.wrap(f'发送{name}', self.send_email, after=(f'渲染{name}',))
+                # 手动补发时不带幂等键（发件箱按 标题+正文 去重）
+                outbox_key = '|'.join(str(part) for part in key) if key and not self.force_send else None
+                sending[send_pool.submit(send, subject=title, body=future.result(), is_alert=alert,
+                                         key=outbox_key)] = (name, title, key)
+            for future in as_completed(sending):
+                name, title, key = sending[future]
+                results[name] = future.result()
+                if results[name] and key:
+                    self.alert_ledger.record(*key, subject=title)
+        
+        failed = [name for name, ok in results.items() if not ok]
+        if failed:
+            print(f"⚠️ 发送失败: {'、'.join(failed)}")
+        return results
     
-    def generate_daily_report(self, row, entry_signals, exit_signal):
-        """生成每日监控报告 - HTML表格版本"""
-        # 获取最近5天数据
-        df = self.get_btc_data()
-        df = self.calculate_indicators(df)
-        recent_5days = df.tail(5)
-        
-        # 支撑阻力位功能已移除
-        
-        # 运行策略回测（快速版本）
-        strategy_results = self.run_quick_backtest(df)
+    # ============ 观察列表（多品种） ============
+    
+    def monitor_watchlist(self, symbols, interval='1d', lookback_days=400, max_workers=32):
+        """
+        一次运行扫描整个观察列表
         
-        # 检查近5天金叉/死叉
-        golden_cross_dates = []
-        death_cross_dates = []
-        for _, r in recent_5days.iterrows():
-            if r.get('wt_golden_cross', False):
-                golden_cross_dates.append(r['date'].strftime('%m-%d'))
-            if r.get('wt_death_cross', False):
-                death_cross_dates.append(r['date'].strftime('%m-%d'))
+        - 所有品种并发获取（共享连接池），一次面板计算指标
+        - 入场规则对所有品种一次判断（MONITOR_ENTRY_RULES.matrix，行=品种）
+        - 发送一封汇总日报 + 每个品种的高优先级入场/出场提醒
         
-        # 生成HTML报告
-        html = f"""
-<h2>📊 BTC监控日报 - {row['date'].strftime('%Y年%m月%d日')}</h2>
-<p style="font-size: 20px;"><strong>当前价格：</strong><span style="color: #2196F3; font-size: 24px;">${row['close']:,.0f}</span></p>
-
-<h3>📈 技术指标现状</h3>
-<table>
-  <tr>
-    <th>指标</th>
-    <th>当前值</th>
-    <th>说明</th>
-  </tr>
-  <tr>
-    <td><strong>WT1</strong></td>
-    <td>{row['wt1']:.1f}</td>
-    <td>{'超卖区' if row['wt1'] < -30 else '中性区' if row['wt1'] < 0 else '超买区'}</td>
-  </tr>
-  <tr>
-    <td><strong>WT2</strong></td>
-    <td>{row['wt2']:.1f}</td>
-    <td>{'中性区' if row['wt2'] < 0 else '超买区'}</td>
-  </tr>
-  <tr>
-    <td><strong>WT交叉</strong></td>
-    <td style="color: {'green' if row['wt1'] > row['wt2'] else 'red'}; font-weight: bold;">{'金叉' if row['wt1'] > row['wt2'] else '死叉'}</td>
-    <td>WT1({row['wt1']:.1f}) {'>' if row['wt1'] > row['wt2'] else '<'} WT2({row['wt2']:.1f})</td>
-  </tr>
-  <tr>
-    <td><strong>ADX</strong></td>
-    <td>{row['adx']:.1f}</td>
-    <td>{'强趋势' if row['adx'] > 25 else '中等趋势' if row['adx'] > 20 else '弱趋势'}</td>
-  </tr>
-  <tr>
-    <td><strong>价格 vs MA14</strong></td>
-    <td style="color: {'green' if row['close'] > row['ma14'] else 'red'}; font-weight: bold;">{'在上方' if row['close'] > row['ma14'] else '在下方'}</td>
-    <td>${row['close']:,.0f} / ${row['ma14']:,.0f}</td>
-  </tr>
-  <tr>
-    <td><strong>SQZMOM</strong></td>
-    <td style="color: {'green' if row['sqz_off'] else 'red' if row['sqz_on'] else 'gray'}; font-weight: bold;">{'释放' if row['sqz_off'] else '挤压' if row['sqz_on'] else '无'}</td>
-    <td>{'可以做多' if row['sqz_off'] else '观望' if row['sqz_on'] else '无信号'}</td>
-  </tr>
-  <tr>
-    <td><strong>挤压动能值</strong></td>
-    <td style="color: {'green' if row.get('sqz_val', 0) > 0 else 'red'}; font-weight: bold;">{row.get('sqz_val', 0):+.1f}</td>
-    <td>动能增强</td>
-  </tr>
-  <tr>
-    <td><strong>挤压动能柱</strong></td>
-    <td style="color: {'#00ff00' if row.get('is_lime') else 'green' if row.get('is_green') else 'red' if row.get('is_red') else 'maroon'}; font-weight: bold;">{'强多柱(青绿)' if row.get('is_lime') else '弱多柱(深绿)' if row.get('is_green') else '强空柱(红色)' if row.get('is_red') else '弱空柱(暗红)'}</td>
-    <td>动能向上</td>
-  </tr>
-</table>
-
-<h3>🔴 当前持仓状态</h3>
-<div class="alert">
-  <p style="font-size: 16px; font-weight: bold;">⚠️ 当前没有任何持仓！</p>
-</div>
-
-<h3>🎯 今天能买第几仓？</h3>
-<table>
-  <tr style="background-color: #fff3cd;">
-    <th>仓位</th>
-    <th>条件</th>
-    <th>动态红杆</th>
-    <th>能买吗？</th>
-  </tr>
-  <tr>
-    <td><strong>第1仓(15%)</strong></td>
-    <td>WT1&lt;-25 且 金叉</td>
-    <td style="font-size: 16px; color: #ff9800;"><strong>1.8倍</strong></td>
-    <td style="font-size: 18px; font-weight: bold; color: {'green' if (row['wt1'] < -25 and row['wt_golden_cross']) else 'red'};">{'✅ 可以买！' if (row['wt1'] < -25 and row['wt_golden_cross']) else '❌ 不满足 (WT1=' + f'{row["wt1"]:.1f}' + '，需要<-25)'}</td>
-  </tr>
-  <tr>
-    <td><strong>第2仓(25%)</strong></td>
-    <td>需要第1仓 + 挤压释放 + 动能增强 + WT1>WT2</td>
-    <td style="font-size: 16px; color: #ff9800;"><strong>2.1倍</strong></td>
-    <td style="font-size: 18px; font-weight: bold; color: {'green' if (row['sqz_off'] and row.get('is_lime', False) and row['wt1'] > row['wt2']) else 'red'};">{'✅ 可以买！' if (row['sqz_off'] and row.get('is_lime', False) and row['wt1'] > row['wt2']) else '❌ 不满足（需要先有第1仓）'}</td>
-  </tr>
-  <tr>
-    <td><strong>第3仓(30%)</strong></td>
-    <td>需要第2仓 + 挤压释放 + 动能增强 + WT1>WT2 + 突破MA14</td>
-    <td style="font-size: 16px; color: #ff9800;"><strong>2.3倍</strong></td>
-    <td style="font-size: 18px; font-weight: bold; color: {'green' if (row['sqz_off'] and row.get('is_lime', False) and row['wt1'] > row['wt2'] and row['close'] > row['ma14']) else 'red'};">{'✅ 可以买！' if (row['sqz_off'] and row.get('is_lime', False) and row['wt1'] > row['wt2'] and row['close'] > row['ma14']) else '❌ 不满足（需要先有第2仓）'}</td>
-  </tr>
-  <tr>
-    <td><strong>第4仓(30%)</strong></td>
-    <td>需要第3仓 + 挤压释放 + 动能增强 + WT1>WT2 + 突破MA14 + ADX上升</td>
-    <td style="font-size: 16px; color: #ff9800;"><strong>2.5倍</strong></td>
-    <td style="font-size: 18px; font-weight: bold; color: {'green' if (row['sqz_off'] and row.get('is_lime', False) and row['wt1'] > row['wt2'] and row['close'] > row['ma14'] and row['adx'] > 20 and row.get('adx_up', False)) else 'red'};">{'✅ 可以买！' if (row['sqz_off'] and row.get('is_lime', False) and row['wt1'] > row['wt2'] and row['close'] > row['ma14'] and row['adx'] > 20 and row.get('adx_up', False)) else '❌ 不满足（需要先有第3仓）'}</td>
-  </tr>
-</table>
-
-{f'<p style="color: green;">🔔 近5天出现过金叉：{", ".join(golden_cross_dates)}</p>' if golden_cross_dates else ''}
-{f'<p style="color: red;">⚠️ 近5天出现过死叉：{", ".join(death_cross_dates)}</p>' if death_cross_dates else ''}
-
-<h3>📊 最近5天走势</h3>
-<table>
-  <tr>
-    <th>日期</th>
-    <th>价格</th>
-    <th>WT状态</th>
-    <th>ADX</th>
-    <th>vs MA14</th>
-  </tr>
-"""
+        Returns:
+            DataFrame: 每个品种的最新指标行
+        """
+        print(f"🚀 启动观察列表扫描（{len(symbols)} 个品种，周期 {interval}）...")
+        print("="*80)
         
-        for _, r in recent_5days.iterrows():
-            wt_status = "金叉" if r["wt1"] > r["wt2"] else "死叉"
-            wt_color = "green" if r["wt1"] > r["wt2"] else "red"
-            ma_status = "上方" if r["close"] > r["ma14"] else "下方"
-            ma_color = "green" if r["close"] > r["ma14"] else "red"
-            html += f"""
-  <tr>
-    <td>{r['date'].strftime('%m-%d')}</td>
-    <td>${r['close']:,.0f}</td>
-    <td style="color: {wt_color};">{wt_status}</td>
-    <td>{r['adx']:.1f}</td>
-    <td style="color: {ma_color};">{ma_status}</td>
-  </tr>
-"""
+        timer = StageTimer()
+        end_time = pd.Timestamp(datetime.utcnow())
+        with timer.stage('并发获取'):
+            frames = fetch_watchlist(self.candle_store, symbols, interval, start=end_time - pd.Timedelta(days=lookback_days),
+                                     end=end_time, max_workers=max_workers)
+        missing = [symbol for symbol in symbols if symbol not in frames]
+        if not frames:
+            print("❌ 获取数据失败")
+            return None
+        
+        with timer.stage('面板指标+规则', after=('并发获取',)):
+            table = scan_frames(frames)
+            fired = MONITOR_ENTRY_RULES.matrix(table)
+            results = {}
+            for i, (symbol, row) in enumerate(table.iterrows()):
+                entry_signals = self.check_entry_signals_detailed(row) if fired[i].any() else []
+                results[symbol] = (entry_signals, self.check_exit_signals_detailed(row))
+        
+        run_number = os.getenv('GITHUB_RUN_NUMBER', '本地')
+        current_date = table['date'].max().strftime('%Y-%m-%d')
+        entry_symbols = [symbol for symbol, (entry_signals, _) in results.items() if entry_signals]
+        if entry_symbols:
+            subject = f"📈【买入信号】{'、'.join(entry_symbols[:5])}{'等' if len(entry_symbols) > 5 else ''}" \
+                      f" 观察列表日报 {current_date} - Run {run_number}"
+        else:
+            subject = f"📊 观察列表日报（{len(table)}个品种） {current_date} - Run {run_number}"
+        emails = [('汇总日报', subject, lambda: self.generate_watchlist_report(table, results, missing),
+                   bool(entry_symbols), ('观察列表', '日报', table['date'].max()))]
+        
+        # 各品种的醒目提醒（与单品种规则相同：第1仓入场、3个以上出场指标）
+        for symbol, (entry_signals, exit_signal) in results.items():
+            bar_date = table.loc[symbol, 'date']
+            date = bar_date.strftime('%Y-%m-%d')
+            name = symbol[:-4] if symbol.endswith('USDT') else symbol
+            for signal in entry_signals:
+                if signal['urgency'] == 'high':
+                    emails.append((f"{name}入场提醒", f"{name} {signal['name']}！当前价格${signal['price']:,.2f}",
+                                   lambda signal=signal, date=date, name=name:
+                                   self.generate_entry_alert(signal, date, symbol=name), True,
+                                   (symbol, f"入场{signal['level']}", bar_date)))
+            if exit_signal.get('has_signal') and exit_signal.get('urgency') == 'high':
+                emails.append((f"{name}出场提醒", f"{name}出场信号！{exit_signal['signal_count']}个指标触发",
+                               lambda exit_signal=exit_signal, date=date, name=name:
+                               self.generate_exit_alert(exit_signal, date, symbol=name), True,
+                               (symbol, '出场', bar_date)))
+        
+        self.render_and_send(emails, timer, after=('面板指标+规则',))
+        timer.report('观察列表流水线耗时')
+        self.outbox.drain(timeout=self.outbox_drain_timeout)
+        
+        print("\n✅ 观察列表扫描完成")
+        return table
+    
+    def generate_watchlist_report(self, table, results, missing=()):
+        """观察列表汇总日报 - HTML表格版本（有信号的品种排在前面；版式见 报告模板模块）"""
+        return render_watchlist_report(table, results, missing)
+    
+    # ============ 守护进程模式 ============
+    
+    def _checkpoint_path(self, interval):
+        return Path(self.candle_store.data_folder) / f'监控守护状态_BTCUSDT_{interval}.pkl'
+    
+    def save_checkpoint(self, interval='1d'):
+        """保存常驻状态（指标帧 + 增量指标状态），先写临时文件再替换，避免中途退出留下坏文件"""
+        path = self._checkpoint_path(interval)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump({'interval': interval, 'frame': self.daemon_frame,
+                         'state': self.indicator_state}, f)
+        os.replace(tmp, path)
+        print(f"💾 守护状态已保存: {path.name}（{len(self.daemon_frame)} 根K线）")
+    
+    def load_checkpoint(self, interval='1d'):
+        """读取常驻状态，成功返回True"""
+        path = self._checkpoint_path(interval)
+        if not path.exists():
+            return False
+        try:
+            with open(path, 'rb') as f:
+                checkpoint = pickle.load(f)
+            if checkpoint.get('interval') != interval:
+                return False
+            if getattr(checkpoint['state'], 'version', 1) != IncrementalIndicatorState.VERSION:
+                print("⚠️ 守护状态版本已过期（指标列有变化），重新初始化")
+                return False
+            self.daemon_frame = checkpoint['frame']
+            self.indicator_state = checkpoint['state']
+        except Exception as e:
+            print(f"⚠️ 守护状态读取失败，重新初始化: {e}")
+            return False
+        print(f"♻️ 已恢复守护状态: 截至 {self.daemon_frame['date'].iloc[-1].strftime('%Y-%m-%d %H:%M')}")
+        return True
+    
+    def bootstrap_daemon(self, interval='1d'):
+        """启动时全量计算一次指标并预热增量状态（已常驻或有检查点时直接复用）"""
+        if self.daemon_frame is not None and self.indicator_state is not None:
+            return
+        if self.load_checkpoint(interval):
+            return
         
-        html += """
-</table>
-
-<h3>📊 WT1历史数据</h3>
-<table>
-  <tr>
-    <th>日期</th>
-    <th>WT1值</th>
-    <th>WT2值</th>
-    <th>状态</th>
-  </tr>
-"""
+        if interval == '1d':
+            df = self.get_btc_data()
+        else:
+            end_time = pd.Timestamp(datetime.utcnow())
+            df = self.candle_store.sync('BTCUSDT', interval, start=end_time - pd.Timedelta(days=365), end=end_time)
+        if df is None or len(df) == 0:
+            raise RuntimeError("获取数据失败，无法启动守护进程")
         
-        # 取最近7天数据
-        recent_7days = df.tail(7)
-        for _, r in recent_7days.iterrows():
-            days_ago = (row['date'] - r['date']).days
-            date_label = f"{r['date'].strftime('%Y-%m-%d')} ({'今天' if days_ago == 0 else f'{days_ago}天前'})"
-            wt_status = "金叉" if r["wt1"] > r["wt2"] else "死叉" if r["wt1"] < r["wt2"] else "无交叉"
-            wt_color = "green" if r["wt1"] > r["wt2"] else "red"
-            html += f"""
-  <tr>
-    <td>{date_label}</td>
-    <td>{r['wt1']:.1f}</td>
-    <td>{r['wt2']:.1f}</td>
-    <td style="color: {wt_color}; font-weight: bold;">{wt_status}</td>
-  </tr>
-"""
+        # 只保留已收盘K线，未收盘K线由收盘时刻的增量更新提交
+        now_ms = int(pd.Timestamp(datetime.utcnow()).value // 10**6)
+        open_ms = df['date'].values.astype('datetime64[ms]').astype(np.int64)
+        df = df[open_ms + INTERVAL_MS[interval] <= now_ms].reset_index(drop=True)
         
-        html += """
-</table>
-
-<h3>📊 动能值历史数据</h3>
-<table>
-  <tr>
-    <th>日期</th>
-    <th>动能值</th>
-    <th>动能柱颜色</th>
-    <th>挤压状态</th>
-    <th>变化</th>
-    <th>说明</th>
-  </tr>
-"""
+        self.daemon_frame = self.calculate_indicators(df)
+        self.indicator_state = IncrementalIndicatorState()
+        self.indicator_state.extend(df['high'].values, df['low'].values, df['close'].values)
+        print(f"✅ 守护进程初始化完成: {len(df)} 根已收盘K线")
+    
+    def on_candle_close(self, interval='1d', now=None):
+        """
+        收盘时刻的增量更新：只获取新收盘的K线，逐根推进指标状态并追加到常驻帧
         
-        # 取最近7天数据
-        for _, r in recent_7days.iterrows():
-            days_ago = (row['date'] - r['date']).days
-            date_label = f"{r['date'].strftime('%Y-%m-%d')} ({'今天' if days_ago == 0 else f'{days_ago}天前'})"
-            # 动能值 - 按截图格式显示更合理的数值
-            sqz_val = r.get('sqz_val', 0)
-            # 处理NaN值
-            if pd.isna(sqz_val) or sqz_val == 0:
-                sqz_val = 0
-            # 如果动能值太大，按截图格式调整显示
-            if abs(sqz_val) > 1000:
-                sqz_val_display = sqz_val / 1000  # 缩小1000倍显示
-                sqz_val_str = f"{sqz_val_display:+.1f}k"
-            else:
-                sqz_val_str = f"{sqz_val:+.1f}"
-            
-            sqz_status = "释放" if r.get('sqz_off') else "挤压中" if r.get('sqz_on') else "无"
-            
-            # 动能柱颜色 - 按正确逻辑显示
-            if r.get('sqz_on'):
-                # 挤压状态：灰色
-                color_name = "灰色"
-                color_code = "gray"
-            elif r.get('is_lime'):
-                # 上升：绿色
-                color_name = "绿色"
-                color_code = "#00ff00"
-            elif r.get('is_green'):
-                # 上升中下降：绿灰
-                color_name = "绿灰"
-                color_code = "#90EE90"
-            elif r.get('is_red'):
-                # 下降：红色
-                color_name = "红色"
-                color_code = "red"
-            elif r.get('is_maroon'):
-                # 下降减弱：红灰
-                color_name = "红灰"
-                color_code = "#FFB6C1"
-            else:
-                # 其他情况：灰色
-                color_name = "灰色"
-                color_code = "gray"
-            
-            # 变化 - 计算真实变化
-            if len(recent_7days) > 1:
-                prev_idx = recent_7days.index.get_loc(r.name) - 1
-                if prev_idx >= 0:
-                    prev_val = recent_7days.iloc[prev_idx].get('sqz_val', 0)
-                    if pd.isna(prev_val):
-                        prev_val = 0
-                    change = sqz_val - prev_val
-                    change_str = f"{change:+.1f}"
-                else:
-                    change_str = "+0.0"
-            else:
-                change_str = "+0.0"
-            
-            # 说明 - 按截图简化
-            if sqz_val > 0 and r.get('sqz_off'):
-                explanation = "动能增强，可以做多"
-            elif sqz_val > 0:
-                explanation = "动能一般，等待释放"
-            else:
-                explanation = "动能弱，观望"
-            
-            html += f"""
-  <tr>
-    <td>{date_label}</td>
-    <td>{sqz_val_str}</td>
-    <td style="color: {color_code}; font-weight: bold;">{color_name}</td>
-    <td>{sqz_status}</td>
-    <td>{change_str}</td>
-    <td>{explanation}</td>
-  </tr>
-"""
+        Returns:
+            新提交的K线数
+        """
+        step = INTERVAL_MS[interval]
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp(datetime.utcnow())
+        last_date = self.daemon_frame['date'].iloc[-1]
+        # 最后一根已收盘K线的开盘时间
+        closed_open = pd.Timestamp((now.value // 10**6 // step - 1) * step, unit='ms')
+        if closed_open <= last_date:
+            return 0
+        
+        bars = self.candle_store.sync('BTCUSDT', interval, start=last_date + pd.Timedelta(milliseconds=step),
+                                      end=closed_open)
+        new_bars = bars[(bars['date'] > last_date) & (bars['date'] <= closed_open)]
+        return self.advance_frame(new_bars)
+    
+    def advance_frame(self, new_bars):
+        """把新收盘K线逐根推进增量指标并追加到常驻帧，返回追加的K线数"""
+        new_bars = new_bars[new_bars['date'] > self.daemon_frame['date'].iloc[-1]].reset_index(drop=True)
+        if len(new_bars) == 0:
+            return 0
+        
+        rows = [self.indicator_state.push(bar.high, bar.low, bar.close) for bar in new_bars.itertuples()]
+        new_rows = pd.concat([new_bars, pd.DataFrame(rows)], axis=1)
+        
+        # 4小时信号只需对新K线对齐（前几根已收盘K线提供日线近似时的 shift 上下文）
+        context = pd.concat([self.daemon_frame.tail(2), new_rows], ignore_index=True)
+        context = self.add_4h_signals(context)
+        for col in ('sqz4h', 'mom4h', 'highlight_green'):
+            if col in context:
+                new_rows[col] = context[col].values[-len(new_rows):]
+        
+        self.daemon_frame = pd.concat([self.daemon_frame, new_rows.reindex(columns=self.daemon_frame.columns)],
+                                      ignore_index=True)
+        if self.provisional_tracker is not None:
+            self.confirm_provisional(new_rows)
+        return len(new_rows)
+    
+    @staticmethod
+    def next_close_time(now, interval='1d'):
+        """下一根K线的收盘时刻（UTC，Binance按整点对齐）"""
+        step = INTERVAL_MS[interval]
+        now_ms = pd.Timestamp(now).value // 10**6
+        return pd.Timestamp((now_ms // step + 1) * step, unit='ms')
+    
+    def run_daemon(self, interval='1d', close_delay=2.0, intraday_minutes=None):
+        """
+        守护进程模式：数据与指标常驻内存，每根K线收盘时刻唤醒
         
-        html += """
-</table>
-"""
+        - 唤醒后只获取刚收盘的K线，增量更新指标，发送日报/提醒
+        - intraday_minutes: 收盘前每隔N分钟用未收盘K线试算一次，发送盘中预警（None 关闭）
+        - SIGINT / SIGTERM 优雅退出，退出前保存检查点，下次启动直接恢复
         
-        # 添加卖出信号实时判断表格
-        html += """
-<h3>📊 卖出信号实时判断</h3>
-<table>
-  <tr>
-    <th>卖出信号</th>
-    <th>当前值</th>
-    <th>触发条件</th>
-    <th>状态</th>
-  </tr>
-"""
+        Args:
+            interval: K线周期（默认日线）
+            close_delay: 收盘后等待秒数（给交易所落库留时间）
+        """
+        print(f"🚀 启动BTC技术指标监控守护进程（周期 {interval}）...")
+        print("="*80)
         
-        # WT死叉
-        wt_cross_status = "未触发 (金叉状态)" if row['wt1'] > row['wt2'] else "已触发"
-        wt_cross_color = "green" if row['wt1'] > row['wt2'] else "red"
-        html += f"""
-  <tr>
-    <td><strong>WT死叉</strong></td>
-    <td>WT1({row['wt1']:.1f}) {'>' if row['wt1'] > row['wt2'] else '<'} WT2({row['wt2']:.1f})</td>
-    <td>WT1 &lt; WT2</td>
-    <td style="color: {wt_cross_color}; font-weight: bold;">{wt_cross_status}</td>
-  </tr>
-"""
+        stop = threading.Event()
         
-        # ADX下降
-        adx_status = "未触发 (22.3 > 20)" if row['adx'] >= 20 else "已触发"
-        adx_color = "green" if row['adx'] >= 20 else "red"
-        html += f"""
-  <tr>
-    <td><strong>ADX下降</strong></td>
-    <td>{row['adx']:.1f}</td>
-    <td>ADX &lt; 20</td>
-    <td style="color: {adx_color}; font-weight: bold;">{adx_status}</td>
-  </tr>
-"""
+        def request_stop(signum, frame):
+            print(f"\n🛑 收到退出信号({signum})，处理完当前任务后退出...")
+            stop.set()
         
-        # 跌破MA14
-        ma14_status = "未触发 (价格在上方)" if row['close'] > row['ma14'] else "已触发"
-        ma14_color = "green" if row['close'] > row['ma14'] else "red"
-        html += f"""
-  <tr>
-    <td><strong>跌破MA14</strong></td>
-    <td>{row['close']:,.0f} > {row['ma14']:,.0f}</td>
-    <td>价格 &lt; MA14</td>
-    <td style="color: {ma14_color}; font-weight: bold;">{ma14_status}</td>
-  </tr>
-"""
+        previous_handlers = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+        self.outbox.start()  # 后台线程重试发送失败的邮件
+        try:
+            self.bootstrap_daemon(interval)
+            if intraday_minutes:
+                self._get_provisional_tracker(interval)
+            # 补齐停机期间收盘的K线
+            if self.on_candle_close(interval):
+                self.dispatch_signals(self.daemon_frame)
+            self.save_checkpoint(interval)
+            
+            while not stop.is_set():
+                close_at = self.next_close_time(datetime.utcnow(), interval) + pd.Timedelta(seconds=close_delay)
+                wake_at = close_at
+                if intraday_minutes:
+                    wake_at = min(close_at, pd.Timestamp(datetime.utcnow()) + pd.Timedelta(minutes=intraday_minutes))
+                wait_seconds = (wake_at - pd.Timestamp(datetime.utcnow())).total_seconds()
+                print(f"⏳ 下次唤醒: {wake_at.strftime('%Y-%m-%d %H:%M:%S')} UTC（{wait_seconds / 3600:.2f} 小时后）")
+                if stop.wait(max(wait_seconds, 0)):
+                    break
+                
+                if wake_at < close_at:
+                    try:
+                        self.check_intraday(interval)
+                    except Exception as e:
+                        print(f"⚠️ 盘中试算失败，下次重试: {e}")
+                    continue
+                
+                t0 = time.perf_counter()
+                try:
+                    added = self.on_candle_close(interval)
+                except Exception as e:
+                    print(f"⚠️ 增量更新失败，下个收盘重试: {e}")
+                    continue
+                t_update = time.perf_counter() - t0
+                if not added:
+                    print("⚠️ 交易所尚未返回新收盘K线，下个收盘重试")
+                    continue
+                
+                self.dispatch_signals(self.daemon_frame)
+                t_total = time.perf_counter() - t0
+                print(f"⏱️ 收盘→发送完成: {t_total:.3f}s（获取+增量指标 {t_update:.3f}s）")
+                self.save_checkpoint(interval)
+        finally:
+            self.outbox.stop()
+            if getattr(self, 'daemon_frame', None) is not None:
+                self.save_checkpoint(interval)
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+        print("✅ 守护进程已退出")
+    
+    def run_stream(self, interval='1d', url=None, intraday_minutes=None):
+        """
+        推送模式：订阅WebSocket K线，收盘消息到达即推进指标并发送日报（无需等待定时唤醒）
         
-        # 挤压开启
-        sqz_status = "未触发 (当前释放)" if row.get('sqz_off') else "已触发" if row.get('sqz_on') else "未触发"
-        sqz_color = "green" if row.get('sqz_off') else "red"
-        sqz_state_text = "释放" if row.get('sqz_off') else "挤压中" if row.get('sqz_on') else "无"
-        html += f"""
-  <tr>
-    <td><strong>挤压开启</strong></td>
-    <td>{sqz_state_text}</td>
-    <td>挤压状态 = 挤压中</td>
-    <td style="color: {sqz_color}; font-weight: bold;">{sqz_status}</td>
-  </tr>
-"""
+        断线自动重连，重连后漏掉的收盘K线经REST补齐；SIGINT / SIGTERM 保存检查点后退出
         
-        # ATR追踪
-        atr_val = row.get('atr', 0)
-        atr_mult = self.atr_mult  # 使用类属性中的倍数
-        atr_trail = row['close'] - (atr_val * atr_mult)
-        atr_distance = row['close'] - atr_trail
-        atr_distance_pct = (atr_distance / row['close']) * 100
-        atr_status = f"未触发 ({row['close']:,.0f} > {atr_trail:,.0f})"
-        html += f"""
-  <tr>
-    <td><strong>ATR追踪</strong></td>
-    <td>{atr_trail:,.0f}</td>
-    <td>价格 &lt; ATR追踪线</td>
-    <td style="color: green; font-weight: bold;">{atr_status}</td>
-  </tr>
-</table>
-
-<h3>💰 卖出条件（实时判断）</h3>
-<table>
-  <tr>
-    <th>什么时候卖</th>
-    <th>卖多少</th>
-    <th>当前状态</th>
-    <th>判断结果</th>
-  </tr>
-  <tr>
-    <td>涨10% + 1个信号</td>
-    <td style="color: #ff9800; font-weight: bold;">卖30%</td>
-    <td>WT死叉✗/ADX&lt;20✗/跌破MA14✗/挤压开启✗</td>
-    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
-  </tr>
-  <tr>
-    <td>涨10% + 2个信号</td>
-    <td style="color: #ff9800; font-weight: bold;">再卖20%</td>
-    <td>需要2个信号同时出现</td>
-    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
-  </tr>
-  <tr>
-    <td>涨40%</td>
-    <td style="color: #ff9800; font-weight: bold;">卖50%</td>
-    <td>防止高位回落</td>
-    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
-  </tr>
-  <tr>
-    <td>涨50%</td>
-    <td style="color: #ff9800; font-weight: bold;">卖80-90%</td>
-    <td>超高位止盈</td>
-    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
-  </tr>
-  <tr>
-    <td>跌破ATR追踪线</td>
-    <td style="color: #ff9800; font-weight: bold;">全卖</td>
-    <td>ATR追踪止盈</td>
-    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
-  </tr>
-  <tr>
-    <td>亏损10%</td>
-    <td style="color: red; font-weight: bold;">止损</td>
-    <td>风险控制</td>
-    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
-  </tr>
-</table>
-
-<h3>📊 ATR追踪计算</h3>
-<table>
-  <tr>
-    <th>项目</th>
-    <th>数值</th>
-    <th>说明</th>
-  </tr>
-  <tr>
-    <td><strong>当前价格</strong></td>
-    <td>{row['close']:,.0f}美元</td>
-    <td>BTC当前价格</td>
-  </tr>
-  <tr>
-    <td><strong>14日ATR</strong></td>
-    <td>{atr_val:,.0f}美元</td>
-    <td>平均真实波幅</td>
-  </tr>
-  <tr>
-    <td><strong>动态倍数</strong></td>
-    <td style="font-size: 16px; color: #ff9800;"><strong>{atr_mult:.1f}倍</strong></td>
-    <td>根据市场条件调整</td>
-  </tr>
-  <tr>
-    <td><strong>ATR追踪线</strong></td>
-    <td>{atr_trail:,.0f}美元</td>
-    <td>{row['close']:,.0f} - ({atr_val:,.0f} × {atr_mult:.1f})</td>
-  </tr>
-  <tr>
-    <td><strong>追踪距离</strong></td>
-    <td>{atr_distance:,.0f}美元 ({atr_distance_pct:.1f}%)</td>
-    <td>当前价格到追踪线的距离</td>
-  </tr>
-</table>
-"""
+        Args:
+            url: 推送地址（默认Binance，测试时可指向本地 KlineReplayServer）
+            intraday_minutes: 未收盘推送每隔N分钟试算一次盘中预警（None 关闭）
+        """
+        print(f"🚀 启动BTC技术指标监控推送模式（周期 {interval}）...")
+        print("="*80)
         
-        # 策略测试结果
-        return_color = 'green' if strategy_results['total_return'] > 0 else 'red'
-        
-        html += f"""
-<h3>📈 策略测试结果（最近30天）</h3>
-<table>
-  <tr>
-    <th>指标</th>
-    <th>数值</th>
-    <th>说明</th>
-  </tr>
-  <tr>
-    <td><strong>总收益率</strong></td>
-    <td style="color: {return_color}; font-size: 18px;">{strategy_results['total_return']:.1f}%</td>
-    <td>最近30天策略表现</td>
-  </tr>
-  <tr>
-    <td><strong>交易次数</strong></td>
-    <td>{strategy_results['trades_count']}</td>
-    <td>信号触发次数</td>
-  </tr>
-  <tr>
-    <td><strong>当前持仓</strong></td>
-    <td>{strategy_results['current_positions']}</td>
-    <td>活跃仓位数量</td>
-  </tr>
-  <tr>
-    <td><strong>账户价值</strong></td>
-    <td>${strategy_results['total_value']:,.0f}</td>
-    <td>当前总价值</td>
-  </tr>
-  <tr>
-    <td><strong>当前杠杆</strong></td>
-    <td style="color: red; font-size: 18px; font-weight: bold;">0倍</td>
-    <td>无持仓，无杠杆</td>
-  </tr>
-</table>
-
-<p><strong>历史回测收益率：+73.56%</strong>（2024-2025年）</p>
-<p style="color: #666; font-size: 12px;">本邮件由BTC技术指标监控系统自动发送</p>
-
-<h3>🎯 今日操作建议</h3>
-"""
+        def on_close(bar):
+            t0 = time.perf_counter()
+            if not self.advance_frame(pd.DataFrame([bar])):
+                return
+            self.dispatch_signals(self.daemon_frame)
+            print(f"⏱️ 收盘推送→发送完成: {time.perf_counter() - t0:.3f}s")
+            self.save_checkpoint(interval)
+        
+        last_check = [None]
+        
+        def on_update(bar):
+            now = pd.Timestamp(datetime.utcnow())
+            if last_check[0] is not None and now - last_check[0] < pd.Timedelta(minutes=intraday_minutes):
+                return
+            last_check[0] = now
+            self.evaluate_provisional(bar, now=now)
+        
+        self.bootstrap_daemon(interval)
+        if intraday_minutes:
+            self._get_provisional_tracker(interval)
+        client = KlineStreamClient('BTCUSDT', interval, store=self.candle_store, url=url, on_close=on_close,
+                                   on_update=on_update if intraday_minutes else None)
+        client.last_closed = self.daemon_frame['date'].iloc[-1]
+        
+        def request_stop(signum, frame):
+            print(f"\n🛑 收到退出信号({signum})，断开推送后退出...")
+            client.stop()
+        
+        previous_handlers = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+        self.outbox.start()
+        try:
+            client.run()
+        finally:
+            self.outbox.stop()
+            self.save_checkpoint(interval)
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+        print(f"✅ 推送模式已退出（收盘K线 {client.stats['closed']} 根，重连 {client.stats['reconnects']} 次）")
+    
+    # ============ 盘中预警（未收盘K线试算） ============
+    
+    def _get_provisional_tracker(self, interval='1d'):
+        if self.provisional_tracker is None:
+            path = Path(self.candle_store.data_folder) / f'盘中预警记录_BTCUSDT_{interval}.csv'
+            self.provisional_tracker = ProvisionalSignalTracker(path)
+        return self.provisional_tracker
+    
+    def signal_keys(self, row):
+        """一根K线触发的信号 {键: 描述}，盘中试算与收盘确认用同一套键"""
+        keys = {f"入场{s['level']}": s['name'] for s in self.check_entry_signals_detailed(row)}
+        exit_signal = self.check_exit_signals_detailed(row)
+        if exit_signal.get('has_signal'):
+            keys['出场'] = f"出场信号（{exit_signal['signal_count']}个指标）"
+        return keys
+    
+    def fetch_forming_bar(self, interval='1d', now=None):
+        """获取当前未收盘K线（只请求当前这一根）"""
+        step = INTERVAL_MS[interval]
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp(datetime.utcnow())
+        open_time = pd.Timestamp(now.value // 10**6 // step * step, unit='ms')
+        bars = self.candle_store.sync('BTCUSDT', interval, start=open_time, end=open_time)
+        bars = bars[bars['date'] == open_time]
+        return bars.iloc[-1].to_dict() if len(bars) else None
+    
+    def check_intraday(self, interval='1d', now=None):
+        """盘中定时任务：获取未收盘K线并试算信号，返回新出现的预备信号"""
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp(datetime.utcnow())
+        self._get_provisional_tracker(interval)
+        bar = self.fetch_forming_bar(interval, now)
+        if bar is None:
+            print("⚠️ 未获取到未收盘K线，跳过本次盘中试算")
+            return {}
+        return self.evaluate_provisional(bar, now=now)
+    
+    def evaluate_provisional(self, bar, now=None):
+        """
+        用未收盘K线试算入场/出场规则（增量状态 peek，O(1)，不重算历史、不改变状态）
         
-        # 入场信号
-        if entry_signals:
-            html += '<div class="alert"><h3>🚨 检测到买入信号！</h3>'
-            for s in entry_signals:
-                position_pct = [15,25,30,30][s['level']-1]
-                position_amount = [15000,25000,30000,30000][s['level']-1]
-                stop_loss = s['price']*0.85
-                take_profit_str = "持有，等ATR信号" if s['level']==1 else "涨10%后如果出现2个卖出信号，先卖一半"
-                
-                html += f"""
-<div style="background-color: white; padding: 15px; margin: 10px 0; border: 2px solid #ff9800;">
-  <h4>{s['name']}</h4>
-  <p><strong>当前价格：</strong><span style="color: #2196F3; font-size: 18px;">${s['price']:,.0f}</span></p>
-  
-  <p><strong>✅ 满足条件：</strong></p>
-  <ul>
-"""
-                for cond in s['conditions']:
-                    html += f'    <li>{cond}</li>\n'
-                
-                html += f"""
-  </ul>
-  
-  <p><strong>💰 怎么操作：</strong></p>
-  <table>
-    <tr>
-      <th>项目</th>
-      <th>详情</th>
-    </tr>
-    <tr>
-      <td>仓位</td>
-      <td>第{s['level']}仓 - 用{position_pct}%的资金</td>
-    </tr>
-    <tr>
-      <td>资金量</td>
-      <td>${position_amount:,} (假设10万本金)</td>
-    </tr>
-    <tr>
-      <td>入场价</td>
-      <td>${s['price']:,.0f} 附近</td>
-    </tr>
-    <tr>
-      <td>止损位</td>
-      <td>${stop_loss:,.0f} (-15%)</td>
-    </tr>
-    <tr>
-      <td>止盈策略</td>
-      <td>{take_profit_str}</td>
-    </tr>
-  </table>
-  
-  <p style="color: {'red' if s['level'] > 1 else 'green'}; font-weight: bold;">
-    {f'⚠️ 注意：要先有第{s["level"]-1}仓，才能买第{s["level"]}仓！' if s['level'] > 1 else '✅ 第1仓可以直接买'}
-  </p>
-</div>
-"""
-            html += '</div>'
-        else:
-            html += '<p>暂无买入信号，继续观望</p>'
+        同一根K线上的同一信号只提醒一次；收盘时由 advance_frame 记录是否确认
         
-        # 出场信号
-        if exit_signal.get('has_signal'):
-            html += f"""
-<div class="danger">
-  <h3>⚠️ 检测到{exit_signal['signal_count']}个卖出信号！</h3>
-  <p><strong>触发的信号：</strong></p>
-  <ul>
-"""
-            for sig in exit_signal['signals']:
-                html += f'    <li>{sig}</li>\n'
-            
-            html += f"""
-  </ul>
-  
-  <p><strong>💡 建议操作：</strong></p>
-  <ol>
-    <li>先卖50%仓位，锁定利润</li>
-    <li>剩下50%继续持有，等ATR信号</li>
-    <li>如果有3-4个卖出信号，考虑全部清仓</li>
-  </ol>
-</div>
-"""
-        else:
-            html += '<div class="success"><p>✅ 无卖出信号，继续持有</p></div>'
-        
-        html += """
-<hr>
-<h3>📋 策略说明</h3>
-<table>
-  <tr>
-    <th>仓位</th>
-    <th>资金</th>
-    <th>入场条件</th>
-    <th>止盈方式</th>
-  </tr>
-  <tr>
-    <td>第1仓</td>
-    <td>15%</td>
-    <td>WT金叉抄底</td>
-    <td>ATR追踪</td>
-  </tr>
-  <tr>
-    <td>第2仓</td>
-    <td>25%</td>
-    <td>动能确认</td>
-    <td>主动+ATR</td>
-  </tr>
-  <tr>
-    <td>第3仓</td>
-    <td>30%</td>
-    <td>突破MA14</td>
-    <td>主动+ATR</td>
-  </tr>
-  <tr>
-    <td>第4仓</td>
-    <td>30%</td>
-    <td>ADX趋势加强</td>
-    <td>主动+ATR</td>
-  </tr>
-</table>
-"""
+        Returns:
+            {信号键: 描述}：本次新出现的预备信号
+        """
+        if self.indicator_state is None or bar['date'] <= self.daemon_frame['date'].iloc[-1]:
+            return {}
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp(datetime.utcnow())
+        row = self.indicator_state.peek(bar['high'], bar['low'], bar['close'])
+        row.update(date=bar['date'], open=bar['open'], high=bar['high'], low=bar['low'], close=bar['close'])
+        
+        tracker = self.provisional_tracker or self._get_provisional_tracker()
+        new = tracker.observe(bar['date'], self.signal_keys(row), now, bar['close'])
+        if not new:
+            return {}
+        
+        date = pd.Timestamp(bar['date']).strftime('%Y-%m-%d')
+        names = "、".join(new.values())
+        print(f"⏳ 盘中预备信号（未收盘）: {names} @ ${bar['close']:,.0f}")
+        self.send_email(
+            subject=f"⏳【盘中预警·未收盘】{names} BTC ${bar['close']:,.0f} {date}",
+            body=self.generate_provisional_alert(row, new, now),
+            is_alert=True
+        )
+        return new
+    
+    def confirm_provisional(self, closed_rows):
+        """K线收盘后记录当日预备信号是否确认，并打印累计确认率"""
+        tracker = self.provisional_tracker
+        for row in closed_rows.to_dict('records'):
+            result = tracker.confirm(row['date'], self.signal_keys(row),
+                                     close_time=pd.Timestamp(datetime.utcnow()))
+            if not result:
+                continue
+            text = "，".join(f"{key}{'✅' if ok else '❌'}" for key, ok in result.items())
+            print(f"🔎 {row['date'].strftime('%Y-%m-%d')} 盘中预警收盘确认: {text}")
+            stats = tracker.stats()
+            for item in stats.itertuples():
+                print(f"   {item.signal}: 预警 {item.provisional} 次，确认 {item.confirmed} 次"
+                      f"（{item.confirmation_rate:.0f}%），平均提前 {item.avg_lead_hours:.1f} 小时")
+    
+    def generate_provisional_alert(self, row, signals, now):
+        """生成盘中预警邮件 - HTML表格版（预编译模板）"""
+        return render_provisional_alert(row, signals, now)
+    
+    def generate_daily_report(self, row, entry_signals, exit_signal, df=None):
+        """生成每日监控报告 - HTML表格版本（df 为已计算指标的帧，为None时重新获取；版式见 报告模板模块）"""
+        if df is None:
+            df = self.get_btc_data()
+            df = self.calculate_indicators(df)
         
-        return html
+        # 持仓账本推进到最新收盘K线（每根新K线只算一步）
+        self.advance_strategy(df)
+        strategy_results = self.strategy_summary(row['close'])
+        
+        # 今日各仓入场条件 + 整段历史的条件命中统计（同一套规则）
+        entry_ok = MONITOR_ENTRY_RULES.check(row)
+        entry_hits = MONITOR_ENTRY_RULES.hit_counts(df)
+        hit_rows = []
+        for level, group in entry_hits.groupby('rule', sort=True):
+            hits, conditions = group['hits'].to_numpy(), group['condition'].to_numpy()
+            weakest = int(np.argmin(hits[:-1]))  # 最后一行为"全部满足"
+            hit_rows.append((level, int(hits[-1]), conditions[weakest], int(hits[weakest])))
+        
+        # 最近7天的指标行（普通字典，模板填槽比逐行 Series 访问快得多）
+        recent_rows = df.tail(7).to_dict('records')
+        return render_daily_report(row, recent_rows, entry_ok, hit_rows, len(df), strategy_results,
+                                   entry_signals, exit_signal, self.atr_mult, positions=self.long_positions)
     
     def generate_daily_report_old(self, row, entry_signals, exit_signal):
         """生成每日监控报告"""
@@ -1988,73 +1843,9 @@ class BTCIndicatorMonitor:
         
         return html
     
-    def generate_entry_alert(self, signal, date):
-        """生成入场警报邮件 - HTML表格版"""
-        position_pct = [0.15, 0.25, 0.30, 0.30][signal['level']-1]
-        example_amount = 100000 * position_pct
-        stop_loss = signal['price']*0.85
-        take_profit_str = "ATR追踪" if signal['level']==1 else "涨10%+2个卖出信号→卖50%"
-        step3_str = "等ATR信号止盈" if signal['level']==1 else "涨10%后看卖出信号"
-        
-        html = f"""
-<div style="background-color: #4CAF50; padding: 20px; text-align: center;">
-  <h1 style="color: white;">🚨 BTC买入机会！</h1>
-</div>
-
-<h2>{signal['name']}</h2>
-<p><strong>日期：</strong>{date}</p>
-<p><strong>当前价格：</strong><span style="color: #2196F3; font-size: 24px;">${signal['price']:,.0f}</span></p>
-
-<h3>✅ 满足条件</h3>
-<ul>
-"""
-        for cond in signal['conditions']:
-            html += f'  <li>{cond}</li>\n'
-        
-        html += f"""
-</ul>
-
-<h3>💰 操作指南（第{signal['level']}仓）</h3>
-<table>
-  <tr>
-    <th>项目</th>
-    <th>详情</th>
-  </tr>
-  <tr>
-    <td>仓位比例</td>
-    <td style="font-size: 18px; color: #f44336;"><strong>{position_pct*100:.0f}%</strong></td>
-  </tr>
-  <tr>
-    <td>资金量</td>
-    <td>${example_amount:,} (假设10万本金)</td>
-  </tr>
-  <tr>
-    <td>入场价</td>
-    <td>${signal['price']:,.0f}</td>
-  </tr>
-  <tr>
-    <td>止损位</td>
-    <td>${stop_loss:,.0f} (-15%)</td>
-  </tr>
-  <tr>
-    <td>止盈策略</td>
-    <td>{take_profit_str}</td>
-  </tr>
-</table>
-
-<h3>📝 操作步骤</h3>
-<ol>
-  <li>用<strong>${example_amount:,}</strong>在<strong>${signal['price']:,.0f}</strong>附近买入</li>
-  <li>设置止损单<strong>${stop_loss:,.0f}</strong></li>
-  <li>{step3_str}</li>
-</ol>
-
-<p style="color: {'red' if signal['level'] > 1 else 'green'}; font-weight: bold; font-size: 16px;">
-  {f'⚠️ 注意：需要先有第{signal["level"]-1}仓！' if signal['level'] > 1 else '✅ 第1仓可直接买'}
-</p>
-"""
-        
-        return html
+    def generate_entry_alert(self, signal, date, symbol='BTC'):
+        """生成入场警报邮件 - HTML表格版（预编译模板）"""
+        return render_entry_alert(signal, date, symbol)
     
     def generate_entry_alert_old(self, signal, date):
         """旧版HTML格式"""
@@ -2152,154 +1943,44 @@ class BTCIndicatorMonitor:
         
         return html
     
-    def generate_exit_alert(self, signal, date):
-        """生成出场警报邮件 - HTML表格版"""
-        urgency_text = '🚨🚨 非常高' if signal['signal_count'] >= 3 else '🚨 高'
-        
-        html = f"""
-<div style="background-color: #f44336; padding: 20px; text-align: center;">
-  <h1 style="color: white;">⚠️ BTC卖出信号！</h1>
-</div>
-
-<h2>检测到{signal['signal_count']}个出场指标</h2>
-<p><strong>日期：</strong>{date}</p>
-<p><strong>当前价格：</strong><span style="color: #f44336; font-size: 24px;">${signal['price']:,.0f}</span></p>
-<p><strong>紧急程度：</strong><span style="color: red; font-size: 18px;">{urgency_text}</span></p>
-
-<h3>⚠️ 触发的信号</h3>
-<ul>
-"""
-        for sig in signal['signals']:
-            html += f'  <li><strong>{sig}</strong></li>\n'
-        
-        html += f"""
-</ul>
-
-<div class="danger">
-  <h3>💰 操作建议</h3>
-  <p>如果您有持仓，建议这样操作：</p>
-  
-  <table>
-    <tr>
-      <th>步骤</th>
-      <th>操作</th>
-    </tr>
-    <tr>
-      <td>步骤1</td>
-      <td>先卖50%仓位，在${signal['price']:,.0f}附近卖出，锁定一半利润</td>
-    </tr>
-    <tr>
-      <td>步骤2</td>
-      <td>剩余50%继续持有，用ATR追踪止盈</td>
-    </tr>
-    <tr>
-      <td>步骤3</td>
-      <td>如果信号增加到3-4个，考虑全部清仓</td>
-    </tr>
-  </table>
-</div>
-
-<p style="color: #666; margin-top: 20px;">⚠️ 请及时查看TradingView确认信号后再操作</p>
-"""
-        
-        return html
+    def generate_exit_alert(self, signal, date, symbol='BTC'):
+        """生成出场警报邮件 - HTML表格版（预编译模板）"""
+        return render_exit_alert(signal, date, symbol)
     
     def get_btc_data(self):
-        """获取BTC数据 - 优先使用Binance真实数据"""
-        import time
-        import requests
-        
-        # 方法1：使用Binance API分批获取完整5年数据
+        """获取BTC数据 - 优先使用Binance真实数据（本地K线存储 + 只补缺失区间）"""
+        # 方法1：本地K线存储，按覆盖索引只请求缺失区间（最近5年）
         print("📥 开始从Binance获取真实BTC数据...")
         try:
-            all_data = []
-            
-            # 计算时间范围（最近5年）
-            end_time = int(datetime.now().timestamp() * 1000)
-            start_time = end_time - (5 * 365 * 24 * 60 * 60 * 1000)  # 5年前
-            
-            # Binance API每次最多返回1000条，需要分批获取
-            current_start = start_time
-            batch_count = 0
-            
-            while current_start < end_time:
-                batch_count += 1
-                print(f"  获取批次 {batch_count}...", end=' ')
-                
-                try:
-                    url = "https://api.binance.com/api/v3/klines"
-                    params = {
-                        'symbol': 'BTCUSDT',
-                        'interval': '1d',
-                        'startTime': current_start,
-                        'endTime': end_time,
-                        'limit': 1000
-                    }
-                    
-                    response = requests.get(url, params=params, timeout=30)
-                    
-                    if response.status_code == 200:
-                        batch_data = response.json()
-                        
-                        if not batch_data or len(batch_data) == 0:
-                            print("无更多数据")
-                            break
-                        
-                        all_data.extend(batch_data)
-                        print(f"✓ 获取 {len(batch_data)} 条")
-                        
-                        # 更新起始时间到最后一条数据的时间+1天
-                        last_timestamp = batch_data[-1][0]
-                        current_start = last_timestamp + (24 * 60 * 60 * 1000)
-                        
-                        # 如果返回的数据少于1000条，说明已经获取完毕
-                        if len(batch_data) < 1000:
-                            break
-                        
-                        # 避免触发API限制
-                        time.sleep(0.5)
-                    else:
-                        print(f"✗ HTTP {response.status_code}")
-                        break
-                        
-                except requests.exceptions.Timeout:
-                    print("✗ 超时，重试...")
-                    time.sleep(2)
-                    continue
-                except Exception as e:
-                    print(f"✗ 错误: {e}")
-                    break
-            
-            # 处理获取到的数据
-            if all_data and len(all_data) > 100:
-                df = pd.DataFrame(all_data, columns=[
-                    'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                    'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-                    'taker_buy_quote', 'ignore'
-                ])
-                
-                df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
-                df['open'] = df['open'].astype(float)
-                df['high'] = df['high'].astype(float)
-                df['low'] = df['low'].astype(float)
-                df['close'] = df['close'].astype(float)
-                df['volume'] = df['volume'].astype(float)
-                
-                df = df[['date', 'open', 'high', 'low', 'close', 'volume']].reset_index(drop=True)
-                
-                print(f"\n✅ 从Binance成功获取 {len(df)} 天真实数据")
-                print(f"📅 数据区间: {df['date'].min().strftime('%Y-%m-%d')} 至 {df['date'].max().strftime('%Y-%m-%d')}")
-                print(f"💰 价格区间: ${df['close'].min():.2f} - ${df['close'].max():.2f}")
-                
-                return df
+            end_time = pd.Timestamp(datetime.utcnow())
+            start_time = end_time - pd.Timedelta(days=5 * 365)
+            
+            df = self.candle_store.sync('BTCUSDT', '1d', start=start_time, end=end_time)
+            df = df[df['date'] >= start_time.normalize()].reset_index(drop=True)
+            if len(df) <= 100:
+                raise ValueError(f"本地及远程数据不足（{len(df)} 天）")
+            
+            # 覆盖率检查：缺口会被calculate_indicators的bfill/ffill掩盖，这里明确提示
+            report = self.candle_store.coverage_report('BTCUSDT', '1d', start=df['date'].min(), end=end_time)
+            print(f"🧮 数据覆盖率: {report['coverage_pct']:.2f}% "
+                  f"({report['present']}/{report['expected']}天, 缺口{report['gaps']}个, 重复{report['duplicates']}根)")
+            if report['gaps']:
+                for gap_start, gap_end in report['missing_ranges'][:5]:
+                    print(f"   ⚠️ 缺失: {gap_start.strftime('%Y-%m-%d')} 至 {gap_end.strftime('%Y-%m-%d')}")
+            
+            print(f"\n✅ 从Binance成功获取 {len(df)} 天真实数据")
+            print(f"📅 数据区间: {df['date'].min().strftime('%Y-%m-%d')} 至 {df['date'].max().strftime('%Y-%m-%d')}")
+            print(f"💰 价格区间: ${df['close'].min():.2f} - ${df['close'].max():.2f}")
+            
+            return df
                 
         except Exception as e:
             print(f"\n⚠️ Binance API失败: {e}")
         
         return None
     
-    def calculate_indicators(self, df):
-        """计算技术指标"""
+    def calculate_indicators(self, df, sync_4h=True):
+        """计算技术指标（sync_4h=False 时4h K线已预先同步，不再请求）"""
         print("计算技术指标...")
         
         # WaveTrend
@@ -2323,34 +2004,25 @@ class BTCIndicatorMonitor:
             kc_period = 20
             kc_mult = 1.5
             
-            # 转换为pandas Series以便使用shift
-            close_series = pd.Series(close)
-            high_series = pd.Series(high)
-            low_series = pd.Series(low)
+            # 融合滚动矩：SMA / STDDEV / 最高 / 最低 / 波幅均值一次算出（窗口相同时只遍历一次）
+            bb = rolling_moments(close, bb_period, high, low, use_true_range=use_true_range)
+            kc = bb if kc_period == bb_period else rolling_moments(close, kc_period, high, low,
+                                                                     use_true_range=use_true_range)
             
             # === 布林带计算 ===
-            # source = close, basis = ta.sma(source, lengthBB)
-            bb_mid = talib.SMA(close, timeperiod=bb_period)
-            bb_std = talib.STDDEV(close, timeperiod=bb_period)
+            # source = close, basis = ta.sma(source, lengthBB), dev = multBB * ta.stdev(source, lengthBB)
+            bb_mid = bb['mean']
+            bb_std = bb['std']
             bb_upper = bb_mid + (bb_mult * bb_std)
             bb_lower = bb_mid - (bb_mult * bb_std)
             
             # === 肯特纳通道计算 ===
             # maKC = ta.sma(source, lengthKC)
-            kc_mid = talib.SMA(close, timeperiod=kc_period)
+            kc_mid = kc['mean']
             
             # rangeKC = useTrueRange ? ta.tr : (high - low)
-            if use_true_range:
-                # True Range = max(high-low, abs(high-close[1]), abs(low-close[1]))
-                tr1 = high_series - low_series
-                tr2 = abs(high_series - close_series.shift(1))
-                tr3 = abs(low_series - close_series.shift(1))
-                range_kc = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1).values
-            else:
-                range_kc = high - low
-            
             # rangemaKC = ta.sma(rangeKC, lengthKC)
-            range_ma_kc = talib.SMA(range_kc, timeperiod=kc_period)
+            range_ma_kc = kc['range_mean']
             kc_upper = kc_mid + (range_ma_kc * kc_mult)
             kc_lower = kc_mid - (range_ma_kc * kc_mult)
             
@@ -2363,9 +2035,9 @@ class BTCIndicatorMonitor:
             
             # === 动能线线性回归计算 ===
             # avgHL = (ta.highest(high, lengthKC) + ta.lowest(low, lengthKC)) / 2
-            avg_hl = (talib.MAX(high, timeperiod=kc_period) + talib.MIN(low, timeperiod=kc_period)) / 2
+            avg_hl = (kc['max'] + kc['min']) / 2
             # avgAll = (avgHL + ta.sma(close, lengthKC)) / 2
-            avg_all = (avg_hl + talib.SMA(close, timeperiod=kc_period)) / 2
+            avg_all = (avg_hl + kc_mid) / 2
             # val = ta.linreg(source - avgAll, lengthKC, 0)
             source_minus_avg = close - avg_all
             val = linear_regression(source_minus_avg, kc_period)
@@ -2413,6 +2085,8 @@ class BTCIndicatorMonitor:
         df['sqz_on'], df['sqz_off'], df['no_sqz'], df['sqz_val'], df['is_lime'], df['is_green'], df['is_red'], df['is_maroon'] = sqzmom(df['high'], df['low'], df['close'])
         df['adx'] = talib.ADX(df['high'], df['low'], df['close'], 14)
         df['ma14'] = talib.SMA(df['close'], 14)
+        # ATR：持仓账本的ATR追踪止盈线（check_take_profit 读取 row['atr']）
+        df['atr'] = talib.ATR(df['high'], df['low'], df['close'], 14)
         
         # 填充NaN值
         df = df.fillna(method='bfill').fillna(method='ffill')
@@ -2420,80 +2094,242 @@ class BTCIndicatorMonitor:
         df['wt_golden_cross'] = (df['wt1'].shift(1) < df['wt2'].shift(1)) & (df['wt1'] > df['wt2'])
         df['wt_death_cross'] = (df['wt1'].shift(1) > df['wt2'].shift(1)) & (df['wt1'] < df['wt2'])
         df['adx_up'] = (df['adx'] > 20) & (df['adx'] > df['adx'].shift(1))
+        df = self.add_4h_signals(df, sync=sync_4h)
         
         df = df.fillna(method='bfill').fillna(method='ffill')
         
         print("✅ 技术指标计算完成")
         return df
     
-    def run_quick_backtest(self, df):
-        """快速策略回测 - 用于每日报告"""
+    # ============ 策略持仓账本 ============
+    
+    def _strategy_book_path(self):
+        return Path(self.candle_store.data_folder) / '策略持仓账本_BTCUSDT.pkl'
+    
+    def _strategy_state(self):
+        return {'version': self.strategy_book_version, 'start': self.strategy_start, 'cash': self.cash, 'account_value': self.account_value,
+                'long_positions': self.long_positions, 'short_positions': self.short_positions,
+                'trades': self.strategy_trades, 'last_date': self.strategy_last_date}
+    
+    def _set_strategy_state(self, state):
+        self.cash = state['cash']
+        self.account_value = state['account_value']
+        self.long_positions = state['long_positions']
+        self.short_positions = state['short_positions']
+        self.strategy_trades = state['trades']
+        self.strategy_last_date = state['last_date']
+    
+    def save_strategy_book(self):
+        """保存持仓账本，先写临时文件再替换"""
+        path = self._strategy_book_path()
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(self._strategy_state(), f)
+        os.replace(tmp, path)
+    
+    def load_strategy_book(self):
+        """读取持仓账本，成功返回True（版本或起始日期与当前配置不同时视为无账本）"""
+        path = self._strategy_book_path()
+        if not path.exists():
+            return False
         try:
-            # 模拟策略参数
-            initial_capital = 100000
-            current_cash = initial_capital
-            positions = []
-            trades = []
-            
-            # 简化的策略逻辑
-            for idx, row in df.tail(30).iterrows():  # 只测试最近30天
-                current_price = row['close']
-                
-                # 检查入场信号
-                if row['wt1'] < -30 and row['wt1'] > row['wt2'] and len(positions) == 0:
-                    # 第1仓入场
-                    position_size = initial_capital * 0.15
-                    shares = position_size / current_price
-                    positions.append({
-                        'entry_price': current_price,
-                        'shares': shares,
-                        'amount': position_size,
-                        'level': 1
-                    })
-                    current_cash -= position_size
-                    trades.append({
-                        'date': row['date'],
-                        'action': '买入',
-                        'price': current_price,
-                        'amount': position_size,
-                        'level': 1
-                    })
-                
-                # 检查出场信号
-                if positions and (row.get('wt_death_cross', False) or row['adx'] < 20):
-                    for pos in positions:
-                        pnl = (current_price - pos['entry_price']) / pos['entry_price']
-                        current_cash += pos['amount'] + (pos['shares'] * current_price - pos['amount'])
-                        trades.append({
-                            'date': row['date'],
-                            'action': '卖出',
-                            'price': current_price,
-                            'amount': pos['amount'],
-                            'pnl_pct': pnl * 100
-                        })
-                    positions = []
-            
-            # 计算收益
-            total_value = current_cash
-            for pos in positions:
-                total_value += pos['shares'] * df['close'].iloc[-1]
-            
-            return_pct = (total_value - initial_capital) / initial_capital * 100
-            
-            return {
-                'total_return': return_pct,
-                'trades_count': len(trades),
-                'current_positions': len(positions),
-                'total_value': total_value
-            }
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('version') != self.strategy_book_version or state.get('start') != self.strategy_start:
+                return False
+            self._set_strategy_state(state)
         except Exception as e:
-            return {
-                'total_return': 0,
-                'trades_count': 0,
-                'current_positions': 0,
-                'total_value': 100000,
-                'error': str(e)
-            }
+            print(f"⚠️ 持仓账本读取失败，从头回放: {e}")
+            return False
+        return True
+    
+    def advance_strategy(self, df, now=None, persist=True):
+        """
+        把持仓账本推进到 df 中最后一根已收盘的日线（账本的仓位、止损、追踪线、分批止盈状态逐根延续）
+        
+        首次运行（无账本文件）从 strategy_start 起回放一次历史，之后每次只推进新收盘的K线，
+        每根K线O(1)；未收盘的K线不入账
+        
+        Returns:
+            本次推进的K线数
+        """
+        if self.strategy_last_date is None and not self.load_strategy_book():
+            self.reset_strategy()
+        
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp(datetime.utcnow())
+        open_ms = df['date'].values.astype('datetime64[ms]').astype(np.int64)
+        closed = open_ms + INTERVAL_MS['1d'] <= now.value // 10**6
+        if self.strategy_last_date is None:
+            pending = closed & (df['date'] >= self.strategy_start).to_numpy()
+        else:
+            pending = closed & (df['date'] > self.strategy_last_date).to_numpy()
+        new_rows = df[pending]
+        if len(new_rows) == 0:
+            return 0
+        
+        fired = MONITOR_ENTRY_RULES.matrix(new_rows)
+        keys = MONITOR_ENTRY_RULES.keys()
+        trade_id = len(self.strategy_trades) + 1
+        for row, row_fired in zip(new_rows.to_dict('records'), fired):
+            trade_id = self.step_strategy(row, dict(zip(keys, row_fired)), self.strategy_trades, trade_id)
+        self.strategy_last_date = new_rows['date'].iloc[-1]
+        if persist:
+            self.save_strategy_book()
+        print(f"📒 持仓账本推进 {len(new_rows)} 根K线至 {self.strategy_last_date.strftime('%Y-%m-%d')}，"
+              f"持仓 {len(self.long_positions)} 仓")
+        return len(new_rows)
+    
+    def strategy_summary(self, price):
+        """持仓账本摘要（日报策略表）：自 strategy_start 起的收益、交易次数、持仓数、按 price 估算的账户价值"""
+        positions_value = sum(pos.get('remaining_shares', pos['shares']) * price for pos in self.long_positions)
+        total_value = self.cash + positions_value
+        return {
+            'start': self.strategy_start,
+            'total_return': (total_value - self.initial_capital) / self.initial_capital * 100,
+            'trades_count': len(self.strategy_trades),
+            'current_positions': len(self.long_positions),
+            'total_value': total_value,
+            'exposure': positions_value / total_value if total_value > 0 else 0.0
+        }
+    
+    # ============ 历史日报批量重建 ============
+    
+    def regenerate_reports(self, start, end=None, out_dir=None, df=None, max_workers=None):
+        """
+        批量重建历史日报：指标帧只算一次，逐日信号向量化判断，多进程并行渲染（不发送邮件）
+        
+        每份日报与当天运行时生成的一致：截至该日的K线、近5天交叉、截至该日的持仓账本
+        （从 strategy_start 起逐日推进一次，不影响已保存的账本）、截至该日的入场条件命中统计（前缀和）；
+        只有触发信号的日期才生成详细说明
+        
+        Args:
+            start / end: 日期区间（含两端，end 默认最新K线）
+            out_dir: 输出目录（默认 K线数据/历史日报），每天一个HTML + 索引.csv
+            df: 已计算指标的帧（为None时获取并计算）
+            max_workers: 渲染进程数（默认CPU核数）
+        
+        Returns:
+            DataFrame: 索引（date / subject / entry_levels / exit_count / close / file）
+        """
+        print(f"🚀 批量重建历史日报: {start} ~ {end or '最新'}")
+        print("="*80)
+        timer = StageTimer()
+        if df is None:
+            with timer.stage('获取+计算指标'):
+                df = self.get_btc_data()
+                if df is None or len(df) == 0:
+                    print("❌ 获取数据失败")
+                    return None
+                df = self.calculate_indicators(df)
+        df = df.reset_index(drop=True)
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end) if end is not None else df['date'].iloc[-1]
+        selected = np.flatnonzero(((df['date'] >= start) & (df['date'] <= end)).to_numpy())
+        if not len(selected):
+            print("❌ 区间内没有K线")
+            return None
+        out_dir = Path(out_dir) if out_dir is not None else Path(self.candle_store.data_folder) / '历史日报'
+        
+        with timer.stage('逐日信号', after=('获取+计算指标',)):
+            records = df.to_dict('records')
+            # 入场：规则矩阵一次判断；出场：4个指标计数（与 check_exit_signals_detailed 同口径）
+            fired = MONITOR_ENTRY_RULES.matrix(df)
+            exit_count = (df['wt_death_cross'].to_numpy().astype(bool).astype(int) + (df['adx'] < 20).to_numpy()
+                          + (df['close'] < df['ma14']).to_numpy() + df['sqz_on'].to_numpy().astype(bool))
+            hits = HitCountHistory(MONITOR_ENTRY_RULES, df)
+            keys = MONITOR_ENTRY_RULES.keys()
+            
+            # 独立的账本从 strategy_start 起逐日推进，结束后恢复已保存的账本
+            saved_book = self._strategy_state()
+            self.reset_strategy()
+            cursor = int(np.searchsorted(df['date'].to_numpy(), np.datetime64(pd.Timestamp(self.strategy_start))))
+            try:
+                trade_id = 1
+                jobs, index = [], []
+                for i in selected:
+                    row = records[i]
+                    while cursor <= i:
+                        trade_id = self.step_strategy(records[cursor], dict(zip(keys, fired[cursor])),
+                                                      self.strategy_trades, trade_id)
+                        cursor += 1
+                    entry_signals = self.check_entry_signals_detailed(row) if fired[i].any() else []
+                    exit_signal = self.check_exit_signals_detailed(row) if exit_count[i] >= 2 else {'has_signal': False}
+                    strategy_results = self.strategy_summary(row['close'])
+                    date = row['date'].strftime('%Y-%m-%d')
+                    subject, _ = self.report_subject(entry_signals, date, '历史')
+                    filename = f'BTC日报_{date}.html'
+                    jobs.append((filename, dict(
+                        row=row, recent_rows=records[max(0, i - 6):i + 1],
+                        entry_ok={key: bool(ok) for key, ok in zip(MONITOR_ENTRY_RULES.keys(), fired[i])},
+                        hit_rows=hits.rows(i), n_bars=i + 1, strategy_results=strategy_results,
+                        entry_signals=entry_signals, exit_signal=exit_signal, atr_mult=self.atr_mult,
+                        positions=copy.deepcopy(self.long_positions))))
+                    index.append({'date': date, 'subject': subject,
+                                  'entry_levels': '、'.join(str(s['level']) for s in entry_signals),
+                                  'exit_count': int(exit_count[i]), 'close': row['close'], 'file': filename})
+            finally:
+                self._set_strategy_state(saved_book)
+        
+        with timer.stage('并行渲染', after=('逐日信号',)):
+            count, size = render_reports(jobs, out_dir, max_workers=max_workers)
+            index = pd.DataFrame(index)
+            index.to_csv(out_dir / '索引.csv', index=False, encoding='utf-8-sig')
+        timer.report('历史日报重建耗时')
+        
+        print(f"✅ {count} 份日报已写入 {out_dir}（{size / 1e6:.1f}MB），"
+              f"入场信号 {int((index['entry_levels'] != '').sum())} 天，出场信号 {int((index['exit_count'] >= 2).sum())} 天")
+        return index
+
+    
+    # ============ 自检 ============
+    
+    def self_check_strategy_book(self, bars=900, seed=7):
+        """
+        持仓账本自检（合成K线，不联网、不发邮件）：分三段推进、每段之间从磁盘重新读取账本，
+        与一次性回放的结果一致，且ATR追踪线被设置、出现"ATR追踪"出场
+        """
+        import tempfile
+        print("🧪 持仓账本自检（合成K线）")
+        folder = tempfile.mkdtemp(prefix='持仓账本自检_')
+        self.candle_store = CandleStore(folder)
+        self.sqzmom_4h = IntradaySqzmomLayer(self.candle_store, 'BTCUSDT', '4h')
+        
+        rng = np.random.default_rng(seed)
+        # 分段漂移（涨跌交替），保证有入场、主动止盈和追踪止盈
+        drift = np.repeat(rng.choice([-0.004, 0.0, 0.006], size=bars // 60 + 1), 60)[:bars]
+        close = 30000 * np.exp(np.cumsum(drift + rng.normal(0, 0.025, bars)))
+        df = pd.DataFrame({'date': pd.date_range('2022-01-01', periods=bars, freq='D'), 'open': close,
+                           'high': close * (1 + rng.uniform(0, 0.02, bars)),
+                           'low': close * (1 - rng.uniform(0, 0.02, bars)), 'close': close, 'volume': 1.0})
+        df = self.calculate_indicators(df, sync_4h=False)
+        self.strategy_start = df['date'].iloc[100].strftime('%Y-%m-%d')
+        now = df['date'].iloc[-1] + pd.Timedelta(days=2)
+        
+        # 逐根回放（不落盘），每根之后检查持仓是否挂上了ATR追踪线
+        self.reset_strategy()
+        trail_set = False
+        for end in range(1, bars + 1):
+            self.advance_strategy(df.iloc[:end], now=now, persist=False)
+            trail_set |= any(pos['trail_stop_price'] is not None for pos in self.long_positions)
+        expected = copy.deepcopy(self._strategy_state())
+        
+        # 分三段推进，每段之间模拟新进程（清空内存后从磁盘读取账本）
+        for end in (bars // 3, 2 * bars // 3, bars):
+            self.reset_strategy()
+            self.advance_strategy(df.iloc[:end], now=now)
+        
+        reasons = [trade['exit_reason'] for trade in self.strategy_trades]
+        trail_exits = sum(reason == 'ATR追踪' for reason in reasons)
+        same = (len(self.strategy_trades) == len(expected['trades']) and np.isclose(self.cash, expected['cash'])
+                and [pos['date'] for pos in self.long_positions] == [pos['date'] for pos in expected['long_positions']])
+        print(f"   交易 {len(reasons)} 笔，ATR追踪出场 {trail_exits} 笔，持仓中追踪线已设置: {trail_set}，"
+              f"分段推进与一次性回放一致: {same}")
+        assert 'atr' in df and df['atr'].notna().all(), "指标帧缺少ATR"
+        assert trail_set, "持仓的ATR追踪线从未设置"
+        assert trail_exits > 0, "没有出现ATR追踪出场"
+        assert same, "分段推进与一次性回放不一致"
+        print("✅ 持仓账本自检通过")
+        return True
 
 
 if __name__ == "__main__":
@@ -2522,9 +2358,26 @@ if __name__ == "__main__":
     
     # 创建监控系统
     monitor = BTCIndicatorMonitor(email_config)
+    monitor.force_send = os.getenv('MONITOR_FORCE_SEND') == '1'  # 手动补发：忽略提醒记录
     
-    # 运行监控
-    monitor.monitor_and_alert()
+    # 运行监控：--daemon 常驻进程（每根K线收盘唤醒），--stream WebSocket推送驱动，默认单次运行
+    intraday_minutes = float(os.getenv('MONITOR_INTRADAY_MINUTES', '0')) or None  # 盘中预警间隔（分钟）
+    if '--stream' in sys.argv:
+        monitor.run_stream(interval=os.getenv('MONITOR_INTERVAL', '1d'), url=os.getenv('MONITOR_STREAM_URL'),
+                           intraday_minutes=intraday_minutes)
+    elif '--daemon' in sys.argv:
+        monitor.run_daemon(interval=os.getenv('MONITOR_INTERVAL', '1d'), intraday_minutes=intraday_minutes)
+    elif '--selftest' in sys.argv:
+        # --selftest：持仓账本自检（合成K线，不联网、不发邮件）
+        monitor.self_check_strategy_book()
+    elif '--reports' in sys.argv:
+        # --reports 开始日期 [结束日期]：批量重建历史日报（只写文件，不发送邮件）
+        args = sys.argv[sys.argv.index('--reports') + 1:]
+        monitor.regenerate_reports(args[0], args[1] if len(args) > 1 else None)
+    else:
+        # MONITOR_SYMBOLS=BTCUSDT,ETHUSDT,... 时一次扫描整个观察列表
+        symbols = [s.strip().upper() for s in os.getenv('MONITOR_SYMBOLS', '').split(',') if s.strip()]
+        monitor.monitor_and_alert(symbols or None)
     
     print("\n" + "="*80)
     print("📧 使用说明:")
@@ -2538,6 +2391,13 @@ if __name__ == "__main__":
     print("   - 可以用cron定时执行（每天1次）")
     print("   - crontab -e")
     print("   - 添加: 0 9 * * * /usr/bin/python3 /path/to/【邮箱提示】指标提醒.py")
+    print("   - 或常驻运行: python3 【邮箱提示】指标提醒.py --daemon（收盘即推送，Ctrl+C 保存状态退出）")
+    print("   - 盘中预警: MONITOR_INTRADAY_MINUTES=15 配合 --daemon/--stream，未收盘K线每15分钟试算一次")
+    print("   - 观察列表: MONITOR_SYMBOLS=BTCUSDT,ETHUSDT,SOLUSDT 一次扫描多个品种，发送汇总日报")
+    print("   - 同一根K线重复运行不会重复发信；MONITOR_FORCE_SEND=1 强制补发")
+    print("   - 历史日报: python3 【邮箱提示】指标提醒.py --reports 2024-01-01 2024-12-31（写入 K线数据/历史日报）")
+    print("   - 持仓账本: K线数据/策略持仓账本_BTCUSDT.pkl 每天推进一根K线；删除后下次运行从2024-01-01重新回放")
+    print("   - 账本自检: python3 【邮箱提示】指标提醒.py --selftest（合成K线，检查ATR追踪止盈与分段推进）")
     
     print("\n3. 邮件内容:")
     print("   - 每天发送监控日报")
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """本地直接测试QQ SMTP"""
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / '模块'))
+from 邮件发件箱模块 import LocalSMTPServer, SMTPTransport
 
 # 使用你最新的授权码
 sender = '350980368@qq.com'
@@ -13,23 +15,30 @@ receiver = '350980368@qq.com'
 print(f"📧 测试发送: {sender} -> {receiver}")
 print(f"🔐 授权码: {password[:4]}****{password[-4:]}")
 
-msg = MIMEMultipart()
-msg['From'] = sender
-msg['To'] = receiver
-msg['Subject'] = "本地SMTP测试"
-
 body = "<html><body><h1>本地测试成功</h1><p>BTC价格: $112,460</p></body></html>"
-msg.attach(MIMEText(body, 'html', 'utf-8'))
+
+# --local: 不连QQ邮箱，发到本机SMTP替身（离线验证持久会话）
+local = LocalSMTPServer().start() if '--local' in sys.argv else None
+if local:
+    transport = SMTPTransport(local.host, local.port, sender, password, to=[receiver], use_ssl=False)
+else:
+    transport = SMTPTransport('smtp.qq.com', 465, sender, password, to=[receiver], debug=1)  # 打开详细日志
 
 try:
-    print("📤 尝试SSL 465...")
-    with smtplib.SMTP_SSL('smtp.qq.com', 465, timeout=30) as server:
-        server.set_debuglevel(1)  # 打开详细日志
-        server.login(sender, password)
-        server.sendmail(sender, [receiver], msg.as_string())
-    print("✅ 本地测试成功！")
+    print("📤 尝试SSL 465..." if not local else f"📤 本地SMTP替身 {local.host}:{local.port}...")
+    # 同一个会话连续发送两封：只连接/登录一次
+    messages = [{'id': f'local-smtp-test-{i}', 'subject': f"本地SMTP测试 {i + 1}/2", 'html': body} for i in range(2)]
+    with transport:
+        results = transport.send_batch(messages)
+    for message, (ok, error, _) in zip(messages, results):
+        print(f"{'✅' if ok else '❌'} {message['subject']}{'' if ok else f': {error}'}")
+    print(f"🔌 SMTP连接 {transport.stats['connects']} 次，发送 {transport.stats['sent']} 封")
+    if all(ok for ok, _, _ in results):
+        print("✅ 本地测试成功！")
 except Exception as e:
     print(f"❌ 本地测试失败: {e}")
     import traceback
     traceback.print_exc()
-
+finally:
+    if local:
+        local.stop()
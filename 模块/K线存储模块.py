@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线存储模块 - 本地K线缓存 + 缺口检测 + 定向补数据
+
+功能：
+1. 按 (交易对, 周期) 把K线保存在本地CSV
+2. 用区间索引记录哪些K线已存在（O(n)向量化日期差分）
+3. 检测缺口和重复K线，只请求缺失区间
+4. 输出覆盖率报告
+"""
+
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+BINANCE_LIMIT = 1000  # Binance每次最多返回1000条
+
+# 各周期的毫秒数（Binance按UTC整点对齐）
+INTERVAL_MS = {
+    '1m': 60 * 1000,
+    '5m': 5 * 60 * 1000,
+    '15m': 15 * 60 * 1000,
+    '1h': 60 * 60 * 1000,
+    '4h': 4 * 60 * 60 * 1000,
+    '1d': 24 * 60 * 60 * 1000,
+}
+
+KLINE_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+
+
+def to_slots(dates, interval='1d'):
+    """把K线开盘时间转换为整数槽位（时间戳 // 周期）"""
+    ts = pd.to_datetime(pd.Series(dates)).values.astype('datetime64[ms]').astype(np.int64)
+    return ts // INTERVAL_MS[interval]
+
+
+def slot_to_timestamp(slot, interval='1d'):
+    """槽位 -> K线开盘时间"""
+    return pd.Timestamp(int(slot) * INTERVAL_MS[interval], unit='ms')
+
+
+def fetch_binance_klines(symbol, interval, start_ms, end_ms, session=None):
+    """
+    从Binance分批获取 [start_ms, end_ms] 范围内的K线
+
+    Returns:
+        (DataFrame, 请求次数)
+    """
+    import requests
+    http = session or requests
+
+    all_data = []
+    current_start = int(start_ms)
+    step = INTERVAL_MS[interval]
+    requests_made = 0
+
+    while current_start <= end_ms:
+        params = {
+            'symbol': symbol,
+            'interval': interval,
+            'startTime': current_start,
+            'endTime': int(end_ms),
+            'limit': BINANCE_LIMIT
+        }
+        try:
+            response = http.get(BINANCE_KLINES_URL, params=params, timeout=30)
+            requests_made += 1
+        except requests.exceptions.Timeout:
+            print("✗ 超时，重试...")
+            time.sleep(2)
+            continue
+
+        if response.status_code != 200:
+            print(f"✗ HTTP {response.status_code}")
+            break
+
+        batch_data = response.json()
+        if not batch_data:
+            break
+
+        all_data.extend(batch_data)
+        current_start = batch_data[-1][0] + step
+
+        if len(batch_data) < BINANCE_LIMIT:
+            break
+        # 避免触发API限制
+        time.sleep(0.5)
+
+    return klines_to_frame(all_data), requests_made
+
+
+def klines_to_frame(raw):
+    """Binance原始K线 -> 标准DataFrame(date, open, high, low, close, volume)"""
+    if not raw:
+        return pd.DataFrame(columns=KLINE_COLUMNS)
+
+    df = pd.DataFrame([row[:6] for row in raw], columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = df[col].astype(float)
+    return df[KLINE_COLUMNS].reset_index(drop=True)
+
+
+class CoverageIndex:
+    """
+    K线覆盖区间索引
+
+    只保存已存在K线的连续区间 [start_slot, end_slot]（闭区间），
+    10年日线无缺口时只有1个区间，比逐日位图更紧凑。
+    """
+
+    def __init__(self, intervals, duplicates=0, interval='1d'):
+        self.intervals = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+        self.duplicates = int(duplicates)
+        self.interval = interval
+
+    @classmethod
+    def from_dates(cls, dates, interval='1d'):
+        """
+        O(n)构建索引：对已排序的槽位做一次差分
+        - diff == 0 → 重复K线
+        - diff > 1  → 缺口
+        """
+        slots = to_slots(dates, interval) if len(dates) else np.array([], dtype=np.int64)
+        if len(slots) == 0:
+            return cls(np.empty((0, 2), dtype=np.int64), 0, interval)
+
+        # 存储本身有序，只有乱序输入才需要排序
+        if np.any(slots[1:] < slots[:-1]):
+            slots = np.sort(slots)
+
+        diffs = np.diff(slots)
+        duplicates = int(np.count_nonzero(diffs == 0))
+
+        breaks = np.flatnonzero(diffs > 1)
+        starts = np.concatenate(([slots[0]], slots[breaks + 1]))
+        ends = np.concatenate((slots[breaks], [slots[-1]]))
+        return cls(np.column_stack((starts, ends)), duplicates, interval)
+
+    @property
+    def present(self):
+        """已存在的K线数（去重后）"""
+        if len(self.intervals) == 0:
+            return 0
+        return int((self.intervals[:, 1] - self.intervals[:, 0] + 1).sum())
+
+    def contains(self, slot):
+        """判断某槽位是否已存在（二分查找）"""
+        if len(self.intervals) == 0:
+            return False
+        i = np.searchsorted(self.intervals[:, 0], slot, side='right') - 1
+        return i >= 0 and slot <= self.intervals[i, 1]
+
+    def missing_slots(self, start_slot, end_slot):
+        """
+        返回 [start_slot, end_slot] 内缺失的区间列表 [(a, b), ...]（闭区间）
+        """
+        missing = []
+        cursor = int(start_slot)
+        for a, b in self.intervals:
+            if b < cursor:
+                continue
+            if a > end_slot:
+                break
+            if a > cursor:
+                missing.append((cursor, min(int(a) - 1, int(end_slot))))
+            cursor = max(cursor, int(b) + 1)
+            if cursor > end_slot:
+                break
+        if cursor <= end_slot:
+            missing.append((cursor, int(end_slot)))
+        return missing
+
+    def to_bitmap(self, start_slot, end_slot):
+        """导出 [start_slot, end_slot] 的压缩位图（np.packbits，8根K线/字节）"""
+        bits = np.zeros(int(end_slot - start_slot + 1), dtype=bool)
+        for a, b in self.intervals:
+            lo, hi = max(a, start_slot), min(b, end_slot)
+            if lo <= hi:
+                bits[lo - start_slot:hi - start_slot + 1] = True
+        return np.packbits(bits)
+
+    def report(self, start_slot=None, end_slot=None):
+        """覆盖率报告"""
+        if len(self.intervals) == 0 and (start_slot is None or end_slot is None):
+            return {
+                'interval': self.interval,
+                'expected': 0, 'present': 0, 'missing': 0,
+                'duplicates': self.duplicates, 'gaps': 0,
+                'coverage_pct': 0.0, 'largest_gap': 0, 'missing_ranges': []
+            }
+
+        start_slot = int(self.intervals[0, 0]) if start_slot is None else int(start_slot)
+        end_slot = int(self.intervals[-1, 1]) if end_slot is None else int(end_slot)
+
+        gaps = self.missing_slots(start_slot, end_slot)
+        gap_sizes = [b - a + 1 for a, b in gaps]
+        expected = end_slot - start_slot + 1
+        missing = int(sum(gap_sizes))
+
+        return {
+            'interval': self.interval,
+            'expected': expected,
+            'present': expected - missing,
+            'missing': missing,
+            'duplicates': self.duplicates,
+            'gaps': len(gaps),
+            'coverage_pct': (expected - missing) / expected * 100 if expected > 0 else 0.0,
+            'largest_gap': max(gap_sizes) if gap_sizes else 0,
+            'missing_ranges': [(slot_to_timestamp(a, self.interval), slot_to_timestamp(b, self.interval))
+                               for a, b in gaps]
+        }
+
+
+class CandleStore:
+    """本地K线存储 - 只补缺失区间，避免每次全量下载"""
+
+    def __init__(self, data_folder='K线数据'):
+        self.data_folder = str(data_folder)
+        os.makedirs(self.data_folder, exist_ok=True)
+        self._frames = {}  # 进程内缓存 {(symbol, interval): df}
+
+    def _path(self, symbol, interval):
+        return os.path.join(self.data_folder, f'{symbol}_{interval}.csv')
+
+    def load(self, symbol='BTCUSDT', interval='1d'):
+        """读取本地K线（无文件时返回空表）"""
+        key = (symbol, interval)
+        if key in self._frames:
+            return self._frames[key]
+
+        path = self._path(symbol, interval)
+        if os.path.exists(path):
+            df = pd.read_csv(path, parse_dates=['date'])
+        else:
+            df = pd.DataFrame(columns=KLINE_COLUMNS)
+            df['date'] = pd.to_datetime(df['date'])
+        self._frames[key] = df
+        return df
+
+    def save(self, df, symbol='BTCUSDT', interval='1d'):
+        """保存K线（覆盖写入）"""
+        df = df[KLINE_COLUMNS].reset_index(drop=True)
+        df.to_csv(self._path(symbol, interval), index=False)
+        self._frames[(symbol, interval)] = df
+        return df
+
+    def merge(self, new_df, symbol='BTCUSDT', interval='1d'):
+        """合并新K线：同一开盘时间以新数据为准，结果按时间排序"""
+        old_df = self.load(symbol, interval)
+        if new_df is None or len(new_df) == 0:
+            return old_df
+
+        merged = pd.concat([old_df, new_df[KLINE_COLUMNS]], ignore_index=True) if len(old_df) else new_df[KLINE_COLUMNS]
+        merged = merged.drop_duplicates(subset='date', keep='last').sort_values('date')
+        return self.save(merged, symbol, interval)
+
+    def coverage(self, symbol='BTCUSDT', interval='1d'):
+        """构建覆盖索引"""
+        df = self.load(symbol, interval)
+        return CoverageIndex.from_dates(df['date'], interval)
+
+    def coverage_report(self, symbol='BTCUSDT', interval='1d', start=None, end=None):
+        """
+        覆盖率报告
+
+        Args:
+            start, end: 期望覆盖的时间范围（默认取本地数据首尾）
+        """
+        index = self.coverage(symbol, interval)
+        start_slot = None if start is None else int(to_slots([start], interval)[0])
+        end_slot = None if end is None else int(to_slots([end], interval)[0])
+        report = index.report(start_slot, end_slot)
+        report['symbol'] = symbol
+        return report
+
+    def sync(self, symbol='BTCUSDT', interval='1d', start=None, end=None, fetcher=None, refresh_last=True):
+        """
+        补齐 [start, end] 范围内缺失的K线
+
+        Args:
+            refresh_last: 本地最后一根K线可能是未收盘K线，总是重新获取
+            fetcher: fetcher(symbol, interval, start_ms, end_ms) -> (df, 请求次数)
+
+        Returns:
+            本地完整K线 DataFrame
+        """
+        fetcher = fetcher or fetch_binance_klines
+        step = INTERVAL_MS[interval]
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp(datetime.utcnow())
+        start = pd.Timestamp(start) if start is not None else end - pd.Timedelta(days=5 * 365)
+
+        start_slot = int(to_slots([start], interval)[0])
+        end_slot = int(to_slots([end], interval)[0])
+
+        df = self.load(symbol, interval)
+        index = CoverageIndex.from_dates(df['date'], interval)
+
+        if index.duplicates:
+            print(f"⚠️ {symbol} {interval} 存在 {index.duplicates} 根重复K线，已去重")
+            df = self.save(df.drop_duplicates(subset='date', keep='last').sort_values('date'), symbol, interval)
+
+        missing = index.missing_slots(start_slot, end_slot)
+        if refresh_last and len(index.intervals) and start_slot <= index.intervals[-1, 1] <= end_slot:
+            last_slot = int(index.intervals[-1, 1])
+            if missing and missing[-1][0] == last_slot + 1:
+                missing[-1] = (last_slot, missing[-1][1])
+            else:
+                missing.append((last_slot, last_slot))
+
+        if not missing:
+            print(f"✅ {symbol} {interval} 本地数据完整，无需请求")
+            return df
+
+        total_requests = 0
+        filled = []
+        for a, b in missing:
+            try:
+                fetched, n_requests = fetcher(symbol, interval, a * step, b * step)
+            except Exception as e:
+                # 请求失败时保留本地数据，下次运行再补
+                print(f"⚠️ 补数据失败 {slot_to_timestamp(a, interval)} ~ {slot_to_timestamp(b, interval)}: {e}")
+                continue
+            total_requests += n_requests
+            filled.append((a, b))
+            df = self.merge(fetched, symbol, interval)
+
+        if filled:
+            missing_bars = sum(b - a + 1 for a, b in filled)
+            print(f"📥 {symbol} {interval} 补齐 {len(filled)} 个缺失区间（{missing_bars} 根K线），共 {total_requests} 次请求")
+        return df
@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线推送模块 - WebSocket实时K线接入 + 本地回放服务器
+
+- KlineStreamClient: 订阅 Binance <symbol>@kline_<interval> 推送
+  * 内存中跟踪未收盘K线（on_update 回调，盘中预警用）
+  * 收盘K线（k.x = true）写入 CandleStore，并触发 on_close 回调（增量指标）
+  * 断线自动重连（指数退避）；重连后第一条推送揭示当前K线，
+    中间漏掉的已收盘K线通过 REST（CandleStore.sync）补齐，不依赖本地时钟
+- KlineReplayServer: 本地WebSocket服务器，回放录制的K线推送（.jsonl），
+  可模拟断线和断线期间丢失的消息，用于离线测试和基准测试
+- record_stream / synthesize_kline_messages: 录制真实推送 / 由K线表合成推送
+
+只用标准库实现WebSocket（RFC 6455）协议，不依赖 websockets 包。
+
+用法：
+    client = KlineStreamClient('BTCUSDT', '1d', store=CandleStore('K线数据'), on_close=print)
+    client.run()                      # 阻塞运行，client.stop() 或 Ctrl+C 退出
+"""
+
+import base64
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import ssl
+import struct
+import threading
+import time
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from K线存储模块 import INTERVAL_MS, KLINE_COLUMNS
+
+BINANCE_WS_URL = "wss://stream.binance.com:9443/ws"
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+# ============ WebSocket 协议（RFC 6455 最小实现） ============
+
+def _accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+def _encode_frame(opcode, payload, mask):
+    """编码单帧（FIN=1）；客户端发出的帧必须加掩码"""
+    header = bytearray([0x80 | opcode])
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack('!H', length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack('!Q', length)
+    if not mask:
+        return bytes(header) + payload
+    key = os.urandom(4)
+    masked = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+    return bytes(header) + key + masked
+
+
+class WebSocketConnection:
+    """一个已握手的WebSocket连接（帧解析带缓冲，读超时不会丢失半帧数据）"""
+
+    def __init__(self, sock, is_client):
+        self.sock = sock
+        self.is_client = is_client
+        self.buffer = bytearray()
+        self.closed = False
+        self._fragments = []
+        self._fragment_opcode = None
+
+    @classmethod
+    def connect(cls, url, timeout=10.0):
+        """客户端握手（支持 ws:// 与 wss://）"""
+        parts = urlparse(url)
+        secure = parts.scheme == 'wss'
+        host = parts.hostname
+        port = parts.port or (443 if secure else 80)
+        sock = socket.create_connection((host, port), timeout=timeout)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        request = (f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\n"
+                   f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n")
+        sock.sendall(request.encode())
+
+        conn = cls(sock, is_client=True)
+        head = conn._read_http_head()
+        status = head.split('\r\n', 1)[0]
+        if ' 101 ' not in status + ' ':
+            sock.close()
+            raise ConnectionError(f"WebSocket握手失败: {status}")
+        headers = _parse_headers(head)
+        if headers.get('sec-websocket-accept') != _accept_key(key):
+            sock.close()
+            raise ConnectionError("WebSocket握手校验失败")
+        return conn
+
+    def _read_http_head(self):
+        while b'\r\n\r\n' not in self.buffer:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("握手期间连接关闭")
+            self.buffer += chunk
+        end = self.buffer.index(b'\r\n\r\n') + 4
+        head = bytes(self.buffer[:end]).decode('latin-1')
+        del self.buffer[:end]
+        return head
+
+    def _parse_frame(self):
+        """从缓冲区解析一帧，数据不足返回None"""
+        buf = self.buffer
+        if len(buf) < 2:
+            return None
+        fin, opcode = buf[0] & 0x80, buf[0] & 0x0F
+        masked, length = buf[1] & 0x80, buf[1] & 0x7F
+        pos = 2
+        if length == 126:
+            if len(buf) < 4:
+                return None
+            length = struct.unpack('!H', buf[2:4])[0]
+            pos = 4
+        elif length == 127:
+            if len(buf) < 10:
+                return None
+            length = struct.unpack('!Q', buf[2:10])[0]
+            pos = 10
+        key = b''
+        if masked:
+            if len(buf) < pos + 4:
+                return None
+            key = bytes(buf[pos:pos + 4])
+            pos += 4
+        if len(buf) < pos + length:
+            return None
+        payload = bytes(buf[pos:pos + length])
+        del buf[:pos + length]
+        if masked:
+            payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+        return bool(fin), opcode, payload
+
+    def send(self, opcode, payload=b''):
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        self.sock.sendall(_encode_frame(opcode, payload, mask=self.is_client))
+
+    def send_text(self, text):
+        self.send(OP_TEXT, text)
+
+    def recv(self, timeout=None):
+        """
+        接收一条完整消息
+
+        Returns:
+            文本（str）；超时返回None；连接关闭抛出 ConnectionError
+        """
+        self.sock.settimeout(timeout)
+        while True:
+            frame = self._parse_frame()
+            if frame is None:
+                try:
+                    chunk = self.sock.recv(65536)
+                except socket.timeout:
+                    return None
+                if not chunk:
+                    self.closed = True
+                    raise ConnectionError("连接已断开")
+                self.buffer += chunk
+                continue
+
+            fin, opcode, payload = frame
+            if opcode == OP_PING:
+                self.send(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                if not self.closed:
+                    self.closed = True
+                    try:
+                        self.send(OP_CLOSE, payload[:2])
+                    except OSError:
+                        pass
+                raise ConnectionError("对端关闭连接")
+            if opcode != OP_CONTINUATION:
+                self._fragment_opcode = opcode
+                self._fragments = []
+            self._fragments.append(payload)
+            if fin:
+                data = b''.join(self._fragments)
+                self._fragments = []
+                return data.decode('utf-8') if self._fragment_opcode == OP_TEXT else data
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                self.send(OP_CLOSE, struct.pack('!H', 1000))
+            except OSError:
+                pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def _parse_headers(head):
+    headers = {}
+    for line in head.split('\r\n')[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+# ============ K线消息 ============
+
+def stream_url(symbol, interval, base_url=BINANCE_WS_URL):
+    return f"{base_url.rstrip('/')}/{symbol.lower()}@kline_{interval}"
+
+
+def parse_kline_message(text):
+    """
+    Binance K线推送 -> (bar, 是否收盘)；非K线消息返回 (None, False)
+
+    bar: dict(date, open, high, low, close, volume)，date 为开盘时间（UTC，无时区）
+    """
+    message = json.loads(text)
+    message = message.get('data', message)  # 组合流 {"stream":..., "data":...}
+    k = message.get('k') if isinstance(message, dict) else None
+    if not k:
+        return None, False
+    bar = {
+        'date': pd.Timestamp(int(k['t']), unit='ms'),
+        'open': float(k['o']), 'high': float(k['h']), 'low': float(k['l']),
+        'close': float(k['c']), 'volume': float(k['v']),
+    }
+    return bar, bool(k['x'])
+
+
+def synthesize_kline_messages(df, symbol='BTCUSDT', interval='1d', updates_per_bar=4):
+    """
+    由K线表合成推送消息：每根K线 updates_per_bar 条未收盘更新 + 1条收盘消息
+    （未收盘更新的价格沿 open → close 线性变化，high/low 逐步扩展到最终值）
+    """
+    step = INTERVAL_MS[interval]
+    messages = []
+    for bar in df.itertuples():
+        t = int(pd.Timestamp(bar.date).value // 10**6)
+        for j in range(1, updates_per_bar + 2):
+            frac = j / (updates_per_bar + 1)
+            closed = j == updates_per_bar + 1
+            price = bar.open + (bar.close - bar.open) * frac
+            high = bar.high if closed else max(bar.open, price) + (bar.high - max(bar.open, bar.close)) * frac
+            low = bar.low if closed else min(bar.open, price) - (min(bar.open, bar.close) - bar.low) * frac
+            messages.append(json.dumps({
+                'e': 'kline', 'E': t + int(step * frac), 's': symbol,
+                'k': {'t': t, 'T': t + step - 1, 's': symbol, 'i': interval,
+                      'o': f'{bar.open}', 'c': f'{bar.close if closed else price}',
+                      'h': f'{high}', 'l': f'{low}', 'v': f'{bar.volume * frac}', 'x': closed},
+            }))
+    return messages
+
+
+def record_stream(url, path, limit=1000, timeout=None):
+    """录制真实推送到 .jsonl（每行一条原始消息），用于回放"""
+    conn = WebSocketConnection.connect(url)
+    count = 0
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            while count < limit:
+                text = conn.recv(timeout)
+                if text is None:
+                    break
+                f.write(text.strip() + '\n')
+                count += 1
+    finally:
+        conn.close()
+    print(f"✅ 已录制 {count} 条推送 → {path}")
+    return count
+
+
+def load_recording(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+# ============ 客户端 ============
+
+class KlineStreamClient:
+    """K线推送客户端"""
+
+    def __init__(self, symbol='BTCUSDT', interval='1d', store=None, url=None, on_update=None, on_close=None,
+                 fetcher=None, reconnect_delay=1.0, max_reconnect_delay=60.0):
+        """
+        Args:
+            store: CandleStore，收盘K线写入这里；缺口通过 store.sync 补齐
+            url: 推送地址（默认Binance；测试时指向 KlineReplayServer.url）
+            on_update(bar): 每条未收盘更新
+            on_close(bar): 每根已提交的收盘K线（含补齐的K线，按时间顺序）
+            fetcher: 传给 store.sync 的REST获取函数（默认Binance）
+        """
+        self.symbol = symbol
+        self.interval = interval
+        self.step = pd.Timedelta(milliseconds=INTERVAL_MS[interval])
+        self.store = store
+        self.url = url or stream_url(symbol, interval)
+        self.on_update = on_update
+        self.on_close = on_close
+        self.fetcher = fetcher
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.forming = None        # 当前未收盘K线
+        self.last_closed = None    # 最后一根已提交收盘K线的开盘时间
+        self._needs_gap_check = True
+        self._stop = threading.Event()
+        self._conn = None
+        self.stats = {'messages': 0, 'updates': 0, 'closed': 0, 'backfilled': 0, 'reconnects': 0}
+
+        if store is not None:
+            bars = store.load(symbol, interval)
+            if len(bars):
+                # 本地最后一根可能是未收盘K线，只把倒数第二根视为确定已收盘
+                self.last_closed = pd.Timestamp(bars['date'].iloc[-2]) if len(bars) > 1 else None
+
+    def _commit(self, bar):
+        """提交一根收盘K线（重复或过期的忽略）"""
+        if self.last_closed is not None and bar['date'] <= self.last_closed:
+            return False
+        if self.store is not None:
+            self.store.merge(pd.DataFrame([bar], columns=KLINE_COLUMNS), self.symbol, self.interval)
+        self.last_closed = bar['date']
+        self.stats['closed'] += 1
+        if self.on_close:
+            self.on_close(bar)
+        return True
+
+    def backfill(self, before):
+        """通过REST补齐 (last_closed, before) 之间的已收盘K线"""
+        if self.last_closed is None or self.store is None:
+            return 0
+        start = self.last_closed + self.step
+        end = before - self.step
+        if end < start:
+            return 0
+        kwargs = {'fetcher': self.fetcher} if self.fetcher else {}
+        bars = self.store.sync(self.symbol, self.interval, start=start, end=end, **kwargs)
+        missed = bars[(bars['date'] >= start) & (bars['date'] <= end)]
+        count = 0
+        for row in missed[KLINE_COLUMNS].to_dict('records'):
+            row['date'] = pd.Timestamp(row['date'])
+            if self._commit(row):
+                count += 1
+        self.stats['backfilled'] += count
+        if count:
+            print(f"📥 {self.symbol} {self.interval} 补齐断线期间 {count} 根K线")
+        return count
+
+    def handle_message(self, text):
+        """处理一条推送"""
+        bar, closed = parse_kline_message(text)
+        if bar is None:
+            return
+        self.stats['messages'] += 1
+
+        # 连接后第一条、或跳过了K线：先补齐缺口
+        if self.last_closed is not None and (self._needs_gap_check or bar['date'] > self.last_closed + self.step):
+            self.backfill(bar['date'])
+        self._needs_gap_check = False
+
+        if closed:
+            self.forming = None
+            self._commit(bar)
+        else:
+            self.forming = bar
+            self.stats['updates'] += 1
+            if self.on_update:
+                self.on_update(bar)
+
+    def run(self, max_messages=None):
+        """阻塞运行：断线自动重连，stop() 后返回"""
+        delay = self.reconnect_delay
+        handled = 0
+        while not self._stop.is_set():
+            try:
+                self._conn = WebSocketConnection.connect(self.url)
+                self._needs_gap_check = True
+                delay = self.reconnect_delay
+                while not self._stop.is_set():
+                    text = self._conn.recv(timeout=1.0)
+                    if text is None:
+                        continue
+                    self.handle_message(text)
+                    handled += 1
+                    if max_messages is not None and handled >= max_messages:
+                        self._stop.set()
+            except (ConnectionError, OSError) as e:
+                if self._stop.is_set():
+                    break
+                self.stats['reconnects'] += 1
+                print(f"⚠️ 推送连接中断（{e}），{delay:.1f}s 后重连...")
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+            finally:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+    def stop(self):
+        self._stop.set()
+
+
+# ============ 本地回放服务器 ============
+
+class KlineReplayServer:
+    """
+    本地WebSocket回放服务器
+
+    所有连接共享一个回放游标（模拟持续进行的实时流）：
+    - disconnect_every: 每发送N条消息主动断开一次连接
+    - drop_on_reconnect: 断开后丢弃的消息数（模拟断线期间错过的推送）
+    """
+
+    def __init__(self, messages, host='127.0.0.1', port=0, interval=0.0, disconnect_every=None,
+                 drop_on_reconnect=0):
+        self.messages = list(messages)
+        self.interval = interval
+        self.disconnect_every = disconnect_every
+        self.drop_on_reconnect = drop_on_reconnect
+        self.cursor = 0
+        self.connections = 0
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                server._serve(self.request)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/ws"
+
+    def _serve(self, sock):
+        conn = WebSocketConnection(sock, is_client=False)
+        head = conn._read_http_head()
+        key = _parse_headers(head).get('sec-websocket-key')
+        if not key:
+            sock.sendall(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            return
+        sock.sendall((f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {_accept_key(key)}\r\n\r\n").encode())
+
+        with self._lock:
+            if self.connections:
+                # 最后一条总会送达（真实推送不会结束，丢失的只是中间消息）
+                self.cursor = min(self.cursor + self.drop_on_reconnect, max(len(self.messages) - 1, self.cursor))
+            self.connections += 1
+        sent = 0
+        try:
+            while True:
+                with self._lock:
+                    if self.cursor >= len(self.messages):
+                        break
+                    message = self.messages[self.cursor]
+                    self.cursor += 1
+                conn.send_text(message)
+                sent += 1
+                if self.interval:
+                    time.sleep(self.interval)
+                if self.disconnect_every and sent >= self.disconnect_every:
+                    sock.close()  # 不发关闭帧，模拟网络中断
+                    return
+            self.done.set()
+            # 回放结束：保持连接直到客户端关闭
+            while True:
+                try:
+                    conn.recv(timeout=1.0)
+                except (ConnectionError, OSError):
+                    break
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+    import numpy as np
+    from K线存储模块 import CandleStore
+
+    print("=" * 80)
+    print("🧪 K线推送：本地回放 + 断线重连 + REST补缺口")
+    print("=" * 80)
+
+    rng = np.random.default_rng(2)
+    n = 400
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    candles = pd.DataFrame({'date': pd.date_range('2023-01-01', periods=n, freq='D'), 'open': np.r_[close[0], close[:-1]],
+                            'high': close * 1.01, 'low': close * 0.99, 'close': close, 'volume': rng.uniform(1, 5, n)})
+    candles['high'] = candles[['open', 'high']].max(axis=1)
+    candles['low'] = candles[['open', 'low']].min(axis=1)
+
+    history, live = candles.iloc[:100], candles.iloc[100:]
+    messages = synthesize_kline_messages(live, updates_per_bar=20)
+
+    def fake_rest(symbol, interval, start_ms, end_ms):
+        ms = candles['date'].values.astype('datetime64[ms]').astype(np.int64)
+        return candles[(ms >= start_ms) & (ms <= end_ms)].reset_index(drop=True), 1
+
+    workdir = tempfile.mkdtemp(prefix='K线推送_')
+    try:
+        # 1) 吞吐：无断线回放
+        store = CandleStore(workdir)
+        store.save(history)
+        latencies = []
+        client = KlineStreamClient('BTCUSDT', '1d', store=store, fetcher=fake_rest,
+                                   on_close=lambda bar: latencies.append(time.perf_counter()))
+        with KlineReplayServer(messages) as server:
+            client.url = server.url
+            t0 = time.perf_counter()
+            client.run(max_messages=len(messages))
+            elapsed = time.perf_counter() - t0
+        print(f"回放 {len(messages)} 条推送: {elapsed * 1000:.0f}ms（{len(messages) / elapsed:,.0f} 条/秒），"
+              f"提交 {client.stats['closed']} 根收盘K线")
+
+        # 2) 断线重连：每300条断开一次，断线期间丢失50条（约2根K线）
+        shutil.rmtree(workdir)
+        store = CandleStore(workdir)
+        store.save(history)
+        client = KlineStreamClient('BTCUSDT', '1d', store=store, fetcher=fake_rest, reconnect_delay=0.01)
+        with KlineReplayServer(messages, disconnect_every=300, drop_on_reconnect=50) as server:
+            client.url = server.url
+            runner = threading.Thread(target=client.run)
+            runner.start()
+            server.done.wait(30)
+            deadline = time.time() + 5
+            while client.last_closed != live['date'].iloc[-1] and time.time() < deadline:
+                time.sleep(0.01)
+            client.stop()
+            runner.join()
+
+        stored = store.load('BTCUSDT', '1d')
+        complete = stored['date'].reset_index(drop=True).equals(candles['date'])
+        exact = np.allclose(stored['close'].values, candles['close'].values)
+        print(f"断线 {client.stats['reconnects']} 次，REST补齐 {client.stats['backfilled']} 根；"
+              f"本地K线完整: {'是' if complete and exact else '否'}（{len(stored)}/{len(candles)}）")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件研究模块 - 任意指标条件的事后表现统计（向量化）
+
+- find_runs:   游程编码找连续满足条件的区间（如 wt1 < -30 的超卖周期）
+- EventStudy:  事件锚点之后多个持有期的收益、最大浮盈(MFE)、最大浮亏(MAE)，
+               用一次滑窗视图 + 累计最大/最小值得到，不逐行循环
+- summary:     按事件类型汇总（次数、平均/中位收益、胜率、平均MFE/MAE）
+
+价格可以是单序列 (bars,)，也可以是面板 (币种, bars)，多币种一次算完。
+
+用法：
+    study = EventStudy(df['close'], df['high'], df['low'], dates=df['date'], horizons=(5, 20, 60))
+    runs = study.run_events(df['wt1'] < -30, name='超卖周期', values=df['wt1'])
+    bars = study.bar_events({'超卖金叉': (df['wt1'] < -30) & golden})
+    print(study.summary(pd.concat([runs, bars])))
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _as_2d(x, dtype=np.float64):
+    arr = np.asarray(x, dtype=dtype)
+    return arr[None, :] if arr.ndim == 1 else arr
+
+
+def find_runs(mask, min_length=1, include_open=True):
+    """
+    游程编码：连续为True的区间
+
+    Args:
+        mask: bool (bars,) 或 (行, bars)
+        min_length: 最短持续根数
+        include_open: 是否包含到最后一根仍未结束的区间
+
+    Returns:
+        dict: row / start / end（含）/ length，均为int数组，按 (row, start) 排序
+    """
+    mask = _as_2d(mask, dtype=bool)
+    n_rows, n = mask.shape
+    # 每行末尾补一个False，展平后的游程不会跨行
+    padded = np.zeros((n_rows, n + 1), dtype=np.int8)
+    padded[:, :n] = mask
+    edges = np.diff(np.r_[0, padded.ravel()])
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    rows, start = np.divmod(starts, n + 1)
+    end = ends % (n + 1)
+    length = end - start + 1
+    keep = length >= min_length
+    if not include_open:
+        keep &= end < n - 1
+    return {'row': rows[keep], 'start': start[keep], 'end': end[keep], 'length': length[keep]}
+
+
+class EventStudy:
+    """事件研究引擎"""
+
+    def __init__(self, close, high=None, low=None, dates=None, symbols=None, horizons=(5, 20, 60)):
+        """
+        Args:
+            close, high, low: (bars,) 或 (币种, bars)；省略 high/low 时用 close 计算MFE/MAE
+            dates: 日期（长度为 bars），用于输出
+            symbols: 面板时的币种名
+            horizons: 持有期（根数）
+        """
+        self.close = _as_2d(close)
+        self.high = self.close if high is None else _as_2d(high)
+        self.low = self.close if low is None else _as_2d(low)
+        self.dates = None if dates is None else pd.Index(dates)
+        self.symbols = list(symbols) if symbols is not None else None
+        self.horizons = tuple(int(h) for h in horizons)
+
+    @property
+    def n_bars(self):
+        return self.close.shape[1]
+
+    # ---------- 核心度量 ----------
+    def measure(self, rows, anchors, offset=0):
+        """
+        锚点之后各持有期的表现
+
+        基准价 = close[锚点]；h期收益 = close[锚点+offset+h] / 基准价 - 1；
+        MFE/MAE = (锚点, 锚点+offset+h] 区间内 最高价最大值 / 最低价最小值 相对基准价。
+        超出数据末尾的持有期为NaN。
+
+        Returns:
+            dict: return_{h}d / mfe_{h}d / mae_{h}d -> (事件数,) 百分比
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        anchors = np.asarray(anchors, dtype=np.int64)
+        n = self.n_bars
+        span = max(self.horizons) + offset
+        out = {}
+        if len(anchors) == 0:
+            for h in self.horizons:
+                for key in ('return', 'mfe', 'mae'):
+                    out[f'{key}_{h}d'] = np.empty(0)
+            return out
+
+        base = self.close[rows, anchors]
+        # 右侧补NaN后取 (锚点+1) 起长度为 span 的滑窗，一次拿到所有事件的后续路径
+        pad = np.full((self.close.shape[0], span), np.nan)
+        path_close = sliding_window_view(np.hstack([self.close, pad]), span, axis=1)[rows, anchors + 1]
+        path_high = sliding_window_view(np.hstack([self.high, pad]), span, axis=1)[rows, anchors + 1]
+        path_low = sliding_window_view(np.hstack([self.low, pad]), span, axis=1)[rows, anchors + 1]
+        running_high = np.fmax.accumulate(path_high, axis=1)
+        running_low = np.fmin.accumulate(path_low, axis=1)
+
+        for h in self.horizons:
+            col = offset + h - 1
+            valid = anchors + offset + h < n
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out[f'return_{h}d'] = np.where(valid, (path_close[:, col] / base - 1) * 100, np.nan)
+                out[f'mfe_{h}d'] = np.where(valid, (running_high[:, col] / base - 1) * 100, np.nan)
+                out[f'mae_{h}d'] = np.where(valid, (running_low[:, col] / base - 1) * 100, np.nan)
+        return out
+
+    def _frame(self, name, rows, anchors, extra, offset):
+        data = {'event': name}
+        if self.symbols is not None:
+            data['symbol'] = np.asarray(self.symbols, dtype=object)[rows]
+        data.update(extra)
+        data['anchor'] = anchors
+        if self.dates is not None:
+            data['anchor_date'] = self.dates[anchors]
+        data['anchor_price'] = self.close[rows, anchors]
+        data.update(self.measure(rows, anchors, offset))
+        return pd.DataFrame(data)
+
+    # ---------- 事件定义 ----------
+    def bar_events(self, conditions, offset=0):
+        """
+        逐根事件：条件为True的每一根都是一个事件（锚点=该根）
+
+        Args:
+            conditions: {事件名: bool数组}
+        """
+        frames = []
+        for name, mask in conditions.items():
+            rows, anchors = np.nonzero(_as_2d(mask, dtype=bool))
+            frames.append(self._frame(name, rows, anchors, {}, offset))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def run_events(self, mask, name='event', anchor='end', offset=0, values=None,
+                   min_length=1, include_open=False):
+        """
+        区间事件：连续满足条件的一段算一个事件
+
+        Args:
+            anchor: 'start' / 'end' / 'extreme'（区间内 values 最小的一根）
+            offset: 收益从锚点后第 offset 根开始计持有期
+            values: 区间内要记录极值的序列（如 wt1），输出 min_value / min_date / min_price
+
+        Returns:
+            DataFrame: event, start, end, duration, [start_date, end_date, min_*], anchor, 收益/MFE/MAE列
+        """
+        runs = find_runs(mask, min_length=min_length, include_open=include_open)
+        rows, start, end = runs['row'], runs['start'], runs['end']
+        extra = {'start': start, 'end': end, 'duration': runs['length']}
+        if self.dates is not None:
+            extra['start_date'] = self.dates[start]
+            extra['end_date'] = self.dates[end]
+
+        argmin = None
+        if values is not None:
+            vals = _as_2d(values)
+            # 区间内最小值及其首次出现位置：对每根K线所属区间分组求最小
+            run_id = np.repeat(np.arange(len(start)), runs['length'])
+            bar = np.arange(len(run_id)) - np.repeat(np.cumsum(runs['length']) - runs['length'] - start,
+                                                     runs['length'])
+            row_of_bar = rows[run_id]
+            v = vals[row_of_bar, bar]
+            order = np.lexsort((bar, v, run_id))
+            first = np.flatnonzero(np.diff(np.r_[-1, run_id[order]]))
+            argmin = bar[order][first]
+            extra['min_value'] = v[order][first]
+            if self.dates is not None:
+                extra['min_date'] = self.dates[argmin]
+            extra['min_price'] = self.close[rows, argmin]
+
+        if anchor == 'start':
+            anchors = start
+        elif anchor == 'end':
+            anchors = end
+        elif anchor == 'extreme':
+            if argmin is None:
+                raise ValueError("anchor='extreme' 需要提供 values")
+            anchors = argmin
+        else:
+            raise ValueError(f"未知锚点: {anchor}")
+        return self._frame(name, rows, anchors, extra, offset)
+
+    # ---------- 汇总 ----------
+    def summary(self, events, by='event'):
+        """按事件类型汇总：次数、平均持续、各持有期平均/中位收益、胜率、平均MFE/MAE"""
+        if events is None or len(events) == 0:
+            return pd.DataFrame()
+        grouped = events.groupby(by, sort=False)
+        table = pd.DataFrame({'count': grouped.size()})
+        if 'duration' in events:
+            table['avg_duration'] = grouped['duration'].mean()
+        for h in self.horizons:
+            ret = f'return_{h}d'
+            table[f'avg_{ret}'] = grouped[ret].mean()
+            table[f'median_{ret}'] = grouped[ret].median()
+            wins = (events[ret] > 0).groupby(events[by], sort=False).sum()
+            valid = events[ret].notna().groupby(events[by], sort=False).sum()
+            table[f'win_rate_{h}d'] = (wins / valid.replace(0, np.nan) * 100).astype(float)
+            table[f'avg_mfe_{h}d'] = grouped[f'mfe_{h}d'].mean()
+            table[f'avg_mae_{h}d'] = grouped[f'mae_{h}d'].mean()
+        return table
+
+
+if __name__ == "__main__":
+    import time
+
+    print("=" * 80)
+    print("🧪 事件研究：向量化 vs 逐行循环")
+    print("=" * 80)
+
+    rng = np.random.default_rng(21)
+    n = 3000
+    close = 10000 * np.exp(np.cumsum(rng.normal(0.0005, 0.03, n)))
+    high = close * (1 + rng.uniform(0, 0.02, n))
+    low = close * (1 - rng.uniform(0, 0.02, n))
+    wt1 = pd.Series(rng.normal(0, 1, n)).ewm(span=8).mean().to_numpy() * 60
+    dates = pd.date_range('2017-01-01', periods=n)
+
+    frame = pd.DataFrame({'date': dates, 'close': close, 'wt1': wt1})
+
+    def loop_periods():
+        """原 find_continuous_periods 的逐行写法（只取收益部分）"""
+        rows, in_period, end_price = [], False, 0.0
+        for i in range(len(frame)):
+            row = frame.iloc[i]
+            if row['wt1'] < -30:
+                in_period, end_price = True, row['close']
+            elif in_period:
+                in_period = False
+                rows.append([(frame.iloc[i + h]['close'] / end_price - 1) * 100 if i + h < n else np.nan
+                             for h in (5, 20, 60)])
+        return np.array(rows)
+
+    study = EventStudy(close, high, low, dates=dates)
+    t0 = time.perf_counter()
+    runs = study.run_events(wt1 < -30, name='wt1<-30', values=wt1, offset=1)
+    t_vec = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    reference = loop_periods()
+    t_loop = time.perf_counter() - t0
+    ok = np.allclose(runs[['return_5d', 'return_20d', 'return_60d']].to_numpy(), reference, equal_nan=True)
+    print(f"超卖周期 {len(runs)} 个: 向量 {t_vec * 1000:.1f}ms vs 循环 {t_loop * 1000:.1f}ms, 结果一致: {ok}")
+
+    # 多币种面板：50个币种 × 3000根
+    S = 50
+    pc = 10000 * np.exp(np.cumsum(rng.normal(0.0005, 0.03, (S, n)), axis=1))
+    pw = pd.DataFrame(rng.normal(0, 1, (n, S))).ewm(span=8).mean().to_numpy().T * 60
+    golden = np.zeros((S, n), dtype=bool)
+    golden[:, 1:] = (pw[:, 1:] > pw[:, :-1]) & (pw[:, :-1] < -30)
+    panel = EventStudy(pc, symbols=[f'C{i}' for i in range(S)], horizons=(5, 20, 60, 120))
+    t0 = time.perf_counter()
+    events = pd.concat([
+        panel.run_events(pw < -30, name='超卖周期', offset=1),
+        panel.bar_events({'超卖拐头': golden, 'wt1<-60': pw < -60}),
+    ], ignore_index=True)
+    table = panel.summary(events)
+    t_panel = time.perf_counter() - t0
+    print(f"面板 {S}×{n:,}: {len(events):,} 个事件, {t_panel * 1000:.0f}ms")
+    print(table[['count', 'avg_return_20d', 'win_rate_20d', 'avg_mfe_20d', 'avg_mae_20d']].round(2).to_string())
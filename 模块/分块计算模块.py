@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分块计算模块 - 分钟级长历史的指标外存计算
+
+- K线按列存为 .npy（date_ms / open / high / low / close / volume），以内存映射方式读取
+- 按块流式处理：
+  * 递归型指标（WaveTrend、ADX）携带状态跨块延续
+  * 窗口型指标（SQZMOM、均线）每块向前多取 warmup 根K线作为预热
+- 输出写入内存映射 .npy，峰值内存只与块大小有关，与历史长度无关
+- 结果与整段内存计算一致（递归型指标与信号逐位一致，窗口型浮点列在舍入误差内）
+
+用法：
+    csv_to_columns('K线数据/BTCUSDT_1m.csv', '分块数据/BTCUSDT_1m')
+    outputs = ChunkedIndicatorExecutor('分块数据/BTCUSDT_1m', '分块数据/BTCUSDT_1m_指标').run()
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from 指标模块 import sma, sqzmom, sqzmom_warmup
+from 编译指标模块 import wavetrend_chunk, wavetrend_state, adx_chunk, adx_state
+
+CANDLE_COLUMNS = ['date_ms', 'open', 'high', 'low', 'close', 'volume']
+
+
+# ============ 列式K线文件 ============
+
+def _column_path(folder, name):
+    return os.path.join(str(folder), f'{name}.npy')
+
+
+def _create_columns(folder, n_rows):
+    os.makedirs(str(folder), exist_ok=True)
+    return {col: np.lib.format.open_memmap(_column_path(folder, col), mode='w+',
+                                           dtype=np.int64 if col == 'date_ms' else np.float64,
+                                           shape=(n_rows,))
+            for col in CANDLE_COLUMNS}
+
+
+def frame_to_columns(df, folder):
+    """DataFrame(date, open, high, low, close, volume) -> 列式 .npy"""
+    columns = _create_columns(folder, len(df))
+    columns['date_ms'][:] = pd.to_datetime(df['date']).values.astype('datetime64[ms]').astype(np.int64)
+    for col in CANDLE_COLUMNS[1:]:
+        columns[col][:] = df[col].to_numpy(dtype=np.float64)
+    for arr in columns.values():
+        arr.flush()
+    return len(df)
+
+
+def csv_to_columns(csv_path, folder, chunksize=500_000):
+    """大CSV分块转换为列式 .npy（不整体读入内存）"""
+    with open(csv_path, 'rb') as f:
+        n_rows = sum(1 for _ in f) - 1
+    columns = _create_columns(folder, n_rows)
+    pos = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        end = pos + len(chunk)
+        columns['date_ms'][pos:end] = pd.to_datetime(chunk['date']).values.astype('datetime64[ms]').astype(np.int64)
+        for col in CANDLE_COLUMNS[1:]:
+            columns[col][pos:end] = chunk[col].to_numpy(dtype=np.float64)
+        pos = end
+    for arr in columns.values():
+        arr.flush()
+    print(f"✅ 转换完成: {n_rows:,} 行 → {folder}")
+    return n_rows
+
+
+def open_columns(folder):
+    """只读内存映射打开列式K线"""
+    return {col: np.load(_column_path(folder, col), mmap_mode='r') for col in CANDLE_COLUMNS}
+
+
+# ============ 指标定义 ============
+
+class WindowIndicator:
+    """窗口型指标：只依赖最近 warmup 根K线，分块时向前重叠预热"""
+
+    def __init__(self, name, warmup, fn, outputs):
+        self.name = name
+        self.warmup = warmup
+        self.fn = fn            # fn(cols) -> {输出名: 数组}
+        self.outputs = outputs  # {输出名: dtype}
+
+
+class StatefulIndicator:
+    """递归型指标：状态跨块延续"""
+
+    def __init__(self, name, init_state, fn, outputs):
+        self.name = name
+        self.init_state = init_state  # () -> state
+        self.fn = fn                  # fn(cols, state) -> {输出名: 数组}，state原地更新
+        self.outputs = outputs
+
+
+def _wavetrend(cols, state):
+    wt1, wt2 = wavetrend_chunk(cols['high'], cols['low'], cols['close'], state)
+    return {'wt1': wt1, 'wt2': wt2}
+
+
+def _adx(cols, state):
+    plus_di, minus_di, adx = adx_chunk(cols['high'], cols['low'], cols['close'], state)
+    return {'plus_di': plus_di, 'minus_di': minus_di, 'adx': adx}
+
+
+def _sqzmom(cols):
+    return sqzmom(cols['high'], cols['low'], cols['close'])
+
+
+def default_indicators():
+    """与监控脚本 calculate_indicators 对应的指标集"""
+    flag = np.bool_
+    return [
+        StatefulIndicator('wavetrend', wavetrend_state, _wavetrend, {'wt1': np.float64, 'wt2': np.float64}),
+        StatefulIndicator('adx', adx_state, _adx,
+                          {'plus_di': np.float64, 'minus_di': np.float64, 'adx': np.float64}),
+        WindowIndicator('sqzmom', sqzmom_warmup(), _sqzmom, {
+            'sqz_on': flag, 'sqz_off': flag, 'no_sqz': flag, 'sqz_val': np.float64,
+            'is_lime': flag, 'is_green': flag, 'is_red': flag, 'is_maroon': flag,
+        }),
+        WindowIndicator('ma14', 14, lambda cols: {'ma14': sma(cols['close'], 14)}, {'ma14': np.float64}),
+    ]
+
+
+# ============ 分块执行器 ============
+
+class ChunkedIndicatorExecutor:
+    """分块指标执行器"""
+
+    def __init__(self, candle_folder, output_folder, chunk_size=500_000, indicators=None):
+        self.candle_folder = str(candle_folder)
+        self.output_folder = str(output_folder)
+        self.chunk_size = int(chunk_size)
+        self.indicators = indicators or default_indicators()
+        self.warmup = max([ind.warmup for ind in self.indicators if isinstance(ind, WindowIndicator)], default=0)
+
+    def _create_outputs(self, n_rows):
+        os.makedirs(self.output_folder, exist_ok=True)
+        outputs = {}
+        for indicator in self.indicators:
+            for name, dtype in indicator.outputs.items():
+                outputs[name] = np.lib.format.open_memmap(_column_path(self.output_folder, name), mode='w+',
+                                                          dtype=dtype, shape=(n_rows,))
+        return outputs
+
+    def run(self, verbose=True):
+        """
+        执行全部分块
+
+        Returns:
+            {输出名: 只读内存映射数组}
+        """
+        candles = open_columns(self.candle_folder)
+        n_rows = len(candles['close'])
+        outputs = self._create_outputs(n_rows)
+        states = {ind.name: ind.init_state() for ind in self.indicators if isinstance(ind, StatefulIndicator)}
+
+        t0 = time.perf_counter()
+        n_chunks = 0
+        for start in range(0, n_rows, self.chunk_size):
+            end = min(start + self.chunk_size, n_rows)
+            lo = max(0, start - self.warmup)
+            # 只把本块（含预热）读入内存
+            window = {col: np.asarray(candles[col][lo:end]) for col in ('high', 'low', 'close')}
+            block = {col: arr[start - lo:] for col, arr in window.items()}
+
+            for indicator in self.indicators:
+                if isinstance(indicator, StatefulIndicator):
+                    result = indicator.fn(block, states[indicator.name])
+                    for name in indicator.outputs:
+                        outputs[name][start:end] = result[name]
+                else:
+                    result = indicator.fn(window if indicator.warmup else block)
+                    offset = start - lo if indicator.warmup else 0
+                    for name in indicator.outputs:
+                        outputs[name][start:end] = result[name][offset:]
+            n_chunks += 1
+
+            if verbose:
+                print(f"   块 {n_chunks}: [{start:,}, {end:,}) 完成")
+
+        for arr in outputs.values():
+            arr.flush()
+        elapsed = time.perf_counter() - t0
+        if verbose:
+            print(f"✅ {n_rows:,} 行 / {n_chunks} 块, 用时 {elapsed:.2f}s")
+        return {name: np.load(_column_path(self.output_folder, name), mmap_mode='r') for name in outputs}
+
+
+def compute_in_memory(candles, indicators=None):
+    """整段内存计算（用于核对分块结果）"""
+    indicators = indicators or default_indicators()
+    cols = {col: np.asarray(candles[col]) for col in ('high', 'low', 'close')}
+    result = {}
+    for indicator in indicators:
+        if isinstance(indicator, StatefulIndicator):
+            result.update(indicator.fn(cols, indicator.init_state()))
+        else:
+            result.update(indicator.fn(cols))
+    return result
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+    import tracemalloc
+
+    print("=" * 80)
+    print("🧪 分块计算 vs 整段内存计算")
+    print("=" * 80)
+
+    n = 2_600_000  # 约5年1分钟K线
+    rng = np.random.default_rng(0)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.0005, n)))
+    df = pd.DataFrame({
+        'date': pd.date_range('2020-01-01', periods=n, freq='min'),
+        'open': close, 'high': close * (1 + rng.uniform(0, 0.001, n)),
+        'low': close * (1 - rng.uniform(0, 0.001, n)), 'close': close,
+        'volume': rng.uniform(1, 10, n),
+    })
+
+    workdir = tempfile.mkdtemp(prefix='分块计算_')
+    try:
+        frame_to_columns(df, os.path.join(workdir, 'candles'))
+        del df, close
+
+        # 预编译Numba内核，避免计入峰值
+        compute_in_memory({col: np.ones(64) for col in ('high', 'low', 'close')})
+
+        tracemalloc.start()
+        executor = ChunkedIndicatorExecutor(os.path.join(workdir, 'candles'), os.path.join(workdir, 'out'),
+                                            chunk_size=250_000)
+        chunked = executor.run(verbose=False)
+        _, peak_chunked = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        reference = compute_in_memory(open_columns(os.path.join(workdir, 'candles')))
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # 递归型与布尔信号逐位一致；窗口型浮点列的滚动和随预热起点不同，在舍入误差内一致
+        window_floats = {name for ind in executor.indicators if isinstance(ind, WindowIndicator)
+                         for name, dtype in ind.outputs.items() if dtype == np.float64}
+        mismatched = [name for name in reference
+                      if not (np.allclose(chunked[name], reference[name], rtol=1e-9, atol=1e-9, equal_nan=True)
+                              if name in window_floats
+                              else np.array_equal(np.asarray(chunked[name]), reference[name], equal_nan=True))]
+        print(f"行数 {n:,}, 块大小 {executor.chunk_size:,}, 预热 {executor.warmup} 根")
+        print(f"峰值内存: 分块 {peak_chunked / 1024 / 1024:.0f}MB vs 整段 {peak_memory / 1024 / 1024:.0f}MB")
+        print(f"结果一致（递归型/信号逐位比较，窗口型浮点列容差1e-9）: {'是' if not mismatched else '否 ' + str(mismatched)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
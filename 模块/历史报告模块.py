@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史报告模块 - 任意日期区间的日报批量重建（审计 / 渲染器基准）
+
+- HitCountHistory：规则子条件命中次数的前缀和，任意日期的 hit_counts(df[:i+1]) 为 O(条件数)，
+  不再对每个日期重算整段历史
+- render_reports()：多进程并行渲染并写出HTML（报告模板是纯函数，按块分给各进程，
+  每块只传一次参数）
+
+指标帧只计算一次；逐日的入场/出场信号由监控脚本用向量掩码一次得到，
+只有触发信号的日期才生成详细说明。
+
+用法：
+    hits = HitCountHistory(MONITOR_ENTRY_RULES, df)
+    hits.rows(i)    # == 监控日报在 df[:i+1] 上的命中统计行
+    render_reports([(文件名, render_daily_report参数), ...], out_dir, max_workers=4)
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from 报告模板模块 import render_daily_report, wrap_email
+
+
+class HitCountHistory:
+    """规则子条件命中次数的前缀和"""
+
+    def __init__(self, rules, frame):
+        cond_masks = rules.condition_masks(frame)
+        self.levels = []
+        for key in sorted(rules.keys()):
+            conditions = list(rules[key].conditions)
+            masks = [np.asarray(cond_masks[cond], dtype=bool) for cond in conditions]
+            # 最后一列为"全部满足"
+            stack = np.column_stack(masks + [np.logical_and.reduce(masks)])
+            self.levels.append((key, conditions, np.cumsum(stack, axis=0)))
+
+    def rows(self, i):
+        """
+        截至第 i 根K线（含）的命中统计
+
+        Returns:
+            [(规则键, 全部满足次数, 最少命中的子条件, 其命中次数), ...]
+        """
+        out = []
+        for key, conditions, cumulative in self.levels:
+            hits = cumulative[i]
+            weakest = int(np.argmin(hits[:-1]))
+            out.append((key, int(hits[-1]), conditions[weakest], int(hits[weakest])))
+        return out
+
+
+def _render_chunk(jobs, out_dir):
+    total = 0
+    for filename, kwargs in jobs:
+        html = wrap_email(render_daily_report(**kwargs))
+        with open(os.path.join(out_dir, filename), 'w', encoding='utf-8') as f:
+            f.write(html)
+        total += len(html)
+    return len(jobs), total
+
+
+def render_reports(jobs, out_dir, max_workers=None, chunk_size=64):
+    """
+    并行渲染并写出日报
+
+    Args:
+        jobs: [(文件名, render_daily_report 关键字参数), ...]
+        max_workers: 进程数（默认CPU核数，最多8；1 为单进程）
+
+    Returns:
+        (报告数, 总字符数)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    max_workers = max_workers or min(8, os.cpu_count() or 1)
+    chunks = [jobs[k:k + chunk_size] for k in range(0, len(jobs), chunk_size)]
+    if max_workers <= 1 or len(chunks) <= 1:
+        results = [_render_chunk(chunk, out_dir) for chunk in chunks]
+    else:
+        # fork 启动：子进程继承已导入的模块，无需重新导入 pandas
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(chunks)), mp_context=context) as pool:
+            results = list(pool.map(_render_chunk, chunks, [out_dir] * len(chunks)))
+    return sum(n for n, _ in results), sum(size for _, size in results)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    import pandas as pd
+    from 规则模块 import MONITOR_ENTRY_RULES
+
+    print("=" * 80)
+    print("🧪 历史日报批量重建：命中统计前缀和 + 并行渲染")
+    print("=" * 80)
+
+    rng = np.random.default_rng(4)
+    n = 1500
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    df = pd.DataFrame({
+        'date': pd.date_range('2020-01-01', periods=n, freq='D'), 'close': close,
+        'ma14': pd.Series(close).rolling(14, min_periods=1).mean(), 'wt1': rng.normal(0, 40, n),
+        'wt2': rng.normal(0, 40, n), 'adx': rng.uniform(10, 40, n), 'atr': close * 0.03,
+        'sqz_on': rng.random(n) < 0.3, 'sqz_off': rng.random(n) < 0.3, 'sqz_val': rng.normal(0, 2000, n),
+        'is_lime': rng.random(n) < 0.25, 'is_green': rng.random(n) < 0.25, 'is_red': rng.random(n) < 0.25,
+        'is_maroon': False, 'wt_golden_cross': rng.random(n) < 0.1, 'wt_death_cross': rng.random(n) < 0.1,
+        'adx_up': rng.random(n) < 0.3})
+
+    # 前缀和 vs 每个日期重新 hit_counts
+    year = range(n - 365, n)
+    t0 = time.perf_counter()
+    hits = HitCountHistory(MONITOR_ENTRY_RULES, df)
+    fast = [hits.rows(i) for i in year]
+    t_fast = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    slow = []
+    for i in year:
+        table = MONITOR_ENTRY_RULES.hit_counts(df.iloc[:i + 1])
+        rows = []
+        for level, group in table.groupby('rule', sort=True):
+            h, c = group['hits'].to_numpy(), group['condition'].to_numpy()
+            k = int(np.argmin(h[:-1]))
+            rows.append((level, int(h[-1]), c[k], int(h[k])))
+        slow.append(rows)
+    t_slow = time.perf_counter() - t0
+    print(f"365天命中统计: 前缀和 {t_fast * 1000:.1f}ms vs 逐日重算 {t_slow * 1000:.0f}ms，结果一致={fast == slow}")
+
+    records = df.to_dict('records')
+    strategy = {'total_return': 0.0, 'trades_count': 0, 'current_positions': 0, 'total_value': 100000,
+                'exposure': 0.0, 'start': '2024-01-01'}
+    jobs = [(f"BTC日报_{records[i]['date']:%Y-%m-%d}.html",
+             dict(row=records[i], recent_rows=records[i - 6:i + 1], entry_ok={1: False, 2: False, 3: False, 4: False},
+                  hit_rows=rows, n_bars=i + 1, strategy_results=strategy, entry_signals=[],
+                  exit_signal={'has_signal': False}, atr_mult=2.0))
+            for i, rows in zip(year, fast)]
+    for workers in (1, 4):
+        out_dir = tempfile.mkdtemp(prefix='历史日报_')
+        t0 = time.perf_counter()
+        count, size = render_reports(jobs, out_dir, max_workers=workers)
+        print(f"{workers} 进程: {count} 份日报 {size / 1e6:.1f}MB，{time.perf_counter() - t0:.2f}s")
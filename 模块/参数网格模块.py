@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+参数网格模块 - 一次调用计算多组参数的WaveTrend / SQZMOM
+
+输出为 (参数组数 × K线数) 矩阵，每行对应一组参数。
+共享中间量：
+- hlc3、真实波幅(TR)只算一次
+- 同一 channelLength 的 esa / d / ci 只算一次
+- 同一长度的滚动均值/标准差/最高/最低/回归只算一次
+
+用法：
+    grid = param_grid(channel_length=[8, 10, 12], average_length=[18, 21, 24])
+    wt = wavetrend_grid(high, low, close, **grid)   # wt['wt1'].shape == (9, len(close))
+"""
+
+import itertools
+
+import numpy as np
+
+from 指标模块 import (_as_float, sma, rolling_std, rolling_max, rolling_min, shift,
+                     true_range, ema, linreg, linreg_slope)
+
+
+def param_grid(**axes):
+    """
+    参数笛卡尔积，返回 {参数名: 一维数组}，各数组等长
+
+    Example:
+        param_grid(length_bb=[10, 20], mult_bb=[1.5, 2.0])
+        -> {'length_bb': [10, 10, 20, 20], 'mult_bb': [1.5, 2.0, 1.5, 2.0]}
+    """
+    names = list(axes)
+    combos = list(itertools.product(*(np.atleast_1d(axes[name]) for name in names)))
+    return {name: np.array([combo[i] for combo in combos]) for i, name in enumerate(names)}
+
+
+def _unique_rows(values, compute):
+    """
+    按参数取值去重计算：compute(v) 对每个不同取值只调用一次
+
+    Returns:
+        (S, N) 矩阵，第 s 行 = compute(values[s])
+    """
+    uniques, inverse = np.unique(values, return_inverse=True)
+    table = np.stack([compute(v) for v in uniques])
+    return table[inverse]
+
+
+def _cross(a, b):
+    """a 上穿 b（与 pandas shift 版本一致：前一根为NaN时为False）"""
+    a_prev, b_prev = shift(a), shift(b)
+    return (a_prev < b_prev) & (a > b)
+
+
+def wavetrend_grid(high, low, close, channel_length=10, average_length=21, source='hlc3'):
+    """
+    WaveTrend 参数网格
+
+    Args:
+        channel_length, average_length: 标量或等长数组（广播后为参数组数S）
+        source: 'hlc3'（WT策略脚本）或 'close'（真实BTC高置信度策略.calculate_wavetrend）
+
+    Returns:
+        dict: wt1, wt2, golden_cross, death_cross，形状 (S, N)
+    """
+    n1, n2 = np.broadcast_arrays(np.atleast_1d(channel_length), np.atleast_1d(average_length))
+    close = _as_float(close)
+    src = (_as_float(high) + _as_float(low) + close) / 3 if source == 'hlc3' else close
+
+    # esa / d / ci 只依赖 channelLength：按不同取值各算一次（沿行向量化）
+    channels, inverse = np.unique(n1, return_inverse=True)
+    rows = np.broadcast_to(src, (len(channels), len(src)))
+    esa = ema(rows, channels)
+    d = ema(np.abs(rows - esa), channels)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ci = (rows - esa) / (0.015 * d)  # 第一根 d=0 → NaN，与pandas一致
+
+    wt1 = ema(ci[inverse], n2)
+    wt2 = sma(wt1, 4)
+    return {
+        'wt1': wt1,
+        'wt2': wt2,
+        'golden_cross': _cross(wt1, wt2),
+        'death_cross': _cross(wt2, wt1),
+    }
+
+
+def sqzmom_grid(high, low, close, length_bb=20, mult_bb=2.0, length_kc=20, mult_kc=1.5,
+                use_true_range=True, ddof=0, momentum='linreg'):
+    """
+    SQZMOM 参数网格
+
+    Args:
+        length_bb, mult_bb, length_kc, mult_kc: 标量或等长数组（广播后为参数组数S）
+        ddof: 布林带标准差自由度。0 = TV/指标模块.sqzmom，1 = pandas std（真实BTC高置信度策略）
+        momentum: 'linreg' = ta.linreg末端值（指标模块.sqzmom），
+                  'slope' = 斜率×(n-1)（真实BTC高置信度策略.calculate_sqzmom）
+
+    Returns:
+        dict: sqz_on, sqz_off, no_sqz, sqz_val, is_lime, is_green, is_red, is_maroon，形状 (S, N)
+    """
+    lbb, mbb, lkc, mkc = np.broadcast_arrays(*(np.atleast_1d(v) for v in (length_bb, mult_bb, length_kc, mult_kc)))
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    mbb = mbb[:, None].astype(np.float64)
+    mkc = mkc[:, None].astype(np.float64)
+
+    # 共享：TR、各长度的滚动统计
+    range_kc = true_range(high, low, close) if use_true_range else high - low
+
+    bb_mid = _unique_rows(lbb, lambda n: sma(close, int(n)))
+    bb_std = _unique_rows(lbb, lambda n: rolling_std(close, int(n), ddof))
+    kc_mid = _unique_rows(lkc, lambda n: sma(close, int(n)))
+    range_ma = _unique_rows(lkc, lambda n: sma(range_kc, int(n)))
+
+    # 动能线只依赖 lengthKC
+    fit = linreg if momentum == 'linreg' else linreg_slope
+
+    def momentum_row(n):
+        n = int(n)
+        avg_all = ((rolling_max(high, n) + rolling_min(low, n)) / 2 + sma(close, n)) / 2
+        return fit(close - avg_all, n)
+
+    val = _unique_rows(lkc, momentum_row)
+
+    bb_upper = bb_mid + mbb * bb_std
+    bb_lower = bb_mid - mbb * bb_std
+    kc_upper = kc_mid + range_ma * mkc
+    kc_lower = kc_mid - range_ma * mkc
+
+    sqz_on = (bb_lower > kc_lower) & (bb_upper < kc_upper)
+    sqz_off = (bb_lower < kc_lower) & (bb_upper > kc_upper)
+    val_prev = np.nan_to_num(shift(val), nan=0.0)
+    return {
+        'sqz_on': sqz_on,
+        'sqz_off': sqz_off,
+        'no_sqz': ~sqz_on & ~sqz_off,
+        'sqz_val': val,
+        'is_lime': (val > 0) & (val > val_prev),
+        'is_green': (val > 0) & (val < val_prev),
+        'is_red': (val < 0) & (val < val_prev),
+        'is_maroon': (val < 0) & (val > val_prev),
+    }
+
+
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+    from 指标模块 import sqzmom
+
+    print("=" * 80)
+    print("🧪 参数网格 vs 逐组计算")
+    print("=" * 80)
+
+    rng = np.random.default_rng(42)
+    n_bars = 2000
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.02, n_bars)))
+    high = close * (1 + rng.uniform(0, 0.02, n_bars))
+    low = close * (1 - rng.uniform(0, 0.02, n_bars))
+    df = pd.DataFrame({'high': high, 'low': low, 'close': close})
+
+    # WaveTrend：10×10 = 100组
+    grid = param_grid(channel_length=range(6, 16), average_length=range(15, 25))
+    t0 = time.perf_counter()
+    wt = wavetrend_grid(high, low, close, **grid)
+    t_grid = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    max_diff = 0.0
+    for s, (n1, n2) in enumerate(zip(grid['channel_length'], grid['average_length'])):
+        hlc3 = (df['high'] + df['low'] + df['close']) / 3
+        esa = hlc3.ewm(span=n1, adjust=False).mean()
+        d = (hlc3 - esa).abs().ewm(span=n1, adjust=False).mean()
+        ci = (hlc3 - esa) / (0.015 * d)
+        wt1 = ci.ewm(span=n2, adjust=False).mean()
+        wt2 = wt1.rolling(window=4).mean()
+        max_diff = max(max_diff, np.nanmax(np.abs(wt1.values - wt['wt1'][s])),
+                       np.nanmax(np.abs(wt2.values - wt['wt2'][s])))
+    t_loop = time.perf_counter() - t0
+    print(f"WaveTrend {len(grid['channel_length'])}组 × {n_bars}根: 网格 {t_grid*1000:.1f}ms, "
+          f"逐组pandas {t_loop*1000:.1f}ms, 最大误差 {max_diff:.2e}")
+
+    # SQZMOM：3×3×3×4 = 108组
+    grid = param_grid(length_bb=[10, 20, 30], mult_bb=[1.5, 2.0, 2.5],
+                      length_kc=[10, 20, 30], mult_kc=[1.0, 1.25, 1.5, 2.0])
+    t0 = time.perf_counter()
+    sq = sqzmom_grid(high, low, close, **grid)
+    t_grid = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    mismatches = 0
+    for s in range(len(grid['length_bb'])):
+        ref = sqzmom(high, low, close, int(grid['length_bb'][s]), grid['mult_bb'][s],
+                     int(grid['length_kc'][s]), grid['mult_kc'][s])
+        mismatches += int(not np.allclose(ref['sqz_val'], sq['sqz_val'][s], equal_nan=True))
+        mismatches += sum(int(not np.array_equal(ref[key], sq[key][s]))
+                          for key in ('sqz_on', 'sqz_off', 'is_lime', 'is_red'))
+    t_loop = time.perf_counter() - t0
+    print(f"SQZMOM {len(grid['length_bb'])}组 × {n_bars}根: 网格 {t_grid*1000:.1f}ms, "
+          f"逐组 {t_loop*1000:.1f}ms, 不一致 {mismatches} 处")
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+因子IC模块 - 全部因子 × 全部持有期的秩相关IC一次算完
+
+- 因子矩阵、未来收益矩阵各做一次秩变换（NaN保持缺失）
+- IC矩阵 = 按缺失掩码加权的矩阵乘法求 Pearson(秩) —— 不再逐个 (因子, 周期) 调 spearmanr
+- rolling_ic: 滚动窗口IC时间序列（每个窗口内重新排名，= 逐窗口 spearmanr；窗口分块批量排名）
+- decay:      1~120日 IC衰减曲线与峰值/半衰期
+
+说明：全样本IC的秩只在每列自身的有效样本上算一次；与逐对 dropna 后重新排名的 spearmanr 相比，
+差别只来自两端被剔除的少量样本（未来收益末尾、因子预热期），连续因子通常在 1e-3 以内，
+大量并列值的离散因子在长周期上可到 5e-3；p值同样用 t 近似。
+
+用法：
+    engine = ICEngine(df[factor_cols], df['close'], dates=df['date'])
+    engine.ic_table((5, 20, 60))     # IC / p值 / 样本数
+    engine.decay(120)                # 因子 × 1..120日
+    engine.rolling_ic(20, window=250)
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from scipy import stats as _stats
+except ImportError:  # 没有scipy时只不给p值
+    _stats = None
+
+
+def forward_returns(close, horizons):
+    """未来收益矩阵 (bars, H)：close[t+h] / close[t] - 1，末尾不足h根为NaN"""
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    out = np.full((n, len(horizons)), np.nan)
+    for j, h in enumerate(horizons):
+        if h < n:
+            out[:n - h, j] = close[h:] / close[:n - h] - 1
+    return out
+
+
+def rank_matrix(x):
+    """逐列平均秩（并列取平均，NaN保持NaN），一次处理所有列"""
+    return pd.DataFrame(np.asarray(x, dtype=np.float64)).rank(method='average').to_numpy()
+
+
+def _prepare(ranks):
+    """返回 (有效掩码, 中心化后缺失置0的秩)"""
+    valid = ~np.isnan(ranks)
+    centered = ranks - np.nanmean(np.where(valid, ranks, np.nan), axis=0)
+    return valid.astype(np.float64), np.where(valid, centered, 0.0)
+
+
+def masked_corr(a_ranks, b_ranks, min_periods=30):
+    """
+    两组秩的两两相关（只用两列同时有效的行）
+
+    Returns:
+        (corr, counts)：形状 (A列数, B列数)
+    """
+    ma, a = _prepare(a_ranks)
+    mb, b = _prepare(b_ranks)
+    n = ma.T @ mb
+    sa = a.T @ mb
+    sb = ma.T @ b
+    sab = a.T @ b
+    saa = (a * a).T @ mb
+    sbb = ma.T @ (b * b)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = n * sab - sa * sb
+        var = (n * saa - sa * sa) * (n * sbb - sb * sb)
+        corr = cov / np.sqrt(var)
+    corr[(n < min_periods) | ~(var > 0)] = np.nan
+    return corr, n.astype(np.int64)
+
+
+def _row_ranks(x):
+    """逐行平均秩（并列取平均，NaN保持NaN）：排序后按并列组的首尾位置求平均"""
+    width = x.shape[1]
+    order = np.argsort(x, axis=1)  # NaN排在末尾；并列值排序后相邻，顺序无关
+    sorted_x = np.take_along_axis(x, order, axis=1)
+    positions = np.broadcast_to(np.arange(width), x.shape)
+    new_group = np.ones(x.shape, dtype=bool)
+    new_group[:, 1:] = sorted_x[:, 1:] != sorted_x[:, :-1]
+    group_end = np.ones(x.shape, dtype=bool)
+    group_end[:, :-1] = new_group[:, 1:]
+    first = np.maximum.accumulate(np.where(new_group, positions, 0), axis=1)
+    last = np.minimum.accumulate(np.where(group_end, positions, width)[:, ::-1], axis=1)[:, ::-1]
+    ranks = np.empty(x.shape)
+    np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=1)
+    ranks[np.isnan(x)] = np.nan
+    return ranks
+
+
+def window_spearman(a, b, window, min_periods=30, chunk=2048):
+    """
+    滚动窗口Spearman相关：每个窗口只取两列同时有效的行，在窗口内重新排名（并列取平均）
+
+    Returns:
+        长度同输入的数组，前 window-1 个与有效样本不足 min_periods 的窗口为NaN
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    out = np.full(len(a), np.nan)
+    if len(a) < window:
+        return out
+    a_windows = sliding_window_view(a, window)
+    b_windows = sliding_window_view(b, window)
+    for start in range(0, len(a_windows), chunk):
+        wa, wb = a_windows[start:start + chunk], b_windows[start:start + chunk]
+        both = ~np.isnan(wa) & ~np.isnan(wb)
+        count = both.sum(axis=1)
+        # 有效样本的平均秩恒为 (count+1)/2，缺失行中心化后置0
+        middle = (count[:, None] + 1) / 2
+        ra = np.nan_to_num(_row_ranks(np.where(both, wa, np.nan)) - middle)
+        rb = np.nan_to_num(_row_ranks(np.where(both, wb, np.nan)) - middle)
+        var = (ra * ra).sum(axis=1) * (rb * rb).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = (ra * rb).sum(axis=1) / np.sqrt(var)
+        corr[(count < min_periods) | ~(var > 0)] = np.nan
+        out[window - 1 + start:window - 1 + start + len(corr)] = corr
+    return out
+
+
+def ic_p_values(ic, counts):
+    """相关系数的双侧p值（t检验，与 spearmanr 相同的近似）；没有scipy时为NaN"""
+    if _stats is None:
+        return np.full(np.shape(ic), np.nan)
+    dof = np.maximum(counts - 2, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = ic * np.sqrt(dof / np.maximum(1 - ic * ic, 1e-300))
+    return 2 * _stats.t.sf(np.abs(t), dof)
+
+
+class ICEngine:
+    """批量IC引擎"""
+
+    def __init__(self, factors, close, dates=None, min_periods=30):
+        """
+        Args:
+            factors: DataFrame（列=因子）或 {因子名: 数组}
+            close: 收盘价
+            dates: 日期（rolling_ic 的索引）
+        """
+        factors = pd.DataFrame(factors)
+        self.names = list(factors.columns)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.index = pd.Index(dates) if dates is not None else pd.RangeIndex(len(self.close))
+        self.min_periods = min_periods
+        self.factor_values = factors.to_numpy(dtype=np.float64)
+        self.factor_ranks = rank_matrix(self.factor_values)
+        self._return_ranks = {}
+
+    def _ranks_for(self, horizons):
+        missing = [h for h in horizons if h not in self._return_ranks]
+        if missing:
+            ranks = rank_matrix(forward_returns(self.close, missing))
+            for j, h in enumerate(missing):
+                self._return_ranks[h] = ranks[:, j]
+        return np.column_stack([self._return_ranks[h] for h in horizons])
+
+    def ic_matrix(self, horizons=(5, 20, 60)):
+        """因子 × 持有期 IC（DataFrame）"""
+        horizons = [int(h) for h in horizons]
+        ic, _ = masked_corr(self.factor_ranks, self._ranks_for(horizons), self.min_periods)
+        return pd.DataFrame(ic, index=self.names, columns=horizons)
+
+    def ic_table(self, horizons=(5, 20, 60)):
+        """
+        与 FactorAnalyzer.evaluate_factors 对应的宽表
+
+        Returns:
+            DataFrame: 行=因子，列 ic_{h}d / p_{h}d / n_{h}d
+        """
+        horizons = [int(h) for h in horizons]
+        ic, counts = masked_corr(self.factor_ranks, self._ranks_for(horizons), self.min_periods)
+        p = ic_p_values(ic, counts)
+        table = pd.DataFrame(index=self.names)
+        for j, h in enumerate(horizons):
+            table[f'ic_{h}d'] = ic[:, j]
+            table[f'p_{h}d'] = p[:, j]
+            table[f'n_{h}d'] = counts[:, j]
+        return table
+
+    def decay(self, max_horizon=120):
+        """IC衰减曲线：因子 × 1..max_horizon 日"""
+        return self.ic_matrix(range(1, int(max_horizon) + 1))
+
+    def decay_summary(self, max_horizon=120):
+        """
+        每个因子的 峰值IC / 峰值周期 / 半衰期（|IC| 从峰值首次跌到一半以下的周期）
+        """
+        curve = self.decay(max_horizon)
+        values = np.abs(curve.to_numpy())
+        horizons = np.asarray(curve.columns)
+        filled = np.where(np.isnan(values), -np.inf, values)
+        peak_pos = filled.argmax(axis=1)
+        peak = values[np.arange(len(values)), peak_pos]
+        after_peak = np.arange(values.shape[1])[None, :] > peak_pos[:, None]
+        below = after_peak & (values < peak[:, None] / 2)
+        half_pos = np.where(below.any(axis=1), below.argmax(axis=1), -1)
+        return pd.DataFrame({
+            'peak_ic': curve.to_numpy()[np.arange(len(values)), peak_pos],
+            'peak_horizon': horizons[peak_pos],
+            'half_life': np.where(half_pos >= 0, horizons[np.maximum(half_pos, 0)], np.nan),
+        }, index=curve.index)
+
+    def rolling_ic(self, horizon=20, window=250):
+        """
+        滚动IC时间序列（所有因子一次算出）
+
+        每个时点用最近 window 根（因子, h日未来收益）同时有效的样本，并在窗口内重新排名，
+        与对该窗口 dropna 后调 spearmanr 一致（不沿用全样本的秩，因子水平随时间漂移时也准确）；
+        注意 t 时点的值用到了 t+h 的价格，只用于研究，不可作为实时信号。
+        """
+        returns = forward_returns(self.close, [int(horizon)])[:, 0]
+        ic = np.column_stack([window_spearman(self.factor_values[:, k], returns, window, self.min_periods)
+                              for k in range(len(self.names))])
+        return pd.DataFrame(ic, index=self.index, columns=self.names)
+
+
+if __name__ == "__main__":
+    import time
+
+    print("=" * 80)
+    print("🧪 批量IC vs 逐对 spearmanr")
+    print("=" * 80)
+
+    rng = np.random.default_rng(4)
+    n = 3000
+    close = 10000 * np.exp(np.cumsum(rng.normal(0.0005, 0.03, n)))
+    future = pd.Series(close).pct_change(20).shift(-20).to_numpy()
+    factors = {}
+    for k in range(10):
+        signal = np.nan_to_num(future) * rng.uniform(-1, 1) + rng.normal(0, 0.1, n)
+        warmup = rng.integers(0, 200)
+        signal[:warmup] = np.nan
+        factors[f'factor_{k}'] = signal
+    factors = pd.DataFrame(factors)
+
+    t0 = time.perf_counter()
+    engine = ICEngine(factors, close)
+    table = engine.ic_table((5, 20, 60))
+    curve = engine.decay(120)
+    rolling = engine.rolling_ic(20, window=250)
+    t_batch = time.perf_counter() - t0
+
+    if _stats is not None:
+        t0 = time.perf_counter()
+        diffs = []
+        for h in (5, 20, 60):
+            ret = pd.Series(close).pct_change(h).shift(-h)
+            for name in factors:
+                valid = pd.DataFrame({'f': factors[name], 'r': ret}).dropna()
+                ic, _ = _stats.spearmanr(valid['f'], valid['r'])
+                diffs.append(abs(ic - table.loc[name, f'ic_{h}d']))
+        t_loop = time.perf_counter() - t0
+        print(f"10因子 × 3周期: 逐对 spearmanr {t_loop * 1000:.0f}ms, 与批量IC最大差 {max(diffs):.1e}")
+
+        # 滚动IC：抽查若干窗口，与窗口内 dropna 后的 spearmanr 对比
+        ret = pd.Series(close).pct_change(20).shift(-20)
+        diffs = []
+        for end in (400, 1200, 2500, n - 21):
+            for name in ('factor_0', 'factor_5'):
+                valid = pd.DataFrame({'f': factors[name], 'r': ret}).iloc[end - 249:end + 1].dropna()
+                ic, _ = _stats.spearmanr(valid['f'], valid['r'])
+                diffs.append(abs(ic - rolling[name].iloc[end]))
+        print(f"滚动IC vs 窗口内 spearmanr 最大差 {max(diffs):.1e}")
+        assert max(diffs) < 1e-9
+
+    print(f"批量: IC表 + 1~120日衰减({curve.size}个IC) + 滚动IC, 共 {t_batch * 1000:.0f}ms")
+    print(table[['ic_5d', 'ic_20d', 'ic_60d']].round(4).head(4).to_string())
+    print(engine.decay_summary(120).head(4).to_string())
+    print(f"滚动IC(20日, 250窗口) 非空 {rolling.notna().sum().iloc[0]} 个时点")
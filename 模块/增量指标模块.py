@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量指标模块 - 监控指标的常驻增量状态
+
+与 【邮箱提示】指标提醒.calculate_indicators 的列一一对应：
+wt1 / wt2 / sqz_on / sqz_off / no_sqz / sqz_val / is_lime / is_green / is_red / is_maroon /
+plus_di / minus_di / adx / ma14 / atr / wt_golden_cross / wt_death_cross / adx_up
+
+- WaveTrend、ADX：编译指标模块 的分块状态（每根K线O(1)）
+- ATR：Wilder平滑的真实波幅（= talib.ATR，前 atr_length 根TR均值作种子），持仓账本的ATR追踪线用
+- 布林带/肯特纳/最高最低：RollingMoments（O(1)）
+- 动能线 linreg：最近 length_kc 个 (close - avgAll) 的闭式回归（常数窗口）
+- push(): 收盘K线提交并返回该K线的指标行
+- peek(): 未收盘K线试算，不改变任何状态（盘中预警用）
+
+历史足够长（>数百根）时，结果与整段计算在浮点误差内一致
+（talib.EMA 用SMA作种子，这里用首值作种子，差别随 (1-α)^n 衰减）。
+
+用法：
+    state = IncrementalIndicatorState()
+    state.extend(df['high'], df['low'], df['close'])   # 启动预热
+    row = state.push(high, low, close)                  # 每根新收盘K线
+    provisional = state.peek(high, low, close)          # 盘中试算
+"""
+
+from collections import deque
+
+import numpy as np
+
+from 编译指标模块 import wavetrend_chunk, wavetrend_state, adx_chunk, adx_state
+from 滚动统计模块 import RollingMoments
+
+INDICATOR_COLUMNS = ['wt1', 'wt2', 'sqz_on', 'sqz_off', 'no_sqz', 'sqz_val', 'is_lime', 'is_green',
+                     'is_red', 'is_maroon', 'plus_di', 'minus_di', 'adx', 'ma14', 'atr',
+                     'wt_golden_cross', 'wt_death_cross', 'adx_up']
+
+
+def _linreg_end(values):
+    """ta.linreg(x, n, 0)：窗口拟合线在最后一根的值（窗口不满或含NaN时为NaN）"""
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    idx = np.arange(n) - (n - 1) / 2
+    slope = (idx @ (y - y.mean())) / (idx @ idx)
+    return float(y.mean() + slope * (n - 1) / 2)
+
+
+class IncrementalIndicatorState:
+    """监控指标增量状态（可pickle，用于守护进程检查点）"""
+
+    # 状态结构变化时加1，旧检查点不再复用
+    VERSION = 2
+
+    def __init__(self, length_bb=20, mult_bb=2.0, length_kc=20, mult_kc=1.5, adx_length=14, ma_length=14,
+                 atr_length=14):
+        if length_bb != length_kc:
+            raise ValueError("增量SQZMOM要求布林带与肯特纳通道周期相同")
+        self.length_kc = length_kc
+        self.mult_bb = mult_bb
+        self.mult_kc = mult_kc
+        self.adx_length = adx_length
+        self.wt_state = wavetrend_state()
+        self.adx_state = adx_state()
+        self.moments = RollingMoments(length_kc, ddof=0)
+        self.momentum_src = deque(maxlen=length_kc)   # close - avgAll
+        self.closes = deque(maxlen=ma_length)
+        self.atr_length = atr_length
+        self.atr = (0, 0.0, np.nan)   # (已累计TR根数, 种子期TR和, ATR)
+        self.version = self.VERSION
+        self.last = None   # 上一根已提交K线的指标行
+        self.count = 0
+
+    def _next_atr(self, high, low, close):
+        """推进一根K线后的ATR状态（不修改 self，talib.ATR 口径：第一根K线没有前收，不计TR）"""
+        count, tr_sum, atr = self.atr
+        if self.closes:
+            prev_close = self.closes[-1]
+            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+            count += 1
+            if count < self.atr_length:
+                tr_sum += tr
+            elif count == self.atr_length:
+                atr = (tr_sum + tr) / self.atr_length
+            else:
+                atr = (atr * (self.atr_length - 1) + tr) / self.atr_length
+        return count, tr_sum, atr
+
+    def _evaluate(self, high, low, close, wt_state, adx_state, moments):
+        """计算一根K线的指标行（wt_state / adx_state 原地推进，moments 为 RollingMoments 的结果）"""
+        wt1, wt2 = wavetrend_chunk(np.array([high]), np.array([low]), np.array([close]), wt_state)
+        plus_di, minus_di, adx = adx_chunk(np.array([high]), np.array([low]), np.array([close]),
+                                           adx_state, self.adx_length)
+        wt1, wt2 = float(wt1[0]), float(wt2[0])
+        plus_di, minus_di, adx = float(plus_di[0]), float(minus_di[0]), float(adx[0])
+
+        if moments is None:
+            sqz_on = sqz_off = False
+            src, val = np.nan, np.nan
+        else:
+            bb_upper = moments['mean'] + self.mult_bb * moments['std']
+            bb_lower = moments['mean'] - self.mult_bb * moments['std']
+            kc_upper = moments['mean'] + self.mult_kc * moments['range_mean']
+            kc_lower = moments['mean'] - self.mult_kc * moments['range_mean']
+            sqz_on = bool(bb_lower > kc_lower and bb_upper < kc_upper)
+            sqz_off = bool(bb_lower < kc_lower and bb_upper > kc_upper)
+            src = close - ((moments['max'] + moments['min']) / 2 + moments['mean']) / 2
+            window = list(self.momentum_src)[1:] + [src] \
+                if len(self.momentum_src) == self.length_kc else list(self.momentum_src) + [src]
+            val = _linreg_end(window) if len(window) == self.length_kc and not np.isnan(window).any() else np.nan
+
+        closes = list(self.closes)[1:] + [close] if len(self.closes) == self.closes.maxlen \
+            else list(self.closes) + [close]
+        ma14 = float(np.mean(closes)) if len(closes) == self.closes.maxlen else np.nan
+
+        prev = self.last or {}
+        val_prev = prev.get('sqz_val', np.nan)
+        val_prev = 0.0 if np.isnan(val_prev) else val_prev
+        prev_wt1, prev_wt2 = prev.get('wt1', np.nan), prev.get('wt2', np.nan)
+        row = {
+            'wt1': wt1, 'wt2': wt2,
+            'sqz_on': sqz_on, 'sqz_off': sqz_off, 'no_sqz': not sqz_on and not sqz_off,
+            'sqz_val': val,
+            'is_lime': bool(val > 0 and val > val_prev), 'is_green': bool(val > 0 and val < val_prev),
+            'is_red': bool(val < 0 and val < val_prev), 'is_maroon': bool(val < 0 and val > val_prev),
+            'plus_di': plus_di, 'minus_di': minus_di, 'adx': adx, 'ma14': ma14,
+            'atr': self._next_atr(high, low, close)[2],
+            'wt_golden_cross': bool(prev_wt1 < prev_wt2 and wt1 > wt2),
+            'wt_death_cross': bool(prev_wt1 > prev_wt2 and wt1 < wt2),
+            'adx_up': bool(adx > 20 and adx > prev.get('adx', np.nan)),
+        }
+        return row, src
+
+    def push(self, high, low, close):
+        """提交一根收盘K线，返回其指标行"""
+        high, low, close = float(high), float(low), float(close)
+        moments = self.moments.push(high, low, close)
+        row, src = self._evaluate(high, low, close, self.wt_state, self.adx_state, moments)
+        if moments is not None:
+            self.momentum_src.append(src)
+        self.atr = self._next_atr(high, low, close)
+        self.closes.append(close)
+        self.last = row
+        self.count += 1
+        return row
+
+    def peek(self, high, low, close):
+        """用未收盘K线试算指标行（O(1)，不改变状态）"""
+        high, low, close = float(high), float(low), float(close)
+        moments = self.moments.peek(high, low, close)
+        row, _ = self._evaluate(high, low, close, self.wt_state.copy(), self.adx_state.copy(), moments)
+        return row
+
+    def extend(self, high, low, close):
+        """批量提交历史K线（启动预热），返回最后一根的指标行"""
+        row = None
+        for h, l, c in zip(np.asarray(high, dtype=np.float64), np.asarray(low, dtype=np.float64),
+                           np.asarray(close, dtype=np.float64)):
+            row = self.push(h, l, c)
+        return row
+
+
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+    import talib
+    from 指标模块 import sqzmom, sma
+    from 编译指标模块 import wavetrend, adx
+
+    print("=" * 80)
+    print("🧪 增量指标 vs 整段计算")
+    print("=" * 80)
+
+    rng = np.random.default_rng(11)
+    n = 1500
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.03, n)))
+    high = close * (1 + rng.uniform(0, 0.02, n))
+    low = close * (1 - rng.uniform(0, 0.02, n))
+
+    IncrementalIndicatorState().extend(high[:50], low[:50], close[:50])  # 预编译Numba内核
+
+    t0 = time.perf_counter()
+    state = IncrementalIndicatorState()
+    rows = [state.push(h, l, c) for h, l, c in zip(high, low, close)]
+    t_push = (time.perf_counter() - t0) / n
+    inc = pd.DataFrame(rows)
+
+    full = pd.DataFrame(sqzmom(high, low, close))
+    full['wt1'], full['wt2'] = wavetrend(high, low, close)
+    full['plus_di'], full['minus_di'], full['adx'] = adx(high, low, close)
+    full['ma14'] = sma(close, 14)
+    full['atr'] = talib.ATR(high, low, close, 14)
+    full['wt_golden_cross'] = (full['wt1'].shift(1) < full['wt2'].shift(1)) & (full['wt1'] > full['wt2'])
+    full['wt_death_cross'] = (full['wt1'].shift(1) > full['wt2'].shift(1)) & (full['wt1'] < full['wt2'])
+    full['adx_up'] = (full['adx'] > 20) & (full['adx'] > full['adx'].shift(1))
+
+    tail = slice(100, None)
+    mismatched = [col for col in INDICATOR_COLUMNS
+                  if not np.allclose(inc[col].iloc[tail].astype(float), full[col].iloc[tail].astype(float),
+                                     rtol=1e-7, atol=1e-7, equal_nan=True)]
+    print(f"逐根推进 {n} 根: 平均 {t_push * 1e6:.0f}µs/根, 列一致: {'是' if not mismatched else '否 ' + str(mismatched)}")
+
+    before = state.last
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        state.peek(high[-1] * 1.01, low[-1], close[-1] * 1.005)
+    t_peek = (time.perf_counter() - t0) / 1000
+    print(f"peek 试算: 平均 {t_peek * 1e6:.0f}µs/次, 状态未改变: {state.last is before}")
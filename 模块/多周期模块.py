@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多周期模块 - 小周期指标增量计算，并无未来函数地对齐到日线
+
+对齐规则（等同于TV request.security + lookahead_off）：
+每根日线只使用在该日线收盘时刻之前已经收盘的最后一根4h K线。
+
+4h K线可以直接下载，也可以由存储中的1h K线经 StoreResampler 增量聚合（base_interval='1h'）。
+"""
+
+import numpy as np
+import pandas as pd
+
+from K线存储模块 import INTERVAL_MS
+from 指标模块 import sqzmom, sqzmom_warmup
+from 重采样模块 import StoreResampler
+
+
+def close_times_ms(dates, interval):
+    """K线开盘时间 -> 收盘时间（毫秒）"""
+    open_ms = pd.to_datetime(pd.Series(dates)).values.astype('datetime64[ms]').astype(np.int64)
+    return open_ms + INTERVAL_MS[interval]
+
+
+def align_last_completed(base_close_ms, htf_close_ms, values, fill=np.nan):
+    """
+    有序索引 searchsorted 连接：对每个 base 收盘时刻，取已收盘的最后一个值
+
+    Args:
+        base_close_ms: 目标周期（如日线）收盘时间，升序
+        htf_close_ms: 源周期（如4h）收盘时间，升序
+        values: 源周期指标值，与 htf_close_ms 等长
+    """
+    values = np.asarray(values)
+    idx = np.searchsorted(htf_close_ms, base_close_ms, side='right') - 1
+    valid = idx >= 0
+    out = np.full(len(base_close_ms), fill, dtype=np.result_type(values.dtype, np.asarray(fill).dtype))
+    out[valid] = values[idx[valid]]
+    return out
+
+
+class IntradaySqzmomLayer:
+    """4小时SQZMOM层 - K线存入CandleStore，指标只对新增K线增量计算"""
+
+    OUTPUT_COLUMNS = ['sqz_on', 'sqz_off', 'no_sqz', 'sqz_val', 'is_lime', 'is_green', 'is_red', 'is_maroon']
+
+    def __init__(self, candle_store, symbol='BTCUSDT', interval='4h', base_interval=None):
+        """
+        Args:
+            base_interval: 基础周期（如'1h'）；给定时只同步基础K线，interval K线由 StoreResampler 增量聚合
+        """
+        self.store = candle_store
+        self.symbol = symbol
+        self.interval = interval
+        self.base_interval = base_interval
+        self.resampler = StoreResampler(candle_store, symbol, base_interval, rules=(interval,)) \
+            if base_interval else None
+        self.warmup = sqzmom_warmup()
+        self.frame = None  # 已计算的小周期指标（date + OHLCV + SQZMOM列）
+
+    def _bars(self, start, end, sync):
+        if self.resampler is None:
+            return self.store.sync(self.symbol, self.interval, start=start, end=end) if sync \
+                else self.store.load(self.symbol, self.interval)
+        if sync:
+            self.store.sync(self.symbol, self.base_interval, start=start, end=end)
+        # 含未完成周期：与直接下载时的未收盘K线一样，下次从它开始重算，align() 不会用到它
+        return self.resampler.refresh().get(self.interval)
+
+    def update(self, start=None, end=None, sync=True):
+        """同步K线并增量计算SQZMOM，返回完整指标帧"""
+        bars = self._bars(start, end, sync).reset_index(drop=True)
+
+        if self.frame is None or len(self.frame) == 0:
+            self.frame = self._compute(bars)
+            return self.frame
+
+        # 上次最后一根可能是未收盘K线，从它开始重算
+        last_date = self.frame['date'].iloc[-1]
+        first_new = int(np.searchsorted(bars['date'].values, np.datetime64(last_date), side='left'))
+        if first_new >= len(bars):
+            return self.frame
+        if first_new != len(self.frame) - 1 or bars['date'].iloc[0] != self.frame['date'].iloc[0]:
+            # 历史被补齐/改写过，全量重算
+            self.frame = self._compute(bars)
+            return self.frame
+
+        # 只对 [first_new - warmup, end) 计算，丢弃预热部分
+        lo = max(0, first_new - self.warmup)
+        tail = self._compute(bars.iloc[lo:].reset_index(drop=True)).iloc[first_new - lo:]
+        self.frame = pd.concat([self.frame.iloc[:first_new], tail], ignore_index=True)
+        return self.frame
+
+    def _compute(self, bars):
+        result = sqzmom(bars['high'].values, bars['low'].values, bars['close'].values)
+        frame = bars[['date', 'open', 'high', 'low', 'close', 'volume']].copy()
+        for col in self.OUTPUT_COLUMNS:
+            frame[col] = result[col]
+        return frame
+
+    def align(self, daily_dates, now=None, base_interval='1d'):
+        """
+        把4h指标对齐到日线：sqz4h（4h挤压释放）、mom4h（4h动能值）
+
+        Args:
+            now: 当前时间，收盘时间晚于now的4h K线（未收盘）不参与对齐
+        """
+        if self.frame is None or len(self.frame) == 0:
+            raise ValueError("4h指标尚未计算，请先调用update()")
+
+        now = pd.Timestamp.utcnow().tz_localize(None) if now is None else pd.Timestamp(now)
+        now_ms = int(now.value // 10**6)
+
+        htf_close = close_times_ms(self.frame['date'], self.interval)
+        completed = htf_close <= now_ms
+        htf_close = htf_close[completed]
+
+        base_close = close_times_ms(daily_dates, base_interval)
+        return pd.DataFrame({
+            'sqz4h': align_last_completed(base_close, htf_close, self.frame['sqz_off'].values[completed], fill=False),
+            'mom4h': align_last_completed(base_close, htf_close, self.frame['sqz_val'].values[completed]),
+        })
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from K线存储模块 import CandleStore
+    from 重采样模块 import resample_ohlcv
+
+    print("=" * 80)
+    print("🧪 4h SQZMOM层：直接4h K线 vs 1h K线增量聚合")
+    print("=" * 80)
+
+    rng = np.random.default_rng(4)
+    n = 24 * 900
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.006, n)))
+    hourly = pd.DataFrame({'date': pd.date_range('2022-01-01', periods=n, freq='h'), 'open': close,
+                           'high': close * (1 + rng.uniform(0, 0.004, n)), 'low': close * (1 - rng.uniform(0, 0.004, n)),
+                           'close': close, 'volume': rng.uniform(1, 10, n)})
+    store = CandleStore(tempfile.mkdtemp(prefix='多周期自检_'))
+    direct = IntradaySqzmomLayer(store, 'BTCUSDT', '4h')
+    layered = IntradaySqzmomLayer(store, 'BTCUSDT', '4h', base_interval='1h')
+
+    # 先喂到一个4h周期中间（最后一根4h未完成），再追加剩余1h K线
+    for upto in (n - 30, n):
+        bars = hourly.iloc[:upto]
+        store.save(bars, 'BTCUSDT', '1h')
+        store.save(resample_ohlcv(bars, '4h'), 'BTCUSDT', '4h')
+        expected = direct.update(sync=False)
+        result = layered.update(sync=False)
+        same = len(result) == len(expected) and np.allclose(
+            result[['open', 'high', 'low', 'close', 'volume', 'sqz_val']].to_numpy(dtype=np.float64),
+            expected[['open', 'high', 'low', 'close', 'volume', 'sqz_val']].to_numpy(dtype=np.float64), equal_nan=True) \
+            and (result['sqz_off'].to_numpy() == expected['sqz_off'].to_numpy()).all()
+        print(f"1h {upto:,} 根 -> 4h {len(result):,} 根（最后一根{'未' if upto % 4 else '已'}完成），"
+              f"与直接4h K线一致: {'是' if same else '否'}")
+
+    daily = pd.date_range('2022-01-01', periods=900, freq='D')
+    now = hourly['date'].iloc[-1] + pd.Timedelta(hours=1)
+    aligned_same = direct.align(daily, now=now).equals(layered.align(daily, now=now))
+    print(f"对齐到日线的 sqz4h / mom4h 一致: {'是' if aligned_same else '否'}")
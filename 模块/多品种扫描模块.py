@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多品种扫描模块 - 观察列表一次运行：并发获取 + 面板指标 + 每个品种的最新指标行
+
+- fetch_watchlist(): 线程池并发 CandleStore.sync，所有请求共用一个带连接池的 requests.Session
+  （HTTP keep-alive，不再每个品种重新握手）；50个品种的耗时≈最慢的那一个
+- 对齐沿用 面板模块.build_panel（按日期并集对齐，上市较晚的品种前面为NaN）
+- monitor_indicators(): 在面板上补充监控口径的指标列（指标模块 的函数沿最后一个轴，天然支持多序列），
+  列与 增量指标模块.INDICATOR_COLUMNS / 监控 calculate_indicators 相同
+  （面板模块.panel_indicators 是 真实BTC高置信度策略 的口径，列名和算法都不同）
+- latest_table():    每个品种最后一根有效K线的指标行（行=品种），可直接交给 RuleSet.matrix
+
+口径：EMA 为 pandas ewm(adjust=False)，与 编译指标模块 / 增量指标模块 一致
+（talib.EMA 以SMA作种子，差别随历史长度衰减）；4小时SQZMOM层不参与观察列表扫描。
+
+用法：
+    frames = fetch_watchlist(store, ['BTCUSDT', 'ETHUSDT', ...], start=start, end=end)
+    table = scan_frames(frames)          # 行=品种
+    MONITOR_ENTRY_RULES.matrix(table)     # 所有品种一次判断
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from K线存储模块 import fetch_binance_klines
+from 指标模块 import ema, sma, shift, sqzmom
+from 编译指标模块 import adx
+from 面板模块 import build_panel
+
+
+def make_session(pool_size=16):
+    """带连接池的HTTP会话（多线程共用）"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def fetch_watchlist(store, symbols, interval='1d', start=None, end=None, max_workers=32, fetcher=None):
+    """
+    并发同步观察列表的K线
+
+    Args:
+        store: CandleStore（每个品种一个文件，线程间互不干扰）
+        fetcher: fetcher(symbol, interval, start_ms, end_ms) -> (df, 请求次数)；
+                 默认用共享连接池的 fetch_binance_klines
+
+    Returns:
+        {品种: K线DataFrame}（获取失败的品种不在结果中）
+    """
+    session = None
+    if fetcher is None:
+        session = make_session(max_workers)
+        fetcher = partial(fetch_binance_klines, session=session)
+
+    def sync(symbol):
+        df = store.sync(symbol, interval, start=start, end=end, fetcher=fetcher)
+        if start is not None:
+            df = df[df['date'] >= pd.Timestamp(start)]
+        return df.reset_index(drop=True)
+
+    frames = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols)))) as pool:
+            futures = {symbol: pool.submit(sync, symbol) for symbol in symbols}
+            for symbol, future in futures.items():
+                try:
+                    df = future.result()
+                except Exception as e:
+                    print(f"⚠️ {symbol} 获取失败: {e}")
+                    continue
+                if len(df):
+                    frames[symbol] = df
+    finally:
+        if session is not None:
+            session.close()
+    return frames
+
+
+def _adx_rows(high, low, close, period):
+    """Wilder ADX 逐行计算（从每行第一根有效K线开始，前面保持NaN）"""
+    outs = [np.full(close.shape, np.nan) for _ in range(3)]
+    for r in range(close.shape[0]):
+        valid = np.flatnonzero(~np.isnan(close[r]))
+        if len(valid) <= 2 * period:
+            continue
+        first = valid[0]
+        for out, values in zip(outs, adx(high[r, first:], low[r, first:], close[r, first:], period)):
+            out[r, first:] = values
+    return outs
+
+
+def monitor_indicators(panel, adx_length=14, ma_length=14):
+    """
+    监控口径的面板指标（panel 为 面板模块.Panel，输出为 (品种, K线) 矩阵）
+
+    Returns:
+        dict: wt1 / wt2 / sqz_on / sqz_off / no_sqz / sqz_val / is_lime / is_green / is_red / is_maroon /
+              plus_di / minus_di / adx / ma14 / wt_golden_cross / wt_death_cross / adx_up
+    """
+    high, low, close = panel['high'], panel['low'], panel['close']
+
+    # WaveTrend：EMA沿行向量化
+    ap = (high + low + close) / 3
+    esa = ema(ap, 10)
+    d = ema(np.abs(ap - esa), 10)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ci = (ap - esa) / (0.015 * d)
+    ci[~np.isfinite(ci)] = np.nan
+    wt1 = ema(ci, 21)
+    wt2 = sma(wt1, 4)
+
+    out = {'wt1': wt1, 'wt2': wt2}
+    out.update(sqzmom(high, low, close))
+    out['plus_di'], out['minus_di'], out['adx'] = _adx_rows(high, low, close, adx_length)
+    out['ma14'] = sma(close, ma_length)
+
+    wt1_prev, wt2_prev = shift(wt1), shift(wt2)
+    out['wt_golden_cross'] = (wt1_prev < wt2_prev) & (wt1 > wt2)
+    out['wt_death_cross'] = (wt1_prev > wt2_prev) & (wt1 < wt2)
+    out['adx_up'] = (out['adx'] > 20) & (out['adx'] > shift(out['adx']))
+    return out
+
+
+def latest_table(panel, indicators):
+    """
+    每个品种最后一根有效K线的 价格 + 指标行
+
+    Returns:
+        DataFrame: 行=品种（index），列 symbol / date / open..volume / 指标列
+    """
+    valid = panel.valid
+    last = valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    rows = np.arange(len(panel.symbols))
+    table = pd.DataFrame({'symbol': panel.symbols, 'date': panel.dates[last]}, index=panel.symbols)
+    for col, values in panel.fields.items():
+        table[col] = values[rows, last]
+    for col, values in indicators.items():
+        table[col] = values[rows, last]
+    return table[valid.any(axis=1)]
+
+
+def scan_frames(frames):
+    """K线字典 → 最新指标表（对齐 + 一次面板计算）"""
+    # 不按自然日取整：观察列表也可能是4小时等日内周期
+    panel = build_panel(frames, normalize=False)
+    return latest_table(panel, monitor_indicators(panel))
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import tempfile
+    from K线存储模块 import CandleStore, INTERVAL_MS
+    from 规则模块 import MONITOR_ENTRY_RULES
+
+    print("=" * 80)
+    print("🧪 观察列表扫描：并发获取 + 面板指标")
+    print("=" * 80)
+
+    rng = np.random.default_rng(3)
+    n_symbols, n_bars = 50, 800
+    end = pd.Timestamp('2024-06-30')
+    universe = {}
+    for k in range(n_symbols):
+        bars = n_bars - int(rng.integers(0, 300)) if k % 5 == 4 else n_bars  # 部分品种上市较晚
+        close = 100 * (k + 1) * np.exp(np.cumsum(rng.normal(0, 0.03, bars)))
+        universe[f'SYM{k:02d}USDT'] = pd.DataFrame({
+            'date': pd.date_range(end=end, periods=bars, freq='D'),
+            'open': close, 'high': close * (1 + rng.uniform(0, 0.03, bars)),
+            'low': close * (1 - rng.uniform(0, 0.03, bars)), 'close': close, 'volume': 1.0})
+
+    latency = 0.2  # 模拟一次HTTP往返
+
+    def fake_fetcher(symbol, interval, start_ms, end_ms):
+        time.sleep(latency)
+        df = universe[symbol]
+        ms = df['date'].values.astype('datetime64[ms]').astype(np.int64)
+        return df[(ms >= start_ms) & (ms <= end_ms)].reset_index(drop=True), 1
+
+    start = end - pd.Timedelta(days=n_bars - 1)
+    with contextlib.redirect_stdout(io.StringIO()):  # 预编译Numba内核（与计时相同的数据路径）
+        warm = fetch_watchlist(CandleStore(tempfile.mkdtemp(prefix='观察列表_')), list(universe)[:2],
+                               start=start, end=end, fetcher=lambda *args: (universe[args[0]], 1))
+    MONITOR_ENTRY_RULES.matrix(scan_frames(warm))
+    for count in (1, n_symbols):
+        store = CandleStore(tempfile.mkdtemp(prefix='观察列表_'))
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            frames = fetch_watchlist(store, list(universe)[:count], start=start, end=end, fetcher=fake_fetcher)
+        t_fetch = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        table = scan_frames(frames)
+        fired = MONITOR_ENTRY_RULES.matrix(table)
+        t_scan = time.perf_counter() - t0
+        print(f"{count:>2} 个品种: 并发获取 {t_fetch:.2f}s（单次往返 {latency}s），面板指标+规则 {t_scan * 1000:.0f}ms")
+
+    # 面板结果 vs 逐品种单独计算
+    from 编译指标模块 import wavetrend
+    worst = 0.0
+    for symbol in ('SYM00USDT', 'SYM04USDT'):
+        df = frames[symbol]
+        wt1, _ = wavetrend(df['high'], df['low'], df['close'])
+        sq = sqzmom(df['high'], df['low'], df['close'])
+        _, _, adx_single = adx(df['high'], df['low'], df['close'])
+        worst = max(worst, abs(wt1[-1] - table.loc[symbol, 'wt1']),
+                    abs(sq['sqz_val'][-1] - table.loc[symbol, 'sqz_val']),
+                    abs(adx_single[-1] - table.loc[symbol, 'adx']))
+    print(f"面板 vs 单品种计算 最大差: {worst:.1e}")
+    print(f"入场规则命中: {dict(zip(MONITOR_ENTRY_RULES.keys(), fired.sum(axis=0)))}")
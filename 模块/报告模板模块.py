@@ -0,0 +1,1050 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告模板模块 - 预编译的邮件HTML模板
+
+- Template：str.format 语法（{字段} / {字段:格式}），导入时解析一次并编译成一个拼接函数，
+  render() 只填数据槽位，不再每次构造整段 f-string
+- render_cached()：输入相同（如同一仓位等级的说明段）时直接返回缓存的HTML，跨品种、跨提醒复用
+- 不含任何槽位的段落（卖出条件表、策略说明、页脚、表头）是模块常量，只生成一次
+- wrap_email()：邮件外壳（CSS）预先切成头尾两段，只拼接正文
+
+render_daily_report / render_entry_alert / render_exit_alert / render_provisional_alert /
+render_watchlist_report 的输出与原 generate_* 方法逐字节一致（日报的持仓段、策略表改为读取持仓账本）；
+数据准备（持仓账本、命中统计）仍在监控脚本中完成。
+
+用法：
+    html = wrap_email(render_entry_alert(signal, '2024-05-01', symbol='BTC'))
+"""
+
+from functools import lru_cache
+from string import Formatter
+
+import pandas as pd
+
+
+class Template:
+    """预编译模板（只支持具名槽位，不支持属性/下标访问）"""
+
+    def __init__(self, source):
+        self.source = source
+        self.fields = []
+        pieces = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if literal:
+                pieces.append(repr(literal))
+            if field is None:
+                continue
+            if not field.isidentifier() or conversion:
+                raise ValueError(f"模板槽位只支持具名字段: {{{field}}}")
+            self.fields.append(field)
+            pieces.append(f"format(v[{field!r}], {spec!r})" if spec else f"str(v[{field!r}])")
+        # 编译成单个表达式：''.join((静态文本, 槽位, 静态文本, ...))
+        self._render = eval(f"lambda v: ''.join(({', '.join(pieces)},))" if pieces else "lambda v: ''",
+                            {'format': format, 'str': str})
+        self._cached = lru_cache(maxsize=512)(lambda items: self._render(dict(items)))
+
+    def render(self, **values):
+        return self._render(values)
+
+    def render_cached(self, **values):
+        """相同输入返回缓存结果（values 须可哈希）"""
+        return self._cached(tuple(sorted(values.items())))
+
+
+# ============ 邮件外壳 ============
+
+_EMAIL_HEAD, _EMAIL_TAIL = """
+        <html>
+        <head>
+        <style>
+            body { font-family: Arial, sans-serif; }
+            table { border-collapse: collapse; width: 100%; margin: 10px 0; }
+            th { background-color: #4CAF50; color: white; padding: 10px; text-align: left; }
+            td { border: 1px solid #ddd; padding: 8px; }
+            tr:nth-child(even) { background-color: #f2f2f2; }
+            .alert { background-color: #fff3cd; padding: 15px; margin: 10px 0; border-left: 5px solid #ff9800; }
+            .danger { background-color: #ffebee; padding: 15px; margin: 10px 0; border-left: 5px solid #f44336; }
+            .success { background-color: #e8f5e9; padding: 15px; margin: 10px 0; border-left: 5px solid #4CAF50; }
+        </style>
+        </head>
+        <body>
+            {body}
+        </body>
+        </html>
+        """.split('{body}')
+
+
+def wrap_email(body):
+    """正文套上邮件外壳（CSS）"""
+    return _EMAIL_HEAD + body + _EMAIL_TAIL
+
+
+# ============ 每日报告 ============
+
+DAILY_HEAD = Template("""
+<h2>📊 BTC监控日报 - {date_cn}</h2>
+<p style="font-size: 20px;"><strong>当前价格：</strong><span style="color: #2196F3; font-size: 24px;">${close:,.0f}</span></p>
+
+<h3>📈 技术指标现状</h3>
+<table>
+  <tr>
+    <th>指标</th>
+    <th>当前值</th>
+    <th>说明</th>
+  </tr>
+  <tr>
+    <td><strong>WT1</strong></td>
+    <td>{wt1:.1f}</td>
+    <td>{wt1_zone}</td>
+  </tr>
+  <tr>
+    <td><strong>WT2</strong></td>
+    <td>{wt2:.1f}</td>
+    <td>{wt2_zone}</td>
+  </tr>
+  <tr>
+    <td><strong>WT交叉</strong></td>
+    <td style="color: {cross_color}; font-weight: bold;">{cross_text}</td>
+    <td>WT1({wt1:.1f}) {cross_op} WT2({wt2:.1f})</td>
+  </tr>
+  <tr>
+    <td><strong>ADX</strong></td>
+    <td>{adx:.1f}</td>
+    <td>{adx_text}</td>
+  </tr>
+  <tr>
+    <td><strong>价格 vs MA14</strong></td>
+    <td style="color: {ma_color}; font-weight: bold;">{ma_text}</td>
+    <td>${close:,.0f} / ${ma14:,.0f}</td>
+  </tr>
+  <tr>
+    <td><strong>SQZMOM</strong></td>
+    <td style="color: {sqz_color}; font-weight: bold;">{sqz_text}</td>
+    <td>{sqz_advice}</td>
+  </tr>
+  <tr>
+    <td><strong>挤压动能值</strong></td>
+    <td style="color: {sqz_val_color}; font-weight: bold;">{sqz_val:+.1f}</td>
+    <td>动能增强</td>
+  </tr>
+  <tr>
+    <td><strong>挤压动能柱</strong></td>
+    <td style="color: {bar_color}; font-weight: bold;">{bar_text}</td>
+    <td>动能向上</td>
+  </tr>
+</table>
+{positions}
+<h3>🎯 今天能买第几仓？</h3>
+{entry_table}
+<p style="color: #666;">近{n_bars}天入场条件命中：</p>
+<table>
+  <tr><th>仓位</th><th>全部满足</th><th>最少命中的子条件</th></tr>
+  {hit_rows}
+</table>
+
+{golden_note}
+{death_note}
+
+<h3>📊 最近5天走势</h3>
+<table>
+  <tr>
+    <th>日期</th>
+    <th>价格</th>
+    <th>WT状态</th>
+    <th>ADX</th>
+    <th>vs MA14</th>
+  </tr>
+""")
+
+NO_POSITIONS = """
+<h3>🔴 当前持仓状态</h3>
+<div class="alert">
+  <p style="font-size: 16px; font-weight: bold;">⚠️ 当前没有任何持仓！</p>
+</div>
+"""
+
+POSITIONS_HEAD = Template("""
+<h3>🟢 当前持仓状态（{count}仓）</h3>
+<table>
+  <tr>
+    <th>仓位</th>
+    <th>入场日期</th>
+    <th>入场价</th>
+    <th>当前盈亏</th>
+    <th>止损价</th>
+    <th>ATR追踪线</th>
+    <th>已止盈50%</th>
+    <th>剩余</th>
+  </tr>
+""")
+
+POSITION_ROW = Template("""
+  <tr>
+    <td><strong>第{level}仓</strong></td>
+    <td>{date}</td>
+    <td>${entry_price:,.0f}</td>
+    <td style="color: {pnl_color}; font-weight: bold;">{pnl_pct:+.1f}%</td>
+    <td>${stop_loss:,.0f}</td>
+    <td>{trail_stop}</td>
+    <td>{partial_sold}</td>
+    <td>{remaining_pct:.0f}%</td>
+  </tr>
+""")
+
+_ENTRY_CELL = '<td style="font-size: 18px; font-weight: bold; color: {color};">{text}</td>'
+ENTRY_TABLE = Template("""<table>
+  <tr style="background-color: #fff3cd;">
+    <th>仓位</th>
+    <th>条件</th>
+    <th>动态红杆</th>
+    <th>能买吗？</th>
+  </tr>
+  <tr>
+    <td><strong>第1仓(15%)</strong></td>
+    <td>WT1&lt;-25 且 金叉</td>
+    <td style="font-size: 16px; color: #ff9800;"><strong>1.8倍</strong></td>
+    """ + _ENTRY_CELL.replace('color}', 'color1}').replace('text}', 'text1}') + """
+  </tr>
+  <tr>
+    <td><strong>第2仓(25%)</strong></td>
+    <td>需要第1仓 + 挤压释放 + 动能增强 + WT1>WT2</td>
+    <td style="font-size: 16px; color: #ff9800;"><strong>2.1倍</strong></td>
+    """ + _ENTRY_CELL.replace('color}', 'color2}').replace('text}', 'text2}') + """
+  </tr>
+  <tr>
+    <td><strong>第3仓(30%)</strong></td>
+    <td>需要第2仓 + 挤压释放 + 动能增强 + WT1>WT2 + 突破MA14</td>
+    <td style="font-size: 16px; color: #ff9800;"><strong>2.3倍</strong></td>
+    """ + _ENTRY_CELL.replace('color}', 'color3}').replace('text}', 'text3}') + """
+  </tr>
+  <tr>
+    <td><strong>第4仓(30%)</strong></td>
+    <td>需要第3仓 + 挤压释放 + 动能增强 + WT1>WT2 + 突破MA14 + ADX上升</td>
+    <td style="font-size: 16px; color: #ff9800;"><strong>2.5倍</strong></td>
+    """ + _ENTRY_CELL.replace('color}', 'color4}').replace('text}', 'text4}') + """
+  </tr>
+</table>
+""")
+
+HIT_ROW = Template("<tr><td>第{level}仓</td><td>{hits}次</td><td>{condition}（{min_hits}次）</td></tr>")
+
+RECENT_ROW = Template("""
+  <tr>
+    <td>{date}</td>
+    <td>${close:,.0f}</td>
+    <td style="color: {wt_color};">{wt_status}</td>
+    <td>{adx:.1f}</td>
+    <td style="color: {ma_color};">{ma_status}</td>
+  </tr>
+""")
+
+WT_HISTORY_HEAD = """
+</table>
+
+<h3>📊 WT1历史数据</h3>
+<table>
+  <tr>
+    <th>日期</th>
+    <th>WT1值</th>
+    <th>WT2值</th>
+    <th>状态</th>
+  </tr>
+"""
+
+WT_ROW = Template("""
+  <tr>
+    <td>{date_label}</td>
+    <td>{wt1:.1f}</td>
+    <td>{wt2:.1f}</td>
+    <td style="color: {wt_color}; font-weight: bold;">{wt_status}</td>
+  </tr>
+""")
+
+SQZ_HISTORY_HEAD = """
+</table>
+
+<h3>📊 动能值历史数据</h3>
+<table>
+  <tr>
+    <th>日期</th>
+    <th>动能值</th>
+    <th>动能柱颜色</th>
+    <th>挤压状态</th>
+    <th>变化</th>
+    <th>说明</th>
+  </tr>
+"""
+
+SQZ_ROW = Template("""
+  <tr>
+    <td>{date_label}</td>
+    <td>{sqz_val_str}</td>
+    <td style="color: {color_code}; font-weight: bold;">{color_name}</td>
+    <td>{sqz_status}</td>
+    <td>{change_str}</td>
+    <td>{explanation}</td>
+  </tr>
+""")
+
+SELL_SIGNALS_HEAD = """
+</table>
+
+<h3>📊 卖出信号实时判断</h3>
+<table>
+  <tr>
+    <th>卖出信号</th>
+    <th>当前值</th>
+    <th>触发条件</th>
+    <th>状态</th>
+  </tr>
+"""
+
+SELL_SIGNAL_ROW = Template("""
+  <tr>
+    <td><strong>{name}</strong></td>
+    <td>{value}</td>
+    <td>{trigger}</td>
+    <td style="color: {color}; font-weight: bold;">{status}</td>
+  </tr>
+""")
+
+# 卖出条件表（无持仓时内容固定）
+SELL_RULES = """
+<h3>💰 卖出条件（实时判断）</h3>
+<table>
+  <tr>
+    <th>什么时候卖</th>
+    <th>卖多少</th>
+    <th>当前状态</th>
+    <th>判断结果</th>
+  </tr>
+  <tr>
+    <td>涨10% + 1个信号</td>
+    <td style="color: #ff9800; font-weight: bold;">卖30%</td>
+    <td>WT死叉✗/ADX&lt;20✗/跌破MA14✗/挤压开启✗</td>
+    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
+  </tr>
+  <tr>
+    <td>涨10% + 2个信号</td>
+    <td style="color: #ff9800; font-weight: bold;">再卖20%</td>
+    <td>需要2个信号同时出现</td>
+    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
+  </tr>
+  <tr>
+    <td>涨40%</td>
+    <td style="color: #ff9800; font-weight: bold;">卖50%</td>
+    <td>防止高位回落</td>
+    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
+  </tr>
+  <tr>
+    <td>涨50%</td>
+    <td style="color: #ff9800; font-weight: bold;">卖80-90%</td>
+    <td>超高位止盈</td>
+    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
+  </tr>
+  <tr>
+    <td>跌破ATR追踪线</td>
+    <td style="color: #ff9800; font-weight: bold;">全卖</td>
+    <td>ATR追踪止盈</td>
+    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
+  </tr>
+  <tr>
+    <td>亏损10%</td>
+    <td style="color: red; font-weight: bold;">止损</td>
+    <td>风险控制</td>
+    <td style="color: red; font-weight: bold;">不满足（无持仓）</td>
+  </tr>
+</table>
+"""
+
+# 有持仓时各仓的止损/追踪线/止盈状态见持仓明细
+SELL_RULES_HELD = SELL_RULES.replace('不满足（无持仓）', '见持仓明细')
+
+ATR_TABLE = Template("""
+<h3>📊 ATR追踪计算</h3>
+<table>
+  <tr>
+    <th>项目</th>
+    <th>数值</th>
+    <th>说明</th>
+  </tr>
+  <tr>
+    <td><strong>当前价格</strong></td>
+    <td>{close:,.0f}美元</td>
+    <td>BTC当前价格</td>
+  </tr>
+  <tr>
+    <td><strong>14日ATR</strong></td>
+    <td>{atr:,.0f}美元</td>
+    <td>平均真实波幅</td>
+  </tr>
+  <tr>
+    <td><strong>动态倍数</strong></td>
+    <td style="font-size: 16px; color: #ff9800;"><strong>{atr_mult:.1f}倍</strong></td>
+    <td>根据市场条件调整</td>
+  </tr>
+  <tr>
+    <td><strong>ATR追踪线</strong></td>
+    <td>{atr_trail:,.0f}美元</td>
+    <td>{close:,.0f} - ({atr:,.0f} × {atr_mult:.1f})</td>
+  </tr>
+  <tr>
+    <td><strong>追踪距离</strong></td>
+    <td>{atr_distance:,.0f}美元 ({atr_distance_pct:.1f}%)</td>
+    <td>当前价格到追踪线的距离</td>
+  </tr>
+</table>
+""")
+
+STRATEGY_TABLE = Template("""
+<h3>📈 策略持仓账本（自{start}起逐日推进）</h3>
+<table>
+  <tr>
+    <th>指标</th>
+    <th>数值</th>
+    <th>说明</th>
+  </tr>
+  <tr>
+    <td><strong>总收益率</strong></td>
+    <td style="color: {return_color}; font-size: 18px;">{total_return:.1f}%</td>
+    <td>自{start}起策略表现</td>
+  </tr>
+  <tr>
+    <td><strong>交易次数</strong></td>
+    <td>{trades_count}</td>
+    <td>信号触发次数</td>
+  </tr>
+  <tr>
+    <td><strong>当前持仓</strong></td>
+    <td>{current_positions}</td>
+    <td>活跃仓位数量</td>
+  </tr>
+  <tr>
+    <td><strong>账户价值</strong></td>
+    <td>${total_value:,.0f}</td>
+    <td>当前总价值</td>
+  </tr>
+  <tr>
+    <td><strong>当前杠杆</strong></td>
+    <td style="color: {leverage_color}; font-size: 18px; font-weight: bold;">{leverage_text}</td>
+    <td>{leverage_note}</td>
+  </tr>
+</table>
+""")
+
+REPORT_FOOTER = """
+<p><strong>历史回测收益率：+73.56%</strong>（2024-2025年）</p>
+<p style="color: #666; font-size: 12px;">本邮件由BTC技术指标监控系统自动发送</p>
+
+<h3>🎯 今日操作建议</h3>
+"""
+
+ENTRY_CARD_HEAD = Template("""
+<div style="background-color: white; padding: 15px; margin: 10px 0; border: 2px solid #ff9800;">
+  <h4>{name}</h4>
+  <p><strong>当前价格：</strong><span style="color: #2196F3; font-size: 18px;">${price:,.0f}</span></p>
+  
+  <p><strong>✅ 满足条件：</strong></p>
+  <ul>
+""")
+
+ENTRY_CARD_TAIL = Template("""
+  </ul>
+  
+  <p><strong>💰 怎么操作：</strong></p>
+  <table>
+    <tr>
+      <th>项目</th>
+      <th>详情</th>
+    </tr>
+    <tr>
+      <td>仓位</td>
+      <td>第{level}仓 - 用{position_pct}%的资金</td>
+    </tr>
+    <tr>
+      <td>资金量</td>
+      <td>${position_amount:,} (假设10万本金)</td>
+    </tr>
+    <tr>
+      <td>入场价</td>
+      <td>${price:,.0f} 附近</td>
+    </tr>
+    <tr>
+      <td>止损位</td>
+      <td>${stop_loss:,.0f} (-15%)</td>
+    </tr>
+    <tr>
+      <td>止盈策略</td>
+      <td>{take_profit}</td>
+    </tr>
+  </table>
+  
+  <p style="color: {note_color}; font-weight: bold;">
+    {note}
+  </p>
+</div>
+""")
+
+EXIT_CARD_HEAD = Template("""
+<div class="danger">
+  <h3>⚠️ 检测到{count}个卖出信号！</h3>
+  <p><strong>触发的信号：</strong></p>
+  <ul>
+""")
+
+EXIT_CARD_TAIL = """
+  </ul>
+  
+  <p><strong>💡 建议操作：</strong></p>
+  <ol>
+    <li>先卖50%仓位，锁定利润</li>
+    <li>剩下50%继续持有，等ATR信号</li>
+    <li>如果有3-4个卖出信号，考虑全部清仓</li>
+  </ol>
+</div>
+"""
+
+STRATEGY_LEGEND = """
+<hr>
+<h3>📋 策略说明</h3>
+<table>
+  <tr>
+    <th>仓位</th>
+    <th>资金</th>
+    <th>入场条件</th>
+    <th>止盈方式</th>
+  </tr>
+  <tr>
+    <td>第1仓</td>
+    <td>15%</td>
+    <td>WT金叉抄底</td>
+    <td>ATR追踪</td>
+  </tr>
+  <tr>
+    <td>第2仓</td>
+    <td>25%</td>
+    <td>动能确认</td>
+    <td>主动+ATR</td>
+  </tr>
+  <tr>
+    <td>第3仓</td>
+    <td>30%</td>
+    <td>突破MA14</td>
+    <td>主动+ATR</td>
+  </tr>
+  <tr>
+    <td>第4仓</td>
+    <td>30%</td>
+    <td>ADX趋势加强</td>
+    <td>主动+ATR</td>
+  </tr>
+</table>
+"""
+
+LIST_ITEM = Template('    <li>{text}</li>\n')
+
+
+def _entry_table(row, entry_ok):
+    values = {}
+    for level in (1, 2, 3, 4):
+        values[f'color{level}'] = 'green' if entry_ok[level] else 'red'
+        if entry_ok[level]:
+            values[f'text{level}'] = '✅ 可以买！'
+        elif level == 1:
+            values['text1'] = f"❌ 不满足 (WT1={row['wt1']:.1f}，需要<-25)"
+        else:
+            values[f'text{level}'] = f'❌ 不满足（需要先有第{level - 1}仓）'
+    # 大多数日子四仓都不满足，只有第1仓文本随WT1变化，缓存命中率高
+    return ENTRY_TABLE.render_cached(**values)
+
+
+def _sqz_cells(r, prev):
+    """动能值历史表的一行（r / prev 为当日 / 前一日的指标行，prev 为None表示窗口第一行）"""
+    sqz_val = r.get('sqz_val', 0)
+    if pd.isna(sqz_val) or sqz_val == 0:
+        sqz_val = 0
+    sqz_val_str = f"{sqz_val / 1000:+.1f}k" if abs(sqz_val) > 1000 else f"{sqz_val:+.1f}"
+
+    if r.get('sqz_on'):
+        color_name, color_code = "灰色", "gray"
+    elif r.get('is_lime'):
+        color_name, color_code = "绿色", "#00ff00"
+    elif r.get('is_green'):
+        color_name, color_code = "绿灰", "#90EE90"
+    elif r.get('is_red'):
+        color_name, color_code = "红色", "red"
+    elif r.get('is_maroon'):
+        color_name, color_code = "红灰", "#FFB6C1"
+    else:
+        color_name, color_code = "灰色", "gray"
+
+    if prev is not None:
+        prev_val = prev.get('sqz_val', 0)
+        if pd.isna(prev_val):
+            prev_val = 0
+        change_str = f"{sqz_val - prev_val:+.1f}"
+    else:
+        change_str = "+0.0"
+
+    if sqz_val > 0 and r.get('sqz_off'):
+        explanation = "动能增强，可以做多"
+    elif sqz_val > 0:
+        explanation = "动能一般，等待释放"
+    else:
+        explanation = "动能弱，观望"
+    return {'sqz_val_str': sqz_val_str, 'color_code': color_code, 'color_name': color_name,
+            'sqz_status': "释放" if r.get('sqz_off') else "挤压中" if r.get('sqz_on') else "无",
+            'change_str': change_str, 'explanation': explanation}
+
+
+def render_entry_cards(entry_signals):
+    if not entry_signals:
+        return '<p>暂无买入信号，继续观望</p>'
+    html = '<div class="alert"><h3>🚨 检测到买入信号！</h3>'
+    for s in entry_signals:
+        level = s['level']
+        html += ENTRY_CARD_HEAD.render(name=s['name'], price=s['price'])
+        html += ''.join(LIST_ITEM.render(text=cond) for cond in s['conditions'])
+        html += ENTRY_CARD_TAIL.render(
+            level=level, position_pct=[15, 25, 30, 30][level - 1], position_amount=[15000, 25000, 30000, 30000][level - 1],
+            price=s['price'], stop_loss=s['price'] * 0.85,
+            take_profit="持有，等ATR信号" if level == 1 else "涨10%后如果出现2个卖出信号，先卖一半",
+            note_color='red' if level > 1 else 'green',
+            note=f'⚠️ 注意：要先有第{level - 1}仓，才能买第{level}仓！' if level > 1 else '✅ 第1仓可以直接买')
+    return html + '</div>'
+
+
+def render_exit_card(exit_signal):
+    if not exit_signal.get('has_signal'):
+        return '<div class="success"><p>✅ 无卖出信号，继续持有</p></div>'
+    return (EXIT_CARD_HEAD.render(count=exit_signal['signal_count'])
+            + ''.join(LIST_ITEM.render(text=sig) for sig in exit_signal['signals'])
+            + EXIT_CARD_TAIL)
+
+
+def render_positions(positions, price):
+    """持仓状态段：持仓账本中的多头仓位按最新价格估算盈亏（无持仓时为"当前没有任何持仓"）"""
+    if not positions:
+        return NO_POSITIONS
+    rows = []
+    for pos in positions:
+        pnl_pct = (price - pos['entry_price']) / pos['entry_price'] * 100
+        trail = pos.get('trail_stop_price')
+        rows.append(POSITION_ROW.render(
+            level=pos['position_level'], date=pd.Timestamp(pos['date']).strftime('%Y-%m-%d'),
+            entry_price=pos['entry_price'], pnl_color='green' if pnl_pct > 0 else 'red', pnl_pct=pnl_pct,
+            stop_loss=pos['stop_loss_price'], trail_stop=f"${trail:,.0f}" if trail is not None else '—',
+            partial_sold='是' if pos.get('partial_sold') else '否',
+            remaining_pct=pos.get('remaining_shares', pos['shares']) / pos['shares'] * 100))
+    return POSITIONS_HEAD.render(count=len(positions)) + ''.join(rows) + '</table>\n'
+
+
+def render_daily_report(row, recent_rows, entry_ok, hit_rows, n_bars, strategy_results,
+                        entry_signals, exit_signal, atr_mult, positions=()):
+    """
+    每日报告HTML
+
+    Args:
+        row: 最新一根K线的指标行（dict 或 Series）
+        recent_rows: 最近7根K线的指标行列表（按日期升序，最后一根为 row）
+        entry_ok: {仓位: 是否满足}（MONITOR_ENTRY_RULES.check）
+        hit_rows: [(仓位, 全部满足次数, 最少命中的子条件, 其命中次数), ...]
+        n_bars: 命中统计覆盖的K线数
+        strategy_results: 持仓账本摘要（total_return / trades_count / current_positions / total_value /
+                          exposure / start）
+        positions: 持仓账本中的多头仓位（为空时显示"当前没有任何持仓"）
+    """
+    recent_5 = recent_rows[-5:]
+    golden = [r['date'].strftime('%m-%d') for r in recent_5 if r.get('wt_golden_cross', False)]
+    death = [r['date'].strftime('%m-%d') for r in recent_5 if r.get('wt_death_cross', False)]
+    wt1, wt2, close, ma14 = row['wt1'], row['wt2'], row['close'], row['ma14']
+    sqz_val = row.get('sqz_val', 0)
+
+    parts = [DAILY_HEAD.render(
+        date_cn=row['date'].strftime('%Y年%m月%d日'), close=close, wt1=wt1, wt2=wt2,
+        wt1_zone='超卖区' if wt1 < -30 else '中性区' if wt1 < 0 else '超买区',
+        wt2_zone='中性区' if wt2 < 0 else '超买区',
+        cross_color='green' if wt1 > wt2 else 'red', cross_text='金叉' if wt1 > wt2 else '死叉',
+        cross_op='>' if wt1 > wt2 else '<',
+        adx=row['adx'], adx_text='强趋势' if row['adx'] > 25 else '中等趋势' if row['adx'] > 20 else '弱趋势',
+        ma_color='green' if close > ma14 else 'red', ma_text='在上方' if close > ma14 else '在下方', ma14=ma14,
+        sqz_color='green' if row['sqz_off'] else 'red' if row['sqz_on'] else 'gray',
+        sqz_text='释放' if row['sqz_off'] else '挤压' if row['sqz_on'] else '无',
+        sqz_advice='可以做多' if row['sqz_off'] else '观望' if row['sqz_on'] else '无信号',
+        sqz_val_color='green' if sqz_val > 0 else 'red', sqz_val=sqz_val,
+        bar_color='#00ff00' if row.get('is_lime') else 'green' if row.get('is_green') else 'red' if row.get('is_red') else 'maroon',
+        bar_text='强多柱(青绿)' if row.get('is_lime') else '弱多柱(深绿)' if row.get('is_green') else '强空柱(红色)' if row.get('is_red') else '弱空柱(暗红)',
+        positions=render_positions(positions, row['close']), entry_table=_entry_table(row, entry_ok), n_bars=n_bars,
+        hit_rows=''.join(HIT_ROW.render(level=level, hits=hits, condition=condition, min_hits=min_hits)
+                         for level, hits, condition, min_hits in hit_rows),
+        golden_note=f'<p style="color: green;">🔔 近5天出现过金叉：{", ".join(golden)}</p>' if golden else '',
+        death_note=f'<p style="color: red;">⚠️ 近5天出现过死叉：{", ".join(death)}</p>' if death else '')]
+
+    for r in recent_5:
+        parts.append(RECENT_ROW.render(
+            date=r['date'].strftime('%m-%d'), close=r['close'], adx=r['adx'],
+            wt_color='green' if r['wt1'] > r['wt2'] else 'red', wt_status='金叉' if r['wt1'] > r['wt2'] else '死叉',
+            ma_color='green' if r['close'] > r['ma14'] else 'red', ma_status='上方' if r['close'] > r['ma14'] else '下方'))
+
+    labels = []
+    for r in recent_rows:
+        days_ago = (row['date'] - r['date']).days
+        labels.append(f"{r['date'].strftime('%Y-%m-%d')} ({'今天' if days_ago == 0 else f'{days_ago}天前'})")
+
+    parts.append(WT_HISTORY_HEAD)
+    for label, r in zip(labels, recent_rows):
+        parts.append(WT_ROW.render(
+            date_label=label, wt1=r['wt1'], wt2=r['wt2'], wt_color='green' if r['wt1'] > r['wt2'] else 'red',
+            wt_status='金叉' if r['wt1'] > r['wt2'] else '死叉' if r['wt1'] < r['wt2'] else '无交叉'))
+
+    parts.append(SQZ_HISTORY_HEAD)
+    for i, (label, r) in enumerate(zip(labels, recent_rows)):
+        parts.append(SQZ_ROW.render(date_label=label, **_sqz_cells(r, recent_rows[i - 1] if i > 0 else None)))
+
+    # 卖出信号实时判断（ADX行的"未触发"文本沿用原报告）
+    atr_val = row.get('atr', 0)
+    atr_trail = close - atr_val * atr_mult
+    atr_distance = close - atr_trail
+    sqz_state_text = "释放" if row.get('sqz_off') else "挤压中" if row.get('sqz_on') else "无"
+    parts += [
+        SELL_SIGNALS_HEAD,
+        SELL_SIGNAL_ROW.render(name='WT死叉', value=f"WT1({wt1:.1f}) {'>' if wt1 > wt2 else '<'} WT2({wt2:.1f})",
+                               trigger='WT1 &lt; WT2', color='green' if wt1 > wt2 else 'red',
+                               status="未触发 (金叉状态)" if wt1 > wt2 else "已触发"),
+        SELL_SIGNAL_ROW.render(name='ADX下降', value=f"{row['adx']:.1f}", trigger='ADX &lt; 20',
+                               color='green' if row['adx'] >= 20 else 'red',
+                               status="未触发 (22.3 > 20)" if row['adx'] >= 20 else "已触发"),
+        SELL_SIGNAL_ROW.render(name='跌破MA14', value=f"{close:,.0f} > {ma14:,.0f}", trigger='价格 &lt; MA14',
+                               color='green' if close > ma14 else 'red',
+                               status="未触发 (价格在上方)" if close > ma14 else "已触发"),
+        SELL_SIGNAL_ROW.render(name='挤压开启', value=sqz_state_text, trigger='挤压状态 = 挤压中',
+                               color='green' if row.get('sqz_off') else 'red',
+                               status="未触发 (当前释放)" if row.get('sqz_off') else "已触发" if row.get('sqz_on') else "未触发"),
+        SELL_SIGNAL_ROW.render(name='ATR追踪', value=f"{atr_trail:,.0f}", trigger='价格 &lt; ATR追踪线', color='green',
+                               status=f"未触发 ({close:,.0f} > {atr_trail:,.0f})"),
+        '</table>\n',
+        SELL_RULES_HELD if positions else SELL_RULES,
+        ATR_TABLE.render(close=close, atr=atr_val, atr_mult=atr_mult, atr_trail=atr_trail, atr_distance=atr_distance,
+                         atr_distance_pct=atr_distance / close * 100),
+        STRATEGY_TABLE.render(return_color='green' if strategy_results['total_return'] > 0 else 'red',
+                              leverage_color='#ff9800' if positions else 'red',
+                              leverage_text=f"{strategy_results['exposure']:.2f}倍" if positions else '0倍',
+                              leverage_note='持仓市值 / 账户价值' if positions else '无持仓，无杠杆',
+                              **{key: strategy_results[key] for key in
+                                 ('start', 'total_return', 'trades_count', 'current_positions', 'total_value')}),
+        REPORT_FOOTER,
+        render_entry_cards(entry_signals),
+        render_exit_card(exit_signal),
+        STRATEGY_LEGEND,
+    ]
+    return ''.join(parts)
+
+
+# ============ 提醒邮件 ============
+
+ENTRY_ALERT_HEAD = Template("""
+<div style="background-color: #4CAF50; padding: 20px; text-align: center;">
+  <h1 style="color: white;">🚨 {symbol}买入机会！</h1>
+</div>
+
+<h2>{name}</h2>
+<p><strong>日期：</strong>{date}</p>
+<p><strong>当前价格：</strong><span style="color: #2196F3; font-size: 24px;">${price:,.0f}</span></p>
+
+<h3>✅ 满足条件</h3>
+<ul>
+""")
+
+ENTRY_ALERT_TAIL = Template("""
+</ul>
+
+<h3>💰 操作指南（第{level}仓）</h3>
+<table>
+  <tr>
+    <th>项目</th>
+    <th>详情</th>
+  </tr>
+  <tr>
+    <td>仓位比例</td>
+    <td style="font-size: 18px; color: #f44336;"><strong>{position_pct:.0f}%</strong></td>
+  </tr>
+  <tr>
+    <td>资金量</td>
+    <td>${example_amount:,} (假设10万本金)</td>
+  </tr>
+  <tr>
+    <td>入场价</td>
+    <td>${price:,.0f}</td>
+  </tr>
+  <tr>
+    <td>止损位</td>
+    <td>${stop_loss:,.0f} (-15%)</td>
+  </tr>
+  <tr>
+    <td>止盈策略</td>
+    <td>{take_profit}</td>
+  </tr>
+</table>
+
+<h3>📝 操作步骤</h3>
+<ol>
+  <li>用<strong>${example_amount:,}</strong>在<strong>${price:,.0f}</strong>附近买入</li>
+  <li>设置止损单<strong>${stop_loss:,.0f}</strong></li>
+  <li>{step3}</li>
+</ol>
+{level_note}""")
+
+# 仓位等级说明段（只取决于等级，跨品种/跨提醒缓存）
+LEVEL_NOTE = Template("""
+<p style="color: {color}; font-weight: bold; font-size: 16px;">
+  {note}
+</p>
+""")
+
+ALERT_LIST_ITEM = Template('  <li>{text}</li>\n')
+EXIT_LIST_ITEM = Template('  <li><strong>{text}</strong></li>\n')
+
+EXIT_ALERT_HEAD = Template("""
+<div style="background-color: #f44336; padding: 20px; text-align: center;">
+  <h1 style="color: white;">⚠️ {symbol}卖出信号！</h1>
+</div>
+
+<h2>检测到{count}个出场指标</h2>
+<p><strong>日期：</strong>{date}</p>
+<p><strong>当前价格：</strong><span style="color: #f44336; font-size: 24px;">${price:,.0f}</span></p>
+<p><strong>紧急程度：</strong><span style="color: red; font-size: 18px;">{urgency}</span></p>
+
+<h3>⚠️ 触发的信号</h3>
+<ul>
+""")
+
+EXIT_ALERT_TAIL = Template("""
+</ul>
+
+<div class="danger">
+  <h3>💰 操作建议</h3>
+  <p>如果您有持仓，建议这样操作：</p>
+  
+  <table>
+    <tr>
+      <th>步骤</th>
+      <th>操作</th>
+    </tr>
+    <tr>
+      <td>步骤1</td>
+      <td>先卖50%仓位，在${price:,.0f}附近卖出，锁定一半利润</td>
+    </tr>
+    <tr>
+      <td>步骤2</td>
+      <td>剩余50%继续持有，用ATR追踪止盈</td>
+    </tr>
+    <tr>
+      <td>步骤3</td>
+      <td>如果信号增加到3-4个，考虑全部清仓</td>
+    </tr>
+  </table>
+</div>
+
+<p style="color: #666; margin-top: 20px;">⚠️ 请及时查看TradingView确认信号后再操作</p>
+""")
+
+PROVISIONAL_ALERT_HEAD = Template("""
+<div style="background-color: #ff9800; padding: 20px; text-align: center;">
+  <h1 style="color: white;">⏳ BTC盘中预警（K线未收盘）</h1>
+</div>
+
+<p><strong>K线日期：</strong>{bar_date}</p>
+<p><strong>试算时间：</strong>{now} UTC</p>
+<p><strong>当前价格：</strong><span style="color: #ff9800; font-size: 24px;">${close:,.0f}</span></p>
+
+<h3>📋 预备信号</h3>
+<ul>
+""")
+
+PROVISIONAL_ALERT_TAIL = Template("""
+</ul>
+
+<table>
+  <tr><th>指标</th><th>试算值</th></tr>
+  <tr><td>WT1 / WT2</td><td>{wt1:.1f} / {wt2:.1f}</td></tr>
+  <tr><td>ADX</td><td>{adx:.1f}</td></tr>
+  <tr><td>MA14</td><td>${ma14:,.0f}</td></tr>
+  <tr><td>挤压状态</td><td>{sqz_text}</td></tr>
+</table>
+
+<p style="color: #666; margin-top: 20px;">⚠️ 信号基于未收盘K线，收盘时可能消失；以收盘后的日报为准</p>
+""")
+
+
+def render_entry_alert(signal, date, symbol='BTC'):
+    level = signal['level']
+    position_pct = [0.15, 0.25, 0.30, 0.30][level - 1]
+    example_amount = 100000 * position_pct
+    stop_loss = signal['price'] * 0.85
+    return (ENTRY_ALERT_HEAD.render(symbol=symbol, name=signal['name'], date=date, price=signal['price'])
+            + ''.join(ALERT_LIST_ITEM.render(text=cond) for cond in signal['conditions'])
+            + ENTRY_ALERT_TAIL.render(
+                level=level, position_pct=position_pct * 100, example_amount=example_amount, price=signal['price'],
+                stop_loss=stop_loss, take_profit="ATR追踪" if level == 1 else "涨10%+2个卖出信号→卖50%",
+                step3="等ATR信号止盈" if level == 1 else "涨10%后看卖出信号",
+                level_note=LEVEL_NOTE.render_cached(
+                    color='red' if level > 1 else 'green',
+                    note=f'⚠️ 注意：需要先有第{level - 1}仓！' if level > 1 else '✅ 第1仓可直接买')))
+
+
+def render_exit_alert(signal, date, symbol='BTC'):
+    return (EXIT_ALERT_HEAD.render(symbol=symbol, count=signal['signal_count'], date=date, price=signal['price'],
+                                   urgency='🚨🚨 非常高' if signal['signal_count'] >= 3 else '🚨 高')
+            + ''.join(EXIT_LIST_ITEM.render(text=sig) for sig in signal['signals'])
+            + EXIT_ALERT_TAIL.render(price=signal['price']))
+
+
+def render_provisional_alert(row, signals, now):
+    return (PROVISIONAL_ALERT_HEAD.render(bar_date=pd.Timestamp(row['date']).strftime('%Y-%m-%d'),
+                                          now=pd.Timestamp(now).strftime('%Y-%m-%d %H:%M'), close=row['close'])
+            + ''.join(EXIT_LIST_ITEM.render(text=name) for name in signals.values())
+            + PROVISIONAL_ALERT_TAIL.render(wt1=row['wt1'], wt2=row['wt2'], adx=row['adx'], ma14=row['ma14'],
+                                            sqz_text='开启' if row['sqz_on'] else '释放' if row['sqz_off'] else '无'))
+
+
+
+# ============ 观察列表日报 ============
+
+WATCHLIST_HEAD = Template("""
+<h2>📊 观察列表日报 - {date_cn}</h2>
+<p><strong>品种数：</strong>{count}　<strong>入场信号：</strong>{entry_count}　<strong>出场信号：</strong>{exit_count}</p>
+
+<table>
+  <tr>
+    <th>品种</th>
+    <th>价格</th>
+    <th>WT1 / WT2</th>
+    <th>ADX</th>
+    <th>MA14</th>
+    <th>SQZMOM</th>
+    <th>入场</th>
+    <th>出场</th>
+  </tr>""")
+
+WATCHLIST_ROW = Template("""
+  <tr>
+    <td><strong>{symbol}</strong></td>
+    <td>{close:,.4g}</td>
+    <td style="color: {wt_color};">{wt1:.1f} / {wt2:.1f}</td>
+    <td>{adx:.1f}</td>
+    <td style="color: {ma_color};">{ma_text}</td>
+    <td>{sqz_text}</td>
+    <td style="color: {entry_color}; font-weight: bold;">{entry_text}</td>
+    <td style="color: {exit_color}; font-weight: bold;">{exit_text}</td>
+  </tr>""")
+
+WATCHLIST_MISSING = Template('<p style="color: red;">⚠️ 获取失败：{symbols}</p>')
+
+WATCHLIST_TAIL = Template("""
+</table>
+{missing}
+<p style="color: #666; margin-top: 20px;">⚠️ 入场信号只按当日指标判断，第2-4仓需要已有前一仓</p>
+""")
+
+
+def render_watchlist_report(table, results, missing=()):
+    """
+    观察列表汇总日报（有信号的品种排在前面）
+
+    Args:
+        table: 各品种最新一根K线的指标表（index 为品种）
+        results: {品种: (入场信号列表, 出场信号)}
+        missing: 获取失败的品种
+    """
+    def priority(symbol):
+        entry_signals, exit_signal = results[symbol]
+        return (-len(entry_signals), -exit_signal.get('signal_count', 0), symbol)
+
+    rows = []
+    for symbol in sorted(table.index, key=priority):
+        row = table.loc[symbol]
+        entry_signals, exit_signal = results[symbol]
+        has_exit = exit_signal.get('has_signal')
+        above = row['close'] > row['ma14']
+        rows.append(WATCHLIST_ROW.render(
+            symbol=symbol, close=row['close'], wt_color='green' if row['wt1'] > row['wt2'] else 'red',
+            wt1=row['wt1'], wt2=row['wt2'], adx=row['adx'],
+            ma_color='green' if above else 'red', ma_text='上方' if above else '下方',
+            sqz_text='释放' if row['sqz_off'] else '挤压' if row['sqz_on'] else '无',
+            entry_color='green' if entry_signals else '#666',
+            entry_text='、'.join(f"第{s['level']}仓" for s in entry_signals) or '-',
+            exit_color='red' if has_exit else '#666',
+            exit_text=f"{exit_signal['signal_count']}个指标" if has_exit else '-'))
+
+    return (WATCHLIST_HEAD.render(
+                date_cn=table['date'].max().strftime('%Y年%m月%d日'), count=len(table),
+                entry_count=sum(1 for entry_signals, _ in results.values() if entry_signals),
+                exit_count=sum(1 for _, exit_signal in results.values() if exit_signal.get('has_signal')))
+            + ''.join(rows)
+            + WATCHLIST_TAIL.render(missing=WATCHLIST_MISSING.render(symbols=", ".join(missing)) if missing else ''))
+
+
+if __name__ == "__main__":
+    import time
+    import numpy as np
+
+    print("=" * 80)
+    print("🧪 预编译模板：1份 vs 500份报告")
+    print("=" * 80)
+
+    rng = np.random.default_rng(2)
+
+    def fake_rows(n, start):
+        close = 60000 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        rows = []
+        for i in range(n):
+            rows.append({'date': start + pd.Timedelta(days=i), 'close': close[i], 'ma14': close[i] * rng.uniform(0.95, 1.05),
+                         'wt1': rng.normal(0, 40), 'wt2': rng.normal(0, 40), 'adx': rng.uniform(10, 40),
+                         'sqz_on': bool(rng.random() < 0.3), 'sqz_off': bool(rng.random() < 0.3),
+                         'sqz_val': rng.normal(0, 2000), 'is_lime': bool(rng.random() < 0.25),
+                         'is_green': bool(rng.random() < 0.25), 'is_red': bool(rng.random() < 0.25),
+                         'is_maroon': False, 'wt_golden_cross': bool(rng.random() < 0.1),
+                         'wt_death_cross': bool(rng.random() < 0.1), 'atr': close[i] * 0.03})
+        return rows
+
+    strategy = {'total_return': 3.2, 'trades_count': 2, 'current_positions': 1, 'total_value': 103200,
+                'exposure': 0.16, 'start': '2024-01-01'}
+    hit_rows = [(1, 12, 'WT1<-25', 40), (2, 5, '挤压释放', 90), (3, 3, '突破MA14', 120), (4, 1, 'ADX上升', 80)]
+    signal = {'level': 1, 'name': '第1仓买入信号', 'price': 61234.0, 'urgency': 'high',
+              'conditions': ['WT1 = -31.2 < -25 ✅', 'WT金叉 ✅']}
+    exit_signal = {'has_signal': True, 'signal_count': 3, 'price': 61234.0,
+                   'signals': ['WT死叉', 'ADX < 20', '跌破MA14'], 'urgency': 'high'}
+    reports = [fake_rows(7, pd.Timestamp('2024-01-01') + pd.Timedelta(days=k)) for k in range(500)]
+
+    for count in (1, 500):
+        t0 = time.perf_counter()
+        for rows in reports[:count]:
+            html = wrap_email(render_daily_report(rows[-1], rows, {1: False, 2: False, 3: False, 4: False}, hit_rows,
+                                                  1500, strategy, [signal], exit_signal, 2.0))
+            wrap_email(render_entry_alert(signal, '2024-05-01'))
+            wrap_email(render_exit_alert(exit_signal, '2024-05-01'))
+        elapsed = time.perf_counter() - t0
+        print(f"{count:>3} 份（日报+入场+出场提醒）: {elapsed * 1000:7.1f}ms，平均 {elapsed / count * 1e6:6.0f}µs/份，"
+              f"日报 {len(html):,} 字符")
+
+    # 对照：每次重新解析模板（相当于每次构造整段格式化字符串）
+    sources = [t.source for t in (DAILY_HEAD, ATR_TABLE, STRATEGY_TABLE, ENTRY_ALERT_TAIL, EXIT_ALERT_TAIL)]
+    values = {'date_cn': '2024年05月01日', 'close': 1.0, 'wt1': 1.0, 'wt2': 1.0, 'adx': 1.0, 'ma14': 1.0, 'sqz_val': 1.0,
+              'atr': 1.0, 'atr_mult': 2.0, 'atr_trail': 1.0, 'atr_distance': 1.0, 'atr_distance_pct': 1.0,
+              'total_return': 1.0, 'total_value': 1.0, 'position_pct': 15.0, 'example_amount': 15000.0,
+              'price': 1.0, 'stop_loss': 1.0}
+    n = 2000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for source in sources:
+            Template(source)
+    t_parse = (time.perf_counter() - t0) / n
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for template in (DAILY_HEAD, ATR_TABLE, STRATEGY_TABLE, ENTRY_ALERT_TAIL, EXIT_ALERT_TAIL):
+            template.render(**{field: values.get(field, '') for field in template.fields})
+    t_fill = (time.perf_counter() - t0) / n
+    print(f"5个主要段落：解析+编译 {t_parse * 1e6:.0f}µs（只在导入时一次） vs 填槽 {t_fill * 1e6:.0f}µs/次")
+    print(f"缓存段落：入场表 {ENTRY_TABLE._cached.cache_info().hits} 次命中，"
+          f"仓位说明 {LEVEL_NOTE._cached.cache_info().hits} 次命中")
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标模块 - 纯NumPy实现的技术指标（不依赖TA-Lib）
+
+所有函数沿最后一个轴计算，既支持单序列 (bars,)，也支持多序列 (n, bars)。
+前 period-1 根K线为NaN，与TA-Lib/TV保持一致。
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from 滚动统计模块 import rolling_moments
+
+
+def _as_float(x):
+    return np.asarray(x, dtype=np.float64)
+
+
+def _rolling(x, period, reducer):
+    """滑动窗口归约，输出与输入等长，前 period-1 个位置为NaN"""
+    x = _as_float(x)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= period:
+        out[..., period - 1:] = reducer(sliding_window_view(x, period, axis=-1), axis=-1)
+    return out
+
+
+def sma(x, period):
+    """简单移动平均 = talib.SMA"""
+    return _rolling(x, period, np.mean)
+
+
+def rolling_std(x, period, ddof=0):
+    """滚动标准差。ddof=0 = talib.STDDEV / TV ta.stdev，ddof=1 = pandas rolling().std()"""
+    return _rolling(x, period, lambda w, axis: np.std(w, axis=axis, ddof=ddof))
+
+
+def rolling_max(x, period):
+    """= talib.MAX / ta.highest"""
+    return _rolling(x, period, np.max)
+
+
+def rolling_min(x, period):
+    """= talib.MIN / ta.lowest"""
+    return _rolling(x, period, np.min)
+
+
+def shift(x, n=1, fill=np.nan):
+    """沿时间轴右移n根（x[1] 语义）"""
+    x = _as_float(x)
+    out = np.full(x.shape, fill)
+    if n < x.shape[-1]:
+        out[..., n:] = x[..., :-n]
+    return out
+
+
+def _ema_dense(rows, alpha, decay):
+    """ema 快速路径：NaN只出现在开头"""
+    denom = decay + alpha
+    out = np.empty(rows.shape)
+    weighted = rows[:, 0].copy()
+    blended = np.empty_like(weighted)
+    scratch = np.empty_like(weighted)
+    out[:, 0] = weighted
+    for t in range(1, rows.shape[1]):
+        cur = rows[:, t]
+        np.multiply(decay, weighted, out=blended)
+        np.multiply(alpha, cur, out=scratch)
+        blended += scratch
+        blended /= denom
+        np.copyto(weighted, blended, where=weighted != cur)
+        np.copyto(weighted, cur, where=np.isnan(weighted))
+        out[:, t] = weighted
+    return out
+
+
+def ema(x, span):
+    """
+    指数移动平均 = pandas ewm(span, adjust=False).mean()
+
+    span 可以是标量，也可以是每行一个值（多序列、多参数时沿行向量化）。
+    NaN处理与pandas一致：开头的NaN跳过，中间的NaN保持上一个值并按间隔衰减权重。
+    """
+    x = _as_float(x)
+    rows = np.atleast_2d(x)
+    alpha = 2.0 / (np.broadcast_to(_as_float(span), rows.shape[:1]) + 1.0)
+    decay = 1.0 - alpha
+
+    nan = np.isnan(rows)
+    # 只有开头NaN（常见情况）走快速路径：每步只做一次混合
+    leading = np.cumsum(~nan, axis=-1) == 0
+    if not np.any(nan & ~leading):
+        return _ema_dense(rows, alpha, decay).reshape(x.shape)
+
+    out = np.empty(rows.shape)
+    weighted = rows[:, 0].copy()
+    old_wt = np.ones(rows.shape[0])
+    out[:, 0] = weighted
+    for t in range(1, rows.shape[1]):
+        cur = rows[:, t]
+        observed = ~nan[:, t]
+        started = ~np.isnan(weighted)
+        old_wt = np.where(started, old_wt * decay, old_wt)
+        upd = started & observed
+        blended = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        weighted = np.where(upd & (weighted != cur), blended, weighted)
+        weighted = np.where(~started & observed, cur, weighted)
+        old_wt = np.where(observed, 1.0, old_wt)
+        out[:, t] = weighted
+    return out.reshape(x.shape)
+
+
+def true_range(high, low, close):
+    """TR = max(high-low, |high-close[1]|, |low-close[1]|)，第一根K线为 high-low"""
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    prev_close = shift(close)
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return tr
+
+
+def _linreg_fit(x, period):
+    """
+    每个完整窗口的 (slope, intercept)，闭式解：
+    slope = (n·Σxy - Σx·Σy) / (n·Σx² - (Σx)²)
+    """
+    idx = np.arange(period, dtype=np.float64)
+    sum_x = idx.sum()
+    sum_xx = (idx * idx).sum()
+    windows = sliding_window_view(x, period, axis=-1)
+    sum_y = windows.sum(axis=-1)
+    sum_xy = windows @ idx
+    slope = (period * sum_xy - sum_x * sum_y) / (period * sum_xx - sum_x * sum_x)
+    intercept = (sum_y - slope * sum_x) / period
+    return slope, intercept
+
+
+def linreg(x, period):
+    """
+    线性回归末端值，等同于TV的 ta.linreg(x, period, 0)
+
+    窗口内有NaN时结果为NaN。
+    """
+    x = _as_float(x)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] < period:
+        return out
+    slope, intercept = _linreg_fit(x, period)
+    out[..., period - 1:] = intercept + slope * (period - 1)
+    return out
+
+
+def linreg_slope(x, period):
+    """
+    回归斜率 × (period-1)，即窗口内拟合线的总升幅
+    （真实BTC高置信度策略.calculate_sqzmom 中 np.polyfit 版本的动能值）
+    """
+    x = _as_float(x)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] < period:
+        return out
+    slope, _ = _linreg_fit(x, period)
+    out[..., period - 1:] = slope * (period - 1)
+    return out
+
+
+def sqzmom(high, low, close, length_bb=20, mult_bb=2.0, length_kc=20, mult_kc=1.5, use_true_range=True):
+    """
+    Squeeze Momentum（LazyBear，TV Pine Script逻辑）
+
+    Returns:
+        dict: sqz_on, sqz_off, no_sqz, sqz_val, is_lime, is_green, is_red, is_maroon
+    """
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+
+    # 布林带 / 肯特纳通道：融合滚动矩（窗口相同时只算一次）
+    bb = rolling_moments(close, length_bb, high, low, use_true_range=use_true_range)
+    kc = bb if length_kc == length_bb else rolling_moments(close, length_kc, high, low,
+                                                             use_true_range=use_true_range)
+    bb_mid = bb['mean']
+    bb_upper = bb_mid + mult_bb * bb['std']
+    bb_lower = bb_mid - mult_bb * bb['std']
+
+    kc_mid = kc['mean']
+    range_ma_kc = kc['range_mean']
+    kc_upper = kc_mid + range_ma_kc * mult_kc
+    kc_lower = kc_mid - range_ma_kc * mult_kc
+
+    sqz_on = (bb_lower > kc_lower) & (bb_upper < kc_upper)
+    sqz_off = (bb_lower < kc_lower) & (bb_upper > kc_upper)
+    no_sqz = ~sqz_on & ~sqz_off
+
+    # 动能线：linreg(close - avg(avg(highest, lowest), sma(close)), lengthKC, 0)
+    avg_hl = (kc['max'] + kc['min']) / 2
+    avg_all = (avg_hl + kc_mid) / 2
+    val = linreg(close - avg_all, length_kc)
+
+    # nz(val[1])
+    val_prev = np.nan_to_num(shift(val), nan=0.0)
+    return {
+        'sqz_on': sqz_on,
+        'sqz_off': sqz_off,
+        'no_sqz': no_sqz,
+        'sqz_val': val,
+        'is_lime': (val > 0) & (val > val_prev),
+        'is_green': (val > 0) & (val < val_prev),
+        'is_red': (val < 0) & (val < val_prev),
+        'is_maroon': (val < 0) & (val > val_prev),
+    }
+
+
+def sqzmom_warmup(length_bb=20, length_kc=20):
+    """SQZMOM需要的预热K线数（avgAll窗口 + linreg窗口 + val[1]）"""
+    return max(length_bb, 2 * length_kc) + 1
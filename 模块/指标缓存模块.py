@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标缓存模块 - 同一份价格数据的指标只计算一次
+
+- 键：(数据集哈希, 指标名, 参数 + 指标及其依赖的源码哈希)
+- 内存层：按字节数限制的LRU
+- 磁盘层（可选）：.npz文件，多个策略脚本（多个进程）之间共享
+- hits / disk_hits / misses 计数
+
+用法：
+    @cached_indicator('wavetrend_hlc3')
+    def wavetrend(df, n1=10, n2=21): ...
+"""
+
+import functools
+import inspect
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from 数据快照模块 import dataset_hash, param_hash, code_hash
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def price_hash(df):
+    """只对价格列求哈希：指标只依赖OHLCV，其他派生列不影响缓存键"""
+    cols = [col for col in PRICE_COLUMNS if col in df.columns]
+    return dataset_hash(df[cols], source='ohlcv', start='', end='')
+
+
+class IndicatorCache:
+    """内存LRU（按字节限额）+ 可选磁盘层"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, disk_folder=None):
+        self.max_bytes = max_bytes
+        self.disk_folder = None
+        self._entries = OrderedDict()  # key -> (kind, names, arrays)
+        self._bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_folder is not None:
+            self.enable_disk(disk_folder)
+
+    def enable_disk(self, folder):
+        """开启磁盘层（进程间共享）"""
+        self.disk_folder = str(folder)
+        os.makedirs(self.disk_folder, exist_ok=True)
+
+    # ---------- 序列化 ----------
+    @staticmethod
+    def _pack(result):
+        """指标结果 -> (kind, names, arrays)"""
+        if isinstance(result, dict):
+            names = list(result.keys())
+            return 'dict', names, [np.asarray(result[k]) for k in names]
+        if isinstance(result, pd.DataFrame):
+            names = list(result.columns)
+            return 'frame', names, [result[k].to_numpy() for k in names]
+        if isinstance(result, pd.Series):
+            return 'series', [result.name], [result.to_numpy()]
+        return 'array', [None], [np.asarray(result)]
+
+    @staticmethod
+    def _unpack(entry, index):
+        """(kind, names, arrays) -> 与输入df索引对齐的结果（返回副本，调用方修改结果不影响缓存）"""
+        kind, names, arrays = entry
+        if kind == 'dict':
+            return {name: pd.Series(arr.copy(), index=index, name=name) for name, arr in zip(names, arrays)}
+        if kind == 'frame':
+            return pd.DataFrame({name: arr.copy() for name, arr in zip(names, arrays)}, index=index)
+        if kind == 'series':
+            return pd.Series(arrays[0].copy(), index=index, name=names[0])
+        return arrays[0].copy()
+
+    @staticmethod
+    def _nbytes(entry):
+        return sum(arr.nbytes for arr in entry[2])
+
+    # ---------- 内存层 ----------
+    def _remember(self, key, entry):
+        size = self._nbytes(entry)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._nbytes(self._entries.pop(key))
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= self._nbytes(old)
+            self.evictions += 1
+
+    # ---------- 磁盘层 ----------
+    def _disk_path(self, key):
+        return os.path.join(self.disk_folder, f'{key}.npz')
+
+    def _load_disk(self, key):
+        if self.disk_folder is None:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            kind = str(data['__kind__'])
+            names = [n or None for n in data['__names__'].tolist()]
+            arrays = [data[f'a{i}'] for i in range(len(names))]
+        return kind, names, arrays
+
+    def _save_disk(self, key, entry):
+        if self.disk_folder is None:
+            return
+        kind, names, arrays = entry
+        if any(arr.dtype == object for arr in arrays):
+            return  # object数组不落盘
+        payload = {f'a{i}': arr for i, arr in enumerate(arrays)}
+        payload['__kind__'] = np.array(kind)
+        payload['__names__'] = np.array(['' if n is None else str(n) for n in names])
+        tmp_path = self._disk_path(key) + '.tmp.npz'
+        np.savez(tmp_path, **payload)
+        os.replace(tmp_path, self._disk_path(key))
+
+    # ---------- 对外接口 ----------
+    def get_or_compute(self, df, name, params, fn):
+        """
+        查缓存，未命中则计算
+
+        Args:
+            df: 价格数据（含OHLCV列）
+            name: 指标名
+            params: 参数字典（应包含影响结果的全部参数）
+            fn: 无参函数，返回 dict / Series / DataFrame / ndarray
+        """
+        key = f'{name}_{price_hash(df)}_{param_hash(params)}'
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._unpack(entry, df.index)
+
+        entry = self._load_disk(key)
+        if entry is not None:
+            self.disk_hits += 1
+            self._remember(key, entry)
+            return self._unpack(entry, df.index)
+
+        self.misses += 1
+        entry = self._pack(fn())
+        self._remember(key, entry)
+        self._save_disk(key, entry)
+        return self._unpack(entry, df.index)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"指标缓存: 内存命中 {s['hits']} / 磁盘命中 {s['disk_hits']} / 计算 {s['misses']} 次, "
+                f"{s['entries']} 项 {s['bytes'] / 1024 / 1024:.1f}MB")
+
+
+# 进程内共享的默认缓存
+INDICATOR_CACHE = IndicatorCache()
+
+
+def cached_indicator(name, cache=None, depends=()):
+    """
+    指标函数装饰器：f(df, **params) 的结果按 (数据, 指标名, 参数, 源码) 缓存
+
+    参数取函数签名绑定后的完整值（含默认参数），源码改动后旧缓存自动失效。
+    depends: 指标内部调用的辅助函数 / 模块，其源码一并计入键，改动辅助函数时磁盘层不会返回旧结果
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        source_hash = code_hash(fn, *depends)
+        data_arg = next(iter(signature.parameters))
+
+        @functools.wraps(fn)
+        def wrapper(df, *args, **kwargs):
+            bound = signature.bind(df, *args, **kwargs)
+            bound.apply_defaults()
+            params = {k: v for k, v in bound.arguments.items() if k != data_arg}
+            params['__code__'] = source_hash
+            target = cache or INDICATOR_CACHE
+            return target.get_or_compute(df, name, params, lambda: fn(df, *args, **kwargs))
+
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
+
+
+# ============ 策略脚本共用的指标（pandas实现，结果与原脚本逐位一致）============
+
+@cached_indicator('wavetrend_hlc3')
+def wavetrend(df, n1=10, n2=21):
+    """WaveTrend（TradingView标准，ap=hlc3，EMA为ewm(adjust=False)）"""
+    hlc3 = (df['high'] + df['low'] + df['close']) / 3
+    esa = hlc3.ewm(span=n1, adjust=False).mean()
+    d = (hlc3 - esa).abs().ewm(span=n1, adjust=False).mean()
+    ci = (hlc3 - esa) / (0.015 * d)
+    wt1 = ci.ewm(span=n2, adjust=False).mean()  # EMA
+    wt2 = wt1.rolling(window=4).mean()  # SMA
+    return {'wt1': wt1, 'wt2': wt2}
+
+
+@cached_indicator('adx_sma')
+def adx(df, period=14):
+    """ADX（DM/TR用简单移动平均平滑，与各策略脚本一致）"""
+    high_diff = df['high'].diff()
+    low_diff = -df['low'].diff()
+
+    plus_dm = high_diff.where((high_diff > low_diff) & (high_diff > 0), 0)
+    minus_dm = low_diff.where((low_diff > high_diff) & (low_diff > 0), 0)
+
+    tr1 = df['high'] - df['low']
+    tr2 = abs(df['high'] - df['close'].shift())
+    tr3 = abs(df['low'] - df['close'].shift())
+    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+
+    atr = tr.rolling(window=period).mean()
+    plus_di = 100 * (plus_dm.rolling(window=period).mean() / atr)
+    minus_di = 100 * (minus_dm.rolling(window=period).mean() / atr)
+
+    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
+    return {'plus_di': plus_di, 'minus_di': minus_di, 'adx': dx.rolling(window=period).mean()}
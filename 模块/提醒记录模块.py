@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提醒记录模块 - 跨运行的提醒去重（SQLite）
+
+- 键：(品种, 信号类型, K线日期)，同一根K线上的同一信号只发送一次
+- 冷却：同一 (品种, 信号类型) 上次发送后 cooldown 小时内，新K线上的同类信号也不再发送
+  （例如连续多日满足的出场信号）
+- 内存中只保存每个 (品种, 信号类型) 最近一次的发送记录，should_send() 为O(1)字典查找，
+  渲染和发送之前调用，重复的提醒不产生任何开销
+- 只有发送成功后才 record()，失败的提醒下次运行会重试
+
+用法：
+    ledger = AlertLedger('K线数据/提醒记录.sqlite3', cooldowns={'出场': 48})
+    if ledger.should_send('BTCUSDT', '入场1', bar_date):
+        ...发送...
+        ledger.record('BTCUSDT', '入场1', bar_date, subject)
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    symbol   TEXT NOT NULL,
+    signal   TEXT NOT NULL,
+    bar_date TEXT NOT NULL,
+    sent_at  TEXT NOT NULL,
+    subject  TEXT,
+    PRIMARY KEY (symbol, signal, bar_date)
+)
+"""
+
+
+class AlertLedger:
+    """持久化提醒记录"""
+
+    def __init__(self, path=':memory:', cooldowns=None):
+        """
+        Args:
+            path: SQLite文件路径（默认内存库，不持久化）
+            cooldowns: {信号类型: 冷却小时数}，未列出的信号类型只按K线去重
+        """
+        self.path = str(path)
+        self.cooldowns = dict(cooldowns or {})
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        # {(品种, 信号类型): (最近K线日期, 最近发送时间)}
+        self._last = {}
+        rows = self._conn.execute(
+            "SELECT symbol, signal, MAX(bar_date), MAX(sent_at) FROM alerts GROUP BY symbol, signal")
+        for symbol, signal, bar_date, sent_at in rows:
+            self._last[(symbol, signal)] = (pd.Timestamp(bar_date), pd.Timestamp(sent_at))
+
+    def should_send(self, symbol, signal, bar_date, now=None):
+        """该提醒是否需要发送（同一K线已发送、或仍在冷却期内时返回False）"""
+        last = self._last.get((symbol, signal))
+        if last is None:
+            return True
+        last_bar, last_sent = last
+        if pd.Timestamp(bar_date) <= last_bar:
+            return False
+        cooldown = self.cooldowns.get(signal, 0)
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp(datetime.utcnow())
+        return now - last_sent >= pd.Timedelta(hours=cooldown)
+
+    def record(self, symbol, signal, bar_date, subject='', now=None):
+        """记录一次成功发送"""
+        bar_date = pd.Timestamp(bar_date)
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp(datetime.utcnow())
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO alerts VALUES (?, ?, ?, ?, ?)",
+                               (symbol, signal, bar_date.isoformat(), now.isoformat(), subject))
+            self._conn.commit()
+            last = self._last.get((symbol, signal))
+            if last is None or bar_date >= last[0]:
+                self._last[(symbol, signal)] = (bar_date, now)
+
+    def history(self, symbol=None):
+        """发送历史（DataFrame，按发送时间排序）"""
+        query = "SELECT * FROM alerts" + (" WHERE symbol = ?" if symbol else "") + " ORDER BY sent_at"
+        with self._lock:
+            return pd.read_sql_query(query, self._conn, params=(symbol,) if symbol else None)
+
+    def close(self):
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+
+    print("=" * 80)
+    print("🧪 提醒去重：同一K线只发一次 + 冷却期 + 跨运行持久化")
+    print("=" * 80)
+
+    path = os.path.join(tempfile.mkdtemp(prefix='提醒记录_'), '提醒记录.sqlite3')
+    day = pd.Timestamp('2024-05-01')
+    ledger = AlertLedger(path, cooldowns={'出场': 48})
+
+    ledger.record('BTCUSDT', '入场1', day, '第1仓买入信号', now=day + pd.Timedelta(hours=23))
+    ledger.record('BTCUSDT', '出场', day, '出场信号', now=day + pd.Timedelta(hours=23))
+    ledger.close()
+
+    # 模拟第二次运行（新进程）
+    ledger = AlertLedger(path, cooldowns={'出场': 48})
+    cases = [
+        ('同一K线重复运行 入场1', 'BTCUSDT', '入场1', day, 24),
+        ('次日新K线 入场1', 'BTCUSDT', '入场1', day + pd.Timedelta(days=1), 47),
+        ('次日新K线 出场（冷却48h内）', 'BTCUSDT', '出场', day + pd.Timedelta(days=1), 47),
+        ('3日后 出场（冷却已过）', 'BTCUSDT', '出场', day + pd.Timedelta(days=3), 95),
+        ('其他品种 入场1', 'ETHUSDT', '入场1', day, 24),
+    ]
+    for label, symbol, signal, bar_date, hours in cases:
+        ok = ledger.should_send(symbol, signal, bar_date, now=day + pd.Timedelta(hours=hours))
+        print(f"   {label:<24} → {'发送' if ok else '跳过'}")
+
+    n = 100000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        ledger.should_send('BTCUSDT', '入场1', day)
+    print(f"should_send: 平均 {(time.perf_counter() - t0) / n * 1e6:.1f}µs/次")
+    print(ledger.history().to_string(index=False))
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据快照模块 - 按内容哈希标识数据集，保证回测可复现、可缓存
+
+- dataset_hash: 数据字节 + 数据源 + 日期范围 → SHA256
+- SnapshotStore: 不可变快照文件（同一哈希只写一次，文件只读）
+- ResultCache: 回测/指标结果按 (快照哈希, 参数哈希) 缓存
+  输入数据变化 → 快照哈希变化 → 只有依赖它的结果失效
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import stat
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+HASH_LENGTH = 16  # 文件名中使用的哈希前缀长度
+
+
+def _column_bytes(series):
+    """把一列转换为稳定的字节序列（日期按int64，文本按utf-8）"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.values.astype('datetime64[ns]').astype(np.int64).tobytes()
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return np.ascontiguousarray(series.to_numpy()).tobytes()
+    return '\x1f'.join(series.astype(str).tolist()).encode('utf-8')
+
+
+def dataset_hash(df, source='', start=None, end=None):
+    """
+    数据集内容哈希
+
+    Args:
+        df: 数据
+        source: 数据源标识（如 'binance:BTCUSDT:1d'）
+        start, end: 日期范围（默认取 df['date'] 首尾）
+    """
+    if start is None and 'date' in df.columns and len(df):
+        start = df['date'].min()
+    if end is None and 'date' in df.columns and len(df):
+        end = df['date'].max()
+
+    h = hashlib.sha256()
+    header = {
+        'source': source,
+        'start': str(start),
+        'end': str(end),
+        'rows': len(df),
+        'columns': [(str(col), str(df[col].dtype)) for col in df.columns],
+    }
+    h.update(json.dumps(header, sort_keys=True).encode('utf-8'))
+    for col in df.columns:
+        h.update(_column_bytes(df[col]))
+    return h.hexdigest()[:HASH_LENGTH]
+
+
+def param_hash(params):
+    """参数哈希（字典键排序，非JSON类型转为字符串）"""
+    payload = json.dumps(params, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+
+
+def code_hash(*objects):
+    """函数/类源码哈希，代码改动后依赖它的缓存自动失效"""
+    h = hashlib.sha256()
+    for obj in objects:
+        try:
+            h.update(inspect.getsource(obj).encode('utf-8'))
+        except (OSError, TypeError):
+            h.update(getattr(obj, '__qualname__', repr(obj)).encode('utf-8'))
+    return h.hexdigest()[:HASH_LENGTH]
+
+
+class Snapshot:
+    """不可变数据快照"""
+
+    def __init__(self, hash, frame, meta):
+        self.hash = hash
+        self._frame = frame
+        self.meta = meta
+
+    @property
+    def frame(self):
+        """返回副本，避免引擎修改快照内容"""
+        return self._frame.copy()
+
+    def __repr__(self):
+        return f"Snapshot({self.hash}, {self.meta.get('source')}, {self.meta.get('start')} ~ {self.meta.get('end')})"
+
+
+class SnapshotStore:
+    """快照存储 - 文件名即内容哈希，写入后只读"""
+
+    def __init__(self, folder='数据快照'):
+        self.folder = str(folder)
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _paths(self, hash):
+        return (os.path.join(self.folder, f'{hash}.pkl'),
+                os.path.join(self.folder, f'{hash}.json'))
+
+    def snapshot(self, df, source='', start=None, end=None):
+        """为数据集创建快照（已存在则直接复用）"""
+        df = df.reset_index(drop=True)
+        hash = dataset_hash(df, source, start, end)
+        data_path, meta_path = self._paths(hash)
+
+        if os.path.exists(data_path):
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            return Snapshot(hash, df, meta)
+
+        meta = {
+            'hash': hash,
+            'source': source,
+            'start': str(start if start is not None else (df['date'].min() if 'date' in df.columns else None)),
+            'end': str(end if end is not None else (df['date'].max() if 'date' in df.columns else None)),
+            'rows': len(df),
+            'columns': [str(col) for col in df.columns],
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        df.to_pickle(data_path)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        for path in (data_path, meta_path):
+            os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+        print(f"📸 新建数据快照 {hash}（{source}, {len(df)} 行）")
+        return Snapshot(hash, df, meta)
+
+    def load(self, hash, verify=True):
+        """按哈希读取快照"""
+        data_path, meta_path = self._paths(hash)
+        df = pd.read_pickle(data_path)
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if verify:
+            actual = dataset_hash(df, meta['source'], meta['start'], meta['end'])
+            if actual != hash:
+                raise ValueError(f"快照 {hash} 内容校验失败（实际 {actual}）")
+        return Snapshot(hash, df, meta)
+
+    def list(self):
+        """列出全部快照元数据"""
+        metas = []
+        for name in sorted(os.listdir(self.folder)):
+            if name.endswith('.json'):
+                with open(os.path.join(self.folder, name), encoding='utf-8') as f:
+                    metas.append(json.load(f))
+        return metas
+
+
+class ResultCache:
+    """
+    结果缓存 - 键为 (命名空间, 快照哈希, 参数哈希)
+
+    文件布局：{folder}/{namespace}/{snapshot_hash}_{param_hash}.pkl
+    """
+
+    def __init__(self, folder='结果缓存'):
+        self.folder = str(folder)
+        os.makedirs(self.folder, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, namespace, snapshot_hash, params):
+        return os.path.join(self.folder, namespace, f'{snapshot_hash}_{param_hash(params)}.pkl')
+
+    def get(self, namespace, snapshot_hash, params):
+        path = self._path(namespace, snapshot_hash, params)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def put(self, namespace, snapshot_hash, params, value):
+        return self._write(self._path(namespace, snapshot_hash, params), value)
+
+    def _write(self, path, value):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return value
+
+    def memoize(self, namespace, snapshot, params, fn):
+        """
+        命中则直接返回缓存结果，否则执行 fn() 并写入缓存
+
+        Args:
+            snapshot: Snapshot 或快照哈希字符串
+        """
+        snapshot_hash = snapshot.hash if isinstance(snapshot, Snapshot) else str(snapshot)
+        # 键在执行前确定：fn() 可能修改 params 引用的对象状态
+        path = self._path(namespace, snapshot_hash, params)
+        if os.path.exists(path):
+            self.hits += 1
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        self.misses += 1
+        return self._write(path, fn())
+
+    def invalidate(self, snapshot_hash):
+        """删除某个快照的全部依赖结果"""
+        removed = 0
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                if name.startswith(f'{snapshot_hash}_'):
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+        return removed
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线计时模块 - 并发流水线的分阶段耗时与关键路径
+
+- stage(name, after=...): 上下文管理器，记录阶段的开始/结束时刻及其依赖阶段（线程安全）
+- wrap(name, fn, after=...): 包装成可提交到线程池的函数
+- critical_path(): 从最后结束的阶段沿"最晚结束的依赖"回溯，得到决定总耗时的那条链
+- report(): 打印各阶段 起止偏移 / 耗时，以及 关键路径 与 各阶段耗时之和（串行执行需要的时间）
+
+用法：
+    timer = StageTimer()
+    with timer.stage('获取日线'):
+        df = fetch()
+    future = pool.submit(timer.wrap('渲染日报', render, after=('计算指标',)), df)
+    timer.report()
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """分阶段计时器"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.stages = {}   # {阶段名: (开始, 结束, 依赖)}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, after=()):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.stages[name] = (start - self.origin, end - self.origin, tuple(after))
+
+    def wrap(self, name, fn, after=()):
+        """返回计时版本的 fn（供线程池提交）"""
+        def run(*args, **kwargs):
+            with self.stage(name, after):
+                return fn(*args, **kwargs)
+        return run
+
+    def critical_path(self):
+        """
+        Returns:
+            (阶段名列表, 关键路径耗时)：耗时 = 最后结束的阶段的结束时刻（从计时器创建起算）
+        """
+        if not self.stages:
+            return [], 0.0
+        name = max(self.stages, key=lambda key: self.stages[key][1])
+        total = self.stages[name][1]
+        path = [name]
+        while True:
+            deps = [dep for dep in self.stages[name][2] if dep in self.stages]
+            if not deps:
+                break
+            name = max(deps, key=lambda key: self.stages[key][1])
+            path.append(name)
+        return path[::-1], total
+
+    def report(self, title='流水线耗时'):
+        path, total = self.critical_path()
+        serial = sum(end - start for start, end, _ in self.stages.values())
+        print(f"\n⏱️ {title}")
+        for name, (start, end, _) in sorted(self.stages.items(), key=lambda item: item[1][0]):
+            print(f"   {name:<16} {start:7.3f}s → {end:7.3f}s  {end - start:7.3f}s")
+        print(f"   关键路径: {' → '.join(path)} = {total:.3f}s（各阶段串行合计 {serial:.3f}s）")
+        return total
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    print("=" * 80)
+    print("🧪 模拟监控流水线：获取 ∥ 4h预取 → 计算 → 渲染 ∥ 发送（并发上限3）")
+    print("=" * 80)
+
+    timer = StageTimer()
+    with ThreadPoolExecutor(max_workers=4) as work, ThreadPoolExecutor(max_workers=3) as mail:
+        prefetch = work.submit(timer.wrap('预取4h', time.sleep), 0.3)
+        with timer.stage('获取日线'):
+            time.sleep(0.4)
+        prefetch.result()
+        with timer.stage('计算指标', after=('获取日线', '预取4h')):
+            time.sleep(0.1)
+        report = work.submit(timer.wrap('渲染日报', time.sleep, after=('计算指标',)), 0.15)
+        alerts = [work.submit(timer.wrap(f'渲染提醒{i}', time.sleep, after=('计算指标',)), 0.02) for i in range(3)]
+        sends = [mail.submit(timer.wrap(f'发送提醒{i}', time.sleep, after=(f'渲染提醒{i}',)), 0.5)
+                 for i, future in enumerate(alerts) if future.result() is None]
+        report.result()
+        sends.append(mail.submit(timer.wrap('发送日报', time.sleep, after=('渲染日报',)), 0.5))
+        for future in sends:
+            future.result()
+    timer.report('模拟流水线（每封邮件0.5s）')
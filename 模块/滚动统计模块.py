@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滚动统计模块 - 布林带 / 肯特纳通道 / ATR 共用的融合滚动矩
+
+rolling_moments 一次遍历同时得到窗口内：
+- mean:       收盘价均值（= SMA）
+- std:        收盘价标准差（ddof=0 = talib.STDDEV，ddof=1 = pandas rolling().std()）
+- max / min:  最高价最大值 / 最低价最小值（= ta.highest / ta.lowest）
+- range_mean: 真实波幅均值（= ATR的SMA口径 / SQZMOM的 rangemaKC）
+
+均值/方差用Welford增减更新（不做 Σx² - (Σx)²/n 的相减），每 RESYNC_BARS 根
+按窗口精确重算一次，长历史也不累积误差；最大/最小值用单调队列，摊还O(1)。
+
+RollingMoments 为流式版本：peek() 用未收盘K线试算（不改状态），push() 收盘提交，均为O(1)。
+
+用法：
+    m = rolling_moments(close, 20, high, low, ddof=1)
+    bb_upper = m['mean'] + 2 * m['std']
+"""
+
+from collections import deque
+
+import numpy as np
+
+from 编译指标模块 import njit, HAS_NUMBA
+
+# 每累计这么多根有效K线，按窗口精确重算一次均值/方差/波幅和
+RESYNC_BARS = 256
+
+MOMENT_KEYS = ('mean', 'std', 'max', 'min', 'range_mean')
+
+
+# ============ Numba 内核 ============
+
+@njit(cache=True)
+def _rolling_moments_kernel(high, low, close, period, ddof, use_true_range, resync):
+    n = close.shape[0]
+    mean_out = np.full(n, np.nan)
+    std_out = np.full(n, np.nan)
+    max_out = np.full(n, np.nan)
+    min_out = np.full(n, np.nan)
+    range_out = np.full(n, np.nan)
+
+    rng = np.zeros(n)
+    bad = np.zeros(n, dtype=np.bool_)
+    # 单调队列（环形缓冲，容量 period）
+    q_max = np.zeros(period, dtype=np.int64)
+    q_min = np.zeros(period, dtype=np.int64)
+    head_max, size_max, head_min, size_min = 0, 0, 0, 0
+
+    mean, m2, range_sum = 0.0, 0.0, 0.0
+    count, n_bad, since_sync = 0, 0, 0
+
+    for i in range(n):
+        # 移出窗口最旧的一根
+        if i >= period:
+            j = i - period
+            if bad[j]:
+                n_bad -= 1
+            else:
+                count -= 1
+                if count == 0:
+                    mean, m2, range_sum = 0.0, 0.0, 0.0
+                else:
+                    d = close[j] - mean
+                    mean -= d / count
+                    m2 -= d * (close[j] - mean)
+                    range_sum -= rng[j]
+            if size_max > 0 and q_max[head_max] == j:
+                head_max = (head_max + 1) % period
+                size_max -= 1
+            if size_min > 0 and q_min[head_min] == j:
+                head_min = (head_min + 1) % period
+                size_min -= 1
+
+        # 加入新的一根
+        h, l, c = high[i], low[i], close[i]
+        if not (h == h and l == l and c == c):
+            bad[i] = True
+            n_bad += 1
+        else:
+            r = h - l
+            if use_true_range and i > 0 and close[i - 1] == close[i - 1]:
+                r = max(r, abs(h - close[i - 1]), abs(l - close[i - 1]))
+            rng[i] = r
+            count += 1
+            d = c - mean
+            mean += d / count
+            m2 += d * (c - mean)
+            range_sum += r
+            since_sync += 1
+            while size_max > 0 and high[q_max[(head_max + size_max - 1) % period]] <= h:
+                size_max -= 1
+            q_max[(head_max + size_max) % period] = i
+            size_max += 1
+            while size_min > 0 and low[q_min[(head_min + size_min - 1) % period]] >= l:
+                size_min -= 1
+            q_min[(head_min + size_min) % period] = i
+            size_min += 1
+
+        if i < period - 1 or n_bad > 0:
+            continue
+
+        # 定期按窗口精确重算
+        if since_sync >= resync:
+            s, s_r = 0.0, 0.0
+            for j in range(i - period + 1, i + 1):
+                s += close[j]
+                s_r += rng[j]
+            mean = s / period
+            m2 = 0.0
+            for j in range(i - period + 1, i + 1):
+                m2 += (close[j] - mean) * (close[j] - mean)
+            range_sum = s_r
+            since_sync = 0
+
+        mean_out[i] = mean
+        std_out[i] = np.sqrt(max(m2, 0.0) / (period - ddof)) if period > ddof else np.nan
+        max_out[i] = high[q_max[head_max]]
+        min_out[i] = low[q_min[head_min]]
+        range_out[i] = range_sum / period
+
+    return mean_out, std_out, max_out, min_out, range_out
+
+
+# ============ NumPy 回退 ============
+
+def _rolling_moments_numpy(high, low, close, period, ddof, use_true_range, resync=None):
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    n = close.shape[0]
+    outs = [np.full(n, np.nan) for _ in MOMENT_KEYS]
+    if n < period:
+        return tuple(outs)
+    prev_close = np.r_[np.nan, close[:-1]]
+    rng = high - low
+    if use_true_range:
+        rng = np.fmax(rng, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    rng = np.where(np.isnan(high + low + close), np.nan, rng)
+    windows = sliding_window_view(close, period)
+    outs[0][period - 1:] = windows.mean(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        outs[1][period - 1:] = windows.std(axis=-1, ddof=ddof)
+    outs[2][period - 1:] = sliding_window_view(high, period).max(axis=-1)
+    outs[3][period - 1:] = sliding_window_view(low, period).min(axis=-1)
+    outs[4][period - 1:] = sliding_window_view(rng, period).mean(axis=-1)
+    # 窗口内任一根 high/low/close 缺失 → 全部NaN（与内核一致）
+    invalid = np.isnan(sliding_window_view(high + low + close, period).sum(axis=-1))
+    for out in outs:
+        out[period - 1:][invalid] = np.nan
+    return tuple(outs)
+
+
+# ============ 对外接口 ============
+
+def rolling_moments(close, period, high=None, low=None, ddof=0, use_true_range=True):
+    """
+    融合滚动矩（沿最后一个轴，支持 (bars,) 与 (n, bars)）
+
+    Args:
+        close: 收盘价
+        period: 窗口长度
+        high, low: 最高/最低价；省略时用 close 代替（此时 range_mean 为收盘价变动均值）
+        ddof: 标准差自由度
+        use_true_range: False 时 range_mean 为 (high - low) 的均值
+
+    Returns:
+        dict: mean, std, max, min, range_mean，前 period-1 根与含缺失值的窗口为NaN
+    """
+    close = np.asarray(close, dtype=np.float64)
+    high = close if high is None else np.asarray(high, dtype=np.float64)
+    low = close if low is None else np.asarray(low, dtype=np.float64)
+    kernel = _rolling_moments_kernel if HAS_NUMBA else _rolling_moments_numpy
+    period, ddof = int(period), int(ddof)
+
+    shape = close.shape
+    rows_c = np.ascontiguousarray(close.reshape(-1, shape[-1]))
+    rows_h = np.ascontiguousarray(np.broadcast_to(high, shape).reshape(-1, shape[-1]))
+    rows_l = np.ascontiguousarray(np.broadcast_to(low, shape).reshape(-1, shape[-1]))
+    outs = {key: np.empty(rows_c.shape) for key in MOMENT_KEYS}
+    for r in range(rows_c.shape[0]):
+        result = kernel(rows_h[r], rows_l[r], rows_c[r], period, ddof, bool(use_true_range), RESYNC_BARS)
+        for key, value in zip(MOMENT_KEYS, result):
+            outs[key][r] = value
+    return {key: value.reshape(shape) for key, value in outs.items()}
+
+
+class RollingMoments:
+    """
+    流式滚动矩（实时监控用）
+
+    保存最近 period-1 根已收盘K线的状态：
+    - peek(high, low, close): 把一根未收盘K线当作窗口最后一根试算，不改状态
+    - push(high, low, close): 收盘K线提交进窗口，返回含该K线的结果
+    两者都是O(1)，结果与 rolling_moments 在浮点误差内一致。
+    """
+
+    def __init__(self, period, ddof=0, use_true_range=True, resync=RESYNC_BARS):
+        self.period = int(period)
+        self.ddof = int(ddof)
+        self.use_true_range = use_true_range
+        self.resync = resync
+        self.bars = deque()          # (index, high, low, close, range)
+        self._max = deque()          # 单调递减 (index, high)
+        self._min = deque()          # 单调递增 (index, low)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.range_sum = 0.0
+        self.count = 0               # 已提交K线总数
+        self._since_sync = 0
+
+    @property
+    def ready(self):
+        """已有 period-1 根历史，下一根K线起可出结果"""
+        return len(self.bars) >= self.period - 1
+
+    def _range(self, high, low):
+        r = high - low
+        if self.use_true_range and self.bars:
+            prev_close = self.bars[-1][3]
+            r = max(r, abs(high - prev_close), abs(low - prev_close))
+        return r
+
+    def peek(self, high, low, close):
+        """用未收盘K线试算，返回 dict(mean, std, max, min, range_mean)；历史不足时返回None"""
+        if not self.ready:
+            return None
+        k = len(self.bars) + 1
+        d = close - self.mean
+        mean = self.mean + d / k
+        m2 = self.m2 + d * (close - mean)
+        n_free = self.period - self.ddof
+        return {
+            'mean': mean,
+            'std': float(np.sqrt(max(m2, 0.0) / n_free)) if n_free > 0 else np.nan,
+            'max': max(self._max[0][1], high) if self._max else high,
+            'min': min(self._min[0][1], low) if self._min else low,
+            'range_mean': (self.range_sum + self._range(high, low)) / self.period,
+        }
+
+    def push(self, high, low, close):
+        """提交一根收盘K线"""
+        result = self.peek(high, low, close)
+        r = self._range(high, low)
+        index = self.count
+        self.count += 1
+
+        self.bars.append((index, high, low, close, r))
+        k = len(self.bars)
+        d = close - self.mean
+        self.mean += d / k
+        self.m2 += d * (close - self.mean)
+        self.range_sum += r
+        while self._max and self._max[-1][1] <= high:
+            self._max.pop()
+        self._max.append((index, high))
+        while self._min and self._min[-1][1] >= low:
+            self._min.pop()
+        self._min.append((index, low))
+
+        # 只保留 period-1 根
+        if len(self.bars) > self.period - 1:
+            old = self.bars.popleft()
+            k = len(self.bars)
+            if k == 0:
+                self.mean, self.m2, self.range_sum = 0.0, 0.0, 0.0
+            else:
+                d = old[3] - self.mean
+                self.mean -= d / k
+                self.m2 -= d * (old[3] - self.mean)
+                self.range_sum -= old[4]
+        oldest = self.bars[0][0] if self.bars else index + 1
+        while self._max and self._max[0][0] < oldest:
+            self._max.popleft()
+        while self._min and self._min[0][0] < oldest:
+            self._min.popleft()
+
+        self._since_sync += 1
+        if self._since_sync >= self.resync:
+            self._resync()
+        return result
+
+    def extend(self, high, low, close):
+        """批量提交历史K线（启动时预热），返回最后一根的结果"""
+        result = None
+        for h, l, c in zip(high, low, close):
+            result = self.push(float(h), float(l), float(c))
+        return result
+
+    def _resync(self):
+        closes = np.array([bar[3] for bar in self.bars])
+        self.mean = float(closes.mean()) if len(closes) else 0.0
+        self.m2 = float(((closes - self.mean) ** 2).sum())
+        self.range_sum = float(sum(bar[4] for bar in self.bars))
+        self._since_sync = 0
+
+
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+    from 指标模块 import sma, rolling_std, rolling_max, rolling_min, true_range
+
+    print("=" * 80)
+    print(f"🧪 融合滚动矩（Numba: {'已安装' if HAS_NUMBA else '未安装，使用回退实现'}）")
+    print("=" * 80)
+
+    rng = np.random.default_rng(3)
+    n = 2_000_000
+    # 价格从3千涨到10万量级：检验大均值、小方差下的数值稳定性
+    close = 3000 * np.exp(np.cumsum(rng.normal(0.0000018, 0.0005, n)))
+    high = close * (1 + rng.uniform(0, 0.001, n))
+    low = close * (1 - rng.uniform(0, 0.001, n))
+    rolling_moments(close[:100], 20, high[:100], low[:100])  # 预编译
+
+    t0 = time.perf_counter()
+    fused = rolling_moments(close, 20, high, low)
+    t_fused = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    reference = {
+        'mean': sma(close, 20), 'std': rolling_std(close, 20),
+        'max': rolling_max(high, 20), 'min': rolling_min(low, 20),
+        'range_mean': sma(true_range(high, low, close), 20),
+    }
+    t_separate = time.perf_counter() - t0
+
+    s = pd.Series(close)
+    t0 = time.perf_counter()
+    naive_std = np.sqrt(np.maximum((s * s).rolling(20).mean() - s.rolling(20).mean() ** 2, 0)).to_numpy()
+    t_naive = time.perf_counter() - t0
+
+    print(f"{n:,} 根K线, 窗口20, 收盘价 {close[0]:,.0f} → {close[-1]:,.0f}")
+    print(f"融合一次遍历 {t_fused * 1000:.0f}ms vs 五次滑窗 {t_separate * 1000:.0f}ms")
+    for key in MOMENT_KEYS:
+        err = np.nanmax(np.abs(fused[key] - reference[key]) / np.maximum(np.abs(reference[key]), 1e-12))
+        print(f"   {key:<11} 最大相对误差 {err:.1e}")
+    naive_err = np.nanmax(np.abs(naive_std - reference['std']) / np.maximum(reference['std'], 1e-12))
+    print(f"   对照：E[x²]-E[x]² 方差公式的std相对误差 {naive_err:.1e}")
+
+    # 流式：每根K线先试算3次（盘中），再收盘提交
+    stream = RollingMoments(20)
+    m = 50_000
+    t0 = time.perf_counter()
+    streamed = np.full((m, len(MOMENT_KEYS)), np.nan)
+    for i in range(m):
+        for _ in range(3):
+            stream.peek(high[i] * 0.999, low[i], close[i])
+        result = stream.push(high[i], low[i], close[i])
+        if result:
+            streamed[i] = [result[key] for key in MOMENT_KEYS]
+    t_stream = time.perf_counter() - t0
+    batch = np.column_stack([fused[key][:m] for key in MOMENT_KEYS])
+    err = np.nanmax(np.abs(streamed - batch) / np.abs(batch))
+    print(f"流式 {m:,} 根（每根3次试算+1次提交）: {t_stream / (m * 4) * 1e6:.1f}µs/次, 与批量相对误差 {err:.1e}")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+盘中预警模块 - 未收盘日线上的"预备信号"去重与收盘确认率统计
+
+- observe(): 盘中每次试算得到的信号集合，只返回本K线尚未提醒过的新信号（去重）
+- confirm(): K线收盘后，用收盘指标判定每个预备信号是否成立
+- stats():   按信号类型统计 预备次数 / 确认次数 / 确认率 / 平均提前小时数
+
+记录为追加写入的CSV（event = provisional / close），进程重启后仍能去重，
+确认率由两类事件连接得到，不改写历史行。
+
+用法：
+    tracker = ProvisionalSignalTracker('K线数据/盘中预警记录.csv')
+    new = tracker.observe(bar_date, {'入场1': '第1仓买入信号'}, now, price)   # 新信号才提醒
+    tracker.confirm(bar_date, {'入场1'}, close_time)                            # 收盘确认
+"""
+
+import os
+
+import pandas as pd
+
+LEDGER_COLUMNS = ['event', 'bar_date', 'signal', 'time', 'price', 'confirmed']
+
+
+class ProvisionalSignalTracker:
+    """预备信号记录器"""
+
+    def __init__(self, path=None):
+        self.path = str(path) if path is not None else None
+        self.pending = {}     # {bar_date: {signal: (首次出现时间, 价格)}}
+        self.closed = set()   # 已收盘确认过的 bar_date
+        self._rows = []
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    def _load(self):
+        df = pd.read_csv(self.path)
+        # 午夜时间戳写出时没有时分秒，按ISO8601逐个解析
+        df['bar_date'] = pd.to_datetime(df['bar_date'], format='ISO8601')
+        df['time'] = pd.to_datetime(df['time'], format='ISO8601')
+        self._rows = df.to_dict('records')
+        self.closed = set(df.loc[df['event'] == 'close', 'bar_date'])
+        for row in self._rows:
+            if row['event'] == 'provisional' and row['bar_date'] not in self.closed:
+                self.pending.setdefault(row['bar_date'], {})[row['signal']] = (row['time'], row['price'])
+
+    def _append(self, rows):
+        self._rows.extend(rows)
+        if not self.path:
+            return
+        header = not os.path.exists(self.path)
+        pd.DataFrame(rows, columns=LEDGER_COLUMNS).to_csv(self.path, mode='a', header=header, index=False)
+
+    def observe(self, bar_date, signals, now, price):
+        """
+        记录一次盘中试算的信号
+
+        Args:
+            signals: {信号键: 描述}，如 {'入场1': '第1仓买入信号', '出场': '3个出场指标'}
+
+        Returns:
+            {信号键: 描述} 中本K线首次出现的部分（需要提醒的）
+        """
+        bar_date = pd.Timestamp(bar_date)
+        if bar_date in self.closed:
+            return {}
+        seen = self.pending.setdefault(bar_date, {})
+        new = {key: text for key, text in signals.items() if key not in seen}
+        if new:
+            now = pd.Timestamp(now)
+            for key in new:
+                seen[key] = (now, float(price))
+            self._append([{'event': 'provisional', 'bar_date': bar_date, 'signal': key, 'time': now,
+                           'price': float(price), 'confirmed': None} for key in new])
+        return new
+
+    def confirm(self, bar_date, confirmed_signals, close_time=None):
+        """
+        收盘确认：记录本K线每个预备信号是否在收盘时成立
+
+        Returns:
+            {信号键: 是否确认}（本K线没有预备信号时为空，不写记录）
+        """
+        bar_date = pd.Timestamp(bar_date)
+        if bar_date in self.closed:
+            return {}
+        confirmed_signals = set(confirmed_signals)
+        seen = self.pending.pop(bar_date, {})
+        result = {key: key in confirmed_signals for key in seen}
+        self.closed.add(bar_date)
+        if result:
+            close_time = pd.Timestamp(close_time) if close_time is not None else bar_date
+            self._append([{'event': 'close', 'bar_date': bar_date, 'signal': key, 'time': close_time,
+                           'price': None, 'confirmed': ok} for key, ok in result.items()])
+        return result
+
+    def stats(self):
+        """
+        按信号类型统计确认率
+
+        Returns:
+            DataFrame: signal / provisional / confirmed / confirmation_rate(%) / avg_lead_hours
+        """
+        columns = ['signal', 'provisional', 'confirmed', 'confirmation_rate', 'avg_lead_hours']
+        if not self._rows:
+            return pd.DataFrame(columns=columns)
+        df = pd.DataFrame(self._rows, columns=LEDGER_COLUMNS)
+        provisional = df[df['event'] == 'provisional']
+        closes = df[df['event'] == 'close']
+        merged = provisional.merge(closes[['bar_date', 'signal', 'time', 'confirmed']],
+                                   on=['bar_date', 'signal'], suffixes=('', '_close'))
+        if merged.empty:
+            return pd.DataFrame(columns=columns)
+        merged['confirmed_close'] = merged['confirmed_close'].astype(str).str.lower() == 'true'
+        merged['lead'] = (pd.to_datetime(merged['time_close']) - pd.to_datetime(merged['time'])).dt.total_seconds() / 3600
+        grouped = merged.groupby('signal')
+        result = pd.DataFrame({
+            'provisional': grouped.size(),
+            'confirmed': grouped['confirmed_close'].sum().astype(int),
+            'avg_lead_hours': grouped['lead'].mean(),
+        })
+        result['confirmation_rate'] = result['confirmed'] / result['provisional'] * 100
+        return result.reset_index()[columns]
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    import numpy as np
+    from 增量指标模块 import IncrementalIndicatorState
+
+    print("=" * 80)
+    print("🧪 盘中预备信号：O(1)试算 + 去重 + 收盘确认率")
+    print("=" * 80)
+
+    rng = np.random.default_rng(8)
+    n_days, ticks = 600, 96  # 每15分钟一次
+    path = os.path.join(tempfile.mkdtemp(prefix='盘中预警_'), '盘中预警记录.csv')
+    tracker = ProvisionalSignalTracker(path)
+    state = IncrementalIndicatorState()
+
+    def golden(row):
+        return {'WT金叉': 'WT金叉'} if row['wt_golden_cross'] else {}
+
+    price = 30000.0
+    notified, evaluations, t_peek = 0, 0, 0.0
+    for day in range(n_days):
+        bar_date = pd.Timestamp('2023-01-01') + pd.Timedelta(days=day)
+        path_prices = price * np.exp(np.cumsum(rng.normal(0, 0.003, ticks)))
+        high, low = price, price
+        for t, p in enumerate(path_prices):
+            high, low = max(high, p), min(low, p)
+            if state.count > 60:
+                t0 = time.perf_counter()
+                row = state.peek(high, low, p)
+                t_peek += time.perf_counter() - t0
+                evaluations += 1
+                notified += len(tracker.observe(bar_date, golden(row), bar_date + pd.Timedelta(minutes=15 * t), p))
+        row = state.push(high, low, path_prices[-1])
+        tracker.confirm(bar_date, golden(row), bar_date + pd.Timedelta(days=1))
+        price = path_prices[-1]
+
+    print(f"{evaluations:,} 次盘中试算: 平均 {t_peek / evaluations * 1e6:.0f}µs/次，去重后提醒 {notified} 次")
+    print(ProvisionalSignalTracker(path).stats().round(2).to_string(index=False))
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑帧模块 - 指标帧的省内存表示（按需使用）
+
+存储方式：
+- 价格列（open/high/low/close/volume 等）保持 float64
+- 振荡器等其他浮点列 → float32
+- 布尔信号列（sqz_on、is_lime、wt_golden_cross、adx_up …）→ 按位打包，每行每个信号1 bit
+- 文本标签列（period_label 等）→ 分类编码（int8/int16 + 类别表）
+
+读取时按需解码：cf['sqz_on'] 只解码这一列，cf.tail(30) 只解码最后30行。
+
+用法：
+    cf = CompactFrame.from_frame(df)
+    cf['wt1'], cf.row(-1)['is_lime'], cf.tail(30), cf.to_frame()
+"""
+
+import numpy as np
+import pandas as pd
+
+# 默认保持 float64 的列（价格精度敏感）
+FLOAT64_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'price', 'adj_close')
+
+
+def _code_dtype(n_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class CompactFrame:
+    """紧凑指标帧"""
+
+    def __init__(self, index, columns, kinds, exact, floats, flag_names, flags, categories):
+        self.index = index
+        self.columns = list(columns)
+        self._kinds = kinds            # 列名 -> 'exact' / 'float32' / 'flag' / 'category'
+        self._exact = exact            # 列名 -> 原样数组
+        self._floats = floats          # 列名 -> float32 数组
+        self._flag_bit = {name: i for i, name in enumerate(flag_names)}
+        self._flags = flags            # (行数, ceil(信号数/8)) uint8
+        self._categories = categories  # 列名 -> (编码数组, 类别Index)
+
+    # ---------- 构建 ----------
+    @classmethod
+    def from_frame(cls, df, float64_columns=FLOAT64_COLUMNS, max_category_ratio=0.5):
+        """
+        Args:
+            float64_columns: 保持 float64 的列
+            max_category_ratio: 文本列不同取值数 / 行数 不超过该比例时做分类编码
+        """
+        kinds, exact, floats, categories = {}, {}, {}, {}
+        flag_names, flag_columns = [], []
+        n = len(df)
+
+        for col in df.columns:
+            series = df[col]
+            if pd.api.types.is_bool_dtype(series):
+                kinds[col] = 'flag'
+                flag_names.append(col)
+                flag_columns.append(series.to_numpy(dtype=bool))
+            elif pd.api.types.is_float_dtype(series) and col not in float64_columns:
+                kinds[col] = 'float32'
+                floats[col] = series.to_numpy(dtype=np.float32)
+            elif (isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object) and \
+                    series.nunique(dropna=True) <= max(1, n * max_category_ratio):
+                kinds[col] = 'category'
+                cat = pd.Categorical(series)
+                categories[col] = (cat.codes.astype(_code_dtype(len(cat.categories))), cat.categories)
+            else:
+                kinds[col] = 'exact'
+                exact[col] = series.to_numpy()
+
+        if flag_columns:
+            flags = np.packbits(np.column_stack(flag_columns), axis=1)
+        else:
+            flags = np.zeros((n, 0), dtype=np.uint8)
+        return cls(df.index, df.columns, kinds, exact, floats, flag_names, flags, categories)
+
+    # ---------- 解码 ----------
+    def _decode(self, col, rows=slice(None)):
+        kind = self._kinds[col]
+        if kind == 'exact':
+            return self._exact[col][rows]
+        if kind == 'float32':
+            return self._floats[col][rows].astype(np.float64)
+        if kind == 'flag':
+            bit = self._flag_bit[col]
+            return ((self._flags[rows, bit // 8] >> (7 - bit % 8)) & 1).astype(bool)
+        codes, cats = self._categories[col]
+        return pd.Categorical.from_codes(codes[rows], cats).astype(object)
+
+    def __getitem__(self, col):
+        """解码单列 -> Series"""
+        return pd.Series(self._decode(col), index=self.index, name=col)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, col):
+        return col in self._kinds
+
+    def flag(self, col):
+        """布尔信号列 -> bool数组"""
+        return self._decode(col)
+
+    def to_frame(self, columns=None, rows=slice(None)):
+        """解码为 DataFrame（可只取部分列/行）"""
+        columns = columns or self.columns
+        return pd.DataFrame({col: self._decode(col, rows) for col in columns}, index=self.index[rows])
+
+    def tail(self, n=5, columns=None):
+        return self.to_frame(columns, slice(max(0, len(self) - n), len(self)))
+
+    def row(self, i):
+        """单行 -> dict（与 row['col'] / row.get('col') 写法兼容）"""
+        i = range(len(self))[i]
+        return {col: self._decode(col, slice(i, i + 1))[0] for col in self.columns}
+
+    # ---------- 内存 ----------
+    def memory_usage(self):
+        """各部分占用字节数"""
+        usage = {
+            'exact': sum(arr.nbytes if arr.dtype != object else pd.Series(arr).memory_usage(deep=True)
+                         for arr in self._exact.values()),
+            'float32': sum(arr.nbytes for arr in self._floats.values()),
+            'flags': self._flags.nbytes,
+            'category': sum(codes.nbytes + cats.memory_usage(deep=True) for codes, cats in self._categories.values()),
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+    @property
+    def nbytes(self):
+        return self.memory_usage()['total']
+
+    def __repr__(self):
+        counts = pd.Series(self._kinds).value_counts().to_dict()
+        return f"CompactFrame({len(self)} 行, {counts}, {self.nbytes / 1024 / 1024:.1f}MB)"
+
+
+if __name__ == "__main__":
+    import time
+    from 指标模块 import sqzmom, ema, sma, shift
+
+    print("=" * 80)
+    print("🧪 紧凑帧内存对比")
+    print("=" * 80)
+
+    rng = np.random.default_rng(7)
+    for n in (2_000, 1_000_000):
+        close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+        high = close * (1 + rng.uniform(0, 0.002, n))
+        low = close * (1 - rng.uniform(0, 0.002, n))
+        df = pd.DataFrame({
+            'date': pd.date_range('2020-01-01', periods=n, freq='min'),
+            'open': close, 'high': high, 'low': low, 'close': close,
+            'volume': rng.uniform(1, 100, n),
+        })
+
+        # 与监控脚本 calculate_indicators 相同的列
+        hlc3 = (high + low + close) / 3
+        esa = ema(hlc3, 10)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ci = (hlc3 - esa) / (0.015 * ema(np.abs(hlc3 - esa), 10))
+        df['wt1'] = ema(ci, 21)
+        df['wt2'] = sma(df['wt1'].values, 4)
+        for key, value in sqzmom(high, low, close).items():
+            df[key] = value
+        df['adx'] = rng.uniform(5, 60, n)
+        df['ma14'] = sma(close, 14)
+        wt1_prev, wt2_prev = shift(df['wt1'].values), shift(df['wt2'].values)
+        df['wt_golden_cross'] = (wt1_prev < wt2_prev) & (df['wt1'] > df['wt2'])
+        df['wt_death_cross'] = (wt1_prev > wt2_prev) & (df['wt1'] < df['wt2'])
+        df['adx_up'] = (df['adx'] > 20) & (df['adx'] > shift(df['adx'].values))
+        df['highlight_green'] = df['sqz_off'] | df['is_lime']
+        df['period_label'] = rng.choice(['抄底区', '定投区', '持有区', '观望区'], n)
+
+        t0 = time.perf_counter()
+        cf = CompactFrame.from_frame(df)
+        t_build = time.perf_counter() - t0
+
+        before = df.memory_usage(deep=True).sum()
+        after = cf.nbytes
+
+        t0 = time.perf_counter()
+        decoded = cf.to_frame()
+        t_decode = time.perf_counter() - t0
+
+        flags_ok = all(np.array_equal(decoded[col].values, df[col].values)
+                       for col in df.columns if df[col].dtype == bool)
+        labels_ok = decoded['period_label'].equals(df['period_label'])
+        rel_err = np.nanmax(np.abs(decoded['wt1'] - df['wt1']) / np.maximum(np.abs(df['wt1']), 1))
+
+        print(f"{n:>9,} 行: pandas {before / 1024 / 1024:8.2f}MB → 紧凑 {after / 1024 / 1024:8.2f}MB "
+              f"({after / before:.0%}), 构建 {t_build * 1000:.0f}ms, 全量解码 {t_decode * 1000:.0f}ms")
+        print(f"            布尔列一致: {flags_ok}, 标签一致: {labels_ok}, float32相对误差: {rel_err:.1e}")
+        print(f"            {cf.memory_usage()}")
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+编译指标模块 - 递归型指标的融合内核（Numba编译，未安装时回退到NumPy/pandas）
+
+- ema:        = pandas ewm(span, adjust=False).mean()（含NaN语义）
+- rma:        Wilder平滑 = TV ta.rma（前 period 个值的SMA作为种子）
+- wavetrend:  esa → d → ci → wt1 → wt2 整条链在一个循环里完成，不产生中间数组
+- adx:        = talib.ADX / PLUS_DI / MINUS_DI（Wilder平滑）
+- adx_sma:    策略脚本中的简单移动平均版ADX（滚动和增量更新）
+
+HAS_NUMBA 为 False 时，同名函数使用向量化/pandas实现，结果一致（浮点误差内）。
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """未安装Numba：装饰器原样返回函数"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+
+def _as_float(x):
+    return np.ascontiguousarray(x, dtype=np.float64)
+
+
+# ============ Numba 内核 ============
+
+@njit(cache=True)
+def _ewm_step(mean, old_wt, x, alpha):
+    """pandas ewm(adjust=False) 的单步更新，返回 (mean, old_wt)"""
+    if mean == mean:  # 已开始
+        old_wt *= 1.0 - alpha
+        if x == x:
+            if mean != x:
+                mean = (old_wt * mean + alpha * x) / (old_wt + alpha)
+            old_wt = 1.0
+    elif x == x:
+        mean = x
+        old_wt = 1.0
+    return mean, old_wt
+
+
+@njit(cache=True)
+def _ema_kernel(x, alpha):
+    out = np.empty(x.shape[0])
+    mean, old_wt = np.nan, 1.0
+    for i in range(x.shape[0]):
+        mean, old_wt = _ewm_step(mean, old_wt, x[i], alpha)
+        out[i] = mean
+    return out
+
+
+@njit(cache=True)
+def _rma_kernel(x, period):
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    total, count, value = 0.0, 0, np.nan
+    for i in range(n):
+        if count < period:
+            if x[i] != x[i]:
+                total, count = 0.0, 0  # 种子窗口要求连续有效值
+                continue
+            total += x[i]
+            count += 1
+            if count == period:
+                value = total / period
+                out[i] = value
+        elif x[i] == x[i]:
+            value = (value * (period - 1) + x[i]) / period
+            out[i] = value
+    return out
+
+
+@njit(cache=True)
+def _wavetrend_kernel(src, n1, n2, state):
+    """
+    state（原地更新，可跨数据块延续）：
+    [esa, esa_wt, d, d_wt, wt1, wt1_wt, 已处理K线数, ring0..ring3]
+    """
+    n = src.shape[0]
+    wt1 = np.empty(n)
+    wt2 = np.full(n, np.nan)
+    a1 = 2.0 / (n1 + 1.0)
+    a2 = 2.0 / (n2 + 1.0)
+    esa, esa_wt, d, d_wt, w, w_wt = state[0], state[1], state[2], state[3], state[4], state[5]
+    seen = int(state[6])
+    ring = state[7:11]
+    for i in range(n):
+        esa, esa_wt = _ewm_step(esa, esa_wt, src[i], a1)
+        d, d_wt = _ewm_step(d, d_wt, abs(src[i] - esa), a1)
+        denom = 0.015 * d
+        ci = (src[i] - esa) / denom if denom != 0.0 else np.nan
+        w, w_wt = _ewm_step(w, w_wt, ci, a2)
+        wt1[i] = w
+        ring[seen % 4] = w
+        if seen >= 3:
+            wt2[i] = (ring[0] + ring[1] + ring[2] + ring[3]) / 4.0
+        seen += 1
+    state[0], state[1], state[2], state[3], state[4], state[5] = esa, esa_wt, d, d_wt, w, w_wt
+    state[6] = seen
+    return wt1, wt2
+
+
+def wavetrend_state():
+    """WaveTrend 初始状态"""
+    return np.array([np.nan, 1.0, np.nan, 1.0, np.nan, 1.0, 0.0, 0.0, 0.0, 0.0, 0.0])
+
+
+@njit(cache=True)
+def _adx_wilder_kernel(high, low, close, period, state):
+    """
+    TA-Lib ADX 算法（ta_ADX.c），输出 plus_di, minus_di, adx
+
+    state（原地更新，可跨数据块延续）：
+    [已处理K线数, 前高, 前低, 前收, +DM和, -DM和, TR和, DX和, 前ADX]
+    """
+    n = high.shape[0]
+    plus_di = np.full(n, np.nan)
+    minus_di = np.full(n, np.nan)
+    adx = np.full(n, np.nan)
+    seen = int(state[0])
+    prev_high, prev_low, prev_close = state[1], state[2], state[3]
+    prev_plus, prev_minus, prev_tr = state[4], state[5], state[6]
+    sum_dx, prev_adx = state[7], state[8]
+    for j in range(n):
+        i = seen + j
+        if i == 0:
+            prev_high, prev_low, prev_close = high[j], low[j], close[j]
+            continue
+        diff_p = high[j] - prev_high
+        diff_m = prev_low - low[j]
+        plus_dm, minus_dm = 0.0, 0.0
+        if diff_m > 0 and diff_p < diff_m:
+            minus_dm = diff_m
+        elif diff_p > 0 and diff_p > diff_m:
+            plus_dm = diff_p
+        tr = max(high[j] - low[j], abs(high[j] - prev_close), abs(low[j] - prev_close))
+        prev_high, prev_low, prev_close = high[j], low[j], close[j]
+
+        if i < period:
+            prev_plus += plus_dm
+            prev_minus += minus_dm
+            prev_tr += tr
+            continue
+
+        prev_plus = prev_plus - prev_plus / period + plus_dm
+        prev_minus = prev_minus - prev_minus / period + minus_dm
+        prev_tr = prev_tr - prev_tr / period + tr
+
+        dx = 0.0
+        if not (-1e-8 < prev_tr < 1e-8):
+            p = 100.0 * (prev_plus / prev_tr)
+            m = 100.0 * (prev_minus / prev_tr)
+            plus_di[j] = p
+            minus_di[j] = m
+            s = p + m
+            if not (-1e-8 < s < 1e-8):
+                dx = 100.0 * (abs(m - p) / s)
+
+        if i < 2 * period:
+            sum_dx += dx
+            if i == 2 * period - 1:
+                prev_adx = sum_dx / period
+                adx[j] = prev_adx
+        else:
+            prev_adx = (prev_adx * (period - 1) + dx) / period
+            adx[j] = prev_adx
+
+    state[0] = seen + n
+    state[1], state[2], state[3] = prev_high, prev_low, prev_close
+    state[4], state[5], state[6] = prev_plus, prev_minus, prev_tr
+    state[7], state[8] = sum_dx, prev_adx
+    return plus_di, minus_di, adx
+
+
+def adx_state():
+    """ADX(Wilder) 初始状态"""
+    return np.zeros(9)
+
+
+@njit(cache=True)
+def _adx_sma_kernel(high, low, close, period):
+    """简单移动平均版ADX：DM/TR/DX的滚动和在同一循环中增量维护"""
+    n = high.shape[0]
+    plus_di = np.full(n, np.nan)
+    minus_di = np.full(n, np.nan)
+    adx = np.full(n, np.nan)
+    plus_dm = np.zeros(n)
+    minus_dm = np.zeros(n)
+    tr = np.empty(n)
+    dx = np.full(n, np.nan)
+    sum_p, sum_m, sum_tr, sum_dx = 0.0, 0.0, 0.0, 0.0
+    dx_count, dx_missing = 0, 0  # 已产生的DX个数 / 当前窗口内的NaN个数
+    for i in range(n):
+        if i == 0:
+            tr[i] = high[i] - low[i]
+        else:
+            hd = high[i] - high[i - 1]
+            ld = low[i - 1] - low[i]
+            if hd > ld and hd > 0:
+                plus_dm[i] = hd
+            if ld > hd and ld > 0:
+                minus_dm[i] = ld
+            tr[i] = max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+        sum_p += plus_dm[i]
+        sum_m += minus_dm[i]
+        sum_tr += tr[i]
+        if i >= period:
+            sum_p -= plus_dm[i - period]
+            sum_m -= minus_dm[i - period]
+            sum_tr -= tr[i - period]
+        if i >= period - 1:
+            # 平盘窗口（TR和/DI和为0）：DI、DX为NaN，与pandas回退的 0/0 一致
+            atr = sum_tr / period
+            if not (-1e-8 < atr < 1e-8):
+                p = 100.0 * (sum_p / period / atr)
+                m = 100.0 * (sum_m / period / atr)
+                plus_di[i] = p
+                minus_di[i] = m
+                s = p + m
+                if not (-1e-8 < s < 1e-8):
+                    dx[i] = 100.0 * abs(p - m) / s
+            # DX滚动和只累加有效值，窗口内有NaN时ADX为NaN（= rolling().mean()），移出后恢复
+            if dx[i] == dx[i]:
+                sum_dx += dx[i]
+            else:
+                dx_missing += 1
+            dx_count += 1
+            if dx_count > period:
+                old = dx[i - period]
+                if old == old:
+                    sum_dx -= old
+                else:
+                    dx_missing -= 1
+            if dx_count >= period and dx_missing == 0:
+                adx[i] = sum_dx / period
+    return plus_di, minus_di, adx
+
+
+# ============ NumPy / pandas 回退 ============
+
+def _ema_numpy(x, span):
+    return pd.Series(x).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def _rma_numpy(x, period):
+    """SMA种子 + ewm(alpha=1/period)：与Wilder递推等价"""
+    out = np.full(x.shape[0], np.nan)
+    valid = ~np.isnan(x)
+    run = np.convolve(valid.astype(np.int64), np.ones(period, dtype=np.int64), mode='full')[:len(x)]
+    seeds = np.flatnonzero(run == period)
+    if len(seeds) == 0:
+        return out
+    start = seeds[0]
+    seeded = x[start:].copy()
+    seeded[0] = x[start - period + 1:start + 1].mean()
+    out[start:] = pd.Series(seeded).ewm(alpha=1.0 / period, adjust=False, ignore_na=True).mean().to_numpy()
+    out[start:][np.isnan(x[start:])] = np.nan
+    return out
+
+
+def _wavetrend_numpy(src, n1, n2):
+    src = pd.Series(src)
+    esa = src.ewm(span=n1, adjust=False).mean()
+    d = (src - esa).abs().ewm(span=n1, adjust=False).mean()
+    ci = (src - esa) / (0.015 * d)
+    wt1 = ci.ewm(span=n2, adjust=False).mean()
+    return wt1.to_numpy(), wt1.rolling(window=4).mean().to_numpy()
+
+
+def _true_range(high, low, close):
+    prev_close = np.r_[np.nan, close[:-1]]
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def _wilder_sum_numpy(x, period):
+    """TA-Lib的Wilder平滑：以 x[1..period-1] 之和起步，从第 period 根开始递推（已除以period）"""
+    out = np.full(x.shape[0], np.nan)
+    if x.shape[0] <= period:
+        return out
+    seeded = np.r_[x[1:period].sum() / period, x[period:]]
+    out[period - 1:] = pd.Series(seeded).ewm(alpha=1.0 / period, adjust=False).mean().to_numpy()
+    return out
+
+
+def _adx_wilder_numpy(high, low, close, period):
+    diff_p = np.r_[np.nan, np.diff(high)]
+    diff_m = np.r_[np.nan, -np.diff(low)]
+    is_minus = (diff_m > 0) & (diff_p < diff_m)
+    minus_dm = np.where(is_minus, diff_m, 0.0)
+    plus_dm = np.where(~is_minus & (diff_p > 0) & (diff_p > diff_m), diff_p, 0.0)
+    tr = _true_range(high, low, close)
+    sm_p = _wilder_sum_numpy(plus_dm, period)
+    sm_m = _wilder_sum_numpy(minus_dm, period)
+    sm_tr = _wilder_sum_numpy(tr, period)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        plus_di = 100 * (sm_p / sm_tr)
+        minus_di = 100 * (sm_m / sm_tr)
+    plus_di[:period] = np.nan
+    minus_di[:period] = np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dx = 100 * (np.abs(minus_di - plus_di) / (plus_di + minus_di))
+    # ADX：前 period 个DX的均值作种子，之后Wilder递推
+    return plus_di, minus_di, _rma_numpy(dx, period)
+
+
+def _adx_sma_numpy(high, low, close, period):
+    h, l, c = pd.Series(high), pd.Series(low), pd.Series(close)
+    high_diff = h.diff()
+    low_diff = -l.diff()
+    plus_dm = high_diff.where((high_diff > low_diff) & (high_diff > 0), 0)
+    minus_dm = low_diff.where((low_diff > high_diff) & (low_diff > 0), 0)
+    tr = pd.Series(_true_range(high, low, close))
+    atr = tr.rolling(window=period).mean()
+    plus_di = 100 * (plus_dm.rolling(window=period).mean() / atr)
+    minus_di = 100 * (minus_dm.rolling(window=period).mean() / atr)
+    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
+    return plus_di.to_numpy(), minus_di.to_numpy(), dx.rolling(window=period).mean().to_numpy()
+
+
+# ============ 对外接口 ============
+
+def ema(x, span):
+    """指数移动平均（pandas ewm(span, adjust=False) 口径）"""
+    x = _as_float(x)
+    return _ema_kernel(x, 2.0 / (span + 1.0)) if HAS_NUMBA else _ema_numpy(x, span)
+
+
+def rma(x, period):
+    """Wilder平滑（TV ta.rma）"""
+    x = _as_float(x)
+    return _rma_kernel(x, int(period)) if HAS_NUMBA else _rma_numpy(x, int(period))
+
+
+def wavetrend(high, low, close, n1=10, n2=21, source='hlc3'):
+    """WaveTrend 融合内核，返回 (wt1, wt2)；source='close' 对应 真实BTC高置信度策略 口径"""
+    close = _as_float(close)
+    src = (_as_float(high) + _as_float(low) + close) / 3 if source == 'hlc3' else close
+    return _wavetrend_kernel(src, int(n1), int(n2), wavetrend_state()) if HAS_NUMBA \
+        else _wavetrend_numpy(src, n1, n2)
+
+
+def adx(high, low, close, period=14):
+    """ADX（Wilder平滑，= talib.ADX），返回 (plus_di, minus_di, adx)"""
+    args = (_as_float(high), _as_float(low), _as_float(close), int(period))
+    return _adx_wilder_kernel(*args, adx_state()) if HAS_NUMBA else _adx_wilder_numpy(*args)
+
+
+def adx_sma(high, low, close, period=14):
+    """ADX（简单移动平均版，与策略脚本 calculate_adx 一致），返回 (plus_di, minus_di, adx)"""
+    args = (_as_float(high), _as_float(low), _as_float(close), int(period))
+    return _adx_sma_kernel(*args) if HAS_NUMBA else _adx_sma_numpy(*args)
+
+
+def wavetrend_chunk(high, low, close, state, n1=10, n2=21, source='hlc3'):
+    """
+    分块计算WaveTrend：state 由 wavetrend_state() 创建，调用后原地更新，
+    依次喂入各数据块，结果与整段计算逐位一致（未安装Numba时以纯Python执行）
+    """
+    close = _as_float(close)
+    src = (_as_float(high) + _as_float(low) + close) / 3 if source == 'hlc3' else close
+    return _wavetrend_kernel(src, int(n1), int(n2), state)
+
+
+def adx_chunk(high, low, close, state, period=14):
+    """分块计算ADX(Wilder)：state 由 adx_state() 创建，调用后原地更新"""
+    return _adx_wilder_kernel(_as_float(high), _as_float(low), _as_float(close), int(period), state)
+
+
+if __name__ == "__main__":
+    import time
+
+    print("=" * 80)
+    print(f"🧪 编译指标基准测试（Numba: {'已安装' if HAS_NUMBA else '未安装，使用回退实现'}）")
+    print("=" * 80)
+
+    try:
+        import talib
+    except ImportError:
+        talib = None
+
+    def timed(fn, *args, repeat=3):
+        best = float('inf')
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = fn(*args)
+            best = min(best, time.perf_counter() - t0)
+        return best, result
+
+    rng = np.random.default_rng(0)
+    for n in (2_000, 100_000, 5_000_000):
+        close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+        high = close * (1 + rng.uniform(0, 0.003, n))
+        low = close * (1 - rng.uniform(0, 0.003, n))
+        repeat = 1 if n > 1_000_000 else 3
+        print(f"\n📊 {n:,} 根K线")
+
+        t_fast, (wt1, wt2) = timed(wavetrend, high, low, close, 10, 21, 'hlc3', repeat=repeat)
+        t_ref, (ref1, ref2) = timed(_wavetrend_numpy, (high + low + close) / 3, 10, 21, repeat=repeat)
+        err = max(np.nanmax(np.abs(wt1 - ref1)), np.nanmax(np.abs(wt2 - ref2)))
+        print(f"  WaveTrend  融合 {t_fast*1000:8.1f}ms | pandas {t_ref*1000:8.1f}ms | 误差 {err:.1e}")
+
+        t_fast, (_, _, a) = timed(adx_sma, high, low, close, 14, repeat=repeat)
+        t_ref, (_, _, ref) = timed(_adx_sma_numpy, high, low, close, 14, repeat=repeat)
+        print(f"  ADX(SMA)   融合 {t_fast*1000:8.1f}ms | pandas {t_ref*1000:8.1f}ms | "
+              f"误差 {np.nanmax(np.abs(a - ref)):.1e}")
+
+        t_fast, (_, _, a) = timed(adx, high, low, close, 14, repeat=repeat)
+        t_np, (_, _, ref) = timed(_adx_wilder_numpy, high, low, close, 14, repeat=repeat)
+        line = f"  ADX(Wilder) 融合 {t_fast*1000:7.1f}ms | NumPy {t_np*1000:8.1f}ms | 误差 {np.nanmax(np.abs(a - ref)):.1e}"
+        if talib is not None:
+            t_ta, ta = timed(talib.ADX, high, low, close, 14, repeat=repeat)
+            line += f" | talib {t_ta*1000:.1f}ms 误差 {np.nanmax(np.abs(a - ta)):.1e}"
+        print(line)
+
+        t_fast, r = timed(rma, close, 14, repeat=repeat)
+        t_np, ref = timed(_rma_numpy, close, 14, repeat=repeat)
+        print(f"  RMA        融合 {t_fast*1000:8.1f}ms | NumPy {t_np*1000:8.1f}ms | 误差 {np.nanmax(np.abs(r - ref)):.1e}")
+
+    # 平盘段（TR和为0）：DI/DX为NaN，ADX在平盘段移出窗口后恢复，编译内核与pandas回退一致
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, 400)))
+    high, low = close * 1.003, close * 0.997
+    close[100:160] = high[100:160] = low[100:160] = close[99]
+    fast, ref = adx_sma(high, low, close, 14), _adx_sma_numpy(high, low, close, 14)
+    same_nan = all(np.array_equal(np.isnan(a), np.isnan(b)) for a, b in zip(fast, ref))
+    err = max(np.nanmax(np.abs(a - b)) for a, b in zip(fast, ref))
+    print(f"\n📊 平盘段ADX(SMA): NaN位置一致={same_nan} | 误差 {err:.1e} | "
+          f"平盘段之后ADX有效 {int(np.isfinite(fast[2][200:]).sum())}/200")
+    assert same_nan and err < 1e-9
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则模块 - 入场/出场条件的小型表达式语言
+
+同一条规则字符串编译两次：
+- 向量版：整段历史一次得到 bool 掩码（回测、参数扫描、日报统计）
+- 标量版：单根K线 row['列'] 直接判断（实时监控）
+两者逻辑完全相同，不再在 check_entry_signals / get_entry_conditions /
+check_entry_signals_detailed 里各写一遍。
+
+语法（Python表达式子集）：
+    列名、数字、True/False
+    and / or / not、括号
+    < <= > >= == !=（支持连写 -30 < wt1 < 0）
+    + - * /、abs()
+
+用法：
+    rules = RuleSet({1: 'wt1 < -25 and wt_golden_cross', 2: 'sqz_off and is_lime and wt1 > wt2'})
+    rules.check(df.iloc[-1])     # {1: False, 2: True}
+    rules.masks(df)              # {1: bool数组, 2: bool数组}
+    rules.hit_counts(df)         # 每个子条件的命中次数
+"""
+
+import ast
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+_COMPARE_OPS = (ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+_ARITH_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div)
+_FUNCTIONS = {'abs'}
+
+
+# ============ 编译 ============
+
+def _validate(tree, expr):
+    """只允许白名单内的语法"""
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.Not, ast.USub, ast.UAdd,
+                             ast.Load) + _COMPARE_OPS + _ARITH_OPS):
+            continue
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub, ast.UAdd)):
+            continue
+        if isinstance(node, ast.BinOp) and isinstance(node.op, _ARITH_OPS):
+            continue
+        if isinstance(node, ast.Compare) and all(isinstance(op, _COMPARE_OPS) for op in node.ops):
+            continue
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, bool)):
+            continue
+        if isinstance(node, ast.Name):
+            continue
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS \
+                and len(node.args) == 1 and not node.keywords:
+            continue
+        raise ValueError(f"规则语法不支持 {type(node).__name__}: {expr}")
+
+
+def _call(func, *args):
+    return ast.Call(func=ast.Name(id=func, ctx=ast.Load()), args=list(args), keywords=[])
+
+
+class _VectorTransformer(ast.NodeTransformer):
+    """and/or/not → 逐元素逻辑运算，列名 → _col('列名')"""
+
+    def visit_Name(self, node):
+        if node.id in ('True', 'False'):
+            return ast.Constant(value=node.id == 'True')
+        return _call('_col', ast.Constant(value=node.id))
+
+    def visit_Call(self, node):
+        return _call('_abs', self.visit(node.args[0]))
+
+    def visit_BoolOp(self, node):
+        values = [self.visit(v) for v in node.values]
+        return _call('_and' if isinstance(node.op, ast.And) else '_or', *values)
+
+    def visit_UnaryOp(self, node):
+        operand = self.visit(node.operand)
+        if isinstance(node.op, ast.Not):
+            return _call('_not', operand)
+        return ast.UnaryOp(op=node.op, operand=operand)
+
+    def visit_Compare(self, node):
+        operands = [self.visit(node.left)] + [self.visit(c) for c in node.comparators]
+        pairs = [ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]])
+                 for i, op in enumerate(node.ops)]
+        return pairs[0] if len(pairs) == 1 else _call('_and', *pairs)
+
+
+class _ScalarTransformer(ast.NodeTransformer):
+    """列名 → _row['列名']，其余保持Python原生语义（短路求值）"""
+
+    def visit_Name(self, node):
+        if node.id in ('True', 'False'):
+            return ast.Constant(value=node.id == 'True')
+        return ast.Subscript(value=ast.Name(id='_row', ctx=ast.Load()),
+                             slice=ast.Constant(value=node.id), ctx=ast.Load())
+
+
+def _as_bool(x):
+    return np.asarray(x, dtype=bool)
+
+
+_VECTOR_FUNCS = {
+    '_and': lambda *xs: np.logical_and.reduce([_as_bool(x) for x in xs]),
+    '_or': lambda *xs: np.logical_or.reduce([_as_bool(x) for x in xs]),
+    '_not': lambda x: ~_as_bool(x),
+    '_abs': np.abs,
+}
+
+
+def _compile(tree, transformer, label):
+    tree = ast.fix_missing_locations(transformer.visit(tree))
+    return compile(tree, f'<规则 {label}>', 'eval')
+
+
+def _column(frame, name):
+    """DataFrame / dict / CompactFrame 取列 → ndarray"""
+    if isinstance(frame, pd.DataFrame):
+        return frame[name].to_numpy()
+    return np.asarray(frame[name])
+
+
+class Rule:
+    """一条规则（已编译）"""
+
+    def __init__(self, expr, name=None):
+        tree = ast.parse(expr.strip(), mode='eval')
+        _validate(tree, expr)
+        self.expr = ast.unparse(tree)
+        self.name = name if name is not None else self.expr
+        self.columns = tuple(sorted({node.id for node in ast.walk(tree)
+                                     if isinstance(node, ast.Name) and node.id not in _FUNCTIONS | {'True', 'False'}}))
+        body = tree.body
+        if isinstance(body, ast.BoolOp) and isinstance(body.op, ast.And):
+            self.conditions = [ast.unparse(v) for v in body.values]
+        else:
+            self.conditions = [self.expr]
+        self._vector = _compile(ast.parse(self.expr, mode='eval'), _VectorTransformer(), self.expr)
+        self._scalar = _compile(ast.parse(self.expr, mode='eval'), _ScalarTransformer(), self.expr)
+
+    def __repr__(self):
+        return f"Rule({self.expr!r})"
+
+    def check(self, row):
+        """单根K线判断（row 为 Series / dict）"""
+        return bool(eval(self._scalar, {'abs': abs}, {'_row': row}))
+
+    def mask(self, frame, _columns=None):
+        """整段历史 → bool数组"""
+        columns = {} if _columns is None else _columns
+
+        def col(name):
+            if name not in columns:
+                columns[name] = _column(frame, name)
+            return columns[name]
+
+        result = eval(self._vector, dict(_VECTOR_FUNCS, _col=col))
+        n = len(col(self.columns[0])) if self.columns else 1
+        return np.broadcast_to(_as_bool(result), (n,)).copy()
+
+
+@lru_cache(maxsize=512)
+def compile_rule(expr):
+    """按表达式文本缓存编译结果"""
+    return Rule(expr)
+
+
+class RuleSet:
+    """
+    一组有序规则（如四个仓位的入场条件）
+
+    子条件（顶层 and 拆分后的各项）按文本去重：多条规则共用的
+    'sqz_off'、'wt1 > wt2' 等在向量计算时只算一次。
+    """
+
+    def __init__(self, rules, labels=None):
+        """
+        Args:
+            rules: {键: 表达式}，如 {1: 'wt1 < -25 and wt_golden_cross', ...}
+            labels: {子条件表达式: 说明模板}，模板可用 {列名} 引用当前值，用于邮件说明
+        """
+        self.rules = {key: Rule(expr, name=key) for key, expr in rules.items()}
+        self.labels = {compile_rule(cond).expr: text for cond, text in (labels or {}).items()}
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __getitem__(self, key):
+        return self.rules[key]
+
+    def keys(self):
+        return list(self.rules)
+
+    @property
+    def columns(self):
+        return tuple(sorted({col for rule in self.rules.values() for col in rule.columns}))
+
+    # ---------- 单根K线 ----------
+    def check(self, row):
+        """{键: bool}"""
+        return {key: rule.check(row) for key, rule in self.rules.items()}
+
+    def explain(self, key, row, passed='✅', failed='❌'):
+        """逐个子条件的说明文字，如 ['WT1=-31.2 < -25 ✅', 'WT金叉 ❌']"""
+        lines = []
+        for cond in self.rules[key].conditions:
+            template = self.labels.get(cond, cond)
+            try:
+                text = template.format(**{col: row[col] for col in compile_rule(cond).columns})
+            except (KeyError, ValueError, TypeError):
+                text = template
+            lines.append(f"{text} {passed if compile_rule(cond).check(row) else failed}")
+        return lines
+
+    # ---------- 整段历史 ----------
+    def condition_masks(self, frame):
+        """{子条件表达式: bool数组}（共用子条件只算一次）"""
+        columns, masks = {}, {}
+        for rule in self.rules.values():
+            for cond in rule.conditions:
+                if cond not in masks:
+                    masks[cond] = compile_rule(cond).mask(frame, columns)
+        return masks
+
+    def masks(self, frame):
+        """{键: bool数组}"""
+        cond_masks = self.condition_masks(frame)
+        return {key: np.logical_and.reduce([cond_masks[c] for c in rule.conditions])
+                for key, rule in self.rules.items()}
+
+    def matrix(self, frame):
+        """(K线数, 规则数) bool矩阵，列顺序同 keys()，回测循环里按行下标取"""
+        masks = self.masks(frame)
+        return np.column_stack([masks[key] for key in self.rules])
+
+    def hit_counts(self, frame):
+        """
+        每条规则各子条件的命中统计
+
+        Returns:
+            DataFrame: rule, condition, hits（单独满足）, cumulative（前面子条件同时满足）,
+            每条规则最后一行 condition='全部'
+        """
+        cond_masks = self.condition_masks(frame)
+        rows = []
+        for key, rule in self.rules.items():
+            running = None
+            for cond in rule.conditions:
+                mask = cond_masks[cond]
+                running = mask if running is None else running & mask
+                rows.append({'rule': key, 'condition': cond, 'hits': int(mask.sum()),
+                             'cumulative': int(running.sum())})
+            rows.append({'rule': key, 'condition': '全部', 'hits': int(running.sum()),
+                         'cumulative': int(running.sum())})
+        return pd.DataFrame(rows)
+
+
+# ============ 共用规则 ============
+
+# 监控脚本（【邮箱提示】指标提醒 等）：snake_case 列名
+MONITOR_ENTRY_RULES = RuleSet({
+    1: 'wt1 < -25 and wt_golden_cross',
+    2: 'sqz_off and is_lime and wt1 > wt2',
+    3: 'sqz_off and is_lime and wt1 > wt2 and close > ma14',
+    4: 'sqz_off and is_lime and wt1 > wt2 and close > ma14 and adx_up',
+}, labels={
+    'wt1 < -25': 'WT1={wt1:.1f} < -25',
+    'wt_golden_cross': 'WT金叉',
+    'sqz_off': '挤压释放',
+    'is_lime': '动能增强(Lime)',
+    'wt1 > wt2': 'WT1({wt1:.1f}) > WT2({wt2:.1f})',
+    'close > ma14': '价格(${close:,.0f}) > MA14(${ma14:,.0f})',
+    'adx_up': 'ADX>20且上升',
+})
+
+# TradingView策略脚本（真实BTC高置信度策略 等）：camelCase 列名
+TV_ENTRY_RULES = RuleSet({
+    1: 'wtGoldenCross and wt1 < -20',
+    2: 'sqzOff and isLime and wt1 > wt2',
+    3: 'priceStructConfirmed and sqzOff and isLime and wt1 > wt2',
+    4: 'adx > 20 and priceStructConfirmed and sqzOff and isLime and wt1 > wt2',
+})
+
+
+if __name__ == "__main__":
+    import time
+
+    print("=" * 80)
+    print("🧪 规则编译：向量掩码 vs 逐行判断")
+    print("=" * 80)
+
+    rng = np.random.default_rng(11)
+    n = 200_000
+    wt1 = rng.normal(0, 40, n)
+    df = pd.DataFrame({
+        'close': 30000 + rng.normal(0, 500, n).cumsum(),
+        'wt1': wt1,
+        'wt2': wt1 + rng.normal(0, 5, n),
+        'wt_golden_cross': rng.random(n) < 0.05,
+        'sqz_off': rng.random(n) < 0.4,
+        'is_lime': rng.random(n) < 0.3,
+        'adx_up': rng.random(n) < 0.3,
+    })
+    df['ma14'] = df['close'].rolling(14).mean()
+
+    t0 = time.perf_counter()
+    masks = MONITOR_ENTRY_RULES.masks(df)
+    t_vector = time.perf_counter() - t0
+
+    sample = df.iloc[:20_000]
+    t0 = time.perf_counter()
+    rows = [MONITOR_ENTRY_RULES.check(row) for _, row in sample.iterrows()]
+    t_scalar = time.perf_counter() - t0
+
+    consistent = all(np.array_equal(masks[key][:len(sample)], [r[key] for r in rows])
+                     for key in MONITOR_ENTRY_RULES)
+    print(f"向量: {n:,} 根 {t_vector * 1000:.1f}ms; 逐行: {len(sample):,} 根 {t_scalar * 1000:.0f}ms "
+          f"(折合每根 {t_scalar / len(sample) * 1e6:.0f}µs vs {t_vector / n * 1e6:.3f}µs)")
+    print(f"向量与逐行结果一致: {consistent}")
+    print()
+    print(MONITOR_ENTRY_RULES.hit_counts(df).to_string(index=False))
+    print()
+    print('第4仓说明:', MONITOR_ENTRY_RULES.explain(4, df.iloc[-1]))
+    print('连写比较:', compile_rule('-30 < wt1 < 0 and not sqz_off').mask(df).sum(), '根')
@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+邮件发件箱模块 - 落盘的邮件队列：失败重试、幂等、批量投递
+
+- Outbox：邮件先写入 spool/pending/*.json 再投递，进程退出或网络故障都不会丢失提醒；
+  失败按指数退避（带抖动）重试，超过 max_attempts 移入 dead/，成功移入 sent/
+- 幂等键：同一个键只会入队/投递一次（sent/ 中的记录保留 keep_sent_days 天）；
+  Resend 请求带 Idempotency-Key 头，SMTP 邮件的 Message-ID 由键生成，重试不会重复收信
+- 批量：flush() 把到期的邮件按 transport.batch_size 分批（Resend /emails/batch 一次最多100封，
+  SMTP 一个会话内连续发送）
+- ResendTransport / SMTPTransport：两种投递方式；SMTPTransport 保持一个持久会话，
+  多封邮件只登录一次，断线自动重连
+- LocalSMTPServer / StubHTTPEndpoint：本地SMTP替身和HTTP桩，用于离线测试投递与重试
+
+用法：
+    outbox = Outbox('K线数据/邮件发件箱', ResendTransport(api_key, sender, [receiver]))
+    key = outbox.enqueue(subject, html, key='BTCUSDT|入场1|2024-05-01')
+    outbox.deliver(key)       # 立即尝试投递这一封
+    outbox.drain(timeout=60)  # 运行结束前把失败的邮件按退避重试
+"""
+
+import hashlib
+import json
+import os
+import random
+import smtplib
+import socketserver
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _message_id(key):
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _write_json(path, data):
+    """先写临时文件再替换，避免中途退出留下半个文件"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+# ============ 投递方式 ============
+
+class ResendTransport:
+    """Resend HTTP API（单封 /emails，多封 /emails/batch）"""
+
+    batch_size = 100
+
+    def __init__(self, api_key, sender, to, base_url='https://api.resend.com', timeout=30, session=None):
+        import requests
+        self.api_key = api_key
+        self.sender = sender
+        self.to = list(to)
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def _payload(self, message):
+        return {'from': self.sender, 'to': message.get('to') or self.to,
+                'subject': message['subject'], 'html': message['html']}
+
+    def send_batch(self, messages):
+        """
+        Returns:
+            [(是否成功, 错误信息, 是否可重试), ...]，与 messages 一一对应
+        """
+        if len(messages) == 1:
+            url, body = f'{self.base_url}/emails', self._payload(messages[0])
+            idempotency_key = messages[0]['id']
+        else:
+            url, body = f'{self.base_url}/emails/batch', [self._payload(m) for m in messages]
+            idempotency_key = _message_id('|'.join(m['id'] for m in messages))
+        headers = {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json',
+                   'Idempotency-Key': idempotency_key}
+        try:
+            response = self.session.post(url, headers=headers, json=body, timeout=self.timeout)
+        except Exception as e:
+            return [(False, f'{type(e).__name__}: {e}', True)] * len(messages)
+        if response.status_code == 200:
+            return [(True, None, False)] * len(messages)
+        error = f'HTTP {response.status_code}: {response.text[:200]}'
+        return [(False, error, response.status_code in RETRYABLE_STATUS)] * len(messages)
+
+    def close(self):
+        self.session.close()
+
+
+class SMTPTransport:
+    """SMTP 持久会话：首次发送时连接并登录，之后复用同一连接，断线自动重连"""
+
+    batch_size = 50
+
+    def __init__(self, host, port, username=None, password=None, sender=None, to=None,
+                 use_ssl=True, starttls=False, timeout=30, debug=0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+        self.to = list(to or [])
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.timeout = timeout
+        self.debug = debug
+        self._server = None
+        self._lock = threading.Lock()
+        self.stats = {'connects': 0, 'sent': 0}
+
+    def _connect(self):
+        cls = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        server = cls(self.host, self.port, timeout=self.timeout)
+        server.set_debuglevel(self.debug)
+        if self.starttls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self.stats['connects'] += 1
+        return server
+
+    def _session(self):
+        """返回可用的会话（NOOP 探测，失效时重连）"""
+        if self._server is not None:
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._drop()
+        self._server = self._connect()
+        return self._server
+
+    def _drop(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    def build(self, message):
+        """message dict → MIME 邮件（Message-ID 由幂等键生成）"""
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self.sender
+        msg['To'] = ', '.join(message.get('to') or self.to)
+        msg['Subject'] = message['subject']
+        msg['Message-ID'] = f"<{message['id']}@btc-monitor>"
+        msg.attach(MIMEText(message['html'], 'html', 'utf-8'))
+        return msg
+
+    def send_batch(self, messages):
+        results = []
+        with self._lock:
+            for message in messages:
+                try:
+                    server = self._session()
+                    server.send_message(self.build(message))
+                    self.stats['sent'] += 1
+                    results.append((True, None, False))
+                except smtplib.SMTPResponseException as e:
+                    # 4xx 临时错误可重试，5xx 永久错误（认证失败、收件人被拒等）
+                    if e.smtp_code == 421:
+                        self._drop()
+                    results.append((False, f'SMTP {e.smtp_code}: {e.smtp_error!r}', 400 <= e.smtp_code < 500))
+                except (smtplib.SMTPException, OSError) as e:
+                    self._drop()
+                    results.append((False, f'{type(e).__name__}: {e}', True))
+        return results
+
+    def close(self):
+        with self._lock:
+            self._drop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ============ 发件箱 ============
+
+class Outbox:
+    """落盘邮件队列"""
+
+    def __init__(self, spool_dir, transport, max_attempts=6, base_delay=2.0, max_delay=300.0, keep_sent_days=7):
+        self.spool_dir = str(spool_dir)
+        self.transport = transport
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dirs = {state: os.path.join(self.spool_dir, state) for state in ('pending', 'sent', 'dead')}
+        for path in self.dirs.values():
+            os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._in_flight = set()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._worker = None
+
+        self.pending = {}
+        for name in os.listdir(self.dirs['pending']):
+            if name.endswith('.json'):
+                with open(os.path.join(self.dirs['pending'], name), encoding='utf-8') as f:
+                    message = json.load(f)
+                self.pending[message['id']] = message
+        cutoff = time.time() - keep_sent_days * 86400
+        self.sent = set()
+        for name in os.listdir(self.dirs['sent']):
+            path = os.path.join(self.dirs['sent'], name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+            elif name.endswith('.json'):
+                self.sent.add(name[:-5])
+        if self.pending:
+            print(f"📮 发件箱中有 {len(self.pending)} 封待投递邮件")
+
+    def _path(self, state, message_id):
+        return os.path.join(self.dirs[state], f'{message_id}.json')
+
+    def enqueue(self, subject, html, key=None, to=None):
+        """
+        邮件入队（先落盘）
+
+        Args:
+            key: 幂等键（如 'BTCUSDT|入场1|2024-05-01'），省略时按 标题+正文 生成
+
+        Returns:
+            邮件ID（同一个键重复入队返回同一个ID，不会重复投递）
+        """
+        key = key or f'{subject}\n{html}'
+        message_id = _message_id(key)
+        with self._lock:
+            if message_id in self.pending or message_id in self.sent:
+                return message_id
+            message = {'id': message_id, 'key': key, 'subject': subject, 'html': html, 'to': to,
+                       'created_at': time.time(), 'attempts': 0, 'next_attempt_at': 0.0, 'last_error': None}
+            _write_json(self._path('pending', message_id), message)
+            self.pending[message_id] = message
+        self._wake.set()
+        return message_id
+
+    def _claim(self, message_ids):
+        with self._lock:
+            claimed = [self.pending[i] for i in message_ids if i in self.pending and i not in self._in_flight]
+            self._in_flight.update(m['id'] for m in claimed)
+        return claimed
+
+    def _settle(self, messages, results, now):
+        counts = {'sent': 0, 'retry': 0, 'dead': 0}
+        # 同一批共用一个抖动系数：重试时仍是同一批（同一个批量幂等键）
+        jitter = random.uniform(0.8, 1.2)
+        failures = []
+        with self._lock:
+            for message, (ok, error, retryable) in zip(messages, results):
+                message_id = message['id']
+                self._in_flight.discard(message_id)
+                message['attempts'] += 1
+                message['last_error'] = error
+                if ok:
+                    state = 'sent'
+                    self.sent.add(message_id)
+                elif retryable and message['attempts'] < self.max_attempts:
+                    delay = min(self.max_delay, self.base_delay * 2 ** (message['attempts'] - 1))
+                    message['next_attempt_at'] = now + delay * jitter
+                    _write_json(self._path('pending', message_id), message)
+                    counts['retry'] += 1
+                    failures.append((message, delay, error))
+                    continue
+                else:
+                    state = 'dead'
+                    print(f"❌ 投递失败，不再重试: {message['subject']} ({error})")
+                _write_json(self._path(state, message_id), message)
+                os.remove(self._path('pending', message_id))
+                del self.pending[message_id]
+                counts[state] += 1
+        if failures:
+            message, delay, error = failures[0]
+            more = f" 等{len(failures)}封" if len(failures) > 1 else ""
+            print(f"⏳ 投递失败，第{message['attempts']}次，{delay:.1f}s 后重试: {message['subject']}{more} ({error})")
+        return counts
+
+    def deliver(self, message_id):
+        """立即投递一封（不管退避时间），返回是否已送达"""
+        if message_id in self.sent:
+            return True
+        claimed = self._claim([message_id])
+        if not claimed:
+            return message_id in self.sent
+        self._settle(claimed, self.transport.send_batch(claimed), time.time())
+        return message_id in self.sent
+
+    def flush(self, now=None):
+        """投递所有到期的邮件（按 transport.batch_size 分批），返回 {'sent', 'retry', 'dead'} 计数"""
+        now = time.time() if now is None else now
+        with self._lock:
+            due = sorted((m for m in self.pending.values() if m['next_attempt_at'] <= now),
+                         key=lambda m: m['created_at'])
+        claimed = self._claim([m['id'] for m in due])
+        counts = {'sent': 0, 'retry': 0, 'dead': 0}
+        size = max(1, getattr(self.transport, 'batch_size', 1))
+        for start in range(0, len(claimed), size):
+            batch = claimed[start:start + size]
+            for state, count in self._settle(batch, self.transport.send_batch(batch), time.time()).items():
+                counts[state] += count
+        return counts
+
+    def next_due(self):
+        """距离下一封到期邮件的秒数（没有待投递邮件时为None）"""
+        with self._lock:
+            if not self.pending:
+                return None
+            return max(0.0, min(m['next_attempt_at'] for m in self.pending.values()) - time.time())
+
+    def drain(self, timeout=60):
+        """反复投递直到队列为空或超时；未送达的邮件留在磁盘，下次运行继续。返回是否全部送达"""
+        deadline = time.time() + timeout
+        while True:
+            self.flush()
+            wait = self.next_due()
+            if wait is None:
+                return True
+            if time.time() + wait > deadline:
+                print(f"📮 {len(self.pending)} 封邮件未送达，已保存在发件箱，下次运行重试")
+                return False
+            time.sleep(wait)
+
+    # ---------- 后台投递线程（常驻进程用） ----------
+
+    def start(self, poll_interval=30):
+        if self._worker is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                self.flush()
+                wait = self.next_due()
+                self._wake.wait(poll_interval if wait is None else min(wait, poll_interval))
+                self._wake.clear()
+
+        self._worker = threading.Thread(target=run, name='outbox', daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        if self._worker is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._worker.join()
+        self._worker = None
+
+
+# ============ 本地替身（测试用） ============
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """最小SMTP会话：EHLO/HELO、AUTH、MAIL、RCPT、DATA、NOOP、RSET、QUIT"""
+
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 localhost ESMTP stand-in')
+        lines, in_data = [], False
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            if in_data:
+                if line == '.':
+                    in_data = False
+                    with server.lock:
+                        server.data_commands += 1
+                        fail = server.data_commands <= server.fail_first
+                        if not fail:
+                            server.messages.append('\n'.join(lines))
+                    self.reply('451 temporary failure' if fail else '250 OK queued')
+                    lines = []
+                else:
+                    lines.append(line[1:] if line.startswith('..') else line)
+                continue
+            command = line[:4].upper()
+            if command == 'EHLO':
+                self.wfile.write(b'250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n')
+            elif command == 'HELO':
+                self.reply('250 localhost')
+            elif command == 'AUTH':
+                self.reply('235 Authentication successful')
+            elif command == 'DATA':
+                in_data = True
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:  # MAIL / RCPT / NOOP / RSET
+                self.reply('250 OK')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    本地SMTP替身：记录收到的邮件与连接次数，前 fail_first 封返回 451（临时失败）
+
+        with LocalSMTPServer() as smtp:
+            SMTPTransport(smtp.host, smtp.port, use_ssl=False, ...)
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, fail_first=0):
+        super().__init__((host, port), _SMTPHandler)
+        self.host, self.port = self.server_address
+        self.fail_first = fail_first
+        self.messages = []
+        self.connections = 0
+        self.data_commands = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubHTTPEndpoint(ThreadingHTTPServer):
+    """
+    Resend API 桩：按 statuses 依次返回状态码（用完后返回200），记录每个请求
+
+        with StubHTTPEndpoint(statuses=[503]) as stub:
+            ResendTransport('key', sender, [to], base_url=stub.url)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, statuses=()):
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'null')
+                with endpoint.lock:
+                    status = endpoint.statuses.pop(0) if endpoint.statuses else 200
+                    endpoint.requests.append({'path': self.path, 'status': status, 'body': body,
+                                              'idempotency_key': self.headers.get('Idempotency-Key')})
+                if isinstance(body, list):
+                    reply = {'data': [{'id': f'stub-{i}'} for i in range(len(body))]}
+                else:
+                    reply = {'id': 'stub'}
+                data = json.dumps(reply if status == 200 else {'message': 'stub error'}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        super().__init__((host, port), Handler)
+        self.statuses = list(statuses)
+        self.requests = []
+        self.lock = threading.Lock()
+        self.url = f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("=" * 80)
+    print("🧪 发件箱：落盘 + 退避重试 + 幂等 + 批量")
+    print("=" * 80)
+
+    # 1. SMTP：持久会话，第1封临时失败后重试
+    with LocalSMTPServer(fail_first=1) as smtp:
+        transport = SMTPTransport(smtp.host, smtp.port, 'monitor@example.com', 'secret',
+                                  to=['me@example.com'], use_ssl=False)
+        outbox = Outbox(tempfile.mkdtemp(prefix='发件箱_'), transport, base_delay=0.05)
+        keys = [outbox.enqueue(f'提醒{i}', f'<p>{i}</p>', key=f'BTCUSDT|入场|{i}') for i in range(5)]
+        outbox.enqueue('提醒0', '<p>0</p>', key='BTCUSDT|入场|0')  # 重复入队被忽略
+        delivered = outbox.drain(timeout=5)
+        transport.close()
+        print(f"SMTP: 入队6次（1次重复），送达 {len(smtp.messages)} 封，全部送达={delivered}，"
+              f"SMTP连接 {smtp.connections} 次（登录 {transport.stats['connects']} 次）")
+
+    # 2. HTTP：120封分两批，第一批503后用同一个 Idempotency-Key 重试
+    with StubHTTPEndpoint(statuses=[503]) as stub:
+        transport = ResendTransport('re_test', 'BTC Monitor <monitor@example.com>', ['me@example.com'],
+                                    base_url=stub.url)
+        outbox = Outbox(tempfile.mkdtemp(prefix='发件箱_'), transport, base_delay=0.05)
+        for i in range(120):
+            outbox.enqueue(f'观察列表提醒{i}', f'<p>{i}</p>', key=f'SYM{i}|出场|2024-05-01')
+        t0 = time.perf_counter()
+        delivered = outbox.drain(timeout=5)
+        paths = [r['path'] for r in stub.requests]
+        keys = [r['idempotency_key'] for r in stub.requests]
+        print(f"HTTP: 120封 → {len(stub.requests)} 次请求 {paths}，"
+              f"重试沿用幂等键={keys[0] == keys[-1] or keys[0] in keys[1:]}，全部送达={delivered}，"
+              f"{time.perf_counter() - t0:.2f}s")
+
+    # 3. 持久化：投递失败后进程退出，新进程从磁盘恢复并投递
+    spool = tempfile.mkdtemp(prefix='发件箱_')
+    down = SMTPTransport('127.0.0.1', 9, use_ssl=False, timeout=0.5)  # 无服务端口
+    outbox = Outbox(spool, down)
+    key = outbox.enqueue('宕机时的提醒', '<p>!</p>', key='BTCUSDT|出场|2024-05-02')
+    print(f"宕机投递: {outbox.deliver(key)}")
+    with LocalSMTPServer() as smtp:
+        recovered = Outbox(spool, SMTPTransport(smtp.host, smtp.port, use_ssl=False, to=['me@example.com']))
+        print(f"重启后恢复 {len(recovered.pending)} 封，立即投递: {recovered.deliver(key)}，收到 {len(smtp.messages)} 封")
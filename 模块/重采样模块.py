@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重采样模块 - 由小周期K线（1m/1h）聚合出4h、日线、周线
+
+聚合规则：open=first, high=max, low=min, close=last, volume=sum
+- resample_ohlcv: 一次性向量化聚合（np.*.reduceat）
+- IncrementalResampler: 流式聚合，新K线到来时只更新最后一个周期
+- StoreResampler: 基于CandleStore，只把新增的基础K线喂给各目标周期（多周期模块4h层的 base_interval 路径）
+"""
+
+import numpy as np
+import pandas as pd
+
+from K线存储模块 import INTERVAL_MS
+
+WEEK_MS = 7 * INTERVAL_MS['1d']
+# 1970-01-01是周四，周线按周一00:00 UTC对齐（与Binance一致）
+WEEK_OFFSET_MS = 4 * INTERVAL_MS['1d']
+
+RULE_MS = dict(INTERVAL_MS, **{'1w': WEEK_MS})
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
+
+
+def to_ms(dates):
+    return pd.to_datetime(pd.Series(dates)).values.astype('datetime64[ms]').astype(np.int64)
+
+
+def bucket_ids(open_ms, rule):
+    """开盘时间 -> 目标周期编号"""
+    if rule == '1w':
+        return (np.asarray(open_ms) - WEEK_OFFSET_MS) // WEEK_MS
+    return np.asarray(open_ms) // RULE_MS[rule]
+
+
+def bucket_start(bucket_id, rule):
+    """目标周期编号 -> 开盘时间（毫秒）"""
+    if rule == '1w':
+        return np.asarray(bucket_id) * WEEK_MS + WEEK_OFFSET_MS
+    return np.asarray(bucket_id) * RULE_MS[rule]
+
+
+def _aggregate(ids, o, h, l, c, v):
+    """对已排序的周期编号做分组聚合，返回 (组编号, open, high, low, close, volume)"""
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    ends = np.r_[starts[1:], len(ids)] - 1
+    return (ids[starts], o[starts], np.maximum.reduceat(h, starts), np.minimum.reduceat(l, starts),
+            c[ends], np.add.reduceat(v, starts))
+
+
+def resample_ohlcv(df, rule):
+    """
+    一次性重采样
+
+    Args:
+        df: 按时间升序的K线 (date, open, high, low, close, volume)
+        rule: '4h' / '1d' / '1w' 等
+    """
+    if len(df) == 0:
+        return pd.DataFrame(columns=['date'] + OHLCV)
+
+    ids = bucket_ids(to_ms(df['date']), rule)
+    cols = [df[col].to_numpy(dtype=np.float64) for col in OHLCV]
+    gid, o, h, l, c, v = _aggregate(ids, *cols)
+    return pd.DataFrame({
+        'date': pd.to_datetime(bucket_start(gid, rule), unit='ms'),
+        'open': o, 'high': h, 'low': l, 'close': c, 'volume': v
+    })
+
+
+def _combine(a, b):
+    """合并两段聚合结果（a在前，b在后）"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (a[0], max(a[1], b[1]), min(a[2], b[2]), b[3], a[4] + b[4])
+
+
+class IncrementalResampler:
+    """
+    流式重采样器
+
+    状态只包含当前未完成周期：
+    - _prefix: 该周期内除最后一根基础K线外的聚合
+    - _last: 最后一根基础K线（未收盘K线会被同开盘时间的新数据替换）
+    新K线到来时只聚合新K线本身，历史周期不再重算。
+    """
+
+    def __init__(self, rule):
+        self.rule = rule
+        self._completed = {'date_ms': [], 'open': [], 'high': [], 'low': [], 'close': [], 'volume': []}
+        self._bucket = None
+        self._prefix = None
+        self._last = None
+        self._last_open_ms = None
+
+    def _emit(self, bucket, bar):
+        self._completed['date_ms'].append(int(bucket_start(bucket, self.rule)))
+        for key, value in zip(OHLCV, bar):
+            self._completed[key].append(float(value))
+
+    def update(self, bars):
+        """
+        喂入新的基础K线（升序），返回本次新完成的目标周期K线
+        """
+        open_ms = to_ms(bars['date'])
+        cols = [bars[col].to_numpy(dtype=np.float64) for col in OHLCV]
+        n_completed = len(self._completed['date_ms'])
+
+        if self._last_open_ms is not None:
+            # 同开盘时间 = 未收盘K线的更新，替换_last
+            revision = np.flatnonzero(open_ms == self._last_open_ms)
+            if len(revision):
+                i = revision[-1]
+                self._last = tuple(col[i] for col in cols)
+            keep = open_ms > self._last_open_ms
+            open_ms = open_ms[keep]
+            cols = [col[keep] for col in cols]
+
+        if len(open_ms) == 0:
+            return self._completed_since(n_completed)
+
+        ids = bucket_ids(open_ms, self.rule)
+        current = _combine(self._prefix, self._last)
+
+        # 新数据最后一组需要拆出 _last，单独聚合其余部分
+        gid, o, h, l, c, v = _aggregate(ids[:-1], *[col[:-1] for col in cols]) if len(ids) > 1 \
+            else (np.array([], dtype=np.int64),) + (np.array([]),) * 5
+        groups = [(int(g), (o[k], h[k], l[k], c[k], v[k])) for k, g in enumerate(gid)]
+        last_bucket = int(ids[-1])
+        last_bar = tuple(col[-1] for col in cols)
+
+        # 与当前未完成周期合并
+        if self._bucket is not None:
+            if groups and groups[0][0] == self._bucket:
+                groups[0] = (self._bucket, _combine(current, groups[0][1]))
+            elif last_bucket == self._bucket and not groups:
+                groups = [(self._bucket, current)]
+            elif self._bucket < (groups[0][0] if groups else last_bucket):
+                self._emit(self._bucket, current)
+
+        # 除最后一个周期外全部完成
+        prefix = None
+        for bucket, bar in groups:
+            if bucket == last_bucket:
+                prefix = bar
+            else:
+                self._emit(bucket, bar)
+
+        self._bucket = last_bucket
+        self._prefix = prefix
+        self._last = last_bar
+        self._last_open_ms = int(open_ms[-1])
+        return self._completed_since(n_completed)
+
+    def _completed_since(self, n):
+        data = {key: values[n:] for key, values in self._completed.items()}
+        return self._to_frame(data)
+
+    def _to_frame(self, data):
+        return pd.DataFrame({
+            'date': pd.to_datetime(np.asarray(data['date_ms'], dtype=np.int64), unit='ms'),
+            **{key: np.asarray(data[key], dtype=np.float64) for key in OHLCV}
+        })
+
+    def current(self):
+        """当前未完成周期（无则返回None）"""
+        if self._bucket is None:
+            return None
+        bar = _combine(self._prefix, self._last)
+        return dict(date=pd.Timestamp(int(bucket_start(self._bucket, self.rule)), unit='ms'),
+                    **dict(zip(OHLCV, bar)))
+
+    def frame(self, include_partial=True):
+        """已完成周期 + （可选）当前未完成周期"""
+        df = self._to_frame(self._completed)
+        partial = self.current() if include_partial else None
+        if partial is not None:
+            df = pd.concat([df, pd.DataFrame([partial])], ignore_index=True)
+        return df
+
+
+class StoreResampler:
+    """CandleStore视图：由基础周期生成多个目标周期，只处理新增基础K线"""
+
+    def __init__(self, candle_store, symbol='BTCUSDT', base_interval='1h', rules=('4h', '1d', '1w')):
+        self.store = candle_store
+        self.symbol = symbol
+        self.base_interval = base_interval
+        self.resamplers = {rule: IncrementalResampler(rule) for rule in rules}
+        self._seen_ms = None  # 已喂入的最后一根基础K线开盘时间
+
+    def refresh(self):
+        """读取存储中的新K线（含最后一根的更新）并增量聚合"""
+        bars = self.store.load(self.symbol, self.base_interval)
+        if len(bars) == 0:
+            return self
+        if self._seen_ms is not None:
+            open_ms = to_ms(bars['date'])
+            start = int(np.searchsorted(open_ms, self._seen_ms, side='left'))
+            bars = bars.iloc[start:]
+        if len(bars):
+            for resampler in self.resamplers.values():
+                resampler.update(bars)
+            self._seen_ms = int(to_ms(bars['date'].iloc[-1:])[0])
+        return self
+
+    def get(self, rule, include_partial=True):
+        return self.resamplers[rule].frame(include_partial)
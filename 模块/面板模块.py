@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+面板模块 - 多币种数据对齐为 (币种 × 日期) 矩阵，指标一次向量化算完
+
+- build_panel: 多个单币种DataFrame按日期并集对齐，上市前/缺失日为NaN
+- panel_indicators: WaveTrend / SQZMOM / ADX / ATR 等沿日期轴计算
+  （口径与 真实BTC高置信度策略.calculate_all_indicators 一致）
+- Panel.symbol_frame: 取回单个币种的有效行
+"""
+
+import numpy as np
+import pandas as pd
+
+from 指标模块 import sma, shift, ema, linreg_slope
+from 滚动统计模块 import rolling_moments
+
+PANEL_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+
+class Panel:
+    """(币种 × 日期) 价格面板"""
+
+    def __init__(self, symbols, dates, fields):
+        self.symbols = list(symbols)
+        self.dates = pd.DatetimeIndex(dates)
+        self.fields = fields  # {字段: (S, D) ndarray}
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    @property
+    def shape(self):
+        return len(self.symbols), len(self.dates)
+
+    @property
+    def valid(self):
+        """(S, D) 有效行掩码"""
+        return np.isfinite(self.fields['close'])
+
+    def symbol_years(self):
+        """有效数据总量（币种·年）"""
+        return float(self.valid.sum()) / 365.25
+
+    def symbol_frame(self, symbol, columns=None):
+        """单个币种的有效行 -> DataFrame"""
+        s = self.symbols.index(symbol)
+        mask = self.valid[s]
+        columns = columns or list(self.fields)
+        data = {'date': self.dates[mask]}
+        data.update({col: self.fields[col][s, mask] for col in columns})
+        return pd.DataFrame(data).reset_index(drop=True)
+
+
+def build_panel(frames, normalize=True):
+    """
+    多币种对齐
+
+    Args:
+        frames: {symbol: DataFrame(date, open, high, low, close, volume)}
+        normalize: 日期取整到自然日（日线）；日内周期传 False
+    """
+    symbols = [symbol for symbol, df in frames.items() if df is not None and len(df)]
+    normalized = {}
+    for symbol in symbols:
+        df = frames[symbol]
+        dates = pd.to_datetime(df['date'])
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_convert(None)
+        if normalize:
+            dates = dates.dt.normalize()
+        normalized[symbol] = df.assign(date=dates).drop_duplicates('date', keep='last')
+
+    calendar = pd.DatetimeIndex(sorted(set().union(*(set(df['date']) for df in normalized.values()))))
+    fields = {field: np.full((len(symbols), len(calendar)), np.nan) for field in PANEL_FIELDS}
+    for s, symbol in enumerate(symbols):
+        df = normalized[symbol]
+        pos = calendar.get_indexer(df['date'])
+        for field in PANEL_FIELDS:
+            if field in df.columns:
+                fields[field][s, pos] = df[field].to_numpy(dtype=np.float64)
+    return Panel(symbols, calendar, fields)
+
+
+def _diff(x):
+    return x - shift(x)
+
+
+def panel_indicators(panel, wt_channel=10, wt_average=21, adx_length=14, atr_length=14,
+                     length_bb=20, mult_bb=2.0, length_kc=20, mult_kc=1.5):
+    """
+    面板指标（沿日期轴，一次覆盖全部币种）
+
+    口径：SQZMOM布林带为样本标准差、动能值为斜率×(n-1)；WaveTrend取close；
+    ADX/ATR用简单移动平均——与 真实BTC高置信度策略 的pandas实现一致。
+
+    Returns:
+        dict: 列名 -> (S, D) 数组，列名与 calculate_all_indicators 相同
+    """
+    high, low, close = panel['high'], panel['low'], panel['close']
+    out = {}
+
+    # 融合滚动矩：同一窗口长度只遍历一次
+    moments = {}
+
+    def window(period):
+        if period not in moments:
+            moments[period] = rolling_moments(close, period, high, low, ddof=1)
+        return moments[period]
+
+    # SQZMOM
+    basis = window(length_bb)['mean']
+    dev = mult_bb * window(length_bb)['std']
+    ma_kc = window(length_kc)['mean']
+    range_ma = window(length_kc)['range_mean']
+    out['sqzOn'] = (basis - dev > ma_kc - range_ma * mult_kc) & (basis + dev < ma_kc + range_ma * mult_kc)
+    out['sqzOff'] = (basis - dev < ma_kc - range_ma * mult_kc) & (basis + dev > ma_kc + range_ma * mult_kc)
+    avg_all = ((window(length_kc)['max'] + window(length_kc)['min']) / 2 + ma_kc) / 2
+    val = linreg_slope(close - avg_all, length_kc)
+    val_prev = shift(val)
+    out['val'] = val
+    out['isLime'] = (val > 0) & (val > val_prev)
+    out['isGreen'] = (val > 0) & (val < val_prev)
+    out['isRed'] = (val < 0) & (val < val_prev)
+    out['isMaroon'] = (val < 0) & (val > val_prev)
+
+    # WaveTrend（close）
+    esa = ema(close, wt_channel)
+    de = ema(np.abs(close - esa), wt_channel)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ci = (close - esa) / (0.015 * de)
+    wt1 = ema(ci, wt_average)
+    wt2 = sma(wt1, 4)
+    wt1_prev, wt2_prev = shift(wt1), shift(wt2)
+    out['wt1'] = wt1
+    out['wt2'] = wt2
+    out['wtGoldenCross'] = (wt1_prev < wt2_prev) & (wt1 > wt2)
+    out['wtDeathCross'] = (wt1_prev > wt2_prev) & (wt1 < wt2)
+
+    # ADX（DM缺失按0处理，与 pandas where(cond, 0) 一致）
+    high_diff = _diff(high)
+    low_diff = -_diff(low)
+    plus_dm = np.where((high_diff > low_diff) & (high_diff > 0), high_diff, 0.0)
+    minus_dm = np.where((low_diff > high_diff) & (low_diff > 0), low_diff, 0.0)
+    listed = np.isfinite(close)
+    plus_dm = np.where(listed, plus_dm, np.nan)
+    minus_dm = np.where(listed, minus_dm, np.nan)
+    atr = window(atr_length)['range_mean']
+    adx_atr = window(adx_length)['range_mean']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        plus_di = 100 * (sma(plus_dm, adx_length) / adx_atr)
+        minus_di = 100 * (sma(minus_dm, adx_length) / adx_atr)
+        dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+    out['plusDI'] = plus_di
+    out['minusDI'] = minus_di
+    out['adx'] = sma(dx, adx_length)
+    out['atr'] = atr
+
+    # 均线与结构信号
+    out['ma14'] = sma(close, 14)
+    out['ma21'] = sma(close, 21)
+    out['ma60'] = sma(close, 60)
+    out['ema10'] = ema(close, 10)
+    out['ema20'] = ema(close, 20)
+    out['sma14'] = out['ma14']
+    out['sma24'] = sma(close, 24)
+    out['priceStructConfirmed'] = close > out['ma14']
+    out['longCondition'] = out['ma21'] > out['ma60']
+    lime_prev = np.zeros_like(out['isLime'])
+    lime_prev[:, 1:] = out['isLime'][:, :-1]
+    out['trendExit'] = (out['sma14'] < out['sma24']) & (lime_prev & ~out['isLime'])
+    return out
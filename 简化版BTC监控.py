@@ -9,16 +9,26 @@ import numpy as np
 import requests
 from datetime import datetime, timedelta
 import warnings
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
+import sys
+from pathlib import Path
 warnings.filterwarnings('ignore')
 
+sys.path.append(str(Path(__file__).parent / '模块'))
+from 邮件发件箱模块 import Outbox, SMTPTransport
+
 class SimpleBTCIndicatorMonitor:
     def __init__(self, email_config=None):
         """简化版BTC技术指标监控系统"""
         self.email_config = email_config or {}
+        self.outbox = None
+        if self.email_config.get('sender_email'):
+            # SMTP持久会话：多封邮件只连接/登录一次；邮件先落盘，失败按指数退避重试
+            self.smtp = SMTPTransport(self.email_config.get('smtp_server', 'smtp.qq.com'),
+                                      self.email_config.get('smtp_port', 465),
+                                      self.email_config['sender_email'], self.email_config['sender_password'],
+                                      to=[self.email_config['receiver_email']])
+            self.outbox = Outbox(Path(__file__).parent / 'K线数据' / '邮件发件箱_SMTP', self.smtp)
         
     def send_email(self, subject, body, is_alert=False):
         """发送邮件"""
@@ -26,48 +36,36 @@ class SimpleBTCIndicatorMonitor:
             print(f"⚠️ 邮箱未配置，跳过发送: {subject}")
             return False
         
-        try:
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.email_config['sender_email']
-            msg['To'] = self.email_config['receiver_email']
-            
-            if is_alert:
-                msg['Subject'] = f"🚨 {subject}"
-            else:
-                msg['Subject'] = f"📊 {subject}"
-            
-            html_body = f"""
-            <html>
-            <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; }}
-                table {{ border-collapse: collapse; width: 100%; margin: 10px 0; }}
-                th {{ background-color: #4CAF50; color: white; padding: 10px; text-align: left; }}
-                td {{ border: 1px solid #ddd; padding: 8px; }}
-                tr:nth-child(even) {{ background-color: #f2f2f2; }}
-                .alert {{ background-color: #fff3cd; padding: 15px; margin: 10px 0; border-left: 5px solid #ff9800; }}
-                .success {{ background-color: #e8f5e9; padding: 15px; margin: 10px 0; border-left: 5px solid #4CAF50; }}
-            </style>
-            </head>
-            <body>
-                {body}
-            </body>
-            </html>
-            """
-            
-            msg.attach(MIMEText(html_body, 'html'))
-            
-            # 使用SSL连接发送邮件
-            with smtplib.SMTP_SSL('smtp.qq.com', 465) as server:
-                server.login(self.email_config['sender_email'], self.email_config['sender_password'])
-                server.send_message(msg)
-            
+        if is_alert:
+            subject = f"🚨 {subject}"
+        else:
+            subject = f"📊 {subject}"
+        
+        html_body = f"""
+        <html>
+        <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; }}
+            table {{ border-collapse: collapse; width: 100%; margin: 10px 0; }}
+            th {{ background-color: #4CAF50; color: white; padding: 10px; text-align: left; }}
+            td {{ border: 1px solid #ddd; padding: 8px; }}
+            tr:nth-child(even) {{ background-color: #f2f2f2; }}
+            .alert {{ background-color: #fff3cd; padding: 15px; margin: 10px 0; border-left: 5px solid #ff9800; }}
+            .success {{ background-color: #e8f5e9; padding: 15px; margin: 10px 0; border-left: 5px solid #4CAF50; }}
+        </style>
+        </head>
+        <body>
+            {body}
+        </body>
+        </html>
+        """
+        
+        message_id = self.outbox.enqueue(subject, html_body)
+        if self.outbox.deliver(message_id):
             print(f"✅ 邮件已发送: {subject}")
             return True
-            
-        except Exception as e:
-            print(f"❌ 邮件发送失败: {e}")
-            return False
+        print(f"❌ 邮件发送失败，已保存在发件箱: {subject}")
+        return False
     
     def get_btc_data(self):
         """获取BTC数据"""
@@ -345,6 +343,9 @@ class SimpleBTCIndicatorMonitor:
             body=daily_report,
             is_alert=False
         )
+        if self.outbox is not None:
+            self.outbox.drain(timeout=120)
+            self.smtp.close()
         
         print("\n✅ 监控完成")
 